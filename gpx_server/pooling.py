@@ -0,0 +1,60 @@
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import connections
+
+
+def warm_up(timeout: Optional[float] = None) -> Dict[str, int]:
+    """
+    Open the connection pools of all databases, and wait until each has its minimum amount of connections, so the
+    first requests of a worker do not connect. Databases that can not be reached within the timeout are skipped
+
+    :param timeout: seconds to wait per pool, defaults to DB_POOL_TIMEOUT
+    :return: open connections per database
+    """
+    timeout = settings.DB_POOL_TIMEOUT if timeout is None else timeout
+    opened = {}
+    for alias in settings.DATABASES:
+        pool = connections[alias].pool
+        if pool is None:
+            continue
+        from psycopg_pool import PoolTimeout
+        pool.open()
+        try:
+            pool.wait(timeout)
+        except PoolTimeout:
+            # The pool keeps connecting in the background
+            pass
+        opened[alias] = pool.get_stats()['pool_size']
+    return opened
+
+
+def pool_statistics() -> Dict[str, dict]:
+    """
+    Usage of the connection pools of this process per database, since they were opened: size, saturation (part of
+    the maximum size in use) and the time requests waited for a connection. Empty when pooling is disabled
+    """
+    statistics = {}
+    for alias in settings.DATABASES:
+        pool = connections[alias].pool
+        if pool is None:
+            continue
+        stats = pool.get_stats()
+        requests, in_use = stats.get('requests_num', 0), stats['pool_size'] - stats['pool_available']
+        connections_opened = stats.get('connections_num', 0)
+        statistics[alias] = {
+            'size': stats['pool_size'],
+            'max_size': stats['pool_max'],
+            'in_use': in_use,
+            'available': stats['pool_available'],
+            'saturation': in_use / stats['pool_max'],
+            'waiting': stats.get('requests_waiting', 0),
+            'requests': requests,
+            'requests_queued': stats.get('requests_queued', 0),
+            'wait_ms_avg': stats.get('requests_wait_ms', 0) / requests if requests else 0,
+            'timeouts': stats.get('requests_errors', 0),
+            'connections_opened': connections_opened,
+            'connect_ms_avg': stats.get('connections_ms', 0) / connections_opened if connections_opened else 0,
+            'connections_lost': stats.get('connections_lost', 0) + stats.get('returns_bad', 0),
+        }
+    return statistics
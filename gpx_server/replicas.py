@@ -0,0 +1,187 @@
+import hashlib
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+from typing import Optional, List, Dict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, DEFAULT_DB_ALIAS, DatabaseError
+
+# Queries per database since the start of the process
+QUERY_COUNTS = Counter()
+# Replication lag of the replicas: alias -> (checked at (monotonic), lag in seconds or None when unreachable)
+_replica_lags: Dict[str, tuple] = {}
+# Reads of the current request, None outside of requests (commands): everything runs on the default database
+_request_reads = ContextVar('replica_request_reads', default=None)
+# Apps of which the rows are read right after they are written by another request (login), always on the default
+PRIMARY_APPS = {'knox', 'sessions'}
+
+# Seconds the replica is behind, 0 when it replayed everything it received (an idle primary sends nothing) or when
+# it is not a replica (the test mirror)
+LAG_SQL = '''
+    SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END
+'''
+
+
+def replica_lag(alias: str) -> Optional[float]:
+    """
+    Replication lag of a replica, checked at most every REPLICA_LAG_CHECK_SECONDS
+
+    :param alias: database alias of the replica
+    :return: lag in seconds, None when the replica can not be reached
+    """
+    now = time.monotonic()
+    checked = _replica_lags.get(alias)
+    if checked and now - checked[0] < settings.REPLICA_LAG_CHECK_SECONDS:
+        return checked[1]
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            lag = float(cursor.fetchone()[0])
+    except DatabaseError:
+        lag = None
+    _replica_lags[alias] = (now, lag)
+    return lag
+
+
+def available_replicas() -> List[str]:
+    """Replicas that can be reached and are at most REPLICA_MAX_LAG_SECONDS behind"""
+    return [
+        alias for alias in settings.DATABASE_REPLICAS
+        if (lag := replica_lag(alias)) is not None and lag <= settings.REPLICA_MAX_LAG_SECONDS
+    ]
+
+
+def query_counts() -> Dict[str, int]:
+    """Queries per database since the start of the process"""
+    return dict(QUERY_COUNTS)
+
+
+class RequestReads:
+    """
+    Database of the reads of one request. Reads go to a replica when the view allows it (`replica_reads`), until
+    the request writes anything (select_for_update counts as a write); the replica is chosen at the first read
+    """
+
+    def __init__(self):
+        self.replica_reads = False
+        self.database = None
+        self.queries = Counter()
+
+    def read_database(self) -> str:
+        if not self.replica_reads:
+            return DEFAULT_DB_ALIAS
+        if self.database is None:
+            replicas = available_replicas()
+            self.database = random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+        return self.database
+
+    def wrote(self) -> None:
+        # Read your own writes
+        self.replica_reads = False
+
+    def counter(self, alias: str):
+        """Execute wrapper counting the queries on a database"""
+        def count(execute, sql, params, many, context):
+            self.queries[alias] += 1
+            QUERY_COUNTS[alias] += 1
+            return execute(sql, params, many, context)
+        return count
+
+
+class ReplicaRouter:
+    """
+    Database router sending the reads of the views with `replica_reads` to the replicas of the default database
+    (DATABASE_REPLICAS), see ReplicaMiddleware. Writes, and reads outside of these views, stay on the default
+    database. Migrations do not run on the replicas, they follow the default database
+    """
+
+    def db_for_read(self, model, **hints):
+        reads = _request_reads.get()
+        if reads is None or not settings.DATABASE_REPLICAS or model._meta.app_label in PRIMARY_APPS:
+            return None
+        database = reads.read_database()
+        return None if database == DEFAULT_DB_ALIAS else database
+
+    def db_for_write(self, model, **hints):
+        reads = _request_reads.get()
+        if reads is not None:
+            reads.wrote()
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in settings.DATABASE_REPLICAS:
+            # Rows read from a replica are written to the default database
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Rows read from a replica are the rows of the default database
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaMiddleware:
+    """
+    Middleware keeping the reads of a request (see ReplicaRouter) and counting its queries per database.
+
+    Reads go to a replica for safe requests (GET, HEAD, OPTIONS) to views with `replica_reads = True`. A client
+    (token or session) that wrote something stays on the default database for REPLICA_STICKY_SECONDS, so a user who
+    just updated a meter reads it back from the default database
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reads = RequestReads()
+        token = _request_reads.set(reads)
+        try:
+            with ExitStack() as stack:
+                for alias in settings.DATABASES:
+                    stack.enter_context(connections[alias].execute_wrapper(reads.counter(alias)))
+                response = self.get_response(request)
+        finally:
+            _request_reads.reset(token)
+
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+            self.pin(request)
+        if settings.DATABASE_QUERIES_HEADER:
+            response['X-Database-Queries'] = ', '.join(
+                f'{alias}={count}' for alias, count in sorted(reads.queries.items())
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        reads = _request_reads.get()
+        if reads is None or request.method not in ('GET', 'HEAD', 'OPTIONS') or self.pinned(request):
+            return None
+        # Class based views (and the API views) keep their class on the view function
+        reads.replica_reads = getattr(getattr(view_func, 'view_class', None), 'replica_reads', False)
+        return None
+
+    @staticmethod
+    def client_key(request) -> Optional[str]:
+        """Cache key of the client of a request: its token or session, None for anonymous requests"""
+        credentials = request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        if not credentials:
+            return None
+        return 'replica-pin:%s' % hashlib.sha256(credentials.encode()).hexdigest()
+
+    def pin(self, request) -> None:
+        key = self.client_key(request)
+        if key and settings.DATABASE_REPLICAS:
+            cache.set(key, True, settings.REPLICA_STICKY_SECONDS)
+
+    def pinned(self, request) -> bool:
+        key = self.client_key(request)
+        return bool(key and settings.DATABASE_REPLICAS and cache.get(key))
@@ -61,6 +61,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'gpx_server.replicas.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'gpx_server.urls'
@@ -98,7 +99,7 @@ EMAIL_PORT = 587
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'django.db.backends.postgresql',
         'USER': os.environ.get('GPX_DB_USER', 'gpx_manager'),
         'NAME': os.environ.get('GPX_DB_NAME', 'gpx_data'),
         'PASSWORD': os.environ.get('GPX_DB_PASSWORD', 'gpx_password'),
@@ -107,6 +108,70 @@ DATABASES = {
     },
 }
 
+
+def _database_aliases(variable, base, **extra):
+    """
+    Databases of an environment variable, comma separated `alias=name` or `alias=host:port/name`, with the user and
+    password (and the host and port when not given) of the base database
+    :return: dict of alias and database settings
+    """
+    databases = {}
+    for database in filter(None, os.environ.get(variable, '').split(',')):
+        alias, location = database.strip().split('=')
+        server, _, name = location.rpartition('/')
+        host, _, port = server.partition(':')
+        databases[alias] = {**base, 'NAME': name, 'HOST': host or base['HOST'], 'PORT': port or base['PORT'], **extra}
+    return databases
+
+
+# Measurement databases besides the default database, in the format of _database_aliases. These have the full
+# schema, but only hold the measurements of the meters placed on them (see smart_meter.sharding)
+_measurement_databases = _database_aliases('GPX_MEASUREMENT_DATABASES', DATABASES['default'])
+DATABASES.update(_measurement_databases)
+MEASUREMENT_DATABASES = ['default', *_measurement_databases]
+
+# Read replicas of the default database (streaming replication), in the same format. Reads of the views with
+# `replica_reads` go to a replica (see gpx_server.replicas). In the tests a replica mirrors the default database
+_replicas = _database_aliases('GPX_DATABASE_REPLICAS', DATABASES['default'], TEST={'MIRROR': 'default'})
+DATABASES.update(_replicas)
+DATABASE_REPLICAS = list(_replicas)
+# Replicas that are behind more than this amount of seconds are skipped, the lag is checked at most every
+# REPLICA_LAG_CHECK_SECONDS per process
+REPLICA_MAX_LAG_SECONDS = float(os.environ.get('GPX_REPLICA_MAX_LAG_SECONDS', 5))
+REPLICA_LAG_CHECK_SECONDS = float(os.environ.get('GPX_REPLICA_LAG_CHECK_SECONDS', 5))
+# After a write, the reads of the same client (token or session) stay on the default database for this amount of
+# seconds. Pinned clients are kept in the cache, which has to be shared with multiple processes (CACHES)
+REPLICA_STICKY_SECONDS = int(os.environ.get('GPX_REPLICA_STICKY_SECONDS', 10))
+# Add the amount of queries per database to the responses (X-Database-Queries header)
+DATABASE_QUERIES_HEADER = DEBUG
+
+DATABASE_ROUTERS = ['smart_meter.sharding.MeasurementRouter', 'gpx_server.replicas.ReplicaRouter']
+
+# Connection pool per database and process (psycopg_pool), requests borrow a connection instead of connecting. Each
+# worker opens DB_POOL_MIN_SIZE connections per database at start (gpx_server.pooling.warm_up) and at most
+# DB_POOL_MAX_SIZE; a request waits at most DB_POOL_TIMEOUT seconds for a free connection. Connections are checked
+# before they are handed out, and replaced after DB_POOL_MAX_LIFETIME seconds. A max size of 0 disables the pool
+# (a new connection per request)
+DB_POOL_MIN_SIZE = int(os.environ.get('GPX_DB_POOL_MIN_SIZE', 1))
+DB_POOL_MAX_SIZE = int(os.environ.get('GPX_DB_POOL_MAX_SIZE', 4))
+DB_POOL_TIMEOUT = float(os.environ.get('GPX_DB_POOL_TIMEOUT', 10))
+DB_POOL_MAX_IDLE = float(os.environ.get('GPX_DB_POOL_MAX_IDLE', 600))
+DB_POOL_MAX_LIFETIME = float(os.environ.get('GPX_DB_POOL_MAX_LIFETIME', 3600))
+DB_POOL_WARMUP = os.environ.get('GPX_DB_POOL_WARMUP', 'true').lower() == 'true'
+if DB_POOL_MAX_SIZE:
+    for _database in DATABASES.values():
+        _database['CONN_HEALTH_CHECKS'] = True
+        _database['OPTIONS'] = {
+            **_database.get('OPTIONS', {}),
+            'pool': {
+                'min_size': min(DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE),
+                'max_size': DB_POOL_MAX_SIZE,
+                'timeout': DB_POOL_TIMEOUT,
+                'max_idle': DB_POOL_MAX_IDLE,
+                'max_lifetime': DB_POOL_MAX_LIFETIME,
+            },
+        }
+
 # Authentication
 
 AUTH_USER_MODEL = 'users.User'
@@ -183,6 +248,67 @@ REST_KNOX = {
 
 # endregion
 
+# region measurement storage
+
+# Measurement tables are partitioned by month, see the manage_partitions command (run daily)
+MEASUREMENT_PARTITIONS_AHEAD = int(os.environ.get('GPX_MEASUREMENT_PARTITIONS_AHEAD', 3))
+# Months of measurements to keep before partitions are detached, empty to keep everything
+MEASUREMENT_RETENTION_MONTHS = int(os.environ['GPX_MEASUREMENT_RETENTION_MONTHS']) \
+    if os.environ.get('GPX_MEASUREMENT_RETENTION_MONTHS') else None
+# Months of raw measurements to keep per measurement type, older measurements are compacted to one row per hour
+# by the compact_measurements command (run daily)
+MEASUREMENT_RAW_MONTHS = {
+    'power': int(os.environ.get('GPX_POWER_RAW_MONTHS', 13)),
+    'gas': int(os.environ.get('GPX_GAS_RAW_MONTHS', 13)),
+    'solar': int(os.environ.get('GPX_SOLAR_RAW_MONTHS', 13)),
+}
+# Cold archive: measurements are moved to compressed files (one per meter per year) by the archive_measurements
+# command, for calendar years older than MEASUREMENT_ARCHIVE_YEARS and for meters without update for
+# MEASUREMENT_ARCHIVE_INACTIVE_DAYS
+MEASUREMENT_ARCHIVE_ROOT = os.environ.get('GPX_MEASUREMENT_ARCHIVE_ROOT', os.path.join(BASE_DIR, 'archive'))
+MEASUREMENT_ARCHIVE_YEARS = int(os.environ.get('GPX_MEASUREMENT_ARCHIVE_YEARS', 3))
+MEASUREMENT_ARCHIVE_INACTIVE_DAYS = int(os.environ.get('GPX_MEASUREMENT_ARCHIVE_INACTIVE_DAYS', 365))
+# Imports uploaded through the API are queued in this directory and imported by the import_meter_data command
+# (without arguments), uploads are at most MEASUREMENT_IMPORT_MAX_MB megabytes
+MEASUREMENT_IMPORT_ROOT = os.environ.get('GPX_MEASUREMENT_IMPORT_ROOT', os.path.join(BASE_DIR, 'imports'))
+MEASUREMENT_IMPORT_MAX_MB = int(os.environ.get('GPX_MEASUREMENT_IMPORT_MAX_MB', 100))
+# Packed storage: measurements of days older than this amount of days are packed into one row per meter per day by
+# the pack_measurements command (run daily). Empty to keep one row per measurement
+MEASUREMENT_PACK_AFTER_DAYS = int(os.environ['GPX_MEASUREMENT_PACK_AFTER_DAYS']) \
+    if os.environ.get('GPX_MEASUREMENT_PACK_AFTER_DAYS') else None
+# Databases the measurements of new meters are placed on, by a stable hash of the meter id (comma separated aliases,
+# default all measurement databases). After a change, the rebalance_measurements command moves the existing meters
+MEASUREMENT_SHARDS = [alias.strip() for alias in os.environ['GPX_MEASUREMENT_SHARDS'].split(',')] \
+    if os.environ.get('GPX_MEASUREMENT_SHARDS') else list(MEASUREMENT_DATABASES)
+# Highest max_points of the measurement series and page_size of the measurement lists, the amount of buckets a
+# request can ask for
+MEASUREMENT_MAX_POINTS = int(os.environ.get('GPX_MEASUREMENT_MAX_POINTS', 10000))
+# Page size of the measurement lists when no page_size is given, empty to only paginate with page_size
+MEASUREMENT_PAGE_SIZE = int(os.environ['GPX_MEASUREMENT_PAGE_SIZE']) \
+    if os.environ.get('GPX_MEASUREMENT_PAGE_SIZE') else None
+# Rows per fetch from the server-side cursor of the streamed measurement responses (`stream` parameter)
+MEASUREMENT_STREAM_CHUNK_SIZE = int(os.environ.get('GPX_MEASUREMENT_STREAM_CHUNK_SIZE', 2000))
+# Deleted meters and users are purged by the purge_deleted command, measurements are deleted in chunks of this size
+MEASUREMENT_DELETE_CHUNK_SIZE = int(os.environ.get('GPX_MEASUREMENT_DELETE_CHUNK_SIZE', 10000))
+# Data quality scan of the measurement histories (scan_measurement_quality command, run nightly): the last amount of
+# days is scanned (empty for the full history, archived years are not scanned), with this amount of processes
+MEASUREMENT_QUALITY_SCAN_DAYS = int(os.environ.get('GPX_MEASUREMENT_QUALITY_SCAN_DAYS', 400)) \
+    if os.environ.get('GPX_MEASUREMENT_QUALITY_SCAN_DAYS', '400') else None
+MEASUREMENT_QUALITY_WORKERS = int(os.environ.get('GPX_MEASUREMENT_QUALITY_WORKERS', os.cpu_count() or 1))
+# A gap is a time without measurements longer than this amount of hours, a frozen counter a total that did not change
+# for longer than this amount of hours while the meter reported usage (actual value above 0)
+MEASUREMENT_QUALITY_GAP_HOURS = float(os.environ.get('GPX_MEASUREMENT_QUALITY_GAP_HOURS', 24))
+MEASUREMENT_QUALITY_FROZEN_HOURS = float(os.environ.get('GPX_MEASUREMENT_QUALITY_FROZEN_HOURS', 24))
+# A spike is an increase of a total of more than this amount per hour (kWh or m3), for the elapsed time between
+# measurements of at least an hour
+MEASUREMENT_QUALITY_MAX_USAGE = {
+    'power': float(os.environ.get('GPX_POWER_QUALITY_MAX_USAGE', 25)),
+    'gas': float(os.environ.get('GPX_GAS_QUALITY_MAX_USAGE', 10)),
+    'solar': float(os.environ.get('GPX_SOLAR_QUALITY_MAX_USAGE', 25)),
+}
+
+# endregion
+
 # region services
 
 NODEJS_SECRET_TOKEN = os.environ.get('GPX_NODEJS_SECRET_TOKEN', 'testing')
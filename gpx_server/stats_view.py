@@ -1,5 +1,11 @@
-from rest_framework import serializers
+from django.conf import settings
+from rest_framework import serializers, permissions
 from rest_framework.generics import RetrieveAPIView
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from gpx_server.pooling import pool_statistics
+from gpx_server.replicas import query_counts, replica_lag
 
 from smart_meter.models import SmartMeter, GroupMeter
 from users.models import User
@@ -19,6 +25,7 @@ class StatisticsSerializer(serializers.Serializer):
 
 class StatisticsView(RetrieveAPIView):
     serializer_class = StatisticsSerializer
+    replica_reads = True
 
     def get_object(self):
         return {
@@ -26,3 +33,18 @@ class StatisticsView(RetrieveAPIView):
             **GroupMeter.objects.group_meter_statistics(),
             **User.objects.user_statistics(),
         }
+
+
+class DatabaseStatisticsView(APIView):
+    """
+    Queries per database of this process, the usage of its connection pools, and the replication lag of the
+    replicas (null when unreachable). Only for admins
+    """
+    GET_permissions = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response({
+            'queries': query_counts(),
+            'pools': pool_statistics(),
+            'replicas': {alias: replica_lag(alias) for alias in settings.DATABASE_REPLICAS},
+        })
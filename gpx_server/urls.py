@@ -20,7 +20,7 @@ from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.settings import api_settings
 from rest_framework.urlpatterns import format_suffix_patterns
 
-from gpx_server.stats_view import StatisticsView
+from gpx_server.stats_view import StatisticsView, DatabaseStatisticsView
 
 
 def _root(request):
@@ -34,6 +34,7 @@ urlpatterns = [
 api_routing = [
     path('api/', _root),
     path('api/stats/', StatisticsView.as_view()),
+    path('api/stats/databases/', DatabaseStatisticsView.as_view(), name='database_statistics'),
     path('api/auth/', include('users.urls.auth_urls')),
     path('api/users/', include('users.urls.user_urls')),
     path('api/meters/', include('smart_meter.urls.meter_urls')),
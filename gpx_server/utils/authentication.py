@@ -7,7 +7,8 @@ class ApiKeyAuthentication(TokenAuthentication):
     def authenticate_credentials(self, token):
         # Check the token and return a user.
         try:
-            user = User.objects.get(api_key=token)
+            # Deleted users are purged in the background, their meters no longer accept measurements
+            user = User.objects.filter(deleted_on__isnull=True).get(api_key=token)
             return user, token
         except User.DoesNotExist:
             return None, token
@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gpx_server.settings')
 
 application = get_wsgi_application()
+
+# Each gunicorn worker imports the application, fill its connection pools before it accepts requests
+from django.conf import settings  # noqa: E402
+from gpx_server.pooling import warm_up  # noqa: E402
+
+if settings.DB_POOL_WARMUP:
+    warm_up()
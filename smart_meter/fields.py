@@ -0,0 +1,67 @@
+import decimal
+
+from django.conf import settings
+from django.db import models
+from django.db.models import functions
+
+
+class ScaledIntegerField(models.DecimalField):
+    """
+    Decimal field that is stored as a scaled integer: the value times 10^decimal_places, so milli-units (Wh, dm³, W)
+    for 3 decimal places. In python it behaves as a DecimalField (Decimal values, same form and serializer fields),
+    the database stores and aggregates fixed width integers instead of numeric values.
+
+    Aggregates that change the type (Avg) return a plain DecimalField, pass the model field as output_field to scale
+    the result back: `Avg('actual_import', output_field=PowerMeasurement._meta.get_field('actual_import'))`
+    """
+    description = "Decimal number stored as scaled integer"
+
+    def db_type(self, connection):
+        return 'integer' if self.max_digits <= 9 else 'bigint'
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return decimal.Decimal(value).scaleb(-self.decimal_places)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if not prepared:
+            value = self.get_prep_value(value)
+        if value is None or hasattr(value, 'as_sql'):
+            return value
+        return self.to_scaled_integer(value)
+
+    def to_scaled_integer(self, value) -> int:
+        """Scale a decimal value to the stored integer, rounded half up"""
+        return int(self.to_python(value).scaleb(self.decimal_places).to_integral_value(decimal.ROUND_HALF_UP))
+
+
+class AtTimeZone(models.Func):
+    """
+    Wall clock time of a timestamp in the given timezone (timestamp without time zone). Unlike Trunc and Extract with
+    tzinfo this depends on no session setting, so it can be used in an index expression:
+    `Cast(AtTimeZone('timestamp', 'Europe/Amsterdam'), models.DateField())`
+    """
+    template = '(%(expressions)s)'
+    arg_joiner = ' AT TIME ZONE '
+    output_field = models.DateTimeField()
+
+    def __init__(self, expression, timezone, **extra):
+        super().__init__(expression, models.Value(timezone), **extra)
+
+
+def local_date(field='timestamp'):
+    """
+    Local date of a timestamp field in TIME_ZONE (DST-correct, from the timezone rules). The expression of the local
+    index of the measurement tables, a query on the same expression can use the index. Changing TIME_ZONE requires a
+    migration of the index
+    """
+    return functions.Cast(AtTimeZone(field, settings.TIME_ZONE), models.DateField())
+
+
+def local_hour(field='timestamp'):
+    """Local hour of a timestamp field in TIME_ZONE, see local_date"""
+    return functions.Cast(
+        models.Func(models.Value('hour'), AtTimeZone(field, settings.TIME_ZONE), function='date_part'),
+        models.SmallIntegerField(),
+    )
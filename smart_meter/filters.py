@@ -1,17 +1,73 @@
+from django import forms
+from django.conf import settings
 from django.db import models
 from django.db.models import QuerySet, Prefetch, Value, Min, Max
 from django_filters import rest_framework as filters
 from rest_framework.exceptions import ValidationError
 
 from smart_meter.models import Measurement, GroupParticipant, SmartMeter, PowerMeasurement, GasMeasurement, \
-    SolarMeasurement
+    SolarMeasurement, GroupEnergyInterval, MeterQualityReport
+from smart_meter.services.buckets import GAP_FILL_OPTIONS, DOWNSAMPLE_OPTIONS
+from smart_meter.services.partitions import MEASUREMENT_TYPES
+from smart_meter.services.quality import ISSUES
+
+GAP_FILL_CHOICES = [(option, option) for option in GAP_FILL_OPTIONS]
+DOWNSAMPLE_CHOICES = [(option, option) for option in DOWNSAMPLE_OPTIONS]
+
+
+class IntegerFilter(filters.NumberFilter):
+    field_class = forms.IntegerField
+
+
+def max_points_filter():
+    """Maximum amount of timestamp buckets, picks the bucket size (and downsamples) for it (after timestamp)"""
+    return IntegerFilter(min_value=3, max_value=settings.MEASUREMENT_MAX_POINTS, method='filter_max_points')
 
 
 class MeasurementFilter(filters.FilterSet):
     timestamp = filters.IsoDateTimeFromToRangeFilter(field_name='timestamp', required=True, method='filter_timestamp')
+    # Return all buckets of the time range, the buckets without measurements null or carried forward (after timestamp)
+    gaps = filters.ChoiceFilter(choices=GAP_FILL_CHOICES, method='filter_gaps')
+    max_points = max_points_filter()
+    # How the buckets are reduced to max_points, merged (default) or the shape preserving selection
+    downsample = filters.ChoiceFilter(choices=DOWNSAMPLE_CHOICES, method='filter_downsample')
 
     class Meta:
         model = Measurement
+        fields = ['timestamp', 'gaps', 'max_points', 'downsample']
+
+    def filter_timestamp(self, qs, field, value):
+        if value.start is None:
+            raise ValidationError('Requires start timestamp')
+        elif value.stop is None:
+            raise ValidationError('Requires stop timestamp')
+
+        return qs.filter_timestamp(value.start, value.stop, self.form.cleaned_data.get('max_points'))
+
+    def filter_gaps(self, qs, field, value):
+        return qs.fill_gaps(value)
+
+    def filter_max_points(self, qs, field, value):
+        # Used by filter_timestamp
+        return qs
+
+    def filter_downsample(self, qs, field, value):
+        return qs.downsample(value)
+
+
+class MeterSeriesFilter(MeasurementFilter):
+    # The series are merged to max_points, the buckets selected per series would not line up
+    downsample = None
+
+    class Meta(MeasurementFilter.Meta):
+        fields = ['timestamp', 'gaps', 'max_points']
+
+
+class GroupEnergyIntervalFilter(filters.FilterSet):
+    timestamp = filters.IsoDateTimeFromToRangeFilter(field_name='timestamp', required=True, method='filter_timestamp')
+
+    class Meta:
+        model = GroupEnergyInterval
         fields = ['timestamp']
 
     def filter_timestamp(self, qs, field, value):
@@ -20,16 +76,19 @@ class MeasurementFilter(filters.FilterSet):
         elif value.stop is None:
             raise ValidationError('Requires stop timestamp')
 
-        return qs.filter_timestamp(value.start, value.stop)
+        return qs.filter(timestamp__range=(value.start, value.stop))
 
 
 class MeterMeasurementFilter(filters.FilterSet):
     timestamp = filters.IsoDateTimeFromToRangeFilter(method='filter_timestamp')
     measurements = filters.BooleanFilter(method='with_measurements')
+    gaps = filters.ChoiceFilter(choices=GAP_FILL_CHOICES, method='filter_gaps')
+    max_points = max_points_filter()
+    downsample = filters.ChoiceFilter(choices=DOWNSAMPLE_CHOICES, method='filter_downsample')
 
     class Meta:
         model = SmartMeter
-        fields = ['timestamp']
+        fields = ['timestamp', 'gaps', 'max_points', 'downsample']
 
     def with_measurements(self, qs, field, value):
         return qs
@@ -46,6 +105,15 @@ class MeterMeasurementFilter(filters.FilterSet):
         )
         return qs
 
+    def filter_gaps(self, qs, field, value):
+        return qs.annotate(gap_fill_=Value(value, models.CharField()))
+
+    def filter_max_points(self, qs, field, value):
+        return qs.annotate(max_points_=Value(value, models.IntegerField()))
+
+    def filter_downsample(self, qs, field, value):
+        return qs.annotate(downsample_=Value(value, models.CharField()))
+
 
 class GroupParticipantFilter(filters.FilterSet):
     active = filters.BooleanFilter(method='filter_active')
@@ -56,3 +124,20 @@ class GroupParticipantFilter(filters.FilterSet):
 
     def filter_active(self, qs: QuerySet, field, value):
         return qs.filter(left_on__isnull=value)
+
+
+class MeterQualityReportFilter(filters.FilterSet):
+    # Reports with at least this amount of issues
+    issues = filters.NumberFilter(field_name='issues', lookup_expr='gte')
+    # Reports with an issue of this kind in any measurement type
+    issue = filters.ChoiceFilter(choices=[(issue, issue) for issue in ISSUES], method='filter_issue')
+
+    class Meta:
+        model = MeterQualityReport
+        fields = ['issues', 'issue']
+
+    def filter_issue(self, qs, field, value):
+        query = models.Q()
+        for measurement_type in MEASUREMENT_TYPES:
+            query |= models.Q(**{f'report__{measurement_type}__{value}__gt': 0})
+        return qs.filter(query)
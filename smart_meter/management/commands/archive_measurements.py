@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from smart_meter.services.archive import MeasurementArchiver
+from smart_meter.services.partitions import MEASUREMENT_TYPES
+
+
+class Command(BaseCommand):
+    help = "Move old measurements, and all measurements of inactive meters, to the cold archive " \
+           "(MEASUREMENT_ARCHIVE_ROOT)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--type",
+            choices=MEASUREMENT_TYPES.keys(),
+            help="Only archive this measurement type",
+        )
+        parser.add_argument(
+            "--years",
+            type=int,
+            default=settings.MEASUREMENT_ARCHIVE_YEARS,
+            help="Amount of calendar years to keep in the database, before the current year",
+        )
+        parser.add_argument(
+            "--inactive-days",
+            type=int,
+            default=settings.MEASUREMENT_ARCHIVE_INACTIVE_DAYS,
+            help="Archive all measurements of meters without update for this amount of days",
+        )
+
+    def handle(self, *args, **options):
+        types = [options["type"]] if options["type"] else MEASUREMENT_TYPES.keys()
+        for measurement_type in types:
+            archiver = MeasurementArchiver(MEASUREMENT_TYPES[measurement_type], progress_callback=self.stdout.write)
+            archived = archiver.archive(options["years"], options["inactive_days"])
+            self.stdout.write(self.style.SUCCESS(f"{measurement_type}: {archived:,} measurements archived"))
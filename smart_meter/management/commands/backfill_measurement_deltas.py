@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from smart_meter.models import SmartMeter
+from smart_meter.services.deltas import MeasurementDeltaCalculator
+from smart_meter.services.partitions import MEASUREMENT_TYPES
+
+
+class Command(BaseCommand):
+    help = "Calculate the deltas (usage since the previous measurement) of stored measurements from their totals"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--type",
+            choices=MEASUREMENT_TYPES.keys(),
+            help="Only backfill this measurement type",
+        )
+        parser.add_argument(
+            "--meter",
+            type=int,
+            metavar="METER_ID",
+            help="Only backfill the measurements of this meter",
+        )
+
+    def handle(self, *args, **options):
+        meter_id = options["meter"]
+        if meter_id is not None and not SmartMeter.objects.filter(pk=meter_id).exists():
+            raise CommandError(f"Meter {meter_id} does not exist")
+
+        types = [options["type"]] if options["type"] else MEASUREMENT_TYPES.keys()
+        for measurement_type in types:
+            calculator = MeasurementDeltaCalculator(MEASUREMENT_TYPES[measurement_type],
+                                                    progress_callback=self.stdout.write)
+            updated = calculator.backfill(meter_id)
+            self.stdout.write(self.style.SUCCESS(f"{measurement_type}: {updated:,} measurements updated"))
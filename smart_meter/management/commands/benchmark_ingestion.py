@@ -0,0 +1,109 @@
+import json
+import statistics
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+
+from gpx_server.pooling import warm_up, pool_statistics
+from smart_meter.models import SmartMeter
+from smart_meter.services.partitions import MEASUREMENT_MODELS
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Post measurements to the new measurement endpoint like the connectors do, one request after the other, " \
+           "with a new database connection per request (before) and with the connection pool (after): throughput, " \
+           "latency and opened connections. Only use on a benchmark database"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000, help="Amount of requests per run")
+
+    def handle(self, *args, **options):
+        if not settings.DB_POOL_MAX_SIZE:
+            raise CommandError("The connection pool is disabled (GPX_DB_POOL_MAX_SIZE=0)")
+        pool_options = {alias: connections[alias].settings_dict['OPTIONS'].get('pool') for alias in settings.DATABASES}
+        user = User.objects.create_user(username='benchmark_%s' % uuid.uuid4().hex[:8])
+        self.handler = WSGIHandler()
+        self.factory = RequestFactory(SERVER_NAME='localhost', HTTP_AUTHORIZATION='Token %s' % user.api_key)
+        self.start = timezone.now().replace(microsecond=0) - timedelta(days=1)
+        try:
+            self._set_pool(None)
+            before = self._run(options["requests"], 0)
+            self._set_pool(pool_options)
+            warm_up()
+            after = self._run(options["requests"], options["requests"])
+            after['connections opened'] = sum(pool['connections_opened'] for pool in pool_statistics().values())
+
+            self.stdout.write("")
+            self.stdout.write(f"{'measurement':<36}{'before':>14}{'after':>14}")
+            for key in before:
+                self.stdout.write(f"{key:<36}{before[key]:>14,.2f}{after[key]:>14,.2f}")
+        finally:
+            self._set_pool(pool_options)
+            meter_ids = list(SmartMeter.objects.filter(user=user).values_list('pk', flat=True))
+            for model in MEASUREMENT_MODELS:
+                model.objects.filter(meter_id__in=meter_ids).delete()
+            SmartMeter.objects.filter(pk__in=meter_ids).delete()
+            user.delete()
+
+    @staticmethod
+    def _set_pool(pool_options) -> None:
+        """Close the connections and pools, and switch their pooling (None: a connection per request)"""
+        connections.close_all()
+        for alias in settings.DATABASES:
+            connections[alias].close_pool()
+            options = connections[alias].settings_dict['OPTIONS']
+            if pool_options and pool_options[alias]:
+                options['pool'] = pool_options[alias]
+            else:
+                options.pop('pool', None)
+
+    def _run(self, requests: int, offset: int) -> dict:
+        """Post the measurements through the full request cycle, which returns or closes the connections at the end"""
+        opened = []
+
+        def count(sender, connection, **kwargs):
+            opened.append(connection.alias)
+
+        connection_created.connect(count)
+        durations = []
+        try:
+            for i in range(offset, offset + requests):
+                request = self.factory.post(reverse('smart_meter:new_measurement'), json.dumps({
+                    'power': {
+                        'sn': 'benchmark',
+                        'timestamp': (self.start + timedelta(seconds=10 * i)).isoformat(),
+                        'import_1': i,
+                        'import_2': 0,
+                        'export_1': 0,
+                        'export_2': 0,
+                        'actual_import': 1.5,
+                        'actual_export': 0,
+                        'tariff': 1,
+                    },
+                }), content_type='application/json')
+                start = time.perf_counter()
+                response = self.handler(request.environ, lambda status, headers: None)
+                # Closing the response ends the request (request_finished)
+                response.close()
+                durations.append(time.perf_counter() - start)
+                if response.status_code != 201:
+                    raise CommandError(f"Measurement {i} failed: {response.status_code} {response.content[:200]}")
+        finally:
+            connection_created.disconnect(count)
+        durations.sort()
+        return {
+            'requests (per s)': requests / sum(durations),
+            'latency mean (ms)': statistics.mean(durations) * 1000,
+            'latency p95 (ms)': durations[int(len(durations) * 0.95)] * 1000,
+            'connections opened': len(opened),
+        }
@@ -0,0 +1,105 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+
+from smart_meter.models import PowerMeasurement
+from smart_meter.services.benchmark import SyntheticDataset, explain_analyze
+from smart_meter.services.partitions import MEASUREMENT_MODELS
+
+
+class Command(BaseCommand):
+    help = "Load a synthetic multi-year dataset and print EXPLAIN ANALYZE timings of the hot measurement queries, " \
+           "for the previous (before) and current (after) index layout. Only use on a benchmark database"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--meters", type=int, default=3, help="Amount of meters to generate")
+        parser.add_argument("--years", type=int, default=3, help="Years of measurements per meter")
+        parser.add_argument("--interval", type=int, default=5, help="Minutes between measurements")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per query, the fastest run is reported")
+        parser.add_argument("--keep", action="store_true", help="Keep the generated data")
+
+    def handle(self, *args, **options):
+        dataset = SyntheticDataset(
+            meters=options["meters"],
+            years=options["years"],
+            interval=timedelta(minutes=options["interval"]),
+            progress_callback=self.stdout.write,
+        )
+        try:
+            dataset.load()
+            meter = dataset.meters[0]
+            self.repeat = options["repeat"]
+            self.verbosity = options["verbosity"]
+
+            with transaction.atomic():
+                self._previous_index_layout()
+                before = self._run_queries(meter, dataset, previous=True)
+                transaction.set_rollback(True)
+            after = self._run_queries(meter, dataset, previous=False)
+
+            self.stdout.write("")
+            self.stdout.write(f"{'query':<32}{'before (ms)':>14}{'after (ms)':>14}")
+            for label in before:
+                self.stdout.write(f"{label:<32}{before[label]:>14.2f}{after[label]:>14.2f}")
+        finally:
+            if not options["keep"]:
+                dataset.cleanup()
+
+    def _previous_index_layout(self):
+        """
+        Replace the measurement indexes by the layout before the covering indexes (a plain unique index on
+        meter and timestamp, plus an index on meter). Only used inside a transaction that is rolled back
+        """
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            for model in MEASUREMENT_MODELS:
+                table = model._meta.db_table
+                for index in model._meta.constraints + model._meta.indexes:
+                    cursor.execute('DROP INDEX %s' % quote(index.name))
+                cursor.execute('CREATE UNIQUE INDEX %s ON %s (meter_id, "timestamp")'
+                               % (quote('%s_benchmark_uniq' % table), quote(table)))
+                cursor.execute('CREATE INDEX %s ON %s (meter_id)' % (quote('%s_benchmark_meter' % table), quote(table)))
+                cursor.execute('ANALYZE %s' % quote(table))
+
+    def _run_queries(self, meter, dataset, previous):
+        """
+        EXPLAIN ANALYZE the hot queries, in the shape of the previous or current implementation
+        :return: dict of query label and fastest execution time
+        """
+        end = dataset.end
+        middle = dataset.start + (dataset.end - dataset.start) / 2
+        measurements = PowerMeasurement.objects.filter(meter=meter)
+        middle_pk = measurements.filter(timestamp__gte=middle).order_by('timestamp').values_list('pk', flat=True)[0]
+
+        def bucketed(after, before):
+            qs = measurements.filter_timestamp(after, before)
+            return qs.order_by('id') if previous else qs
+
+        queries = {
+            'bucket minute (1 day)': lambda: bucketed(end - timedelta(days=1), end),
+            'bucket hour (13 days)': lambda: bucketed(end - timedelta(days=13), end),
+            'bucket day (1 year)': lambda: bucketed(end - timedelta(days=365), end),
+            'period total (30 days)': lambda: measurements.filter(
+                timestamp__range=(end - timedelta(days=30), end)
+            ).values('meter').annotate(
+                period=models.Max('total_import_1') - models.Min('total_import_1'),
+            ),
+            'last measurement': lambda: (
+                measurements.order_by('-pk') if previous else measurements.order_by('-timestamp')
+            )[:1],
+            'export page': lambda: (
+                measurements.filter(pk__gt=middle_pk).order_by('pk')
+                if previous else
+                measurements.filter(timestamp__gt=middle).order_by('timestamp')
+            ).values_list('timestamp', 'actual_import', 'total_import_1')[:1000],
+        }
+
+        timings = {}
+        for label, query in queries.items():
+            runs = [explain_analyze(query()) for _ in range(self.repeat)]
+            timing, plan = min(runs, key=lambda run: run[0])
+            timings[label] = timing
+            if self.verbosity > 1:
+                self.stdout.write(f"--- {label} ({'before' if previous else 'after'})\n{plan}\n")
+        return timings
@@ -0,0 +1,130 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from smart_meter.models import SmartMeter, SmartMeterLive, LIVE_FIELDS
+
+WIDE_TABLE = 'benchmark_meter_wide'
+LIVE_TABLE = 'benchmark_meter_live'
+
+# Profile columns of the wide table, filled with realistic values
+PROFILE_VALUES = {
+    'user_id': 'n',
+    'name': "'Meter ' || n",
+    'type': "'consumer'",
+    'visibility_type': "'private'",
+    'gpx_version': "'1.2.3'",
+    'resident_count': '2',
+    'residence_type': "'terraced_house'",
+    'residence_energy_label': "'b'",
+    'solar_panel_count': '8',
+    'sn_power': "'benchmark-' || n",
+    'sn_gas': "'benchmark-gas-' || n",
+}
+LIVE_VALUES = {
+    'last_update': 'now()',
+    'power_timestamp': 'now()',
+    'actual_power_import': '0',
+    'actual_power_export': '0',
+    'tariff': '1',
+    'total_power_import_1': '0',
+    'total_power_import_2': '0',
+    'total_power_export_1': '0',
+    'total_power_export_2': '0',
+    'gas_timestamp': 'now()',
+    'actual_gas': '0',
+    'total_gas': '0',
+    'solar_timestamp': 'now()',
+    'actual_solar': '0',
+    'total_solar': '0',
+}
+
+
+class Command(BaseCommand):
+    help = "Compare the updates of the live meter values in the wide meter table with the indexed last_update " \
+           "(before) with the narrow live values table (after): update throughput, HOT updates and table bloat. " \
+           "Only use on a benchmark database"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--meters", type=int, default=1000, help="Amount of meters")
+        parser.add_argument("--updates", type=int, default=20000, help="Amount of updates, round robin over the meters")
+
+    def handle(self, *args, **options):
+        meters, updates = options["meters"], options["updates"]
+        try:
+            self._create_tables(meters)
+            results = {
+                'before': self._run(WIDE_TABLE, 'id', meters, updates),
+                'after': self._run(LIVE_TABLE, 'meter_id', meters, updates),
+            }
+
+            self.stdout.write("")
+            self.stdout.write(f"{'measurement':<36}{'before':>14}{'after':>14}")
+            for key in results['before']:
+                self.stdout.write(f"{key:<36}{results['before'][key]:>14,.2f}{results['after'][key]:>14,.2f}")
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP TABLE IF EXISTS {WIDE_TABLE}, {LIVE_TABLE}')
+
+    @staticmethod
+    def _create_tables(meters):
+        """
+        Create the wide table in the previous layout (meter and live values in one row, indexed last_update) and the
+        narrow table like SmartMeterLive, with the same storage parameters
+        """
+        meter_table, live_table = SmartMeter._meta.db_table, SmartMeterLive._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reloptions FROM pg_class WHERE relname = %s', [live_table])
+            options = cursor.fetchone()[0] or []
+
+            cursor.execute(f'CREATE TABLE {WIDE_TABLE} (LIKE {meter_table} INCLUDING ALL)')
+            cursor.execute(f'ALTER TABLE {WIDE_TABLE} %s' % ', '.join(
+                f'ADD COLUMN {field.column} {field.db_type(connection)}'
+                for field in (SmartMeterLive._meta.get_field(name) for name in LIVE_FIELDS)
+            ))
+            cursor.execute(f'CREATE INDEX ON {WIDE_TABLE} (user_id)')
+            cursor.execute(f'CREATE INDEX ON {WIDE_TABLE} (last_update)')
+            values = {**PROFILE_VALUES, **LIVE_VALUES}
+            cursor.execute(f'INSERT INTO {WIDE_TABLE} (id, %s) SELECT n, %s FROM generate_series(1, %%s) AS n' % (
+                ', '.join(values), ', '.join(values.values())
+            ), [meters])
+
+            cursor.execute(f'CREATE TABLE {LIVE_TABLE} (LIKE {live_table} INCLUDING ALL) %s' % (
+                'WITH (%s)' % ', '.join(options) if options else ''
+            ))
+            cursor.execute(f'INSERT INTO {LIVE_TABLE} (meter_id, %s) SELECT n, %s FROM generate_series(1, %%s) AS n' % (
+                ', '.join(LIVE_VALUES), ', '.join(LIVE_VALUES.values())
+            ), [meters])
+            cursor.execute(f'VACUUM (ANALYZE) {WIDE_TABLE}')
+            cursor.execute(f'VACUUM (ANALYZE) {LIVE_TABLE}')
+
+    @staticmethod
+    def _run(table, key, meters, updates):
+        """Update the live values of the meters one by one (each in its own transaction), like new measurements do"""
+        sql = f'UPDATE {table} SET last_update = now(), power_timestamp = now(), actual_power_import = %s, ' \
+              f'actual_power_export = 0, total_power_import_1 = total_power_import_1 + %s, ' \
+              f'total_power_export_1 = total_power_export_1 + 1 WHERE {key} = %s'
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_table_size(%s), pg_indexes_size(%s)', [table, table])
+            table_size, indexes_size = cursor.fetchone()
+
+            start = time.perf_counter()
+            for i in range(updates):
+                cursor.execute(sql, [i % 2000, i % 7, i % meters + 1])
+            duration = time.perf_counter() - start
+
+            if connection.pg_version >= 150000:
+                cursor.execute('SELECT pg_stat_force_next_flush()')
+            else:
+                # Statistics are sent to the collector at most every 500 ms
+                time.sleep(1)
+            cursor.execute('SELECT n_tup_upd, n_tup_hot_upd, pg_table_size(relid), pg_indexes_size(relid) '
+                           'FROM pg_stat_user_tables WHERE relname = %s', [table])
+            updated, hot_updated, table_after, indexes_after = cursor.fetchone()
+        return {
+            'updates (per s)': updates / duration,
+            'HOT updates (%)': 100 * hot_updated / updated if updated else 0,
+            'table growth (kB)': (table_after - table_size) / 1024,
+            'index growth (kB)': (indexes_after - indexes_size) / 1024,
+        }
@@ -0,0 +1,121 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+
+from smart_meter.models import PowerMeasurement
+from smart_meter.serializers.serializers import PowerMeasurementSerializer
+from smart_meter.services.benchmark import SyntheticDataset, explain_analyze_sql
+
+READING_COLUMNS = ['actual_import', 'actual_export', 'total_import_1', 'total_import_2', 'total_export_1',
+                   'total_export_2']
+
+
+class Command(BaseCommand):
+    help = "Compare power measurements stored as numeric(9, 3) (before) with scaled integers (after): row size, " \
+           "aggregate speed and serialization throughput. Only use on a benchmark database"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--meters", type=int, default=1, help="Amount of meters to generate")
+        parser.add_argument("--years", type=int, default=1, help="Years of measurements per meter")
+        parser.add_argument("--rows", type=int, default=20000, help="Rows to fetch and serialize")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement, the fastest is reported")
+
+    def handle(self, *args, **options):
+        dataset = SyntheticDataset(
+            meters=options["meters"],
+            years=options["years"],
+            interval=timedelta(minutes=5),
+            progress_callback=self.stdout.write,
+        )
+        self.repeat = options["repeat"]
+        try:
+            dataset.load()
+            meter_ids = [meter.pk for meter in dataset.meters]
+            self._create_tables(meter_ids)
+
+            results = {}
+            for label, table in (('before', 'benchmark_numeric'), ('after', 'benchmark_scaled')):
+                results[label] = {
+                    **self._row_size(table),
+                    **self._aggregates(table),
+                    **self._serialization(table, options["rows"]),
+                }
+
+            self.stdout.write("")
+            self.stdout.write(f"{'measurement':<36}{'before':>14}{'after':>14}")
+            for key in results['before']:
+                self.stdout.write(f"{key:<36}{results['before'][key]:>14,.2f}{results['after'][key]:>14,.2f}")
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('DROP TABLE IF EXISTS benchmark_numeric, benchmark_scaled')
+            dataset.cleanup()
+
+    @staticmethod
+    def _create_tables(meter_ids):
+        """Copy the generated measurements into a numeric and a scaled integer table with the same rows"""
+        table = PowerMeasurement._meta.db_table
+        with connection.cursor() as cursor:
+            copy = 'CREATE TABLE %s AS SELECT id, "timestamp", meter_id, %s FROM %s WHERE meter_id = ANY(%%s)'
+            cursor.execute(copy % (
+                'benchmark_numeric',
+                ', '.join('(%s::numeric / 1000)::numeric(9, 3) AS %s' % (c, c) for c in READING_COLUMNS),
+                table,
+            ), [meter_ids])
+            cursor.execute(copy % ('benchmark_scaled', ', '.join(READING_COLUMNS), table), [meter_ids])
+            cursor.execute('VACUUM (ANALYZE) benchmark_numeric')
+            cursor.execute('VACUUM (ANALYZE) benchmark_scaled')
+
+    @staticmethod
+    def _row_size(table):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT AVG(pg_column_size(t.*)), pg_table_size(%%s) FROM %s t' % table, [table])
+            row_size, table_size = cursor.fetchone()
+        return {'row size (bytes)': float(row_size), 'table size (MB)': table_size / 1024 / 1024}
+
+    def _aggregates(self, table):
+        queries = {
+            'aggregate all rows (ms)': 'SELECT SUM(actual_import), AVG(actual_export), '
+                                       'MAX(total_import_1) - MIN(total_import_1) FROM %s' % table,
+            'aggregate per day (ms)': 'SELECT date_trunc(\'day\', "timestamp"), AVG(actual_import), '
+                                      'MAX(total_import_1) - MIN(total_import_1) FROM %s GROUP BY 1' % table,
+        }
+        return {
+            label: min(explain_analyze_sql(sql)[0] for _ in range(self.repeat))
+            for label, sql in queries.items()
+        }
+
+    def _serialization(self, table, rows):
+        """Fetch rows as measurements and render them with the API serializer, in rows per second"""
+        numeric = table == 'benchmark_numeric'
+        field = PowerMeasurement._meta.get_field('actual_import')
+
+        def fetch():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT "timestamp", %s FROM %s ORDER BY id LIMIT %%s'
+                               % (', '.join(READING_COLUMNS), table), [rows])
+                if numeric:
+                    return [PowerMeasurement(timestamp=row[0], **dict(zip(READING_COLUMNS, row[1:])))
+                            for row in cursor.fetchall()]
+                return [PowerMeasurement(timestamp=row[0], **{
+                    column: field.from_db_value(value, None, connection)
+                    for column, value in zip(READING_COLUMNS, row[1:])
+                }) for row in cursor.fetchall()]
+
+        def render(measurements):
+            return JSONRenderer().render(PowerMeasurementSerializer(measurements, many=True).data)
+
+        fetch_time = render_time = float('inf')
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            measurements = fetch()
+            fetched = time.perf_counter()
+            render(measurements)
+            fetch_time = min(fetch_time, fetched - start)
+            render_time = min(render_time, time.perf_counter() - fetched)
+        return {
+            'fetch (rows/s)': len(measurements) / fetch_time,
+            'serialize (rows/s)': len(measurements) / render_time,
+        }
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from smart_meter.services.compaction import MeasurementCompactor
+from smart_meter.services.partitions import MEASUREMENT_TYPES
+
+
+class Command(BaseCommand):
+    help = "Compact raw measurements older than the retention period (MEASUREMENT_RAW_MONTHS) into hourly measurements"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--type",
+            choices=MEASUREMENT_TYPES.keys(),
+            help="Only compact this measurement type",
+        )
+        parser.add_argument(
+            "--raw-months",
+            type=int,
+            help="Override the amount of months to keep raw measurements",
+        )
+
+    def handle(self, *args, **options):
+        types = [options["type"]] if options["type"] else MEASUREMENT_TYPES.keys()
+        for measurement_type in types:
+            raw_months = options["raw_months"]
+            if raw_months is None:
+                raw_months = settings.MEASUREMENT_RAW_MONTHS[measurement_type]
+            compactor = MeasurementCompactor(
+                MEASUREMENT_TYPES[measurement_type], raw_months, progress_callback=self.stdout.write
+            )
+            removed = compactor.compact()
+            self.stdout.write(
+                self.style.SUCCESS(f"{measurement_type}: compacted older than {raw_months} months, {removed:,} rows removed")
+            )
@@ -0,0 +1,99 @@
+from typing import Optional
+
+from django.core.management.base import BaseCommand, CommandError
+
+from smart_meter.models import SmartMeter
+from smart_meter.services.import_data import MeterDataImporter, ImportQueue
+
+
+class Command(BaseCommand):
+    help = "Import the measurement history of a meter from a ZIP archive or CSV file in the export layout " \
+           "(power.csv, gas.csv, solar.csv), or import the files uploaded through the API"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "meter_id",
+            type=int,
+            nargs="?",
+            help="Meter ID",
+        )
+        parser.add_argument(
+            "file",
+            nargs="?",
+            help="Path of the ZIP archive or CSV file",
+        )
+        parser.add_argument(
+            "--update",
+            action="store_true",
+            help="Update the measurements the meter already has at an imported timestamp (default: skip them)",
+        )
+        parser.add_argument(
+            "--skip-invalid",
+            action="store_true",
+            help="Skip invalid rows instead of importing nothing",
+        )
+
+    def handle(self, *args, **options):
+        if options["meter_id"] is None:
+            self.import_queued()
+            return
+        if options["file"] is None:
+            raise CommandError("Give both a meter and a file, or neither to import the uploaded files")
+
+        meter_id = options["meter_id"]
+        try:
+            meter = SmartMeter.objects.get(pk=meter_id)
+        except SmartMeter.DoesNotExist:
+            raise CommandError(f"Meter {meter_id} does not exist")
+
+        try:
+            imported = self.import_file(meter, options["file"], options["update"], options["skip_invalid"])
+        except OSError as e:
+            raise CommandError(str(e))
+        except ValueError as e:
+            raise CommandError(f"Nothing imported:\n{e}")
+        self.stdout.write(self.style.SUCCESS(f"Import completed: {imported:,} measurements imported or updated"))
+
+    def import_queued(self):
+        """
+        Import the files uploaded through the API. An invalid upload is reported and removed, an upload of which the
+        import failed otherwise (e.g. the database) is put back in the queue
+        """
+        queue = ImportQueue()
+        for upload in queue.pending():
+            if not queue.claim(upload["id"]):
+                # Imported by another command
+                continue
+            meter = SmartMeter.objects.filter(pk=upload["meter_id"]).first()
+            try:
+                if meter is None:
+                    self.stderr.write(f"{upload['name']}: meter {upload['meter_id']} does not exist")
+                else:
+                    imported = self.import_file(meter, upload["path"], upload["update"], upload["skip_invalid"],
+                                                name=upload["name"])
+                    self.stdout.write(self.style.SUCCESS(
+                        f"{upload['name']}: {imported:,} measurements imported or updated"
+                    ))
+            except (OSError, ValueError) as e:
+                self.stderr.write(f"{upload['name']}: nothing imported:\n{e}")
+            except BaseException:
+                queue.release(upload["id"])
+                raise
+            queue.remove(upload["id"])
+
+    def import_file(self, meter: SmartMeter, path: str, update: bool, skip_invalid: bool,
+                    name: Optional[str] = None) -> int:
+        """
+        :param name: name of the file in the errors, default the path
+        :return: amount of measurements imported or updated
+        """
+        self.stdout.write(f"Importing data for meter: {meter.name} (ID: {meter.pk})")
+        importer = MeterDataImporter(
+            meter=meter,
+            update=update,
+            skip_invalid=skip_invalid,
+            progress_callback=self.stdout.write,
+        )
+        with open(path, 'rb') as file:
+            results = importer.import_file(file, name)
+        return sum(result['imported'] + result['updated'] for result in results.values())
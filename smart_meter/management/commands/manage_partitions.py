@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from smart_meter.services.partitions import MeasurementPartitioner, MEASUREMENT_MODELS
+
+
+class Command(BaseCommand):
+    help = "Pre-create future monthly measurement partitions and detach or drop expired ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ahead",
+            type=int,
+            default=settings.MEASUREMENT_PARTITIONS_AHEAD,
+            help="Amount of future months to create partitions for",
+        )
+        parser.add_argument(
+            "--retain-months",
+            type=int,
+            default=settings.MEASUREMENT_RETENTION_MONTHS,
+            help="Detach partitions older than this amount of months (default: keep everything)",
+        )
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            help="Drop expired partitions after detaching them",
+        )
+
+    def handle(self, *args, **options):
+        # Every measurement database has its own measurement tables
+        for using in settings.MEASUREMENT_DATABASES:
+            for model in MEASUREMENT_MODELS:
+                partitioner = MeasurementPartitioner(model, progress_callback=self.stdout.write, using=using)
+                partitioner.ensure_partitions(options["ahead"])
+                # Measurements of months without partition are moved out of the default partition
+                for month in partitioner.default_partition_months():
+                    partitioner.create_partition(month)
+
+                if options["retain_months"] is not None:
+                    partitioner.expire_partitions(options["retain_months"], drop=options["drop"])
+
+                default_count = partitioner.default_partition_count()
+                if default_count:
+                    self.stdout.write(
+                        self.style.WARNING(
+                            f"{using}: {partitioner.default_partition_name}: {default_count:,} measurements outside "
+                            f"of the monthly partitions"
+                        )
+                    )
+
+        self.stdout.write(self.style.SUCCESS("Partitions up to date"))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from smart_meter.models import SmartMeter
+from smart_meter.services.merge import MeterMerger
+
+
+class Command(BaseCommand):
+    help = "Merge the history of a meter into another meter of the same user, or continue the started merges"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "target",
+            type=int,
+            nargs="?",
+            help="Meter ID that keeps the merged history",
+        )
+        parser.add_argument(
+            "source",
+            type=int,
+            nargs="?",
+            help="Meter ID of which the history is moved, the meter is deleted afterwards",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            help="Override the maximum amount of measurements moved per transaction (MEASUREMENT_DELETE_CHUNK_SIZE)",
+        )
+
+    def handle(self, *args, **options):
+        if options["target"] is not None and options["source"] is not None:
+            try:
+                merges = [(SmartMeter.objects.get(pk=options["target"]), SmartMeter.objects.get(pk=options["source"]))]
+            except SmartMeter.DoesNotExist:
+                raise CommandError("Meter does not exist")
+        elif options["target"] is None:
+            # Continue the merges started through the API
+            sources = SmartMeter.objects.filter(merged_into__isnull=False).select_related('merged_into')
+            merges = [(source.merged_into, source) for source in sources]
+        else:
+            raise CommandError("Give both a target and a source meter, or neither to continue the started merges")
+
+        for target, source in merges:
+            merger = MeterMerger(target, source, options["chunk_size"], progress_callback=self.stdout.write)
+            try:
+                processed = merger.merge()
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(
+                f"Meter {source.pk} merged into meter {target.pk}, {processed:,} measurements processed"
+            ))
@@ -0,0 +1,57 @@
+from datetime import datetime, timezone as dt_timezone, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from smart_meter.models import SmartMeter
+from smart_meter.services.packing import MeasurementPacker, packed_before, day_start
+from smart_meter.services.partitions import MEASUREMENT_TYPES
+
+
+class Command(BaseCommand):
+    help = "Pack measurements older than MEASUREMENT_PACK_AFTER_DAYS into one row per meter per day, or unpack a meter"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--type",
+            choices=MEASUREMENT_TYPES.keys(),
+            help="Only pack this measurement type",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Override the amount of days to keep measurements unpacked",
+        )
+        parser.add_argument(
+            "--unpack",
+            type=int,
+            metavar="METER_ID",
+            help="Move the packed measurements of this meter back into the measurement tables",
+        )
+
+    def handle(self, *args, **options):
+        types = [options["type"]] if options["type"] else MEASUREMENT_TYPES.keys()
+
+        if options["unpack"] is not None:
+            meter_id = options["unpack"]
+            if not SmartMeter.objects.filter(pk=meter_id).exists():
+                raise CommandError(f"Meter {meter_id} does not exist")
+            for measurement_type in types:
+                packer = MeasurementPacker(MEASUREMENT_TYPES[measurement_type], progress_callback=self.stdout.write)
+                unpacked = packer.unpack(meter_id)
+                self.stdout.write(self.style.SUCCESS(f"{measurement_type}: {unpacked:,} measurements unpacked"))
+            return
+
+        if options["days"] is not None:
+            today = datetime.now(dt_timezone.utc).date()
+            before = day_start(today - timedelta(days=options["days"]))
+        else:
+            before = packed_before()
+        if before is None:
+            raise CommandError("Packing is disabled, set GPX_MEASUREMENT_PACK_AFTER_DAYS or use --days")
+
+        for measurement_type in types:
+            packer = MeasurementPacker(MEASUREMENT_TYPES[measurement_type], progress_callback=self.stdout.write)
+            packed = packer.pack(before)
+            self.stdout.write(
+                self.style.SUCCESS(f"{measurement_type}: packed before {before:%Y-%m-%d}, {packed:,} measurements packed")
+            )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from smart_meter.services.deletion import MeterDeleter
+
+
+class Command(BaseCommand):
+    help = "Delete the meters and users that are marked as deleted, with their measurements in chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            help="Override the maximum amount of measurement rows per delete (MEASUREMENT_DELETE_CHUNK_SIZE)",
+        )
+
+    def handle(self, *args, **options):
+        deleter = MeterDeleter(options["chunk_size"], progress_callback=self.stdout.write)
+        deleted = deleter.purge()
+        self.stdout.write(self.style.SUCCESS(f"{deleted:,} measurement rows deleted"))
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from smart_meter.models import SmartMeter
+from smart_meter.services.rebalance import MeasurementRebalancer
+
+
+class Command(BaseCommand):
+    help = "Move the measurements of the meters to their measurement database (MEASUREMENT_SHARDS), for example " \
+           "after adding a database. Run it again to move the measurements that came in during the move"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--meter",
+            type=int,
+            metavar="METER_ID",
+            help="Only move the measurements of this meter",
+        )
+        parser.add_argument(
+            "--database",
+            help="Move the measurements to this database, instead of the shard of each meter",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            help="Override the maximum amount of rows copied at once (MEASUREMENT_DELETE_CHUNK_SIZE)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only list the meters that would be moved",
+        )
+
+    def handle(self, *args, **options):
+        meter_id = options["meter"]
+        if meter_id is not None and not SmartMeter.objects.filter(pk=meter_id).exists():
+            raise CommandError(f"Meter {meter_id} does not exist")
+        if options["database"] is not None and options["database"] not in settings.MEASUREMENT_DATABASES:
+            raise CommandError(f"Database {options['database']} is not configured")
+
+        rebalancer = MeasurementRebalancer(options["chunk_size"], progress_callback=self.stdout.write)
+        moved = rebalancer.rebalance(
+            [meter_id] if meter_id is not None else None, options["database"], dry_run=options["dry_run"]
+        )
+        if not options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(f"{moved:,} rows moved"))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import dateparse
+
+from smart_meter.models import GroupMeter
+from smart_meter.services.group_series import GroupSeriesAggregator
+
+
+class Command(BaseCommand):
+    help = "Rebuild the combined usage per hour of the groups from the measurements, for example to fill the series " \
+           "of existing groups. New measurements are added to the series at ingest"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--group",
+            type=int,
+            metavar="GROUP_ID",
+            help="Only rebuild the series of this group",
+        )
+        parser.add_argument(
+            "--after",
+            help="Only rebuild the series from this moment (ISO 8601)",
+        )
+
+    def handle(self, *args, **options):
+        group_id = options["group"]
+        if group_id is not None and not GroupMeter.objects.filter(pk=group_id).exists():
+            raise CommandError(f"Group {group_id} does not exist")
+        after = None
+        if options["after"]:
+            after = dateparse.parse_datetime(options["after"])
+            if after is None or after.tzinfo is None:
+                raise CommandError("--after requires a timestamp with timezone, like 2021-03-01T00:00:00+01:00")
+
+        aggregator = GroupSeriesAggregator(progress_callback=self.stdout.write)
+        rebuilt = aggregator.rebuild_groups([group_id] if group_id is not None else None, after)
+        self.stdout.write(self.style.SUCCESS(f"{rebuilt:,} intervals rebuilt"))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from smart_meter.models import SmartMeter
+from smart_meter.services.archive import MeasurementArchiver
+from smart_meter.services.partitions import MEASUREMENT_TYPES
+
+
+class Command(BaseCommand):
+    help = "Move archived measurements of a meter from the cold archive back into the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "meter_id",
+            type=int,
+            help="Meter ID",
+        )
+        parser.add_argument(
+            "--type",
+            choices=MEASUREMENT_TYPES.keys(),
+            help="Only restore this measurement type",
+        )
+        parser.add_argument(
+            "--year",
+            type=int,
+            help="Only restore this year",
+        )
+
+    def handle(self, *args, **options):
+        meter_id = options["meter_id"]
+        if not SmartMeter.objects.filter(pk=meter_id).exists():
+            raise CommandError(f"Meter {meter_id} does not exist")
+
+        types = [options["type"]] if options["type"] else MEASUREMENT_TYPES.keys()
+        for measurement_type in types:
+            archiver = MeasurementArchiver(MEASUREMENT_TYPES[measurement_type], progress_callback=self.stdout.write)
+            restored = archiver.restore(meter_id, options["year"])
+            self.stdout.write(self.style.SUCCESS(f"{measurement_type}: {restored:,} measurements restored"))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from smart_meter.models import SmartMeter
+from smart_meter.services.quality import MeasurementQualityScanner
+
+
+class Command(BaseCommand):
+    help = "Scan the measurement histories of the meters for gaps, counters that went down, spikes, frozen counters " \
+           "and DST anomalies, and store a quality report per meter (run nightly)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--meter",
+            type=int,
+            metavar="METER_ID",
+            help="Only scan this meter",
+        )
+        parser.add_argument(
+            "--requested",
+            action="store_true",
+            help="Only scan the meters of which a new scan was requested through the API (run every few minutes)",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Override the amount of days scanned (MEASUREMENT_QUALITY_SCAN_DAYS), 0 for the full history",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Override the amount of processes (MEASUREMENT_QUALITY_WORKERS)",
+        )
+
+    def handle(self, *args, **options):
+        meter_id = options["meter"]
+        if meter_id is not None and not SmartMeter.objects.visible().filter(pk=meter_id).exists():
+            raise CommandError(f"Meter {meter_id} does not exist")
+
+        scanner = MeasurementQualityScanner(options["days"], options["workers"], progress_callback=self.stdout.write)
+        if options["requested"]:
+            with_issues = scanner.scan_requested()
+        else:
+            with_issues = scanner.scan([meter_id] if meter_id is not None else None)
+        self.stdout.write(self.style.SUCCESS(f"{with_issues:,} meters with issues"))
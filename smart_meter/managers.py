@@ -1,7 +1,12 @@
-from django.db import models, transaction
+from functools import partial
+
+from django.db import models, transaction, connections, DEFAULT_DB_ALIAS
 from django.db.models import Prefetch, functions
+from django.db.models.fields import NOT_PROVIDED
 from django.utils import timezone
 
+from smart_meter.fields import local_date, local_hour
+
 
 class SmartMeterManager(models.Manager):
     """
@@ -9,8 +14,22 @@ class SmartMeterManager(models.Manager):
     """
     use_for_related_fields = True
 
+    def get_queryset(self):
+        """
+        Default queryset joins the live values of the meters (SmartMeterLive)
+        :return: qs
+        """
+        return super().get_queryset().select_related('live')
+
+    def visible(self):
+        """
+        Meters that are not deleted, deleted meters are hidden until they are purged
+        :return: qs
+        """
+        return self.filter(deleted_on__isnull=True)
+
     def user_meters(self, user_id):
-        return self.filter(user_id=user_id)
+        return self.visible().filter(user_id=user_id)
 
     def create(self, user, **kwargs):
         meter = super().create(user=user, **kwargs)
@@ -22,47 +41,58 @@ class SmartMeterManager(models.Manager):
         return meter
 
     def meter_statistics(self):
-        return self.aggregate(
-            live_meters=models.Count('pk', models.Q(last_update__gte=timezone.now() - timezone.timedelta(hours=2))),
+        return self.visible().aggregate(
+            live_meters=models.Count(
+                'pk', models.Q(live__last_update__gte=timezone.now() - timezone.timedelta(hours=2))
+            ),
             total_meters=models.Count('pk'),
         )
 
     def new_measurement(self, user, power, gas=None, solar=None, gpx_version=None):
         gas = gas or {}
         solar = solar or {}
-        meter, created = self.update_or_create(
-            defaults=dict(
-                gpx_version=gpx_version or 'Unknown',
-                sn_power=power.get('sn'),
-                power_timestamp=power.get('timestamp'),
-                actual_power_import=power.get('actual_import'),
-                actual_power_export=power.get('actual_export'),
-                tariff=power.get('tariff'),
-                total_power_import_1=power.get('import_1'),
-                total_power_import_2=power.get('import_2'),
-                total_power_export_1=power.get('export_1'),
-                total_power_export_2=power.get('export_2'),
-                sn_gas=gas.get('sn'),
-                gas_timestamp=gas.get('timestamp'),
-                total_gas=gas.get('gas'),
-                # actual_gas=gas.get('gas'),  -- Actual gas is set after measurement
-                solar_timestamp=solar.get('timestamp'),
-                actual_solar=solar.get('solar'),
-                total_solar=solar.get('total'),
-                last_update=timezone.now(),
-            ),
-            user=user,
-            sn_power=power.get('sn'),
+        live_values = dict(
+            power_timestamp=power.get('timestamp'),
+            actual_power_import=power.get('actual_import'),
+            actual_power_export=power.get('actual_export'),
+            tariff=power.get('tariff'),
+            total_power_import_1=power.get('import_1'),
+            total_power_import_2=power.get('import_2'),
+            total_power_export_1=power.get('export_1'),
+            total_power_export_2=power.get('export_2'),
+            gas_timestamp=gas.get('timestamp'),
+            total_gas=gas.get('gas'),
+            # actual_gas=gas.get('gas'),  -- Actual gas is set after measurement
+            solar_timestamp=solar.get('timestamp'),
+            actual_solar=solar.get('solar'),
+            total_solar=solar.get('total'),
+            last_update=timezone.now(),
         )
+        meter_values = dict(gpx_version=gpx_version or 'Unknown', sn_gas=gas.get('sn'))
+        with transaction.atomic():
+            meter = self.visible().select_for_update(of=('self',)).filter(
+                user=user, sn_power=power.get('sn')
+            ).first()
+            created = meter is None
+            if created:
+                meter = self.create(user=user, sn_power=power.get('sn'), **meter_values, **live_values)
+            else:
+                # The meter row is only updated when the version or gas meter changed, otherwise only the live values
+                changed = [field for field, value in meter_values.items() if getattr(meter, field) != value]
+                for field, value in {**meter_values, **live_values}.items():
+                    setattr(meter, field, value)
+                meter.save(update_fields=changed + list(live_values))
 
         new_power_measurement = None
+        new_solar = None
+        new_gas = None
 
         if power and power.get('timestamp'):
             last_power = meter.last_power_measurement
             new_power_measurement = meter.powermeasurement_set.add_new_power_measurement(created, last_power, **power)
         if solar and new_power_measurement and solar.get('timestamp'):
             last_solar = meter.last_solar_measurement
-            meter.solarmeasurement_set.add_new_solar_measurement(created, last_solar, **solar)
+            new_solar = meter.solarmeasurement_set.add_new_solar_measurement(created, last_solar, **solar)
         if gas and gas.get('timestamp'):
             last_gas = meter.last_gas_measurement
             new_gas = meter.gasmeasurement_set.add_new_gas_measurement(created, last_gas, **gas)
@@ -71,43 +101,435 @@ class SmartMeterManager(models.Manager):
                 meter.actual_gas = new_gas.actual_gas
                 meter.save(update_fields=['actual_gas'])
 
+        new_measurements = [measurement for measurement in (new_power_measurement, new_solar, new_gas) if measurement]
+        if new_measurements and not created:
+            # Add the usage to the combined series of the groups of the meter (a new meter is in no group yet), once
+            # the measurements are committed: the interval rows are shared by all meters of a group
+            from smart_meter.services.group_series import GroupSeriesAggregator
+            transaction.on_commit(partial(GroupSeriesAggregator().add_measurements, meter.pk, new_measurements))
+
         return meter
 
 
-class MeasurementQuerySet(models.QuerySet):
-    def filter_timestamp(self, after, before):
-        qs = self.filter(timestamp__range=(after, before))
-        delta: timezone.timedelta = before - after
-        if delta.days < 2:
-            qs = qs.annotate(
-                timestamp_trunc=functions.TruncMinute('timestamp')
-            ).values('timestamp_trunc')
-        elif delta.days < 14:
-            qs = qs.annotate(
-                timestamp_trunc=functions.TruncHour('timestamp')
-            ).values('timestamp_trunc')
-        else:
-            qs = qs.annotate(
-                timestamp_trunc=functions.TruncDay('timestamp')
-            ).values('timestamp_trunc')
+class MeterShardedQuerySet(models.QuerySet):
+    """
+    QuerySet of a model that is sharded by meter (see sharding.MeasurementRouter). Without an explicit database, a
+    query filtered on the meter (meter, meter_id, meter__in or meter_id__in) runs on the database of the meter, as do
+    create with a meter and the rows of bulk_create. With only the default database nothing is looked up
+    """
 
-        return self.filter_timestamp_aggregation(qs).order_by('id')
+    def filter(self, *args, **kwargs):
+        return super().filter(*args, **kwargs).using_meter(kwargs)
+
+    def create(self, **kwargs):
+        queryset = self.using_meter(kwargs)
+        if queryset is not self:
+            return queryset.create(**kwargs)
+        return super().create(**kwargs)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        if self._db is None and objs:
+            from smart_meter.sharding import is_sharded, meters_database
+            if is_sharded():
+                database = meters_database({obj.meter_id for obj in objs})
+                if database is None:
+                    raise ValueError('Rows of meters on different databases can not be created at once')
+                return self.using(database).bulk_create(objs, *args, **kwargs)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def using_meter(self, lookups):
+        """
+        This queryset on the database of the meter of given lookups
+        :param lookups: filter or create kwargs
+        :return: qs, self when the database is explicit, or there is no meter lookup, or the meter is on the default
+            database (routed as usual, reads can go to a replica)
+        """
+        if self._db is None:
+            database = self._meter_database(lookups)
+            if database and database != DEFAULT_DB_ALIAS:
+                return self.using(database)
+        return self
+
+    @staticmethod
+    def _meter_database(lookups):
+        """Database of the meter(s) of the meter lookup, None without meter lookup or with only one database"""
+        from smart_meter.sharding import is_sharded, measurement_database, meters_database
+        if not is_sharded():
+            return None
+        for key in ('meter', 'meter_id'):
+            value = lookups.get(key)
+            if isinstance(value, (int, models.Model)):
+                return measurement_database(value)
+        for key in ('meter__in', 'meter_id__in'):
+            values = lookups.get(key)
+            if isinstance(values, (list, tuple, set)):
+                return meters_database([getattr(value, 'pk', value) for value in values])
+        return None
+
+
+class MeasurementQuerySet(MeterShardedQuerySet):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Set by filter_timestamp when packed or archived measurements have to be merged in the timestamp buckets
+        self._merge_sources = None
+        # Set by filter_timestamp, (after, before, kind) of the timestamp buckets
+        self._bucket_range = None
+        # Set by fill_gaps, gap fill mode of the timestamp buckets
+        self.gap_fill = None
+        # Set by filter_timestamp, maximum amount of timestamp buckets, and by downsample, how they are reduced to it
+        self.max_points = None
+        self.downsample_method = None
+        # Set by fetch_buckets, the database buckets fetched together with those of other querysets (not cloned)
+        self._fetched_buckets = None
+        # Set by filter_timestamp, the measurements that are aggregated in the timestamp buckets
+        self._bucket_measurements = None
+        # Set by keyset for merged buckets, (timestamp, descending) of the position the buckets are selected from
+        self._position = None
+        # Set by filter_timestamp, the annotations the measurements are grouped on into timestamp buckets
+        self._bucket_key = None
+
+    def _clone(self):
+        clone = super()._clone()
+        clone._merge_sources = self._merge_sources
+        clone._bucket_range = self._bucket_range
+        clone.gap_fill = self.gap_fill
+        clone.max_points = self.max_points
+        clone.downsample_method = self.downsample_method
+        clone._bucket_measurements = self._bucket_measurements
+        clone._position = self._position
+        clone._bucket_key = self._bucket_key
+        return clone
+
+    def order_by(self, *field_names):
+        """
+        The timestamp buckets are ordered on their group key instead of their (aggregated) timestamp, the same order.
+        Aggregated in that order the database can stop after the buckets of a page
+        """
+        if self._bucket_key:
+            field_names = [
+                key for field_name in field_names for key in (
+                    [field_name.replace('timestamp', name) for name in self._bucket_key]
+                    if field_name in ('timestamp', '-timestamp') else [field_name]
+                )
+            ]
+        return super().order_by(*field_names)
+
+    @property
+    def _python_buckets(self):
+        """If the timestamp buckets are built in Python (merged, fetched, gap filled or downsampled), see _fetch_all"""
+        return bool(self._merge_sources or self.gap_fill or self.max_points or self._fetched_buckets is not None)
+
+    def _fetch_all(self):
+        if self._result_cache is None and self._python_buckets:
+            from smart_meter.services.buckets import merged_buckets, merged_buckets_page, fill_gaps, downsample
+            descending = self.ordered_descending
+            if self._merge_sources and self.query.high_mark is not None and not (self.gap_fill or self.max_points):
+                # A page, only the buckets from the position (or the start of the ordering) up to the end of the slice
+                after, before = self._merge_sources[2:4]
+                start = before + timezone.timedelta(microseconds=1) if descending else after
+                position, before_position = self._position or (start, descending)
+                buckets = merged_buckets_page(*self._merge_sources, position, before_position, self.query.high_mark)
+            elif self._merge_sources:
+                buckets = merged_buckets(*self._merge_sources)
+            elif self._fetched_buckets is not None:
+                buckets = self._fetched_buckets
+            else:
+                buckets = list(self._database_buckets())
+            if self.gap_fill:
+                after, before, kind = self._bucket_range
+                buckets = fill_gaps(buckets, self.model, after, before, kind, self.gap_fill)
+            if self.max_points:
+                buckets = downsample(buckets, self.model, self.max_points, self.downsample_method)
+            if self._position:
+                timestamp, before_position = self._position
+                buckets = [bucket for bucket in buckets if (
+                    bucket['timestamp'] < timestamp if before_position else bucket['timestamp'] >= timestamp
+                )]
+            if descending:
+                buckets.reverse()
+            buckets = buckets[self.query.low_mark:self.query.high_mark]
+            self._result_cache = buckets
+        super()._fetch_all()
+
+    @property
+    def ordered_descending(self):
+        """If the buckets are ordered from new to old (ordering -timestamp)"""
+        return bool(self.query.order_by) and str(self.query.order_by[0]).startswith('-')
+
+    def _database_buckets(self):
+        """The timestamp buckets as aggregated by the database, without gap filling and downsampling"""
+        clone = self.fill_gaps(None).order_by('timestamp')
+        clone.max_points = None
+        clone.query.clear_limits()
+        return clone
+
+    def count(self):
+        if self._python_buckets:
+            return len(self)
+        return super().count()
+
+    def stream(self, chunk_size):
+        """
+        The rows one by one, read from a server-side cursor in chunks, so they are never all in memory. The database
+        is resolved right away: the rows can be read after the view returned (a streamed response), when the reads
+        of the request no longer go to a replica. Buckets that are built in Python need all buckets, these are
+        evaluated right away
+        :param chunk_size: rows per fetch from the cursor
+        :return: iterator of rows
+        """
+        if self._python_buckets:
+            return iter(self)
+        return self.using(self.db).iterator(chunk_size=chunk_size)
+
+    def filter_timestamp(self, after, before, max_points=None):
+        """
+        Timestamp buckets of the measurements in the time range, minute, hour or day buckets depending on the length of
+        the range (see services.buckets.bucket_kind)
+        :param after: start of the time range
+        :param before: end of the time range
+        :param max_points: maximum amount of buckets, the bucket size is picked for it and the buckets are downsampled
+        when even day buckets are more (see downsample)
+        :return: qs
+        """
+        from smart_meter.services.buckets import bucket_kind
+        kind = bucket_kind(after, before, max_points)
+        qs = self.filter(timestamp__range=(after, before))._buckets(after, before, kind)
+        qs.max_points = max_points
+        return qs
+
+    def _buckets(self, after, before, kind):
+        """Timestamp buckets of the measurements of this queryset (in the time range), see filter_timestamp"""
+        measurements = self
+        if kind == 'minute':
+            key = {'timestamp_trunc': functions.Trunc('timestamp', kind)}
+            qs = measurements.annotate(**key).values(*key)
+        else:
+            # Hour and day buckets group on the local date and hour, the expressions of the (meter, local date, local
+            # hour) index. The (redundant) local date range lets the planner use that index
+            key = {'local_date': local_date()}
+            if kind == 'hour':
+                key['local_hour'] = local_hour()
+            qs = measurements.annotate(**key).filter(
+                local_date__range=(timezone.localdate(after), timezone.localdate(before))
+            ).values(*key)
+        qs = self.filter_timestamp_aggregation(qs)
+        qs._bucket_key = tuple(key)
+        qs = qs.order_by('timestamp')
+        qs._bucket_range = (after, before, kind)
+        qs._bucket_measurements = measurements
+
+        meter_ids = self._filtered_meter_ids()
+        if meter_ids:
+            from smart_meter.services.archive import MeasurementArchiver
+            from smart_meter.services.packing import packed_before
+            archived = MeasurementArchiver(self.model).has_archive(meter_ids, after, before)
+            packing = packed_before()
+            packed = packing is not None and after < packing
+            if archived or packed:
+                qs._merge_sources = (measurements, meter_ids, after, before, kind, archived, packed)
+        return qs
 
     def filter_timestamp_aggregation(self, qs):
         raise NotImplementedError
 
+    def fill_gaps(self, mode):
+        """
+        Return the timestamp buckets of filter_timestamp on the full grid of the time range, with the buckets without
+        measurements filled in (see services.buckets.fill_gaps). Filled in the same fetch, no extra query
+        :param mode: null or carry, None for only the buckets with measurements
+        :return: qs
+        """
+        if mode and self._bucket_range is None:
+            raise ValueError('Gaps can only be filled in the timestamp buckets of filter_timestamp')
+        clone = self._chain()
+        clone.gap_fill = mode
+        return clone
+
+    def keyset(self, timestamp, id, descending=False):
+        """
+        Timestamp buckets from a position on, for keyset pagination: the buckets of the measurements from (timestamp,
+        id) on, or before it when descending. The position is applied to the measurements before they are aggregated,
+        so the (meter, timestamp) index is scanned from the position (no OFFSET). The position of a bucket is its
+        first measurement (the timestamp and id of the bucket), so a bucket is never split over pages
+        :param timestamp: timestamp of the position
+        :param id: measurement id of the position
+        :param descending: buckets before the position instead of from it
+        :return: qs
+        """
+        if self._bucket_range is None:
+            raise ValueError('Only the timestamp buckets of filter_timestamp can be paginated')
+        if self._merge_sources:
+            # The deltas of packed and archived measurements are derived from the measurement before them, these
+            # buckets are merged in Python from the position on, for the amount of buckets of the slice (see
+            # services.buckets.merged_buckets_page)
+            clone = self._chain()
+            clone._position = (timestamp, descending)
+            return clone
+        if descending:
+            position = models.Q(timestamp__lt=timestamp) | models.Q(timestamp=timestamp, id__lt=id)
+        else:
+            position = models.Q(timestamp__gt=timestamp) | models.Q(timestamp=timestamp, id__gte=id)
+        qs = self._bucket_measurements.filter(position)._buckets(*self._bucket_range)
+        qs = qs.order_by(*self.query.order_by)
+        qs.gap_fill, qs.max_points, qs.downsample_method = self.gap_fill, self.max_points, self.downsample_method
+        return qs
+
+    @property
+    def bucket_size(self):
+        """Bucket size of filter_timestamp, minute, hour or day"""
+        return self._bucket_range[2] if self._bucket_range else None
+
+    def downsample(self, method):
+        """
+        Set how the timestamp buckets of filter_timestamp are reduced to its max_points (see
+        services.buckets.downsample). Done in the same fetch, no extra query
+        :param method: merge or lttb, None for merge
+        :return: qs
+        """
+        if method and self._bucket_range is None:
+            raise ValueError('Only the timestamp buckets of filter_timestamp can be downsampled')
+        clone = self._chain()
+        clone.downsample_method = method
+        return clone
+
+    def gap_spans(self):
+        """
+        Summary of the gaps in the gap filled timestamp buckets
+        :return: list of dicts with the start, end and amount of empty buckets of each gap
+        """
+        from smart_meter.services.buckets import gap_spans
+        buckets = sorted(self, key=lambda bucket: bucket['timestamp'])
+        return gap_spans(buckets, self._bucket_range[1]) if self.gap_fill else []
+
+    def bucket_average(self, field):
+        """
+        Average of an actual field in a timestamp bucket, in the unit of the field (values are stored scaled)
+        :param field: actual field name
+        :return: aggregate expression
+        """
+        return models.Avg(field, output_field=self.model._meta.get_field(field))
+
+    def bucket_total(self, field):
+        """
+        Usage of a total (counter) field in a timestamp bucket, the sum of the deltas stored with the measurements.
+        Each delta is the increase since the previous measurement, so usage on bucket boundaries is counted once
+        :param field: total field name
+        :return: aggregate expression
+        """
+        delta = self.model.delta_fields()[field]
+        return models.Sum(delta, output_field=self.model._meta.get_field(delta))
+
+    def period_total(self, field):
+        """
+        Usage of a total (counter) field over the measurements in the queryset
+        :param field: total field name
+        :return: sum of the deltas, None without measurements
+        """
+        return self.aggregate(period=self.bucket_total(field))['period']
+
+    def bucket_period_total(self, field):
+        """
+        Usage of a total (counter) field over the timestamp buckets of filter_timestamp, summed from the fetched
+        buckets instead of a separate aggregate. The buckets cover the same measurements as period_total, so it is the
+        same sum of deltas
+        :param field: total field name
+        :return: sum of the bucket totals, None without measurements
+        """
+        totals = [bucket[field] for bucket in self if not bucket.get('gap') and bucket[field] is not None]
+        return sum(totals) if totals else None
+
+    def create(self, previous=NOT_PROVIDED, **kwargs):
+        """
+        Create a measurement, with the deltas since the previous measurement of the meter
+        :param previous: previous measurement of the meter (None if there is none), looked up when not provided
+        :param kwargs: measurement data
+        :return: measurement
+        """
+        queryset = self.using_meter(kwargs)
+        if queryset is not self:
+            return queryset.create(previous, **kwargs)
+        measurement = self.model(**kwargs)
+        self._for_write = True
+        if previous is NOT_PROVIDED:
+            previous = self.model.objects.using(self.db).filter(
+                meter_id=measurement.meter_id, timestamp__lt=measurement.timestamp
+            ).order_by('-timestamp').first()
+        measurement.set_deltas(previous)
+        measurement.save(force_insert=True, using=self.db)
+        return measurement
+
+    def _filtered_meter_ids(self):
+        """
+        Meter ids this queryset is filtered on (meter=x or meter__in=[...])
+        :return: list of meter ids, None if not filtered on meter
+        """
+        where = self.query.where
+        if where.connector != 'AND' or where.negated:
+            return None
+        meter_field = self.model._meta.get_field('meter')
+        for lookup in where.children:
+            if getattr(getattr(lookup, 'lhs', None), 'target', None) is not meter_field:
+                continue
+            if lookup.lookup_name == 'exact' and isinstance(lookup.rhs, int):
+                return [lookup.rhs]
+            if lookup.lookup_name == 'in' and isinstance(lookup.rhs, (list, tuple, set)):
+                return list(lookup.rhs)
+        return None
+
+
+def fetch_buckets(querysets):
+    """
+    Fetch the timestamp buckets of querysets of filter_timestamp (of different measurement types) in one statement,
+    a UNION ALL of their bucket queries, instead of a query per queryset. Querysets that are already fetched, merge
+    packed or archived measurements or are on another database than the others are fetched as usual
+    :param querysets: list of MeasurementQuerySet
+    """
+    pending = [qs for qs in querysets if qs._result_cache is None and not qs._merge_sources and qs._bucket_range]
+    database = pending[0].db if pending else None
+    pending = [qs for qs in pending if qs.db == database]
+    if len(pending) < 2:
+        return
+
+    compilers, parts, params = [], [], []
+    for qs in pending:
+        compiler = qs._database_buckets().query.get_compiler(using=database)
+        sql, sql_params = compiler.as_sql()
+        compilers.append((compiler, sql))
+        params.extend(sql_params)
+    # The rows of all querysets have the same amount of columns, the series number first
+    width = max(compiler.col_count for compiler, sql in compilers)
+    for series, (compiler, sql) in enumerate(compilers):
+        padding = ', NULL' * (width - compiler.col_count)
+        parts.append(f'SELECT {series} AS series, buckets.*{padding} FROM ({sql}) AS buckets')
+    with connections[database].cursor() as cursor:
+        cursor.execute(' UNION ALL '.join(parts), params)
+        rows = cursor.fetchall()
+
+    for series, (qs, (compiler, sql)) in enumerate(zip(pending, compilers)):
+        # Same conversion and names as the values() iterable of the queryset
+        query = compiler.query
+        names = list(query.selected) if query.selected else \
+            [*query.extra_select, *query.values_select, *query.annotation_select]
+        results = compiler.results_iter(results=[
+            [row[1:1 + compiler.col_count] for row in rows if row[0] == series]
+        ])
+        qs._fetched_buckets = sorted(
+            (dict(zip(names, row)) for row in results), key=lambda bucket: bucket['timestamp']
+        )
+
 
 class PowerMeasurementQuerySet(MeasurementQuerySet):
     def filter_timestamp_aggregation(self, qs):
         qs = qs.annotate(
             id=models.Min('id'),
-            actual_import=models.Avg('actual_import'),  # power as average over given time period
-            actual_export=models.Avg('actual_export'),  # power as average over given time period
+            actual_import=self.bucket_average('actual_import'),  # power as average over given time period
+            actual_export=self.bucket_average('actual_export'),  # power as average over given time period
             timestamp=models.Min('timestamp'),
-            total_import_1=models.Max('total_import_1') - models.Min('total_import_1'),
-            total_import_2=models.Max('total_import_2') - models.Min('total_import_2'),
-            total_export_1=models.Max('total_export_1') - models.Min('total_export_1'),
-            total_export_2=models.Max('total_export_2') - models.Min('total_export_2'),
+            total_import_1=self.bucket_total('total_import_1'),
+            total_import_2=self.bucket_total('total_import_2'),
+            total_export_1=self.bucket_total('total_export_1'),
+            total_export_2=self.bucket_total('total_export_2'),
         )
         return qs.values(
             'id', 'timestamp', 'actual_import', 'actual_export',
@@ -119,8 +541,8 @@ class SolarMeasurementQuerySet(MeasurementQuerySet):
     def filter_timestamp_aggregation(self, qs):
         qs = qs.annotate(
             id=models.Min('id'),
-            actual_solar=models.Avg('actual_solar'),
-            total_solar=models.Max('total_solar') - models.Min('total_solar'),
+            actual_solar=self.bucket_average('actual_solar'),
+            total_solar=self.bucket_total('total_solar'),
             timestamp=models.Min('timestamp')
         )
         return qs.values('id', 'timestamp', 'actual_solar', 'total_solar', )
@@ -130,8 +552,8 @@ class GasMeasurementQuerySet(MeasurementQuerySet):
     def filter_timestamp_aggregation(self, qs):
         qs = qs.annotate(
             id=models.Min('id'),
-            actual_gas=models.Avg('actual_gas'),
-            total_gas=models.Max('total_gas') - models.Min('total_gas'),
+            actual_gas=self.bucket_average('actual_gas'),
+            total_gas=self.bucket_total('total_gas'),
             timestamp=models.Min('timestamp')
         )
         return qs.values('id', 'timestamp', 'actual_gas', 'total_gas', )
@@ -156,6 +578,7 @@ class PowerMeasurementManager(models.Manager):
         if meter_created or not last_measurement or \
                 last_measurement.timestamp + self.minimum_store_duration < timestamp:
             return self.create(
+                previous=last_measurement,
                 timestamp=timestamp,
                 actual_import=kwargs.get('actual_import'),
                 actual_export=kwargs.get('actual_export'),
@@ -195,6 +618,7 @@ class GasMeasurementManager(models.Manager):
                 # actual gas in m3/h
                 actual_gas = gas_difference * (timezone.timedelta(hours=1) / time_difference)
             return self.create(
+                previous=last_measurement,
                 timestamp=timestamp,
                 actual_gas=actual_gas,
                 total_gas=gas,
@@ -223,6 +647,7 @@ class SolarMeasurementManager(models.Manager):
         if meter_created or not last_measurement or \
                 last_measurement.timestamp + self.minimum_store_duration < timestamp:
             return self.create(
+                previous=last_measurement,
                 timestamp=timestamp,
                 actual_solar=kwargs.get('solar'),
                 total_solar=kwargs.get('total', 0),
@@ -245,7 +670,9 @@ class GroupMeterManager(models.Manager):
         """
         from .models import GroupParticipant
         return super().get_queryset().prefetch_related(
-            Prefetch('participants', GroupParticipant.objects.select_related('meter', 'meter__user').order_by('pk'))
+            Prefetch('participants', GroupParticipant.objects.select_related(
+                'meter', 'meter__live', 'meter__user'
+            ).order_by('pk'))
         )
 
     def managed_by(self, user_id):
@@ -269,12 +696,19 @@ class GroupMeterManager(models.Manager):
         :param user_id:
         :return:
         """
-        return self.filter(participants__meter__user_id=user_id, participants__left_on__isnull=True).distinct()
+        from .models import GroupParticipant
+        return self.filter(models.Exists(
+            GroupParticipant.objects.active().filter(group=models.OuterRef('pk'), meter__user_id=user_id)
+        ))
 
     def live_groups(self, group_ids):
+        from .models import GroupParticipant
         just_now = timezone.now() - timezone.timedelta(seconds=15)
-        return self.filter(participants__left_on__isnull=True,
-                           participants__meter__last_update__gte=just_now, pk__in=group_ids).distinct()
+        return self.filter(models.Exists(
+            GroupParticipant.objects.active().filter(
+                group=models.OuterRef('pk'), meter__live__last_update__gte=just_now
+            )
+        ), pk__in=group_ids)
 
     def group_meter_statistics(self):
         return self.aggregate(
@@ -0,0 +1,172 @@
+# Generated by Django 6.0.5 on 2026-10-18 10:12
+
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import migrations, models, transaction
+import django.db.models.deletion
+
+MEASUREMENT_TABLES = (
+    'smart_meter_powermeasurement',
+    'smart_meter_gasmeasurement',
+    'smart_meter_solarmeasurement',
+)
+
+# Amount of months created ahead of the current month, the manage_partitions command keeps this up to date
+PARTITIONS_AHEAD = 3
+# Ids per transaction of the copy
+BATCH_SIZE = 50000
+# Indexes of the keys of the copy, <table>_<name>
+KEY_NAMES = ('pkey', 'meter_id_timestamp_uniq')
+
+
+def _month_start(timestamp):
+    return datetime(timestamp.year, timestamp.month, 1, tzinfo=dt_timezone.utc)
+
+
+def _next_month(month):
+    return month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+
+
+def _copy_table(schema_editor, table, partitioned):
+    """
+    Replace the measurement table by a copy of itself, either partitioned by month or as plain table, while it stays
+    in use. The copy is created next to the table with its keys and an identity id (the keys are built on the empty
+    table), kept up to date by a trigger on the table and filled per range of ids in separate transactions. The rows
+    of a range are locked while they are copied, so a change to a copied row waits for its copy and the trigger sees
+    it. What is left for the locked transaction only changes the catalog: hand the id sequence over (the identity of
+    the copy restarts after the highest id) and swap the names. The old table is dropped afterwards
+    """
+    connection = schema_editor.connection
+    quote = schema_editor.quote_name
+    new_table = '%s_new' % table
+    old_table = '%s_old' % table
+    mirror = quote('%s_mirror' % table)
+
+    if partitioned:
+        schema_editor.execute(
+            'CREATE TABLE %s (LIKE %s INCLUDING DEFAULTS INCLUDING IDENTITY) PARTITION BY RANGE ("timestamp")'
+            % (quote(new_table), quote(table))
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT MIN("timestamp") FROM %s' % quote(table))
+            first = cursor.fetchone()[0]
+        now = datetime.now(dt_timezone.utc)
+        month = _month_start(first or now)
+        end = _month_start(now)
+        for _ in range(PARTITIONS_AHEAD):
+            end = _next_month(end)
+        while month <= end:
+            schema_editor.execute(
+                'CREATE TABLE %s PARTITION OF %s FOR VALUES FROM (%%s) TO (%%s)'
+                % (quote('%s_p%s' % (table, month.strftime('%Y_%m'))), quote(new_table)),
+                [month, _next_month(month)],
+            )
+            month = _next_month(month)
+        schema_editor.execute(
+            'CREATE TABLE %s PARTITION OF %s DEFAULT' % (quote('%s_default' % table), quote(new_table))
+        )
+        # Unique constraints on a partitioned table must include the partition key
+        key = 'id, "timestamp"'
+    else:
+        schema_editor.execute(
+            'CREATE TABLE %s (LIKE %s INCLUDING DEFAULTS INCLUDING IDENTITY)' % (quote(new_table), quote(table))
+        )
+        key = 'id'
+    # The keys are renamed in the swap, the index names of both tables are in use at the same time
+    schema_editor.execute('ALTER TABLE %s ADD CONSTRAINT %s PRIMARY KEY (%s)'
+                          % (quote(new_table), quote('%s_pkey' % new_table), key))
+    schema_editor.execute(
+        'ALTER TABLE %s ADD CONSTRAINT %s UNIQUE (meter_id, "timestamp")'
+        % (quote(new_table), quote('%s_meter_id_timestamp_uniq' % new_table))
+    )
+    schema_editor.execute(
+        'ALTER TABLE %s ADD CONSTRAINT %s FOREIGN KEY (meter_id) REFERENCES smart_meter_smartmeter (id) '
+        'DEFERRABLE INITIALLY DEFERRED' % (quote(new_table), quote('%s_meter_id_fk' % table))
+    )
+
+    # Measurements that are written during the copy
+    schema_editor.execute(
+        'CREATE FUNCTION %(mirror)s() RETURNS trigger AS $$ BEGIN '
+        'IF TG_OP <> \'INSERT\' THEN DELETE FROM %(new)s WHERE id = OLD.id AND "timestamp" = OLD."timestamp"; END IF; '
+        'IF TG_OP <> \'DELETE\' THEN INSERT INTO %(new)s SELECT NEW.*; END IF; '
+        'RETURN NULL; END $$ LANGUAGE plpgsql' % {'mirror': mirror, 'new': quote(new_table)}
+    )
+    schema_editor.execute(
+        'CREATE TRIGGER %s AFTER INSERT OR UPDATE OR DELETE ON %s FOR EACH ROW EXECUTE FUNCTION %s()'
+        % (mirror, quote(table), mirror)
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT MIN(id), MAX(id) FROM %s' % quote(table))
+        first_id, last_id = cursor.fetchone()
+    if first_id is not None:
+        for start in range(first_id, last_id + 1, BATCH_SIZE):
+            with transaction.atomic(using=connection.alias):
+                schema_editor.execute(
+                    'INSERT INTO %s SELECT * FROM %s WHERE id >= %%s AND id < %%s FOR SHARE ON CONFLICT DO NOTHING'
+                    % (quote(new_table), quote(table)),
+                    [start, start + BATCH_SIZE],
+                )
+
+    with transaction.atomic(using=connection.alias):
+        schema_editor.execute('LOCK TABLE %s IN ACCESS EXCLUSIVE MODE' % quote(table))
+        schema_editor.execute('DROP TRIGGER %s ON %s' % (mirror, quote(table)))
+        schema_editor.execute('DROP FUNCTION %s()' % mirror)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM %s' % quote(table))
+            next_id = cursor.fetchone()[0]
+        schema_editor.execute('ALTER TABLE %s ALTER COLUMN id RESTART WITH %d' % (quote(new_table), next_id))
+        schema_editor.execute('ALTER TABLE %s RENAME TO %s' % (quote(table), quote(old_table)))
+        schema_editor.execute('ALTER TABLE %s RENAME TO %s' % (quote(new_table), quote(table)))
+        for key_name in KEY_NAMES:
+            schema_editor.execute('ALTER INDEX IF EXISTS %s RENAME TO %s'
+                                  % (quote('%s_%s' % (table, key_name)), quote('%s_%s' % (old_table, key_name))))
+            schema_editor.execute('ALTER INDEX %s RENAME TO %s'
+                                  % (quote('%s_%s' % (new_table, key_name)), quote('%s_%s' % (table, key_name))))
+
+    schema_editor.execute('DROP TABLE %s' % quote(old_table))
+    schema_editor.execute('ALTER SEQUENCE %s RENAME TO %s'
+                          % (quote('%s_id_seq' % new_table), quote('%s_id_seq' % table)))
+
+
+def partition_measurements(apps, schema_editor):
+    for table in MEASUREMENT_TABLES:
+        _copy_table(schema_editor, table, partitioned=True)
+
+
+def unpartition_measurements(apps, schema_editor):
+    for table in MEASUREMENT_TABLES:
+        _copy_table(schema_editor, table, partitioned=False)
+        schema_editor.execute(
+            'CREATE INDEX %s ON %s (meter_id)'
+            % (schema_editor.quote_name('%s_meter_id' % table), schema_editor.quote_name(table))
+        )
+
+
+class Migration(migrations.Migration):
+    # Measurement tables are partitioned by month on the timestamp, existing measurements are copied over. The
+    # separate meter index is not recreated, it is covered by the unique (meter, timestamp) index. Not atomic, the
+    # measurements are copied in batches
+    atomic = False
+
+    dependencies = [
+        ('smart_meter', '0021_alter_gasmeasurement_id_alter_groupmeter_id_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_measurements, unpartition_measurements),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name=model_name,
+                    name='meter',
+                    field=models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to='smart_meter.smartmeter',
+                    ),
+                )
+                for model_name in ('powermeasurement', 'gasmeasurement', 'solarmeasurement')
+            ],
+        ),
+    ]
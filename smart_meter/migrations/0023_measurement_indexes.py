@@ -0,0 +1,112 @@
+# Generated by Django 6.0.5 on 2026-10-18 11:40
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+MODELS = ('gasmeasurement', 'powermeasurement', 'solarmeasurement')
+# Covered reading columns of the unique (meter, timestamp) index per model
+INCLUDE = {
+    'gasmeasurement': ('actual_gas', 'total_gas'),
+    'powermeasurement': (
+        'actual_import', 'actual_export', 'total_import_1', 'total_import_2', 'total_export_1', 'total_export_2',
+    ),
+    'solarmeasurement': ('actual_solar', 'total_solar'),
+}
+
+
+def _brin_index(model_name):
+    return django.contrib.postgres.indexes.BrinIndex(fields=['timestamp'], name='%s_time_brin' % model_name)
+
+
+def _unique_constraint(model_name):
+    return models.UniqueConstraint(
+        fields=('meter', 'timestamp'), include=INCLUDE[model_name], name='%s_meter_timestamp_uniq' % model_name
+    )
+
+
+def _partitions(connection, table):
+    """Partitions of a partitioned table, empty for a plain table"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE parent.relname = %s ORDER BY child.relname',
+            [table],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _create_index(schema_editor, table, name, definition, unique=False):
+    """
+    Build an index without blocking writes: each partition is indexed concurrently, and attached to the index on only
+    the partitioned table, which is valid once every partition index is attached
+    """
+    quote = schema_editor.quote_name
+    create = 'CREATE UNIQUE INDEX' if unique else 'CREATE INDEX'
+    partitions = _partitions(schema_editor.connection, table)
+    if not partitions:
+        schema_editor.execute('%s CONCURRENTLY %s ON %s %s' % (create, quote(name), quote(table), definition))
+        return
+    schema_editor.execute('%s %s ON ONLY %s %s' % (create, quote(name), quote(table), definition))
+    for partition in partitions:
+        partition_index = quote('%s_%s' % (partition, name.split('_', 1)[1]))
+        schema_editor.execute('%s CONCURRENTLY %s ON %s %s' % (create, partition_index, quote(partition), definition))
+        schema_editor.execute('ALTER INDEX %s ATTACH PARTITION %s' % (quote(name), partition_index))
+
+
+def create_indexes(apps, schema_editor):
+    """
+    The covering unique index is built before the unique (meter, timestamp) constraint is dropped, the measurements
+    stay unique (and the ingest can upsert on them) throughout
+    """
+    quote = schema_editor.quote_name
+    for model_name in MODELS:
+        model = apps.get_model('smart_meter', model_name)
+        table = model._meta.db_table
+        _create_index(schema_editor, table, _brin_index(model_name).name, 'USING brin ("timestamp")')
+        _create_index(
+            schema_editor, table, _unique_constraint(model_name).name,
+            '(meter_id, "timestamp") INCLUDE (%s)' % ', '.join(
+                quote(model._meta.get_field(field).column) for field in INCLUDE[model_name]
+            ),
+            unique=True,
+        )
+        schema_editor.execute('ALTER TABLE %s DROP CONSTRAINT %s'
+                              % (quote(table), quote('%s_meter_id_timestamp_uniq' % table)))
+
+
+def drop_indexes(apps, schema_editor):
+    quote = schema_editor.quote_name
+    for model_name in MODELS:
+        table = apps.get_model('smart_meter', model_name)._meta.db_table
+        schema_editor.execute('ALTER TABLE %s ADD CONSTRAINT %s UNIQUE (meter_id, "timestamp")'
+                              % (quote(table), quote('%s_meter_id_timestamp_uniq' % table)))
+        # Also drops the attached indexes of the partitions
+        schema_editor.execute('DROP INDEX %s' % quote(_unique_constraint(model_name).name))
+        schema_editor.execute('DROP INDEX %s' % quote(_brin_index(model_name).name))
+
+
+class Migration(migrations.Migration):
+    # Not atomic, the indexes of the partitions are built concurrently
+    atomic = False
+
+    dependencies = [
+        ('smart_meter', '0022_partition_measurements'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(create_indexes, drop_indexes),
+            ],
+            state_operations=[
+                migrations.AlterUniqueTogether(name=model_name, unique_together=set()) for model_name in MODELS
+            ] + [
+                migrations.AddIndex(model_name=model_name, index=_brin_index(model_name)) for model_name in MODELS
+            ] + [
+                migrations.AddConstraint(model_name=model_name, constraint=_unique_constraint(model_name))
+                for model_name in MODELS
+            ],
+        ),
+    ]
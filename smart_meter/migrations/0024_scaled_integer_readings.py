@@ -0,0 +1,213 @@
+# Generated by Django 6.0.5 on 2026-10-18 14:05
+
+from django.db import migrations, transaction
+
+import smart_meter.fields
+
+# Reading columns per model, (name, null)
+READING_FIELDS = {
+    'smartmeter': [
+        ('actual_power_import', False),
+        ('actual_power_export', False),
+        ('total_power_import_1', False),
+        ('total_power_import_2', False),
+        ('total_power_export_1', False),
+        ('total_power_export_2', False),
+        ('actual_gas', True),
+        ('total_gas', True),
+        ('actual_solar', True),
+        ('total_solar', True),
+    ],
+    'groupparticipant': [
+        ('power_import_joined', False),
+        ('power_export_joined', False),
+        ('gas_joined', True),
+        ('solar_joined', True),
+        ('power_import_left', True),
+        ('power_export_left', True),
+        ('gas_left', True),
+        ('solar_left', True),
+    ],
+    'powermeasurement': [
+        ('actual_import', False),
+        ('actual_export', False),
+        ('total_import_1', False),
+        ('total_import_2', False),
+        ('total_export_1', False),
+        ('total_export_2', False),
+    ],
+    'gasmeasurement': [
+        ('actual_gas', False),
+        ('total_gas', False),
+    ],
+    'solarmeasurement': [
+        ('actual_solar', False),
+        ('total_solar', False),
+    ],
+}
+
+# Large tables that are converted in batches, the other tables are converted in place
+BATCHED_MODELS = ('powermeasurement', 'gasmeasurement', 'solarmeasurement')
+BATCH_SIZE = 50000
+
+
+def _column_conversion(to_scaled):
+    """Column type and conversion expression (on the quoted column name) for 3 decimal places"""
+    if to_scaled:
+        return 'integer', 'round(%s * 1000)::integer'
+    return 'numeric(9, 3)', '%s::numeric / 1000'
+
+
+def _convert_in_place(schema_editor, model, columns, to_scaled):
+    quote = schema_editor.quote_name
+    column_type, expression = _column_conversion(to_scaled)
+    schema_editor.execute('ALTER TABLE %s %s' % (quote(model._meta.db_table), ', '.join(
+        'ALTER COLUMN %s TYPE %s USING %s' % (quote(column), column_type, expression % quote(column))
+        for column in columns
+    )))
+
+
+def _partitions(connection, table):
+    """Partitions of a partitioned table, empty for a plain table"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE parent.relname = %s ORDER BY child.relname',
+            [table],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _convert_batched(schema_editor, model, columns, to_scaled):
+    """
+    Convert the reading columns of a measurement table while it stays in use. Converted columns are added, kept up to
+    date by a trigger and filled per range of ids in separate transactions. The covering unique index on the converted
+    columns is built concurrently (per partition, attached to an index on only the partitioned table), and a NOT VALID
+    check constraint is validated for their NOT NULL, without blocking writes. What is left for the locked
+    transaction only changes the catalog: drop the old columns and their index, rename, and SET NOT NULL (proven by
+    the check constraint, without a scan)
+    """
+    connection = schema_editor.connection
+    quote = schema_editor.quote_name
+    db_table = model._meta.db_table
+    table = quote(db_table)
+    column_type, expression = _column_conversion(to_scaled)
+    new = {column: '%s_new' % column for column in columns}
+    assignments = ', '.join('%s = %s' % (quote(new[column]), expression % quote(column)) for column in columns)
+    function = quote('%s_convert_readings' % db_table)
+
+    for column in columns:
+        schema_editor.execute('ALTER TABLE %s ADD COLUMN %s %s' % (table, quote(new[column]), column_type))
+    # Measurements that are written during the conversion
+    schema_editor.execute(
+        'CREATE FUNCTION %s() RETURNS trigger AS $$ BEGIN %s RETURN NEW; END $$ LANGUAGE plpgsql' % (function, ' '.join(
+            'NEW.%s := %s;' % (quote(new[column]), expression % ('NEW.%s' % quote(column))) for column in columns
+        ))
+    )
+    schema_editor.execute(
+        'CREATE TRIGGER %s BEFORE INSERT OR UPDATE ON %s FOR EACH ROW EXECUTE FUNCTION %s()'
+        % (quote('%s_convert_readings' % db_table), table, function)
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT MIN(id), MAX(id) FROM %s' % table)
+        first, last = cursor.fetchone()
+    if first is not None:
+        for start in range(first, last + 1, BATCH_SIZE):
+            with transaction.atomic(using=connection.alias):
+                schema_editor.execute(
+                    'UPDATE %s SET %s WHERE id >= %%s AND id < %%s' % (table, assignments), [start, start + BATCH_SIZE]
+                )
+
+    # The covering unique indexes include the reading columns, built on the converted columns
+    partitions = _partitions(connection, db_table)
+    for constraint in model._meta.constraints:
+        definition = '(%s) INCLUDE (%s)' % (
+            ', '.join(quote(model._meta.get_field(field).column) for field in constraint.fields),
+            ', '.join(quote(new.get(field, field)) for field in constraint.include),
+        )
+        index = quote('%s_new' % constraint.name)
+        if partitions:
+            schema_editor.execute('CREATE UNIQUE INDEX %s ON ONLY %s %s' % (index, table, definition))
+            for partition in partitions:
+                partition_index = quote('%s_%s_new' % (partition, constraint.name.split('_', 1)[1]))
+                schema_editor.execute('CREATE UNIQUE INDEX CONCURRENTLY %s ON %s %s'
+                                      % (partition_index, quote(partition), definition))
+                schema_editor.execute('ALTER INDEX %s ATTACH PARTITION %s' % (index, partition_index))
+        else:
+            schema_editor.execute('CREATE UNIQUE INDEX CONCURRENTLY %s ON %s %s' % (index, table, definition))
+    for column in columns:
+        check = quote('%s_not_null' % new[column])
+        schema_editor.execute(
+            'ALTER TABLE %s ADD CONSTRAINT %s CHECK (%s IS NOT NULL) NOT VALID' % (table, check, quote(new[column]))
+        )
+        schema_editor.execute('ALTER TABLE %s VALIDATE CONSTRAINT %s' % (table, check))
+
+    with transaction.atomic(using=connection.alias):
+        schema_editor.execute('LOCK TABLE %s IN ACCESS EXCLUSIVE MODE' % table)
+        schema_editor.execute('DROP TRIGGER %s ON %s' % (quote('%s_convert_readings' % db_table), table))
+        schema_editor.execute('DROP FUNCTION %s()' % function)
+        for constraint in model._meta.constraints:
+            schema_editor.remove_constraint(model, constraint)
+        for column in columns:
+            schema_editor.execute('ALTER TABLE %s DROP COLUMN %s' % (table, quote(column)))
+            schema_editor.execute(
+                'ALTER TABLE %s RENAME COLUMN %s TO %s' % (table, quote(new[column]), quote(column))
+            )
+            schema_editor.execute('ALTER TABLE %s ALTER COLUMN %s SET NOT NULL' % (table, quote(column)))
+            schema_editor.execute('ALTER TABLE %s DROP CONSTRAINT %s' % (table, quote('%s_not_null' % new[column])))
+        for constraint in model._meta.constraints:
+            schema_editor.execute('ALTER INDEX %s RENAME TO %s' % (quote('%s_new' % constraint.name),
+                                                                  quote(constraint.name)))
+            for partition in partitions:
+                name = '%s_%s' % (partition, constraint.name.split('_', 1)[1])
+                schema_editor.execute('ALTER INDEX %s RENAME TO %s' % (quote('%s_new' % name), quote(name)))
+
+
+def _convert(apps, schema_editor, to_scaled):
+    for model_name, fields in READING_FIELDS.items():
+        model = apps.get_model('smart_meter', model_name)
+        columns = [name for name, null in fields]
+        if model_name in BATCHED_MODELS:
+            _convert_batched(schema_editor, model, columns, to_scaled)
+        else:
+            with transaction.atomic(using=schema_editor.connection.alias):
+                _convert_in_place(schema_editor, model, columns, to_scaled)
+
+
+def to_scaled_integers(apps, schema_editor):
+    _convert(apps, schema_editor, to_scaled=True)
+
+
+def to_numeric(apps, schema_editor):
+    _convert(apps, schema_editor, to_scaled=False)
+
+
+class Migration(migrations.Migration):
+    # Readings are stored as integer milli-units, for all databases: there is no numeric storage option, the raw SQL
+    # of the packing, deltas and imports works on the scaled integers. Not atomic, the measurement tables are
+    # converted in batches
+    atomic = False
+
+    dependencies = [
+        ('smart_meter', '0023_measurement_indexes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(to_scaled_integers, to_numeric),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name=model_name,
+                    name=name,
+                    field=smart_meter.fields.ScaledIntegerField(decimal_places=3, max_digits=9, null=null)
+                    if null else smart_meter.fields.ScaledIntegerField(decimal_places=3, max_digits=9),
+                )
+                for model_name, fields in READING_FIELDS.items() for name, null in fields
+            ],
+        ),
+    ]
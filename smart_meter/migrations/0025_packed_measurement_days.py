@@ -0,0 +1,61 @@
+# Generated by Django 6.0.5 on 2026-10-18 16:20
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smart_meter', '0024_scaled_integer_readings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GasMeasurementDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('seconds', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None)),
+                ('actual_gas', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None)),
+                ('total_gas', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None)),
+                ('meter', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='smart_meter.smartmeter')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('meter', 'date'), name='gasmeasurementday_meter_date_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='PowerMeasurementDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('seconds', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None)),
+                ('actual_import', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None)),
+                ('actual_export', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None)),
+                ('total_import_1', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None)),
+                ('total_import_2', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None)),
+                ('total_export_1', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None)),
+                ('total_export_2', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None)),
+                ('meter', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='smart_meter.smartmeter')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('meter', 'date'), name='powermeasurementday_meter_date_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SolarMeasurementDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('seconds', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None)),
+                ('actual_solar', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None)),
+                ('total_solar', django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), size=None)),
+                ('meter', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='smart_meter.smartmeter')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('meter', 'date'), name='solarmeasurementday_meter_date_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 6.0.5 on 2026-10-18 17:10
+
+import smart_meter.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Existing measurements get delta 0, run the backfill_measurement_deltas command to calculate their deltas
+
+    dependencies = [
+        ('smart_meter', '0025_packed_measurement_days'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='gasmeasurement',
+            name='gasmeasurement_meter_timestamp_uniq',
+        ),
+        migrations.RemoveConstraint(
+            model_name='powermeasurement',
+            name='powermeasurement_meter_timestamp_uniq',
+        ),
+        migrations.RemoveConstraint(
+            model_name='solarmeasurement',
+            name='solarmeasurement_meter_timestamp_uniq',
+        ),
+        migrations.AddField(
+            model_name='gasmeasurement',
+            name='delta_gas',
+            field=smart_meter.fields.ScaledIntegerField(db_default=0, decimal_places=3, max_digits=9),
+        ),
+        migrations.AddField(
+            model_name='powermeasurement',
+            name='delta_export_1',
+            field=smart_meter.fields.ScaledIntegerField(db_default=0, decimal_places=3, max_digits=9),
+        ),
+        migrations.AddField(
+            model_name='powermeasurement',
+            name='delta_export_2',
+            field=smart_meter.fields.ScaledIntegerField(db_default=0, decimal_places=3, max_digits=9),
+        ),
+        migrations.AddField(
+            model_name='powermeasurement',
+            name='delta_import_1',
+            field=smart_meter.fields.ScaledIntegerField(db_default=0, decimal_places=3, max_digits=9),
+        ),
+        migrations.AddField(
+            model_name='powermeasurement',
+            name='delta_import_2',
+            field=smart_meter.fields.ScaledIntegerField(db_default=0, decimal_places=3, max_digits=9),
+        ),
+        migrations.AddField(
+            model_name='solarmeasurement',
+            name='delta_solar',
+            field=smart_meter.fields.ScaledIntegerField(db_default=0, decimal_places=3, max_digits=9),
+        ),
+        migrations.AddConstraint(
+            model_name='gasmeasurement',
+            constraint=models.UniqueConstraint(fields=('meter', 'timestamp'), include=('actual_gas', 'total_gas', 'delta_gas'), name='gasmeasurement_meter_timestamp_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='powermeasurement',
+            constraint=models.UniqueConstraint(fields=('meter', 'timestamp'), include=('actual_import', 'actual_export', 'total_import_1', 'total_import_2', 'total_export_1', 'total_export_2', 'delta_import_1', 'delta_import_2', 'delta_export_1', 'delta_export_2'), name='powermeasurement_meter_timestamp_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='solarmeasurement',
+            constraint=models.UniqueConstraint(fields=('meter', 'timestamp'), include=('actual_solar', 'total_solar', 'delta_solar'), name='solarmeasurement_meter_timestamp_uniq'),
+        ),
+    ]
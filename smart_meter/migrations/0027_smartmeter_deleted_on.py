@@ -0,0 +1,18 @@
+# Generated by Django 6.0.5 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smart_meter', '0026_measurement_deltas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='smartmeter',
+            name='deleted_on',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
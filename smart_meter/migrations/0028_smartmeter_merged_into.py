@@ -0,0 +1,19 @@
+# Generated by Django 6.0.5 on 2026-10-18 19:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smart_meter', '0027_smartmeter_deleted_on'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='smartmeter',
+            name='merged_into',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='smart_meter.smartmeter'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0.5 on 2026-10-18 16:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smart_meter', '0028_smartmeter_merged_into'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='groupparticipant',
+            index=models.Index(condition=models.Q(('left_on__isnull', True)), fields=['group', 'meter'], name='participant_active_group_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='groupparticipant',
+            index=models.Index(condition=models.Q(('left_on__isnull', True)), fields=['meter', 'group'], name='participant_active_meter_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='smartmeter',
+            index=models.Index(fields=['last_update'], name='smartmeter_last_update_idx'),
+        ),
+    ]
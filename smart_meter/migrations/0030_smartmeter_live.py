@@ -0,0 +1,118 @@
+# Generated by Django 6.0.5 on 2026-10-18 17:10
+
+import django.db.models.deletion
+import smart_meter.fields
+from django.db import migrations, models
+
+LIVE_COLUMNS = (
+    'last_update, power_timestamp, actual_power_import, actual_power_export, tariff, total_power_import_1, '
+    'total_power_import_2, total_power_export_1, total_power_export_2, gas_timestamp, actual_gas, total_gas, '
+    'solar_timestamp, actual_solar, total_solar'
+)
+# Room for HOT updates: half of each page is kept free, the updated row version is written in the same page
+LIVE_FILLFACTOR = 50
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smart_meter', '0029_active_participation_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SmartMeterLive',
+            fields=[
+                ('meter', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='live', serialize=False, to='smart_meter.smartmeter')),
+                ('last_update', models.DateTimeField(auto_now_add=True)),
+                ('power_timestamp', models.DateTimeField()),
+                ('actual_power_import', smart_meter.fields.ScaledIntegerField(decimal_places=3, max_digits=9)),
+                ('actual_power_export', smart_meter.fields.ScaledIntegerField(decimal_places=3, max_digits=9)),
+                ('tariff', models.SmallIntegerField()),
+                ('total_power_import_1', smart_meter.fields.ScaledIntegerField(decimal_places=3, max_digits=9)),
+                ('total_power_import_2', smart_meter.fields.ScaledIntegerField(decimal_places=3, max_digits=9)),
+                ('total_power_export_1', smart_meter.fields.ScaledIntegerField(decimal_places=3, max_digits=9)),
+                ('total_power_export_2', smart_meter.fields.ScaledIntegerField(decimal_places=3, max_digits=9)),
+                ('gas_timestamp', models.DateTimeField(null=True)),
+                ('actual_gas', smart_meter.fields.ScaledIntegerField(decimal_places=3, max_digits=9, null=True)),
+                ('total_gas', smart_meter.fields.ScaledIntegerField(decimal_places=3, max_digits=9, null=True)),
+                ('solar_timestamp', models.DateTimeField(null=True)),
+                ('actual_solar', smart_meter.fields.ScaledIntegerField(decimal_places=3, max_digits=9, null=True)),
+                ('total_solar', smart_meter.fields.ScaledIntegerField(decimal_places=3, max_digits=9, null=True)),
+            ],
+        ),
+        migrations.RunSQL(
+            sql='ALTER TABLE smart_meter_smartmeterlive SET (fillfactor = %d)' % LIVE_FILLFACTOR,
+            reverse_sql='ALTER TABLE smart_meter_smartmeterlive RESET (fillfactor)',
+        ),
+        migrations.RunSQL(
+            sql='INSERT INTO smart_meter_smartmeterlive (meter_id, %s) SELECT id, %s FROM smart_meter_smartmeter'
+                % (LIVE_COLUMNS, LIVE_COLUMNS),
+            reverse_sql='UPDATE smart_meter_smartmeter m SET (%s) = (SELECT %s FROM smart_meter_smartmeterlive l '
+                        'WHERE l.meter_id = m.id)' % (LIVE_COLUMNS, LIVE_COLUMNS),
+        ),
+        migrations.RemoveIndex(
+            model_name='smartmeter',
+            name='smartmeter_last_update_idx',
+        ),
+        migrations.RemoveField(
+            model_name='smartmeter',
+            name='actual_gas',
+        ),
+        migrations.RemoveField(
+            model_name='smartmeter',
+            name='actual_power_export',
+        ),
+        migrations.RemoveField(
+            model_name='smartmeter',
+            name='actual_power_import',
+        ),
+        migrations.RemoveField(
+            model_name='smartmeter',
+            name='actual_solar',
+        ),
+        migrations.RemoveField(
+            model_name='smartmeter',
+            name='gas_timestamp',
+        ),
+        migrations.RemoveField(
+            model_name='smartmeter',
+            name='last_update',
+        ),
+        migrations.RemoveField(
+            model_name='smartmeter',
+            name='power_timestamp',
+        ),
+        migrations.RemoveField(
+            model_name='smartmeter',
+            name='solar_timestamp',
+        ),
+        migrations.RemoveField(
+            model_name='smartmeter',
+            name='tariff',
+        ),
+        migrations.RemoveField(
+            model_name='smartmeter',
+            name='total_gas',
+        ),
+        migrations.RemoveField(
+            model_name='smartmeter',
+            name='total_power_export_1',
+        ),
+        migrations.RemoveField(
+            model_name='smartmeter',
+            name='total_power_export_2',
+        ),
+        migrations.RemoveField(
+            model_name='smartmeter',
+            name='total_power_import_1',
+        ),
+        migrations.RemoveField(
+            model_name='smartmeter',
+            name='total_power_import_2',
+        ),
+        migrations.RemoveField(
+            model_name='smartmeter',
+            name='total_solar',
+        ),
+    ]
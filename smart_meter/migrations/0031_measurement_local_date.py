@@ -0,0 +1,91 @@
+# Generated by Django 6.0.5 on 2026-10-18 18:05
+
+import django.db.models.functions.comparison
+import smart_meter.fields
+from django.db import migrations, models
+
+# The zone of the local date and hour, changing TIME_ZONE requires a migration of the indexes
+TIME_ZONE = 'Europe/Amsterdam'
+MODELS = ('gasmeasurement', 'powermeasurement', 'solarmeasurement')
+
+
+def _local_index(model_name):
+    """(meter, local date, local hour) expression index, see smart_meter.fields.local_date"""
+    return models.Index(
+        models.F('meter'),
+        django.db.models.functions.comparison.Cast(
+            smart_meter.fields.AtTimeZone('timestamp', TIME_ZONE), models.DateField()
+        ),
+        django.db.models.functions.comparison.Cast(
+            models.Func(models.Value('hour'), smart_meter.fields.AtTimeZone('timestamp', TIME_ZONE),
+                        function='date_part'),
+            models.SmallIntegerField(),
+        ),
+        name='%s_local_idx' % model_name,
+    )
+
+
+def _partitions(connection, table):
+    """Partitions of a partitioned table, empty for a plain table"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE parent.relname = %s ORDER BY child.relname',
+            [table],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def create_local_indexes(apps, schema_editor):
+    """
+    Build the indexes without blocking writes: an expression index does not rewrite the table (unlike a stored
+    generated column), and each partition is indexed concurrently. The index on only the parent table is valid once
+    the index of every partition is attached, new partitions get the index when they are created
+    """
+    quote = schema_editor.quote_name
+    for model_name in MODELS:
+        model = apps.get_model('smart_meter', model_name)
+        index = _local_index(model_name)
+        columns = index.create_sql(model, schema_editor).parts['columns']
+        table = model._meta.db_table
+        partitions = _partitions(schema_editor.connection, table)
+        if not partitions:
+            schema_editor.execute(
+                'CREATE INDEX CONCURRENTLY %s ON %s (%s)' % (quote(index.name), quote(table), columns)
+            )
+            continue
+        schema_editor.execute('CREATE INDEX %s ON ONLY %s (%s)' % (quote(index.name), quote(table), columns))
+        for partition in partitions:
+            partition_index = quote('%s_local_idx' % partition)
+            schema_editor.execute(
+                'CREATE INDEX CONCURRENTLY %s ON %s (%s)' % (partition_index, quote(partition), columns)
+            )
+            schema_editor.execute('ALTER INDEX %s ATTACH PARTITION %s' % (quote(index.name), partition_index))
+
+
+def drop_local_indexes(apps, schema_editor):
+    for model_name in MODELS:
+        # Also drops the attached indexes of the partitions
+        schema_editor.execute('DROP INDEX %s' % schema_editor.quote_name(_local_index(model_name).name))
+
+
+class Migration(migrations.Migration):
+    # Not atomic, the indexes of the partitions are built concurrently
+    atomic = False
+
+    dependencies = [
+        ('smart_meter', '0030_smartmeter_live'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(create_local_indexes, drop_local_indexes),
+            ],
+            state_operations=[
+                migrations.AddIndex(model_name=model_name, index=_local_index(model_name)) for model_name in MODELS
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0.5 on 2026-10-19 09:12
+
+import django.db.models.deletion
+import smart_meter.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smart_meter', '0031_measurement_local_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupEnergyInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('power_import', smart_meter.fields.ScaledIntegerField(db_default=0, decimal_places=3, max_digits=12)),
+                ('power_export', smart_meter.fields.ScaledIntegerField(db_default=0, decimal_places=3, max_digits=12)),
+                ('gas', smart_meter.fields.ScaledIntegerField(db_default=0, decimal_places=3, max_digits=12)),
+                ('solar', smart_meter.fields.ScaledIntegerField(db_default=0, decimal_places=3, max_digits=12)),
+                ('group', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='intervals', to='smart_meter.groupmeter')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('group', 'timestamp'), name='groupenergyinterval_group_timestamp_uniq')],
+            },
+        ),
+    ]
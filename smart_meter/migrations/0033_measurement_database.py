@@ -0,0 +1,49 @@
+# Generated by Django 6.0.5 on 2026-10-19 10:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smart_meter', '0032_group_energy_interval'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='smartmeter',
+            name='measurement_database',
+            field=models.CharField(default='default', max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='gasmeasurement',
+            name='meter',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, to='smart_meter.smartmeter'),
+        ),
+        migrations.AlterField(
+            model_name='gasmeasurementday',
+            name='meter',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, to='smart_meter.smartmeter'),
+        ),
+        migrations.AlterField(
+            model_name='powermeasurement',
+            name='meter',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, to='smart_meter.smartmeter'),
+        ),
+        migrations.AlterField(
+            model_name='powermeasurementday',
+            name='meter',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, to='smart_meter.smartmeter'),
+        ),
+        migrations.AlterField(
+            model_name='solarmeasurement',
+            name='meter',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, to='smart_meter.smartmeter'),
+        ),
+        migrations.AlterField(
+            model_name='solarmeasurementday',
+            name='meter',
+            field=models.ForeignKey(db_constraint=False, db_index=False, on_delete=django.db.models.deletion.CASCADE, to='smart_meter.smartmeter'),
+        ),
+    ]
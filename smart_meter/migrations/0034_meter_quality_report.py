@@ -0,0 +1,23 @@
+# Generated by Django 6.0.5 on 2026-10-19 11:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smart_meter', '0033_measurement_database'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MeterQualityReport',
+            fields=[
+                ('meter', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='quality_report', serialize=False, to='smart_meter.smartmeter')),
+                ('scanned_on', models.DateTimeField()),
+                ('issues', models.PositiveIntegerField(db_index=True, default=0)),
+                ('report', models.JSONField(default=dict)),
+            ],
+        ),
+    ]
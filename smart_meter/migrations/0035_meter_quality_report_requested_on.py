@@ -0,0 +1,23 @@
+# Generated by Django 6.0.5 on 2026-10-19 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smart_meter', '0034_meter_quality_report'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='meterqualityreport',
+            name='requested_on',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='meterqualityreport',
+            name='scanned_on',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
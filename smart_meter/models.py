@@ -1,13 +1,42 @@
 import uuid
+from datetime import datetime, time, timezone as dt_timezone
 
-from django.db import models
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import BrinIndex
+from django.db import models, DEFAULT_DB_ALIAS
 from django.utils import timezone
 
+from smart_meter.fields import ScaledIntegerField, local_date, local_hour
 from smart_meter.managers import SmartMeterManager, PowerMeasurementManager, GasMeasurementManager, \
-    SolarMeasurementManager, GroupMeterManager, GroupParticipantManager
+    SolarMeasurementManager, GroupMeterManager, GroupParticipantManager, MeterShardedQuerySet
+from smart_meter.sharding import is_sharded, shard_for_meter
 from users.models import User
 
 
+# Meter values that change with each measurement (every 10 seconds), stored in SmartMeterLive
+LIVE_FIELDS = [
+    'last_update', 'power_timestamp', 'actual_power_import', 'actual_power_export', 'tariff', 'total_power_import_1',
+    'total_power_import_2', 'total_power_export_1', 'total_power_export_2', 'gas_timestamp', 'actual_gas',
+    'total_gas', 'solar_timestamp', 'actual_solar', 'total_solar',
+]
+
+
+def live_field(name):
+    """
+    Property for a field of the live values of a meter, reads and writes the value on meter.live
+    :param name: field name in SmartMeterLive
+    :return: property
+    """
+
+    def get_value(meter):
+        return getattr(meter.live_values, name)
+
+    def set_value(meter, value):
+        setattr(meter.live_values, name, value)
+
+    return property(get_value, set_value)
+
+
 class SmartMeter(models.Model):
     """
     Meter model that keeps track of constant meter data (serial number, meter values kWh m³, etc.)
@@ -66,8 +95,12 @@ class SmartMeter(models.Model):
     visibility_type = models.CharField(choices=VISIBILITY_TYPE_OPTIONS, max_length=10, default='private')
     # GPX-Connector version
     gpx_version = models.CharField(max_length=20, default='undefined')  # 'x.y.z'
-    # Timestamp of last change to this model due to measurements
-    last_update = models.DateTimeField(auto_now_add=True)
+    # Set when the meter is deleted, the meter is hidden and deleted in the background (see purge_deleted)
+    deleted_on = models.DateTimeField(null=True)
+    # Set when the history of this (deleted) meter is being merged into another meter (see merge_meters)
+    merged_into = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, related_name='+')
+    # Database with the measurements of the meter, placed when the meter is created (see smart_meter.sharding)
+    measurement_database = models.CharField(max_length=50, default=DEFAULT_DB_ALIAS)
 
     # Residence info
     resident_count = models.IntegerField(default=0)
@@ -75,27 +108,26 @@ class SmartMeter(models.Model):
     residence_energy_label = models.CharField(choices=ENERGY_LABEL_OPTIONS, max_length=10, default='undefined')
     solar_panel_count = models.IntegerField(default=0)
 
-    # Latest power data (required part)
+    # Serial numbers of the meter, the latest measurement values are in SmartMeterLive
     sn_power = models.CharField(max_length=40)
-    power_timestamp = models.DateTimeField()
-    actual_power_import = models.DecimalField(max_digits=9, decimal_places=3)
-    actual_power_export = models.DecimalField(max_digits=9, decimal_places=3)
-    tariff = models.SmallIntegerField()
-    total_power_import_1 = models.DecimalField(max_digits=9, decimal_places=3)
-    total_power_import_2 = models.DecimalField(max_digits=9, decimal_places=3)
-    total_power_export_1 = models.DecimalField(max_digits=9, decimal_places=3)
-    total_power_export_2 = models.DecimalField(max_digits=9, decimal_places=3)
-
-    # Latest gas data
     sn_gas = models.CharField(max_length=40, null=True)
-    gas_timestamp = models.DateTimeField(null=True)
-    actual_gas = models.DecimalField(max_digits=9, decimal_places=3, null=True)
-    total_gas = models.DecimalField(max_digits=9, decimal_places=3, null=True)
 
-    # Latest solar data
-    solar_timestamp = models.DateTimeField(null=True)
-    actual_solar = models.DecimalField(max_digits=9, decimal_places=3, null=True)
-    total_solar = models.DecimalField(max_digits=9, decimal_places=3, null=True)
+    # Latest measurement values, stored in the narrow SmartMeterLive table (see LIVE_FIELDS)
+    last_update = live_field('last_update')
+    power_timestamp = live_field('power_timestamp')
+    actual_power_import = live_field('actual_power_import')
+    actual_power_export = live_field('actual_power_export')
+    tariff = live_field('tariff')
+    total_power_import_1 = live_field('total_power_import_1')
+    total_power_import_2 = live_field('total_power_import_2')
+    total_power_export_1 = live_field('total_power_export_1')
+    total_power_export_2 = live_field('total_power_export_2')
+    gas_timestamp = live_field('gas_timestamp')
+    actual_gas = live_field('actual_gas')
+    total_gas = live_field('total_gas')
+    solar_timestamp = live_field('solar_timestamp')
+    actual_solar = live_field('actual_solar')
+    total_solar = live_field('total_solar')
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -131,7 +163,7 @@ class SmartMeter(models.Model):
         :return: PowerMeasurement
         """
         if not hasattr(self, 'last_power_measurement_'):
-            self.last_power_measurement_ = self.powermeasurement_set.last()
+            self.last_power_measurement_ = self.powermeasurement_set.order_by('timestamp').last()
         return self.last_power_measurement_
 
     @property
@@ -141,7 +173,7 @@ class SmartMeter(models.Model):
         :return: GasMeasurement
         """
         if not hasattr(self, 'last_gas_measurement_'):
-            self.last_gas_measurement_ = self.gasmeasurement_set.last()
+            self.last_gas_measurement_ = self.gasmeasurement_set.order_by('timestamp').last()
         return self.last_gas_measurement_
 
     @property
@@ -151,7 +183,7 @@ class SmartMeter(models.Model):
         :return: GasMeasurement
         """
         if not hasattr(self, 'last_solar_measurement_'):
-            self.last_solar_measurement_ = self.solarmeasurement_set.last()
+            self.last_solar_measurement_ = self.solarmeasurement_set.order_by('timestamp').last()
         return self.last_solar_measurement_
 
     @property
@@ -162,89 +194,65 @@ class SmartMeter(models.Model):
     def timestamp_range_before(self):
         return getattr(self, 'timestamp_range_before_', None)
 
+    @property
+    def gap_fill(self):
+        return getattr(self, 'gap_fill_', None)
+
+    @property
+    def max_points(self):
+        return getattr(self, 'max_points_', None)
+
+    @property
+    def downsample(self):
+        return getattr(self, 'downsample_', None)
+
     @property
     def power_set(self):
         if not hasattr(self, '_power_set'):
             self._power_set = self.powermeasurement_set.get_queryset().filter_timestamp(
-                self.timestamp_range_after, self.timestamp_range_before
-            )
+                self.timestamp_range_after, self.timestamp_range_before, self.max_points
+            ).fill_gaps(self.gap_fill).downsample(self.downsample)
         return self._power_set
 
     @property
     def gas_set(self):
         if not hasattr(self, '_gas_set'):
             self._gas_set = self.gasmeasurement_set.get_queryset().filter_timestamp(
-                self.timestamp_range_after, self.timestamp_range_before
-            )
+                self.timestamp_range_after, self.timestamp_range_before, self.max_points
+            ).fill_gaps(self.gap_fill).downsample(self.downsample)
         return self._gas_set
 
     @property
     def solar_set(self):
         if not hasattr(self, '_solar_set'):
             self._solar_set = self.solarmeasurement_set.get_queryset().filter_timestamp(
-                self.timestamp_range_after, self.timestamp_range_before
-            )
+                self.timestamp_range_after, self.timestamp_range_before, self.max_points
+            ).fill_gaps(self.gap_fill).downsample(self.downsample)
         return self._solar_set
 
     @property
     def period_import_1(self):
-        if not hasattr(self, '_period_import_1'):
-            self._period_import_1 = self.powermeasurement_set.filter(
-                timestamp__gte=self.timestamp_range_after, timestamp__lte=self.timestamp_range_before
-            ).aggregate(
-                period=models.Max('total_import_1') - models.Min('total_import_1'),
-            ).get('period')
-        return self._period_import_1
+        return self.power_set.bucket_period_total('total_import_1')
 
     @property
     def period_import_2(self):
-        if not hasattr(self, '_period_import_2'):
-            self._period_import_2 = self.powermeasurement_set.filter(
-                timestamp__gte=self.timestamp_range_after, timestamp__lte=self.timestamp_range_before
-            ).aggregate(
-                period=models.Max('total_import_2') - models.Min('total_import_2'),
-            ).get('period')
-        return self._period_import_2
+        return self.power_set.bucket_period_total('total_import_2')
 
     @property
     def period_export_1(self):
-        if not hasattr(self, '_period_export_1'):
-            self._period_export_1 = self.powermeasurement_set.filter(
-                timestamp__gte=self.timestamp_range_after, timestamp__lte=self.timestamp_range_before
-            ).aggregate(
-                period=models.Max('total_export_1') - models.Min('total_export_1'),
-            ).get('period')
-        return self._period_export_1
+        return self.power_set.bucket_period_total('total_export_1')
 
     @property
     def period_export_2(self):
-        if not hasattr(self, '_period_export_2'):
-            self._period_export_2 = self.powermeasurement_set.filter(
-                timestamp__gte=self.timestamp_range_after, timestamp__lte=self.timestamp_range_before
-            ).aggregate(
-                period=models.Max('total_export_2') - models.Min('total_export_2'),
-            ).get('period')
-        return self._period_export_2
+        return self.power_set.bucket_period_total('total_export_2')
 
     @property
     def period_gas(self):
-        if not hasattr(self, '_period_gas'):
-            self._period_gas = self.gasmeasurement_set.filter(
-                timestamp__gte=self.timestamp_range_after, timestamp__lte=self.timestamp_range_before
-            ).aggregate(
-                period=models.Max('total_gas') - models.Min('total_gas'),
-            ).get('period')
-        return self._period_gas
+        return self.gas_set.bucket_period_total('total_gas')
 
     @property
     def period_solar(self):
-        if not hasattr(self, '_period_solar'):
-            self._period_solar = self.solarmeasurement_set.filter(
-                timestamp__gte=self.timestamp_range_after, timestamp__lte=self.timestamp_range_before
-            ).aggregate(
-                period=models.Max('total_solar') - models.Min('total_solar'),
-            ).get('period')
-        return self._period_solar
+        return self.solar_set.bucket_period_total('total_solar')
 
     @property
     def power_import(self):
@@ -257,30 +265,141 @@ class SmartMeter(models.Model):
     @property
     def group_participation(self):
         if not hasattr(self, 'group_participation_'):
-            self.group_participation_ = self.group_participations.active().select_related('group', 'meter').first()
+            self.group_participation_ = self.group_participations.active().select_related(
+                'group', 'meter', 'meter__live'
+            ).first()
         return self.group_participation_
 
-    def save(self, **kwargs):
-        if not self.pk and not self.name:
+    @property
+    def live_values(self):
+        """
+        The live values of the meter, a new (unsaved) instance for a new meter
+        :return: SmartMeterLive
+        """
+        try:
+            return self.live
+        except SmartMeterLive.DoesNotExist:
+            self.live = SmartMeterLive(meter=self)
+            return self.live
+
+    def save(self, update_fields=None, **kwargs):
+        created = not self.pk
+        if created and not self.name:
             # New instance, give default name `meter x`, where x is the amount of meters the user has + 1
             self.name = '%s %s' % (self.user.username, self.user.meters.count() + 1)
-        super().save(**kwargs)
+        live_fields = None
+        if update_fields is not None:
+            # Only the changed table is updated, a measurement only updates the narrow live table
+            live_fields = [field for field in update_fields if field in LIVE_FIELDS]
+            update_fields = [field for field in update_fields if field not in LIVE_FIELDS]
+            if update_fields:
+                super().save(update_fields=update_fields, **kwargs)
+        else:
+            super().save(**kwargs)
+        if created and is_sharded():
+            # The measurement database is a hash of the id, known after the insert
+            self.measurement_database = shard_for_meter(self.pk)
+            SmartMeter.objects.filter(pk=self.pk).update(measurement_database=self.measurement_database)
+
+        # The live values are only saved when they are loaded, otherwise they are not changed
+        live = self._state.fields_cache.get('live')
+        if live is None or live_fields == []:
+            return
+        if live._state.adding:
+            live.save(force_insert=True)
+        else:
+            live.save(update_fields=live_fields)
 
     def __str__(self):
         return "Meter %s" % self.sn_power
 
 
+class SmartMeterLive(models.Model):
+    """
+    The latest measurement values of a meter, updated with each measurement. Kept apart from the meter, so an update
+    only rewrites this narrow row. The table has a low fillfactor and no index besides the primary key, so the updates
+    are HOT (heap only tuple) updates within the same page, without new index entries (see migration 0030).
+    Accessed through the properties of SmartMeter.
+    """
+
+    meter = models.OneToOneField(SmartMeter, models.CASCADE, primary_key=True, related_name='live')
+    # Timestamp of last change to the meter due to measurements
+    last_update = models.DateTimeField(auto_now_add=True)
+
+    # Latest power data (required part)
+    power_timestamp = models.DateTimeField()
+    actual_power_import = ScaledIntegerField(max_digits=9, decimal_places=3)
+    actual_power_export = ScaledIntegerField(max_digits=9, decimal_places=3)
+    tariff = models.SmallIntegerField()
+    total_power_import_1 = ScaledIntegerField(max_digits=9, decimal_places=3)
+    total_power_import_2 = ScaledIntegerField(max_digits=9, decimal_places=3)
+    total_power_export_1 = ScaledIntegerField(max_digits=9, decimal_places=3)
+    total_power_export_2 = ScaledIntegerField(max_digits=9, decimal_places=3)
+
+    # Latest gas data
+    gas_timestamp = models.DateTimeField(null=True)
+    actual_gas = ScaledIntegerField(max_digits=9, decimal_places=3, null=True)
+    total_gas = ScaledIntegerField(max_digits=9, decimal_places=3, null=True)
+
+    # Latest solar data
+    solar_timestamp = models.DateTimeField(null=True)
+    actual_solar = ScaledIntegerField(max_digits=9, decimal_places=3, null=True)
+    total_solar = ScaledIntegerField(max_digits=9, decimal_places=3, null=True)
+
+    def __str__(self):
+        return "Live values of meter %s" % self.meter_id
+
+
 class Measurement(models.Model):
     """
     Abstract measurement class, extended by PowerMeasurement and GasMeasurement
     """
 
+    # Stored on the measurement database of the meter (see smart_meter.sharding)
+    sharded_by_meter = True
+
     class Meta:
         abstract = True
-        unique_together = ('meter', 'timestamp')
 
     timestamp = models.DateTimeField()
-    meter = models.ForeignKey(SmartMeter, models.CASCADE)
+    # Tables are partitioned by month on the timestamp (see manage_partitions), lookups by meter use the
+    # unique (meter, timestamp) index of the measurement model, so no separate index on meter. The meter can be on
+    # another database, so there is no foreign key constraint
+    meter = models.ForeignKey(SmartMeter, models.CASCADE, db_index=False, db_constraint=False)
+
+    @classmethod
+    def reading_fields(cls):
+        """
+        Names of the reading fields (actual and total values) of the measurement model
+        :return: list of field names
+        """
+        return [
+            field.name for field in cls._meta.concrete_fields
+            if isinstance(field, ScaledIntegerField) and not field.name.startswith('delta_')
+        ]
+
+    @classmethod
+    def delta_fields(cls):
+        """
+        Delta field per total (counter) field of the measurement model, the increase since the previous measurement
+        :return: dict of total field name and delta field name
+        """
+        return {name: 'delta_%s' % name[len('total_'):] for name in cls.reading_fields() if name.startswith('total_')}
+
+    def set_deltas(self, previous):
+        """
+        Set the delta fields from the previous measurement of the meter. A counter that went down (meter reset or
+        replaced) is clamped to 0, as is the first measurement of a meter
+        :param previous: previous measurement, None if there is none
+        """
+        for total, delta in self.delta_fields().items():
+            field = self._meta.get_field(total)
+            value = field.to_python(getattr(self, total))
+            previous_value = field.to_python(getattr(previous, total)) if previous else None
+            if value is None or previous_value is None or value < previous_value:
+                setattr(self, delta, 0)
+            else:
+                setattr(self, delta, value - previous_value)
 
     def __str__(self):
         return "%s %s %s" % (self.meter, self.__class__.__name__, self.timestamp.strftime("%Y-%m-%d %H:%M:%S"))
@@ -292,14 +411,34 @@ class PowerMeasurement(Measurement):
     """
     objects = PowerMeasurementManager()
 
+    class Meta:
+        constraints = [
+            # Covering index, the timestamp bucket aggregates are served by an index only scan
+            models.UniqueConstraint(
+                fields=['meter', 'timestamp'],
+                include=['actual_import', 'actual_export', 'total_import_1', 'total_import_2', 'total_export_1',
+                         'total_export_2', 'delta_import_1', 'delta_import_2', 'delta_export_1', 'delta_export_2'],
+                name='powermeasurement_meter_timestamp_uniq',
+            ),
+        ]
+        indexes = [
+            BrinIndex(fields=['timestamp'], name='powermeasurement_time_brin'),
+            models.Index('meter', local_date(), local_hour(), name='powermeasurement_local_idx'),
+        ]
+
     # actual in kW
-    actual_import = models.DecimalField(max_digits=9, decimal_places=3)
-    actual_export = models.DecimalField(max_digits=9, decimal_places=3)
+    actual_import = ScaledIntegerField(max_digits=9, decimal_places=3)
+    actual_export = ScaledIntegerField(max_digits=9, decimal_places=3)
     # total kWh
-    total_import_1 = models.DecimalField(max_digits=9, decimal_places=3)
-    total_import_2 = models.DecimalField(max_digits=9, decimal_places=3)
-    total_export_1 = models.DecimalField(max_digits=9, decimal_places=3)
-    total_export_2 = models.DecimalField(max_digits=9, decimal_places=3)
+    total_import_1 = ScaledIntegerField(max_digits=9, decimal_places=3)
+    total_import_2 = ScaledIntegerField(max_digits=9, decimal_places=3)
+    total_export_1 = ScaledIntegerField(max_digits=9, decimal_places=3)
+    total_export_2 = ScaledIntegerField(max_digits=9, decimal_places=3)
+    # kWh since the previous measurement, set at ingest (see Measurement.set_deltas)
+    delta_import_1 = ScaledIntegerField(max_digits=9, decimal_places=3, db_default=0)
+    delta_import_2 = ScaledIntegerField(max_digits=9, decimal_places=3, db_default=0)
+    delta_export_1 = ScaledIntegerField(max_digits=9, decimal_places=3, db_default=0)
+    delta_export_2 = ScaledIntegerField(max_digits=9, decimal_places=3, db_default=0)
 
 
 class GasMeasurement(Measurement):
@@ -308,10 +447,25 @@ class GasMeasurement(Measurement):
     """
     objects = GasMeasurementManager()
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['meter', 'timestamp'],
+                include=['actual_gas', 'total_gas', 'delta_gas'],
+                name='gasmeasurement_meter_timestamp_uniq',
+            ),
+        ]
+        indexes = [
+            BrinIndex(fields=['timestamp'], name='gasmeasurement_time_brin'),
+            models.Index('meter', local_date(), local_hour(), name='gasmeasurement_local_idx'),
+        ]
+
     # actual in m3h
-    actual_gas = models.DecimalField(max_digits=9, decimal_places=3)
+    actual_gas = ScaledIntegerField(max_digits=9, decimal_places=3)
     # total in m3
-    total_gas = models.DecimalField(max_digits=9, decimal_places=3)
+    total_gas = ScaledIntegerField(max_digits=9, decimal_places=3)
+    # m3 since the previous measurement
+    delta_gas = ScaledIntegerField(max_digits=9, decimal_places=3, db_default=0)
 
 
 class SolarMeasurement(Measurement):
@@ -320,10 +474,136 @@ class SolarMeasurement(Measurement):
     """
     objects = SolarMeasurementManager()
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['meter', 'timestamp'],
+                include=['actual_solar', 'total_solar', 'delta_solar'],
+                name='solarmeasurement_meter_timestamp_uniq',
+            ),
+        ]
+        indexes = [
+            BrinIndex(fields=['timestamp'], name='solarmeasurement_time_brin'),
+            models.Index('meter', local_date(), local_hour(), name='solarmeasurement_local_idx'),
+        ]
+
     # actual in kW
-    actual_solar = models.DecimalField(max_digits=9, decimal_places=3)
+    actual_solar = ScaledIntegerField(max_digits=9, decimal_places=3)
     # total in mWh
-    total_solar = models.DecimalField(max_digits=9, decimal_places=3)
+    total_solar = ScaledIntegerField(max_digits=9, decimal_places=3)
+    # mWh since the previous measurement
+    delta_solar = ScaledIntegerField(max_digits=9, decimal_places=3, db_default=0)
+
+
+class MeasurementDay(models.Model):
+    """
+    Abstract packed measurement row, with all measurements of a meter on one day (UTC). Every reading field of the
+    measurement model is an array with a value per measurement, in the stored milli-units. See the pack_measurements
+    command, the measurements of a day are either in the measurement table or packed, filter_timestamp reads both.
+    Delta fields are not packed, they are derived from the totals again when unpacking
+    """
+    measurement_model = None
+    # Stored on the measurement database of the meter, like the measurements (see smart_meter.sharding)
+    sharded_by_meter = True
+    objects = MeterShardedQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    meter = models.ForeignKey(SmartMeter, models.CASCADE, db_index=False, db_constraint=False)
+    date = models.DateField()
+    # Seconds since the start of the day per measurement, ascending (meters report whole seconds)
+    seconds = ArrayField(models.IntegerField())
+
+    @property
+    def start(self):
+        return datetime.combine(self.date, time(), tzinfo=dt_timezone.utc)
+
+    def unpack(self):
+        """
+        Unpack into (unsaved) measurements of the measurement model, in the measurement list format
+        :return: list of measurements, sorted by timestamp
+        """
+        model = self.measurement_model
+        fields = {name: model._meta.get_field(name) for name in model.reading_fields()}
+        return [
+            model(
+                meter_id=self.meter_id,
+                timestamp=self.start + timezone.timedelta(seconds=self.seconds[i]),
+                **{name: field.from_db_value(getattr(self, name)[i], None, None) for name, field in fields.items()},
+            ) for i in range(len(self.seconds))
+        ]
+
+    def __str__(self):
+        return "%s %s %s" % (self.meter, self.__class__.__name__, self.date.isoformat())
+
+
+class PowerMeasurementDay(MeasurementDay):
+    """
+    Packed power measurements of 1 smart meter on 1 day
+    """
+    measurement_model = PowerMeasurement
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['meter', 'date'], name='powermeasurementday_meter_date_uniq'),
+        ]
+
+    actual_import = ArrayField(models.IntegerField())
+    actual_export = ArrayField(models.IntegerField())
+    total_import_1 = ArrayField(models.IntegerField())
+    total_import_2 = ArrayField(models.IntegerField())
+    total_export_1 = ArrayField(models.IntegerField())
+    total_export_2 = ArrayField(models.IntegerField())
+
+
+class GasMeasurementDay(MeasurementDay):
+    """
+    Packed gas measurements of 1 meter on 1 day
+    """
+    measurement_model = GasMeasurement
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['meter', 'date'], name='gasmeasurementday_meter_date_uniq'),
+        ]
+
+    actual_gas = ArrayField(models.IntegerField())
+    total_gas = ArrayField(models.IntegerField())
+
+
+class SolarMeasurementDay(MeasurementDay):
+    """
+    Packed solar measurements of 1 meter on 1 day
+    """
+    measurement_model = SolarMeasurement
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['meter', 'date'], name='solarmeasurementday_meter_date_uniq'),
+        ]
+
+    actual_solar = ArrayField(models.IntegerField())
+    total_solar = ArrayField(models.IntegerField())
+
+
+class MeterQualityReport(models.Model):
+    """
+    Data quality of the measurement history of a meter: gaps, counters that went down, spikes, frozen counters and
+    DST anomalies per measurement type. Written by the scan_measurement_quality command (see services.quality)
+    """
+    meter = models.OneToOneField(SmartMeter, models.CASCADE, primary_key=True, related_name='quality_report')
+    # None until the meter is scanned, when a scan was requested before
+    scanned_on = models.DateTimeField(null=True)
+    # When a new scan was requested through the API, until the scan_measurement_quality command scanned it
+    requested_on = models.DateTimeField(null=True, blank=True)
+    # Total amount of issues of all measurement types
+    issues = models.PositiveIntegerField(default=0, db_index=True)
+    # Per measurement type: amount of measurements, first and last timestamp, amount per issue and a few examples
+    report = models.JSONField(default=dict)
+
+    def __str__(self):
+        return "Quality report of meter %s" % self.meter_id
 
 
 def default_public_key():
@@ -357,7 +637,7 @@ class GroupMeter(models.Model):
         Get all active participants
         :return: 
         """
-        return self.participants.active().select_related('meter')
+        return self.participants.active().select_related('meter', 'meter__live')
 
     @property
     def recent_participants(self):
@@ -366,7 +646,7 @@ class GroupMeter(models.Model):
         :return:
         """
         just_now = timezone.now() - timezone.timedelta(seconds=15)
-        return self.active_participants.filter(meter__last_update__gte=just_now)
+        return self.active_participants.filter(meter__live__last_update__gte=just_now)
 
     @property
     def total_import(self):
@@ -426,6 +706,16 @@ class GroupMeter(models.Model):
 class GroupParticipant(models.Model):
     objects = GroupParticipantManager()
 
+    class Meta:
+        indexes = [
+            # Nearly all lookups are on the active participations (left_on is null), of a group or of a meter. Both
+            # columns are in each index, so existence checks are served by an index only scan
+            models.Index(fields=['group', 'meter'], condition=models.Q(left_on__isnull=True),
+                         name='participant_active_group_idx'),
+            models.Index(fields=['meter', 'group'], condition=models.Q(left_on__isnull=True),
+                         name='participant_active_meter_idx'),
+        ]
+
     group = models.ForeignKey(GroupMeter, on_delete=models.CASCADE, related_name='participants')
     meter = models.ForeignKey(SmartMeter, on_delete=models.CASCADE, related_name='group_participations')
     joined_on = models.DateTimeField(auto_now_add=True)
@@ -435,16 +725,16 @@ class GroupParticipant(models.Model):
     display_name = models.CharField(max_length=30)
 
     # Values at time of joining
-    power_import_joined = models.DecimalField(max_digits=9, decimal_places=3)
-    power_export_joined = models.DecimalField(max_digits=9, decimal_places=3)
-    gas_joined = models.DecimalField(max_digits=9, decimal_places=3, null=True)
-    solar_joined = models.DecimalField(max_digits=9, decimal_places=3, null=True)
+    power_import_joined = ScaledIntegerField(max_digits=9, decimal_places=3)
+    power_export_joined = ScaledIntegerField(max_digits=9, decimal_places=3)
+    gas_joined = ScaledIntegerField(max_digits=9, decimal_places=3, null=True)
+    solar_joined = ScaledIntegerField(max_digits=9, decimal_places=3, null=True)
 
     # Values at time of leaving, default null
-    power_import_left = models.DecimalField(max_digits=9, decimal_places=3, null=True)
-    power_export_left = models.DecimalField(max_digits=9, decimal_places=3, null=True)
-    gas_left = models.DecimalField(max_digits=9, decimal_places=3, null=True)
-    solar_left = models.DecimalField(max_digits=9, decimal_places=3, null=True)
+    power_import_left = ScaledIntegerField(max_digits=9, decimal_places=3, null=True)
+    power_export_left = ScaledIntegerField(max_digits=9, decimal_places=3, null=True)
+    gas_left = ScaledIntegerField(max_digits=9, decimal_places=3, null=True)
+    solar_left = ScaledIntegerField(max_digits=9, decimal_places=3, null=True)
 
     @property
     def active(self):
@@ -522,3 +812,30 @@ class GroupParticipant(models.Model):
         self.power_export_left = self.meter.power_export
         self.gas_left = self.meter.total_gas
         self.solar_left = self.meter.total_solar
+
+
+class GroupEnergyInterval(models.Model):
+    """
+    Combined usage of the participants of a group per hour (UTC), only the measurements within the joined_on/left_on
+    window of each participation count. Maintained by services.group_series: updated with each new measurement and
+    rebuilt when the history of the group changes, so the history of a group is a single range read
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['group', 'timestamp'], name='groupenergyinterval_group_timestamp_uniq'),
+        ]
+
+    group = models.ForeignKey(GroupMeter, on_delete=models.CASCADE, related_name='intervals', db_index=False)
+    # Start of the hour
+    timestamp = models.DateTimeField()
+    # Usage of all participants in kWh
+    power_import = ScaledIntegerField(max_digits=12, decimal_places=3, db_default=0)
+    power_export = ScaledIntegerField(max_digits=12, decimal_places=3, db_default=0)
+    # Usage of all participants in m3
+    gas = ScaledIntegerField(max_digits=12, decimal_places=3, db_default=0)
+    # Production of all participants in mWh
+    solar = ScaledIntegerField(max_digits=12, decimal_places=3, db_default=0)
+
+    def __str__(self):
+        return "%s %s %s" % (self.group, self.__class__.__name__, self.timestamp.strftime("%Y-%m-%d %H:%M"))
@@ -0,0 +1,87 @@
+import base64
+import binascii
+from datetime import timedelta
+
+from django import forms
+from django.conf import settings
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from smart_meter.services.buckets import EPOCH
+from smart_meter.services.packing import to_microseconds
+
+
+class MeasurementCursorPagination(BasePagination):
+    """
+    Keyset (cursor) pagination of the timestamp buckets of the measurement lists, on the (timestamp, id) of the
+    buckets (see MeasurementQuerySet.keyset). A page is fetched with one bucket more than the page size, which tells if
+    there is a next page and where it starts: no OFFSET and no COUNT. The cursor is opaque and stable, new measurements
+    do not move the buckets of the next pages.
+
+    Only paginated with `page_size` or `cursor` given, or with a default page size (MEASUREMENT_PAGE_SIZE). Gap filled
+    and downsampled buckets are not paginated, their amount is bounded by the time range and max_points
+    """
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        self.base_url = None
+        self.next_position = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        cursor = request.query_params.get(self.cursor_query_param)
+        if queryset.gap_fill or queryset.max_points:
+            if self.page_size_query_param in request.query_params or cursor:
+                raise ValidationError('Pagination can not be combined with gaps or max_points')
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        descending = queryset.ordered_descending
+        if cursor:
+            queryset = queryset.keyset(*self.decode_cursor(cursor), descending=descending)
+        buckets = list(queryset[:page_size + 1])
+        if len(buckets) > page_size:
+            # Ascending the next page starts at the first bucket after the page, descending before the last bucket
+            # of the page (the position of a bucket is its first measurement)
+            position = buckets[page_size - 1] if descending else buckets[page_size]
+            # Buckets of only packed or archived measurements have no id, position on the timestamp
+            self.next_position = (position['timestamp'], position['id'] or 0)
+        return buckets[:page_size]
+
+    def get_page_size(self, request):
+        if self.page_size_query_param not in request.query_params:
+            return settings.MEASUREMENT_PAGE_SIZE
+        field = forms.IntegerField(min_value=1, max_value=settings.MEASUREMENT_MAX_POINTS)
+        try:
+            return field.clean(request.query_params[self.page_size_query_param])
+        except forms.ValidationError as e:
+            raise ValidationError({self.page_size_query_param: e.messages})
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(*self.next_position))
+
+    @staticmethod
+    def encode_cursor(timestamp, id):
+        return base64.urlsafe_b64encode(f'{to_microseconds(timestamp)}:{id}'.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """
+        :return: timestamp and measurement id of the position
+        :raises NotFound: invalid cursor
+        """
+        try:
+            timestamp, id = base64.urlsafe_b64decode(cursor.encode()).decode().split(':')
+            return EPOCH + timedelta(microseconds=int(timestamp)), int(id)
+        except (binascii.Error, UnicodeError, ValueError, OverflowError):
+            raise NotFound(self.invalid_cursor_message)
@@ -19,7 +19,7 @@ class UserOwnerOfMeter(BasePermission):
                 '%s requires property user_id' % (view.__class__.__name__,))
         assert hasattr(view, 'meter_id'), (
                 '%s requires property meter_id' % (view.__class__.__name__,))
-        return SmartMeter.objects.filter(user_id=getattr(view, 'user_id'), id=getattr(view, 'meter_id')).exists()
+        return SmartMeter.objects.user_meters(getattr(view, 'user_id')).filter(id=getattr(view, 'meter_id')).exists()
 
 
 class UserManagerOfGroupMeter(BasePermission):
@@ -53,9 +53,7 @@ class RequestUserIsPartOfGroupMeter(BasePermission):
         assert hasattr(view, 'group_id'), (
                 '%s requires property group_id' % (view.__class__.__name__,))
         group_id = getattr(view, 'group_id')
-        return GroupParticipant.objects.filter(
-            meter__user_id=request.user.pk, left_on__isnull=True, group_id=group_id
-        ).exists()
+        return GroupParticipant.objects.active().filter(meter__user_id=request.user.pk, group_id=group_id).exists()
 
 
 class RequestUserIsManagerOfGroupMeter(BasePermission):
@@ -1,13 +1,18 @@
+from functools import partial
+
+from django.conf import settings
 from rest_framework import serializers
 
 from smart_meter.models import SmartMeter, PowerMeasurement, GasMeasurement, GroupParticipant, GroupMeter, \
-    SolarMeasurement
+    SolarMeasurement, SmartMeterLive, LIVE_FIELDS, GroupEnergyInterval, MeterQualityReport
 from users.models import User
 from users.serializers import SimpleUserSerializer
 from .serializer_helpers import SimpleMeterSerializer, GroupParticipantSerializer, NewPowerMeasurementSerializer, \
     NewSolarMeasurementSerializer, NewGasMeasurementSerializer, RealTimeParticipantSerializer, \
     MeterGroupParticipationSerializer, SimpleGroupMeterSerializer, ParticipantLiveDataSerializer, \
     PowerMeasurementSetSerializer, GasMeasurementSetSerializer, SolarMeasurementSetSerializer
+from smart_meter.services.import_data import check_layout
+from smart_meter.streaming import StreamedList
 
 
 class PowerMeasurementSerializer(serializers.ModelSerializer):
@@ -59,6 +64,99 @@ class SolarMeasurementSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+class MeterSeriesSerializer(serializers.Serializer):
+    """
+    Serializer for a bucket of the power, gas and solar series of a meter, list only, read only. Has the fields of the
+    measurement serializers
+    """
+
+    def get_fields(self):
+        fields = {'timestamp': serializers.DateTimeField(read_only=True)}
+        for serializer in (PowerMeasurementSerializer, GasMeasurementSerializer, SolarMeasurementSerializer):
+            fields.update(
+                (name, field) for name, field in serializer().get_fields().items() if name != 'timestamp'
+            )
+        return fields
+
+
+class MeasurementColumnsSerializer(serializers.BaseSerializer):
+    """
+    Columnar serializer for the timestamp buckets of a measurement series, read only: one array per field of the row
+    serializer, with the numbers as JSON numbers. The timestamps are epoch seconds, as `start` and `step` when the
+    buckets are evenly spaced, otherwise as a `timestamp` array (and a null step)
+    """
+
+    def __init__(self, *args, row_serializer, **kwargs):
+        """
+        :param row_serializer: serializer class of one bucket, the columns are its fields
+        """
+        super().__init__(*args, **kwargs)
+        self.row_serializer = row_serializer
+
+    def to_representation(self, buckets):
+        buckets = list(buckets)
+        timestamps = [int(bucket['timestamp'].timestamp()) for bucket in buckets]
+        steps = {second - first for first, second in zip(timestamps, timestamps[1:])}
+        step = steps.pop() if len(steps) == 1 else None
+        data = {
+            'start': timestamps[0] if timestamps else None,
+            'step': step,
+            'timestamp': None if step is not None else timestamps,
+        }
+        for name, field in self.row_serializer().fields.items():
+            if name != 'timestamp':
+                # Rounded like the rows, to the decimal places of the field
+                data[name] = [
+                    None if bucket.get(name) is None else float(field.to_representation(bucket[name]))
+                    for bucket in buckets
+                ]
+        return data
+
+
+class GapSpanSerializer(serializers.Serializer):
+    """
+    Serializer for a gap in the timestamp buckets of a measurement series, read only
+    """
+    # Start of the first empty bucket, the first measurement after the gap (or the end of the time range)
+    start = serializers.DateTimeField(read_only=True)
+    end = serializers.DateTimeField(read_only=True)
+    buckets = serializers.IntegerField(read_only=True)
+
+
+class GroupEnergyIntervalSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the combined usage of a group per hour, list only, read only
+    """
+
+    class Meta:
+        model = GroupEnergyInterval
+        fields = (
+            'timestamp',
+            'power_import',
+            'power_export',
+            'gas',
+            'solar',
+        )
+        read_only_fields = fields
+
+
+class MeterQualityReportSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the data quality report of a meter, read only
+    """
+
+    class Meta:
+        model = MeterQualityReport
+        fields = (
+            'meter',
+            'scanned_on',
+            'requested_on',
+            'issues',
+            'report',
+        )
+        read_only_fields = fields
+
+
 class MeterListSerializer(serializers.ModelSerializer):
     """
     Meter list serializer, for retrieving a list of meters
@@ -90,6 +188,12 @@ class MeterListSerializer(serializers.ModelSerializer):
 
     group_participation = MeterGroupParticipationSerializer(read_only=True)
 
+    def build_property_field(self, field_name, model_class):
+        # The live values are properties of the meter, serialized like the fields of SmartMeterLive
+        if field_name in LIVE_FIELDS:
+            return self.build_standard_field(field_name, SmartMeterLive._meta.get_field(field_name))
+        return super().build_property_field(field_name, model_class)
+
 
 class MeterDetailSerializer(MeterListSerializer):
     """
@@ -127,12 +231,85 @@ class MeterMeasurementsDetailSerializer(MeterDetailSerializer):
             'period_export_2',
             'period_gas',
             'period_solar',
+            'gaps',
         )
         read_only_fields = fields
 
     power_set = PowerMeasurementSetSerializer(many=True, read_only=True)
     gas_set = GasMeasurementSetSerializer(many=True, read_only=True)
     solar_set = SolarMeasurementSetSerializer(many=True, read_only=True)
+    gaps = serializers.SerializerMethodField()
+
+    def to_stream(self, meter: SmartMeter) -> dict:
+        """
+        Representation for a streamed response (see streaming.stream_json): the measurement sets are read from a
+        server-side cursor and written per chunk, and the period usage is summed from them while they are written
+        """
+        data = dict(MeterDetailSerializer(meter, context=self.context).data)
+        for name in ('power_set', 'gas_set', 'solar_set'):
+            queryset = getattr(meter, name)
+            totals = list(queryset.model.delta_fields())
+            data[name] = StreamedList(queryset, self.fields[name].child, totals)
+            for total in totals:
+                data['period_%s' % total[len('total_'):]] = partial(data[name].total, total)
+        data['gaps'] = partial(self.get_gaps, meter)
+        return data
+
+    def get_gaps(self, meter: SmartMeter):
+        """Gaps in the measurement sets, only when the gaps are filled"""
+        if not meter.gap_fill:
+            return None
+        return {
+            'power': GapSpanSerializer(meter.power_set.gap_spans(), many=True).data,
+            'gas': GapSpanSerializer(meter.gas_set.gap_spans(), many=True).data,
+            'solar': GapSpanSerializer(meter.solar_set.gap_spans(), many=True).data,
+        }
+
+
+class MeterMeasurementsColumnsSerializer(MeterMeasurementsDetailSerializer):
+    """
+    Meter detail serializer with the measurement sets in columns, see MeasurementColumnsSerializer
+    """
+    power_set = MeasurementColumnsSerializer(row_serializer=PowerMeasurementSerializer, read_only=True)
+    gas_set = MeasurementColumnsSerializer(row_serializer=GasMeasurementSerializer, read_only=True)
+    solar_set = MeasurementColumnsSerializer(row_serializer=SolarMeasurementSerializer, read_only=True)
+
+
+class MeterMergeSerializer(serializers.Serializer):
+    """
+    Serializer for merging the history of another meter of the user (for example of a replaced smart meter) into
+    the meter of the url
+    """
+    meter = serializers.PrimaryKeyRelatedField(queryset=[])
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fields['meter'].queryset = SmartMeter.objects.user_meters(self.context['view'].user_id)
+        return fields
+
+    def validate_meter(self, meter: SmartMeter):
+        if meter.pk == self.context['view'].meter_id:
+            raise serializers.ValidationError('Een meter kan niet met zichzelf worden samengevoegd')
+        return meter
+
+
+class MeterImportSerializer(serializers.Serializer):
+    """
+    Serializer for uploading the measurement history of the meter of the url, a ZIP archive or CSV file in the layout
+    of the export. Only the size and the headers are checked, the rows are validated when the upload is imported
+    """
+    file = serializers.FileField()
+    update = serializers.BooleanField(default=False)
+    skip_invalid = serializers.BooleanField(default=False)
+
+    def validate_file(self, value):
+        if value.size > settings.MEASUREMENT_IMPORT_MAX_MB * 1024 * 1024:
+            raise serializers.ValidationError(f'Het bestand is groter dan {settings.MEASUREMENT_IMPORT_MAX_MB} MB')
+        try:
+            check_layout(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return value
 
 
 class GroupMeterListSerializer(serializers.ModelSerializer):
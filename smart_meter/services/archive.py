@@ -0,0 +1,352 @@
+import heapq
+import json
+import os
+import shutil
+import struct
+import sys
+import zlib
+from array import array
+from datetime import datetime, timezone as dt_timezone, timedelta
+from decimal import Decimal
+from typing import Optional, Callable, List, Iterator, Iterable, Tuple, Dict
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from smart_meter.models import SmartMeter
+from smart_meter.services.deltas import MeasurementDeltaCalculator
+from smart_meter.services.packing import MeasurementPacker, to_microseconds
+from smart_meter.services.partitions import MeasurementPartitioner, MEASUREMENT_TYPES
+from smart_meter.sharding import measurement_database
+
+ARCHIVE_MAGIC = b'GPXA'
+ARCHIVE_VERSION = 1
+ARCHIVE_EXTENSION = '.gpxa'
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+BATCH_SIZE = 1000
+
+
+def encode_columns(header: dict, columns: List[List[int]]) -> bytes:
+    """
+    Encode integer columns into the archive file format: magic, version, JSON header and per column the zlib
+    compressed little endian int64 values, each prefixed with its length
+
+    :param header: JSON serializable file header
+    :param columns: list of integer columns, all of the same length
+    :return: file content
+    """
+    header_bytes = json.dumps(header).encode()
+    parts = [ARCHIVE_MAGIC, struct.pack('<BI', ARCHIVE_VERSION, len(header_bytes)), header_bytes]
+    for column in columns:
+        values = array('q', column)
+        if sys.byteorder == 'big':
+            values.byteswap()
+        data = zlib.compress(values.tobytes(), 9)
+        parts += [struct.pack('<I', len(data)), data]
+    return b''.join(parts)
+
+
+def decode_columns(content: bytes) -> Tuple[dict, List[array]]:
+    """
+    Decode the archive file format, see encode_columns
+
+    :return: (header, list of integer columns)
+    """
+    if content[:len(ARCHIVE_MAGIC)] != ARCHIVE_MAGIC:
+        raise ValueError('Not a measurement archive file')
+    offset = len(ARCHIVE_MAGIC)
+    version, header_length = struct.unpack_from('<BI', content, offset)
+    if version != ARCHIVE_VERSION:
+        raise ValueError('Unsupported measurement archive version %d' % version)
+    offset += struct.calcsize('<BI')
+    header = json.loads(content[offset:offset + header_length])
+    offset += header_length
+
+    columns = []
+    while offset < len(content):
+        (length,) = struct.unpack_from('<I', content, offset)
+        offset += 4
+        values = array('q')
+        values.frombytes(zlib.decompress(content[offset:offset + length]))
+        if sys.byteorder == 'big':
+            values.byteswap()
+        columns.append(values)
+        offset += length
+    return header, columns
+
+
+def merge_rows(sources: List[Iterable[tuple]]) -> Iterator[tuple]:
+    """
+    Merge iterables of (timestamp, ...) rows that are sorted by timestamp, into one sorted iterator. For a timestamp
+    in multiple sources, the row of the first source is used
+    """
+    last_timestamp = None
+    for row in heapq.merge(*sources, key=lambda r: r[0]):
+        if row[0] != last_timestamp:
+            last_timestamp = row[0]
+            yield row
+
+
+class MeasurementArchiver:
+    """
+    Service to move measurements of a type out of the database into compressed columnar files, one file per meter
+    per year (UTC): `<archive root>/<type>/<meter id>/<year>.gpxa`. Timestamps are stored delta-encoded in
+    microseconds, values as integers scaled by the decimal places of the field.
+
+    Archived measurements stay available: MeasurementQuerySet.filter_timestamp and the MeterDataExporter merge
+    them with the measurements in the database, the database wins for timestamps in both.
+    """
+
+    def __init__(self, model, root: Optional[str] = None, progress_callback: Optional[Callable[[str], None]] = None):
+        """
+        Initialize the archiver for a measurement model
+
+        :param model: PowerMeasurement, GasMeasurement or SolarMeasurement
+        :param root: archive directory, defaults to the MEASUREMENT_ARCHIVE_ROOT setting
+        :param progress_callback: Optional callback function to report progress messages
+        """
+        self.model = model
+        self.measurement_type = next(key for key, value in MEASUREMENT_TYPES.items() if value is model)
+        self.root = os.path.join(root or settings.MEASUREMENT_ARCHIVE_ROOT, self.measurement_type)
+        self.progress_callback = progress_callback
+        self.fields = model.reading_fields()
+        self.packer = MeasurementPacker(model)
+        self.decimal_places = {field: model._meta.get_field(field).decimal_places for field in self.fields}
+
+    def path(self, meter_id: int, year: int) -> str:
+        return os.path.join(self.root, str(meter_id), '%d%s' % (year, ARCHIVE_EXTENSION))
+
+    def delete(self, meter_id: int) -> None:
+        """Remove all archive files of a meter"""
+        shutil.rmtree(os.path.join(self.root, str(meter_id)), ignore_errors=True)
+
+    def archived_years(self, meter_id: int) -> List[int]:
+        """Sorted years with an archive file for given meter"""
+        try:
+            names = os.listdir(os.path.join(self.root, str(meter_id)))
+        except FileNotFoundError:
+            return []
+        return sorted(int(name[:-len(ARCHIVE_EXTENSION)]) for name in names
+                      if name.endswith(ARCHIVE_EXTENSION) and name[:-len(ARCHIVE_EXTENSION)].isdigit())
+
+    def has_archive(self, meter_ids: Iterable[int], after: datetime, before: datetime) -> bool:
+        """If any of the meters has archived measurements in given time range"""
+        years = range(after.astimezone(dt_timezone.utc).year, before.astimezone(dt_timezone.utc).year + 1)
+        return any(os.path.exists(self.path(meter_id, year)) for meter_id in meter_ids for year in years)
+
+    def archive(self, years: int, inactive_days: int, now: Optional[datetime] = None) -> int:
+        """
+        Archive the calendar years older than given amount of years for all meters, and all measurements of meters
+        without an update in given amount of days
+
+        :param years: amount of calendar years to keep in the database, before the current year
+        :param inactive_days: days without update after which a meter is archived completely
+        :param now: moment to count from, defaults to the current time
+        :return: amount of archived measurements
+        """
+        now = now or datetime.now(dt_timezone.utc)
+        inactive_since = now - timedelta(days=inactive_days)
+        archived = 0
+        meters = SmartMeter.objects.order_by('pk').values_list('pk', 'live__last_update')
+        for meter_id, last_update in meters.iterator():
+            last_year = now.year if last_update < inactive_since else now.year - years - 1
+            first = self.model.objects.filter(
+                meter_id=meter_id
+            ).order_by('timestamp').values_list('timestamp', flat=True).first()
+            first_packed = self.packer.days([meter_id]).values_list('date', flat=True).first()
+            first_years = [first.astimezone(dt_timezone.utc).year] if first else []
+            first_years += [first_packed.year] if first_packed else []
+            if not first_years:
+                continue
+            for year in range(min(first_years), last_year + 1):
+                archived += self.archive_year(meter_id, year)
+        return archived
+
+    def archive_year(self, meter_id: int, year: int) -> int:
+        """
+        Move the measurements of a meter in given year to the archive file, merged with the already archived
+        measurements. The file is written before the rows are deleted, so measurements are never lost
+
+        :return: amount of archived measurements
+        """
+        with transaction.atomic(using=measurement_database(meter_id)):
+            measurements = self.model.objects.filter(
+                meter_id=meter_id,
+                timestamp__gte=datetime(year, 1, 1, tzinfo=dt_timezone.utc),
+                timestamp__lt=datetime(year + 1, 1, 1, tzinfo=dt_timezone.utc),
+            )
+            packed_days = self.packer.days([meter_id]).filter(date__year=year)
+            rows = list(merge_rows([
+                measurements.order_by('timestamp').values_list('timestamp', *self.fields),
+                (row for packed_day in packed_days for row in self.packer.read_day(packed_day)),
+            ]))
+            if not rows:
+                return 0
+
+            archived = len(rows)
+            path = self.path(meter_id, year)
+            if os.path.exists(path):
+                rows = list(merge_rows([rows, self._read_file(path)]))
+            self._write_file(path, meter_id, year, rows)
+            measurements.delete()
+            packed_days.delete()
+            self._log(f"{self.model.__name__}: meter {meter_id}, {year} archived ({archived:,} rows)")
+            return archived
+
+    def restore(self, meter_id: int, year: Optional[int] = None) -> int:
+        """
+        Move archived measurements of a meter back into the database
+
+        :param meter_id: id of the meter
+        :param year: only restore this year, defaults to all archived years
+        :return: amount of restored measurements
+        """
+        years = [year] if year else self.archived_years(meter_id)
+        return sum(self.restore_year(meter_id, year) for year in years)
+
+    def restore_year(self, meter_id: int, year: int) -> int:
+        """
+        Insert the measurements of an archive file in the database, and remove the file once committed
+
+        :return: amount of restored measurements
+        """
+        database = measurement_database(meter_id)
+        with transaction.atomic(using=database):
+            path = self.path(meter_id, year)
+            if not os.path.exists(path):
+                return 0
+            rows = self._read_file(path)
+
+            partitioner = MeasurementPartitioner(self.model, using=database)
+            for month in {datetime(row[0].year, row[0].month, 1, tzinfo=dt_timezone.utc) for row in rows}:
+                partitioner.create_partition(month)
+
+            for i in range(0, len(rows), BATCH_SIZE):
+                self.model.objects.bulk_create([
+                    self.model(meter_id=meter_id, timestamp=row[0], **dict(zip(self.fields, row[1:])))
+                    for row in rows[i:i + BATCH_SIZE]
+                ], ignore_conflicts=True)
+            # Deltas are not archived
+            MeasurementDeltaCalculator(self.model).update_range(
+                meter_id, datetime(year, 1, 1, tzinfo=dt_timezone.utc), datetime(year + 1, 1, 1, tzinfo=dt_timezone.utc)
+            )
+
+            transaction.on_commit(lambda: os.remove(path), using=database)
+            self._log(f"{self.model.__name__}: meter {meter_id}, {year} restored ({len(rows):,} rows)")
+            return len(rows)
+
+    def read(self, meter_id: int, after: Optional[datetime] = None, before: Optional[datetime] = None,
+             fields: Optional[List[str]] = None) -> Iterator[tuple]:
+        """
+        Read the archived measurements of a meter, sorted by timestamp
+
+        :param meter_id: id of the meter
+        :param after: only measurements from this moment (inclusive)
+        :param before: only measurements until this moment (inclusive)
+        :param fields: value fields to return, defaults to all
+        :return: iterator of (timestamp, *values)
+        """
+        indexes = [self.fields.index(field) + 1 for field in fields] if fields else None
+        for year in self.archived_years(meter_id):
+            if (after and year < after.astimezone(dt_timezone.utc).year) or \
+                    (before and year > before.astimezone(dt_timezone.utc).year):
+                continue
+            for row in self._read_file(self.path(meter_id, year)):
+                if (after and row[0] < after) or (before and row[0] > before):
+                    continue
+                yield (row[0], *(row[i] for i in indexes)) if indexes else row
+
+    def read_arrays(self, meter_ids: List[int], after: datetime, before: datetime) \
+            -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Read the archived measurements of the meters in the time range as arrays, in the format of
+        MeasurementPacker.read_arrays
+
+        :return: (meter ids, timestamps in microseconds, dict of field and stored integer values), not sorted
+        """
+        after_us, before_us = to_microseconds(after), to_microseconds(before)
+        meters, timestamps, values = [], [], {field: [] for field in self.fields}
+        for meter_id in meter_ids:
+            for year in self.archived_years(meter_id):
+                if not after.astimezone(dt_timezone.utc).year <= year <= before.astimezone(dt_timezone.utc).year:
+                    continue
+                year_timestamps, year_values = self._read_arrays(self.path(meter_id, year))
+                mask = (year_timestamps >= after_us) & (year_timestamps <= before_us)
+                meters.append(np.full(np.count_nonzero(mask), meter_id, np.int64))
+                timestamps.append(year_timestamps[mask])
+                for field, field_values in year_values.items():
+                    values[field].append(field_values[mask])
+
+        def concatenate(arrays):
+            return np.concatenate(arrays) if arrays else np.empty(0, np.int64)
+        return concatenate(meters), concatenate(timestamps), {f: concatenate(v) for f, v in values.items()}
+
+    def last_before(self, meter_id: int, before: datetime) -> Optional[Tuple[int, Dict[str, int]]]:
+        """
+        Last archived measurement of a meter before a moment, in the format of MeasurementPacker.last_before
+
+        :return: (timestamp in microseconds, dict of field and stored integer value), None without archived measurement
+            before the moment
+        """
+        before_us = to_microseconds(before)
+        for year in reversed(self.archived_years(meter_id)):
+            if year > before.astimezone(dt_timezone.utc).year:
+                continue
+            timestamps, values = self._read_arrays(self.path(meter_id, year))
+            index = int(np.searchsorted(timestamps, before_us)) - 1
+            if index >= 0:
+                return int(timestamps[index]), {field: int(column[index]) for field, column in values.items()}
+        return None
+
+    def _read_arrays(self, path: str) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Read an archive file into sorted timestamps in microseconds and the stored integer values per field"""
+        with open(path, 'rb') as file:
+            header, columns = decode_columns(file.read())
+        values = {}
+        for column, column_values in zip(header['columns'][1:], columns[1:]):
+            # Stored integers are in the decimal places of the field
+            scale = 10 ** (self.decimal_places[column['name']] - column['decimal_places'])
+            values[column['name']] = np.asarray(column_values, np.int64) * scale
+        return np.cumsum(np.asarray(columns[0], np.int64)), values
+
+    def _write_file(self, path: str, meter_id: int, year: int, rows: List[tuple]) -> None:
+        """Write rows of (timestamp, *values) to an archive file, replacing it atomically"""
+        timestamps = [(row[0] - EPOCH) // timedelta(microseconds=1) for row in rows]
+        columns = [[b - a for a, b in zip([0] + timestamps, timestamps)]]
+        for i, field in enumerate(self.fields, start=1):
+            columns.append([int(row[i].scaleb(self.decimal_places[field])) for row in rows])
+
+        header = {
+            'type': self.measurement_type,
+            'meter': meter_id,
+            'year': year,
+            'rows': len(rows),
+            'columns': [{'name': 'timestamp', 'encoding': 'delta', 'unit': 'us'}] +
+                       [{'name': field, 'decimal_places': self.decimal_places[field]} for field in self.fields],
+        }
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'wb') as file:
+            file.write(encode_columns(header, columns))
+        os.replace(path + '.tmp', path)
+
+    def _read_file(self, path: str) -> List[tuple]:
+        """Read an archive file into rows of (timestamp, *values)"""
+        with open(path, 'rb') as file:
+            header, columns = decode_columns(file.read())
+
+        timestamps = []
+        timestamp = 0
+        for delta in columns[0]:
+            timestamp += delta
+            timestamps.append(EPOCH + timedelta(microseconds=timestamp))
+        values = {
+            column['name']: [Decimal(value).scaleb(-column['decimal_places']) for value in values]
+            for column, values in zip(header['columns'][1:], columns[1:])
+        }
+        return list(zip(timestamps, *(values[field] for field in self.fields)))
+
+    def _log(self, message: str) -> None:
+        """Log a progress message if callback is provided"""
+        if self.progress_callback:
+            self.progress_callback(message)
@@ -0,0 +1,144 @@
+import re
+import uuid
+from datetime import datetime, timezone as dt_timezone, timedelta
+from typing import Optional, Callable, List
+
+from django.db import connection
+
+from smart_meter.models import SmartMeter, PowerMeasurement, GasMeasurement, SolarMeasurement
+from smart_meter.services.partitions import MeasurementPartitioner, MEASUREMENT_MODELS, month_start, add_months
+from users.models import User
+
+# Column expressions for the generated measurements in stored milli-units, `ts` is the timestamp and `n` the row
+# number of the series
+SYNTHETIC_COLUMNS = {
+    PowerMeasurement: {
+        'actual_import': '(random() * 2000)::integer',
+        'actual_export': '(random() * 500)::integer',
+        'total_import_1': 'n * 4',
+        'total_import_2': 'n * 3',
+        'total_export_1': 'n * 1',
+        'total_export_2': 'n * 2',
+    },
+    GasMeasurement: {
+        'actual_gas': '(random() * 300)::integer',
+        'total_gas': 'n * 2',
+    },
+    SolarMeasurement: {
+        'actual_solar': '(random() * 3000)::integer',
+        'total_solar': 'n * 5',
+    },
+}
+
+EXECUTION_TIME_PATTERN = re.compile(r'Execution Time: ([\d.]+) ms')
+
+
+def explain_analyze(queryset) -> (float, str):
+    """
+    Run EXPLAIN ANALYZE for a queryset
+
+    :return: (execution time in ms, plan)
+    """
+    plan = queryset.explain(analyze=True, buffers=True)
+    match = EXECUTION_TIME_PATTERN.search(plan)
+    return float(match.group(1)) if match else float('nan'), plan
+
+
+def explain_analyze_sql(sql: str, params=None) -> (float, str):
+    """
+    Run EXPLAIN ANALYZE for a raw SQL query
+
+    :return: (execution time in ms, plan)
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (ANALYZE, BUFFERS) ' + sql, params)
+        plan = '\n'.join(row[0] for row in cursor.fetchall())
+    match = EXECUTION_TIME_PATTERN.search(plan)
+    return float(match.group(1)) if match else float('nan'), plan
+
+
+class SyntheticDataset:
+    """
+    Service to load a synthetic multi-year measurement dataset for benchmarking. The data is created for a new
+    benchmark user, and removed again with cleanup(). Only use this on a benchmark database.
+    """
+
+    def __init__(self, meters: int = 3, years: int = 3, interval: timedelta = timedelta(minutes=5),
+                 progress_callback: Optional[Callable[[str], None]] = None):
+        """
+        :param meters: amount of meters to create
+        :param years: amount of years of measurements, up to now
+        :param interval: time between measurements
+        :param progress_callback: Optional callback function to report progress messages
+        """
+        self.meter_count = meters
+        self.years = years
+        self.interval = interval
+        self.progress_callback = progress_callback
+        self.end = datetime.now(dt_timezone.utc).replace(second=0, microsecond=0)
+        self.start = self.end - timedelta(days=365 * years)
+        self.user: Optional[User] = None
+        self.meters: List[SmartMeter] = []
+
+    def load(self) -> None:
+        """Create the benchmark user and meters, and generate the measurements for each meter"""
+        self.user = User.objects.create_user(username='benchmark_%s' % uuid.uuid4().hex[:8])
+        for i in range(self.meter_count):
+            self.meters.append(SmartMeter.objects.create(
+                self.user,
+                name='Benchmark %d' % (i + 1),
+                sn_power='benchmark-%s-%d' % (self.user.pk, i),
+                power_timestamp=self.end,
+                actual_power_import=0,
+                actual_power_export=0,
+                tariff=1,
+                total_power_import_1=0,
+                total_power_import_2=0,
+                total_power_export_1=0,
+                total_power_export_2=0,
+            ))
+
+        months = (self.end.year - self.start.year) * 12 + self.end.month - self.start.month
+        for model in MEASUREMENT_MODELS:
+            partitioner = MeasurementPartitioner(model)
+            for i in range(months + 1):
+                partitioner.create_partition(add_months(month_start(self.start), i))
+
+            for meter in self.meters:
+                self._generate(model, meter)
+            self._log(f"{model.__name__}: {self.meter_count} meters generated")
+
+            quote = connection.ops.quote_name
+            with connection.cursor() as cursor:
+                # Fill the visibility map, index only scans depend on it
+                cursor.execute('VACUUM (ANALYZE) %s' % quote(model._meta.db_table))
+
+    def cleanup(self) -> None:
+        """Remove the benchmark user, meters and measurements"""
+        if not self.user:
+            return
+        meter_ids = [meter.pk for meter in self.meters]
+        for model in MEASUREMENT_MODELS:
+            model.objects.filter(meter_id__in=meter_ids).delete()
+        self.user.delete()
+        self._log("Benchmark data removed")
+
+    def _generate(self, model, meter: SmartMeter) -> None:
+        columns = SYNTHETIC_COLUMNS[model]
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO %s (meter_id, "timestamp", %s) '
+                'SELECT %%s, ts, %s FROM generate_series(%%s::timestamptz, %%s::timestamptz, %%s) '
+                'WITH ORDINALITY AS series(ts, n)' % (
+                    quote(model._meta.db_table),
+                    ', '.join(quote(column) for column in columns),
+                    ', '.join(columns.values()),
+                ),
+                [meter.pk, self.start, self.end, self.interval]
+            )
+
+    def _log(self, message: str) -> None:
+        """Log a progress message if callback is provided"""
+        if self.progress_callback:
+            self.progress_callback(message)
@@ -0,0 +1,510 @@
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from typing import List, Tuple, Dict, Optional
+
+import numpy as np
+from django.db import models
+from django.db.models import functions
+from django.utils import timezone
+
+from smart_meter.services.archive import MeasurementArchiver
+from smart_meter.services.packing import MeasurementPacker, to_microseconds
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+NO_ID = np.iinfo(np.int64).max
+
+# (meter ids, timestamps in microseconds, measurement ids, dict of field and stored integer values)
+Columns = Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[str, np.ndarray]]
+
+
+# Bucket sizes of filter_timestamp, from small to large
+BUCKET_KINDS = ('minute', 'hour', 'day')
+# Downsamplers for a maximum amount of buckets: merge consecutive buckets, or select the buckets that preserve the
+# shape of the series (Largest-Triangle-Three-Buckets)
+DOWNSAMPLE_OPTIONS = ('merge', 'lttb')
+
+
+def bucket_count(after: datetime, before: datetime, kind: str) -> int:
+    """
+    Amount of buckets of a size in the time range, the length of bucket_edges without building them (one more over
+    the end of DST, where bucket_edges has one bucket for the two local hours)
+    """
+    if kind == 'day':
+        return (timezone.localdate(before) - timezone.localdate(after)).days + 1
+    step = timedelta(minutes=1) if kind == 'minute' else timedelta(hours=1)
+    return (before - truncate(after, kind)) // step + 1
+
+
+def bucket_kind(after: datetime, before: datetime, max_points: Optional[int] = None) -> str:
+    """
+    Bucket size of the time range: minute under 2 days, hour under 14 days and day otherwise, or with max_points the
+    smallest size with at most that amount of buckets (day when no size fits, the buckets are then downsampled)
+    """
+    if max_points:
+        return next((kind for kind in BUCKET_KINDS if bucket_count(after, before, kind) <= max_points), 'day')
+    delta = before - after
+    if delta.days < 2:
+        return 'minute'
+    elif delta.days < 14:
+        return 'hour'
+    return 'day'
+
+
+def truncate(timestamp: datetime, kind: str) -> datetime:
+    """
+    Python version of the Trunc database function (minute, hour or day), in the current timezone. The two local hours
+    at the end of DST are one bucket, like the buckets grouped on the local hour, which starts at the first of them
+    """
+    replace = {'second': 0, 'microsecond': 0, 'fold': 0}
+    if kind in ('hour', 'day'):
+        replace['minute'] = 0
+    if kind == 'day':
+        replace['hour'] = 0
+    return timezone.localtime(timestamp).replace(**replace)
+
+
+def bucket_start(timestamp: datetime, kind: str, buckets: int = 0) -> datetime:
+    """Start of the bucket an amount of buckets after the bucket of a timestamp (before it when negative)"""
+    if kind == 'day':
+        day = timezone.localdate(timestamp) + timedelta(days=buckets)
+        return datetime.combine(day, time(), tzinfo=timezone.get_current_timezone())
+    step = timedelta(minutes=1) if kind == 'minute' else timedelta(hours=1)
+    return truncate(timestamp.astimezone(dt_timezone.utc) + buckets * step, kind)
+
+
+def bucket_edges(after: datetime, before: datetime, kind: str) -> np.ndarray:
+    """
+    Start of every bucket in the time range, the same buckets as the Trunc database function and the local date and
+    hour the measurements are grouped on
+
+    :return: array of timestamps in microseconds
+    """
+    start = truncate(after, kind)
+    edges = []
+    if kind == 'day':
+        # Days in local time, these are not always 24 hours
+        day = start.date()
+        while (edge := datetime.combine(day, time(), tzinfo=start.tzinfo)) <= before:
+            edges.append(to_microseconds(edge))
+            day += timedelta(days=1)
+    else:
+        step = timedelta(minutes=1) if kind == 'minute' else timedelta(hours=1)
+        edge = start.astimezone(dt_timezone.utc)
+        local = None
+        while edge <= before:
+            # Steps in UTC, the local hour repeated at the end of DST is the same bucket
+            bucket = truncate(edge, kind).replace(tzinfo=None)
+            if bucket != local:
+                edges.append(to_microseconds(edge))
+            local = bucket
+            edge += step
+    return np.array(edges, np.int64)
+
+
+def database_columns(measurements, fields: List[str]) -> Columns:
+    """Columns of the measurements in a queryset, with the stored integer values"""
+    rows = list(measurements.values_list(
+        'meter_id', 'timestamp', 'id', *(functions.Cast(field, models.IntegerField()) for field in fields)
+    ))
+    if not rows:
+        return empty_columns(fields)
+    columns = list(zip(*rows))
+    return (
+        np.array(columns[0], np.int64),
+        np.array([to_microseconds(timestamp) for timestamp in columns[1]], np.int64),
+        np.array(columns[2], np.int64),
+        {field: np.array(columns[i], np.int64) for i, field in enumerate(fields, start=3)},
+    )
+
+
+def empty_columns(fields: List[str]) -> Columns:
+    return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.int64), \
+        {field: np.empty(0, np.int64) for field in fields}
+
+
+def database_partials(measurements, fields: List[str], kind: str) -> Columns:
+    """
+    Partial aggregates of the measurements in a queryset per bucket, aggregated by the database: the amount of
+    measurements and the sums of the stored integer values
+
+    :return: (amounts, first timestamps in microseconds, first measurement ids, dict of field and sum)
+    """
+    rows = list(measurements.annotate(
+        bucket=functions.Trunc('timestamp', kind)
+    ).values('bucket').annotate(
+        amount=models.Count('id'),
+        first_timestamp=models.Min('timestamp'),
+        first_id=models.Min('id'),
+        **{'sum_%s' % field: models.Sum(functions.Cast(field, models.IntegerField())) for field in fields},
+    ).order_by().values_list('amount', 'first_timestamp', 'first_id', *('sum_%s' % field for field in fields)))
+    if not rows:
+        return empty_columns(fields)
+    columns = list(zip(*rows))
+    return (
+        np.array(columns[0], np.int64),
+        np.array([to_microseconds(timestamp) for timestamp in columns[1]], np.int64),
+        np.array(columns[2], np.int64),
+        {field: np.array([int(value) for value in columns[i]], np.int64) for i, field in enumerate(fields, start=3)},
+    )
+
+
+def previous_readings(measurements, before: Dict[int, int], readers: list) -> Dict[int, Dict[str, int]]:
+    """
+    Totals of the last measurement of each meter before a moment, in the database, the packed days or the archive.
+    The deltas from that moment on are derived from these, like Measurement.set_deltas
+
+    :param measurements: measurement queryset, on the database to look up
+    :param before: moment per meter id, in microseconds
+    :param readers: MeasurementPacker and MeasurementArchiver of the model
+    :return: dict of meter id and the stored integer totals, without the meters that have no measurement before it
+    """
+    model = measurements.model
+    totals = list(model.delta_fields())
+    readings = {}
+    for meter_id, moment in before.items():
+        moment = EPOCH + timedelta(microseconds=moment)
+        candidates = [reader.last_before(meter_id, moment) for reader in readers]
+        row = model.objects.using(measurements.db).filter(
+            meter_id=meter_id, timestamp__lt=moment
+        ).order_by('-timestamp').values_list(
+            'timestamp', *(functions.Cast(total, models.IntegerField()) for total in totals)
+        ).first()
+        if row:
+            candidates.append((to_microseconds(row[0]), dict(zip(totals, row[1:]))))
+        candidates = [candidate for candidate in candidates if candidate]
+        if candidates:
+            readings[meter_id] = max(candidates, key=lambda candidate: candidate[0])[1]
+    return readings
+
+
+def merged_buckets(measurements, meter_ids: List[int], after: datetime, before: datetime, kind: str,
+                   archived: bool, packed: bool) -> List[dict]:
+    """
+    Timestamp buckets of filter_timestamp over the measurements in the database, the packed days and the archive
+    files. The database aggregates its measurements per bucket, except where the packed or archived measurements of
+    a meter are: there the measurements are merged with NumPy, for a timestamp in more than one of them the database
+    is used, then the packed days. The result has the same format and values as the database aggregation of
+    filter_timestamp
+
+    :param measurements: queryset of the measurements in the time range
+    :param meter_ids: meters the queryset is filtered on
+    :param after: start of the time range
+    :param before: end of the time range
+    :param kind: bucket size, minute, hour or day
+    :param archived: include the archive files
+    :param packed: include the packed days
+    :return: list of bucket dicts, sorted by timestamp
+    """
+    model = measurements.model
+    fields = model.reading_fields()
+    deltas = model.delta_fields()
+    sources = []
+    readers = []
+    if packed:
+        readers.append(MeasurementPacker(model))
+    if archived:
+        readers.append(MeasurementArchiver(model))
+    for reader in readers:
+        meters, timestamps, values = reader.read_arrays(meter_ids, after, before)
+        # Packed days are read whole
+        mask = (timestamps >= to_microseconds(after)) & (timestamps <= to_microseconds(before))
+        # Packed and archived measurements have no id
+        sources.append((meters[mask], timestamps[mask], np.full(np.count_nonzero(mask), NO_ID, np.int64),
+                        {field: field_values[mask] for field, field_values in values.items()}))
+
+    # Time span of the packed and archived measurements per meter, the database measurements in it are merged
+    spans = {}
+    for meters, timestamps, _, _ in sources:
+        for meter_id in np.unique(meters).tolist():
+            meter_timestamps = timestamps[meters == meter_id]
+            first, last = int(meter_timestamps.min()), int(meter_timestamps.max())
+            if meter_id in spans:
+                first, last = min(first, spans[meter_id][0]), max(last, spans[meter_id][1])
+            spans[meter_id] = (first, last)
+    in_spans = models.Q()
+    for meter_id, (first, last) in spans.items():
+        in_spans |= models.Q(meter_id=meter_id, timestamp__range=(
+            EPOCH + timedelta(microseconds=first), EPOCH + timedelta(microseconds=last)
+        ))
+    if spans:
+        sources.insert(0, database_columns(measurements.filter(in_spans), fields + list(deltas.values())))
+    else:
+        sources.insert(0, empty_columns(fields + list(deltas.values())))
+
+    meters = np.concatenate([source[0] for source in sources])
+    timestamps = np.concatenate([source[1] for source in sources])
+    ids = np.concatenate([source[2] for source in sources])
+    priority = np.concatenate([np.full(len(source[1]), i) for i, source in enumerate(sources)])
+    # Packed and archived measurements have no deltas, these are derived below
+    values = {
+        field: np.concatenate([source[3].get(field, np.zeros(len(source[1]), np.int64)) for source in sources])
+        for field in fields + list(deltas.values())
+    }
+
+    # Measurements in the spans, once per meter and timestamp
+    selection = np.lexsort((priority, timestamps, meters))
+    unique = np.ones(len(selection), bool)
+    unique[1:] = (meters[selection][1:] != meters[selection][:-1]) | \
+                 (timestamps[selection][1:] != timestamps[selection][:-1])
+    selection = selection[unique]
+
+    # Deltas of the packed and archived measurements are derived from the totals, like Measurement.set_deltas. The
+    # first measurement of a meter is compared with its last measurement before the span
+    first_of_meter = np.flatnonzero(np.r_[True, meters[selection][1:] != meters[selection][:-1]]) \
+        if len(selection) else np.empty(0, np.int64)
+    previous = previous_readings(measurements, {meter_id: span[0] for meter_id, span in spans.items()},
+                                 [MeasurementPacker(model), MeasurementArchiver(model)])
+    for total, delta in deltas.items():
+        derived = np.r_[0, np.maximum(np.diff(values[total][selection]), 0)] if len(selection) else np.empty(0)
+        for index in first_of_meter.tolist():
+            reading = previous.get(int(meters[selection][index]))
+            derived[index] = max(values[total][selection][index] - reading[total], 0) if reading else 0
+        values[delta][selection] = np.where(priority[selection] == 0, values[delta][selection], derived)
+
+    # Partial aggregates per bucket, of the merged measurements and of the rest of the database measurements
+    edges = bucket_edges(after, before, kind)
+    amounts = np.zeros(len(edges), np.int64)
+    first_timestamps = np.full(len(edges), NO_ID, np.int64)
+    first_ids = np.full(len(edges), NO_ID, np.int64)
+    sums = {field: np.zeros(len(edges), np.int64) for field in fields}
+    partials = database_partials(measurements.exclude(in_spans) if spans else measurements,
+                                 fields + list(deltas.values()), kind)
+    for partial_amounts, partial_timestamps, partial_ids, partial_values in (
+        (np.ones(len(selection), np.int64), timestamps[selection], ids[selection],
+         {field: values[field][selection] for field in values}),
+        partials,
+    ):
+        bucket = np.searchsorted(edges, partial_timestamps, side='right') - 1
+        np.add.at(amounts, bucket, partial_amounts)
+        np.minimum.at(first_timestamps, bucket, partial_timestamps)
+        np.minimum.at(first_ids, bucket, partial_ids)
+        for field in fields:
+            # Same as MeasurementQuerySet.bucket_total, sum of the deltas
+            np.add.at(sums[field], bucket, partial_values[deltas.get(field, field)])
+
+    buckets = []
+    for i in np.flatnonzero(amounts).tolist():
+        bucket_dict = {
+            'id': int(first_ids[i]) if first_ids[i] != NO_ID else None,
+            'timestamp': EPOCH + timedelta(microseconds=int(first_timestamps[i])),
+        }
+        for field in fields:
+            total = Decimal(int(sums[field][i])).scaleb(-model._meta.get_field(field).decimal_places)
+            bucket_dict[field] = total if field in deltas else total / int(amounts[i])
+        buckets.append(bucket_dict)
+    return buckets
+
+
+def merged_buckets_page(measurements, meter_ids: List[int], after: datetime, before: datetime, kind: str,
+                        archived: bool, packed: bool, position: datetime, descending: bool, amount: int) -> List[dict]:
+    """
+    The merged buckets (see merged_buckets) of a page of keyset pagination: from a position on, or before it when
+    descending. Merged per window of the amount of buckets from the position, until the windows have that amount of
+    buckets or the time range ends, instead of over the whole time range
+
+    :param position: timestamp of the position
+    :param descending: buckets before the position instead of from it
+    :param amount: amount of buckets of the page
+    :return: list of bucket dicts, sorted by timestamp
+    """
+    buckets = []
+    while len(buckets) < amount:
+        if descending:
+            window = (max(after, bucket_start(position, kind, -amount)),
+                      min(before, position - timedelta(microseconds=1)))
+        else:
+            window = (max(after, position),
+                      min(before, bucket_start(position, kind, amount) - timedelta(microseconds=1)))
+        if window[0] > window[1]:
+            break
+        window_buckets = merged_buckets(measurements.filter(timestamp__range=window), meter_ids, *window, kind,
+                                        archived, packed)
+        buckets = window_buckets + buckets if descending else buckets + window_buckets
+        # Windows end on a bucket edge, a bucket is never split over windows
+        position = window[0] if descending else window[1] + timedelta(microseconds=1)
+    return buckets
+
+
+# Values of the buckets without measurements: null, or carried forward (the counters did not change, usage 0)
+GAP_FILL_OPTIONS = ('null', 'carry')
+
+
+def fill_gaps(buckets: List[dict], model, after: datetime, before: datetime, kind: str, mode: str) -> List[dict]:
+    """
+    Timestamp buckets on the full grid of the time range. A bucket without measurements has the bucket start as
+    timestamp, no id and null values. With mode carry the totals of such a bucket are 0 instead: the counters are
+    carried forward, the usage during a gap is in the first bucket after it (the delta of its first measurement).
+    Each bucket gets a `gap` flag
+
+    :param buckets: buckets of filter_timestamp, sorted by timestamp
+    :param model: measurement model
+    :param after: start of the time range
+    :param before: end of the time range
+    :param kind: bucket size, minute, hour or day
+    :param mode: null or carry
+    :return: list of bucket dicts, sorted by timestamp
+    """
+    edges = bucket_edges(after, before, kind)
+    indexes = np.searchsorted(
+        edges, [to_microseconds(bucket['timestamp']) for bucket in buckets], side='right'
+    ) - 1
+    by_edge = dict(zip(indexes.tolist(), buckets))
+    fields = model.reading_fields()
+    totals = model.delta_fields()
+    filled = []
+    for i, edge in enumerate(edges.tolist()):
+        if i in by_edge:
+            filled.append({**by_edge[i], 'gap': False})
+            continue
+        bucket = {'id': None, 'timestamp': EPOCH + timedelta(microseconds=edge), 'gap': True}
+        for field in fields:
+            bucket[field] = Decimal(0) if mode == 'carry' and field in totals else None
+        filled.append(bucket)
+    return filled
+
+
+def gap_spans(buckets: List[dict], before: datetime) -> List[dict]:
+    """
+    Summary of the gaps in gap filled buckets, one span per run of consecutive empty buckets
+
+    :param buckets: buckets of fill_gaps, sorted by timestamp
+    :param before: end of the time range, the end of a gap at the end of the range
+    :return: list of dicts with the start and end of the gap, and the amount of empty buckets
+    """
+    spans = []
+    for bucket in buckets:
+        if not bucket['gap']:
+            if spans and spans[-1]['end'] is None:
+                spans[-1]['end'] = bucket['timestamp']
+        elif spans and spans[-1]['end'] is None:
+            spans[-1]['buckets'] += 1
+        else:
+            spans.append({'start': bucket['timestamp'], 'end': None, 'buckets': 1})
+    if spans and spans[-1]['end'] is None:
+        spans[-1]['end'] = before
+    return spans
+
+
+def aligned_buckets(series: List[List[dict]], kind: str) -> List[dict]:
+    """
+    Buckets of several measurement series as one row per bucket. The series are gap filled on the same grid, so
+    bucket i of every series is the same bucket (also after merging to max_points). The field names of the
+    measurement types are unique
+
+    :param series: buckets of fill_gaps per measurement type, sorted by timestamp
+    :param kind: bucket size, minute, hour or day
+    :return: list of dicts with the start of the bucket and the fields of every series
+    """
+    rows = []
+    for buckets in zip(*series):
+        row = {'timestamp': truncate(buckets[0]['timestamp'], kind)}
+        for bucket in buckets:
+            row.update((field, value) for field, value in bucket.items() if field not in ('id', 'timestamp', 'gap'))
+        rows.append(row)
+    return rows
+
+
+def lttb_indexes(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indexes of the points that preserve the visual shape of a series. The first and
+    last point are kept, from each bucket in between the point with the largest triangle with the point kept before
+    it and the average of the next bucket
+
+    :param x: x values, ascending
+    :param y: y values
+    :param points: amount of points to keep, at least 3
+    :return: ascending array of indexes
+    """
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+    bounds = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    # Average of each bucket, the last bucket is the last point
+    next_x = np.r_[np.add.reduceat(x[1:n - 1], bounds[:-1] - 1) / np.diff(bounds), x[-1]]
+    next_y = np.r_[np.add.reduceat(y[1:n - 1], bounds[:-1] - 1) / np.diff(bounds), y[-1]]
+    selected = np.empty(points, np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(points - 2):
+        start, end = bounds[i], bounds[i + 1]
+        # Double the area of the triangles of the candidates, at once for the whole bucket
+        area = np.abs((x[previous] - next_x[i + 1]) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (next_y[i + 1] - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def downsample(buckets: List[dict], model, points: int, method: Optional[str] = None) -> List[dict]:
+    """
+    At most an amount of buckets, for buckets of filter_timestamp (or fill_gaps) that are more. The usage is kept: the
+    totals of a bucket are the sum of the buckets it replaces.
+
+    merge (default): consecutive buckets are merged, with the timestamp of the first and the average of the actual
+    values. lttb: the buckets that preserve the shape of the first actual value are kept with their actual values,
+    the usage since the previous kept bucket is added to a bucket (like the usage during a gap with carry). The
+    buckets without an actual value are not selected, each gap is kept as its first bucket
+
+    :param buckets: buckets sorted by timestamp
+    :param model: measurement model
+    :param points: maximum amount of buckets
+    :param method: merge or lttb
+    :return: list of bucket dicts, sorted by timestamp
+    """
+    n = len(buckets)
+    if n <= points:
+        return buckets
+    fields = model.reading_fields()
+    totals = model.delta_fields()
+    # Stored integer values, with the buckets that have a value
+    present = {field: np.array([bucket[field] is not None for bucket in buckets]) for field in fields}
+    values = {
+        field: np.array([
+            int(bucket[field].scaleb(model._meta.get_field(field).decimal_places).to_integral_value())
+            if bucket[field] is not None else 0 for bucket in buckets
+        ], np.int64)
+        for field in fields
+    }
+    kept = None
+    if method == 'lttb':
+        actual = next(field for field in fields if field not in totals)
+        timestamps = np.array([to_microseconds(bucket['timestamp']) for bucket in buckets], np.float64)
+        # A bucket without an actual value is no point of the shape (not a 0), only the buckets with a value are
+        # selected. Each run of buckets without a value is kept at its start, after the last bucket before it, so
+        # the gap stays a gap
+        measured = np.flatnonzero(present[actual])
+        gaps = np.flatnonzero(~present[actual] & np.r_[True, present[actual][:-1]])
+        kept_gaps = np.union1d(gaps, gaps[gaps > 0] - 1)
+        available = points - len(kept_gaps)
+        if available >= min(3, len(measured)):
+            selected = lttb_indexes(timestamps[measured], values[actual][measured].astype(np.float64), available)
+            kept = np.union1d(measured[selected], kept_gaps)
+            starts = np.r_[0, kept[:-1] + 1]
+    lttb = kept is not None
+    if not lttb:
+        # Also with lttb when the runs of buckets without a value are too many to keep
+        starts = np.linspace(0, n, points, endpoint=False).astype(np.int64)
+        kept = starts
+
+    downsampled = [{'id': buckets[i]['id'], 'timestamp': buckets[i]['timestamp']} for i in kept.tolist()]
+    for field in fields:
+        decimal_places = model._meta.get_field(field).decimal_places
+        counts = np.add.reduceat(present[field].astype(np.int64), starts).tolist()
+        if lttb and field not in totals:
+            for bucket_dict, i in zip(downsampled, kept.tolist()):
+                bucket_dict[field] = buckets[i][field]
+            continue
+        sums = np.add.reduceat(values[field], starts).tolist()
+        for bucket_dict, total, count in zip(downsampled, sums, counts):
+            if not count:
+                bucket_dict[field] = None
+            elif field in totals:
+                bucket_dict[field] = Decimal(total).scaleb(-decimal_places)
+            else:
+                bucket_dict[field] = Decimal(total).scaleb(-decimal_places) / count
+    if 'gap' in buckets[0]:
+        # A gap when none of the buckets it replaces had measurements
+        measured = np.add.reduceat(np.array([not bucket['gap'] for bucket in buckets], np.int64), starts)
+        for bucket_dict, count in zip(downsampled, measured.tolist()):
+            bucket_dict['gap'] = not count
+    return downsampled
@@ -0,0 +1,104 @@
+from datetime import datetime, timezone as dt_timezone
+from typing import Optional, Callable
+
+from django.db import models, transaction
+from django.db.models import functions
+
+from smart_meter.models import SmartMeter
+from smart_meter.services.partitions import month_start, add_months
+from smart_meter.sharding import measurement_database
+
+
+class MeasurementCompactor:
+    """
+    Service to compact old raw measurements into one measurement per hour, in the same table. Actual values become
+    the average over the hour, total values the last value of the hour, delta values the sum over the hour, and the
+    timestamp the start of the hour (UTC).
+    With a measurement every 5 minutes this stores 12 times less rows for the compacted months.
+
+    Compaction runs per meter and per month, each in its own transaction, so the locks are short-lived. Running it
+    again is safe, months that are already compacted are skipped.
+    """
+
+    def __init__(self, model, raw_months: int, progress_callback: Optional[Callable[[str], None]] = None):
+        """
+        Initialize the compactor for a measurement model
+
+        :param model: PowerMeasurement, GasMeasurement or SolarMeasurement
+        :param raw_months: amount of months to keep raw measurements, before the current month
+        :param progress_callback: Optional callback function to report progress messages
+        """
+        self.model = model
+        self.raw_months = raw_months
+        self.progress_callback = progress_callback
+        self.actual_fields = [f.name for f in model._meta.concrete_fields if f.name.startswith('actual_')]
+        self.total_fields = [f.name for f in model._meta.concrete_fields if f.name.startswith('total_')]
+        self.delta_fields = list(model.delta_fields().values())
+
+    def compact(self, now: Optional[datetime] = None) -> int:
+        """
+        Compact the measurements older than the raw retention period, for all meters
+
+        :param now: moment to count from, defaults to the current time
+        :return: amount of removed rows
+        """
+        cutoff = add_months(month_start(now or datetime.now(dt_timezone.utc)), -self.raw_months)
+        removed = 0
+        meter_ids = SmartMeter.objects.order_by('pk').values_list('pk', flat=True)
+        for meter_id in meter_ids.iterator():
+            first = self.model.objects.filter(
+                meter_id=meter_id, timestamp__lt=cutoff
+            ).order_by('timestamp').values_list('timestamp', flat=True).first()
+            if not first:
+                continue
+
+            meter_removed = 0
+            month = month_start(first)
+            while month < cutoff:
+                meter_removed += self.compact_month(meter_id, month)
+                month = add_months(month, 1)
+            if meter_removed:
+                self._log(f"{self.model.__name__}: meter {meter_id}, {meter_removed} rows removed")
+            removed += meter_removed
+        return removed
+
+    def compact_month(self, meter_id: int, month: datetime) -> int:
+        """
+        Replace the measurements of a meter in given month by hourly measurements
+
+        :param meter_id: id of the meter
+        :param month: first moment of the month
+        :return: amount of removed rows, 0 if the month was already compacted
+        """
+        with transaction.atomic(using=measurement_database(meter_id)):
+            measurements = self.model.objects.filter(
+                meter_id=meter_id, timestamp__gte=month, timestamp__lt=add_months(month, 1)
+            )
+            hours = list(measurements.annotate(
+                hour=functions.TruncHour('timestamp', tzinfo=dt_timezone.utc)
+            ).values('hour').annotate(
+                count=models.Count('id'),
+                **{field: models.Avg(field, output_field=self.model._meta.get_field(field))
+                   for field in self.actual_fields},
+                **{field: models.Max(field) for field in self.total_fields},
+                **{field: models.Sum(field, output_field=self.model._meta.get_field(field))
+                   for field in self.delta_fields},
+            ).order_by('hour'))
+
+            if all(hour['count'] == 1 for hour in hours):
+                return 0
+
+            deleted, _ = measurements.delete()
+            self.model.objects.bulk_create([
+                self.model(
+                    meter_id=meter_id,
+                    timestamp=hour['hour'],
+                    **{field: hour[field] for field in self.actual_fields + self.total_fields + self.delta_fields},
+                ) for hour in hours
+            ])
+            return deleted - len(hours)
+
+    def _log(self, message: str) -> None:
+        """Log a progress message if callback is provided"""
+        if self.progress_callback:
+            self.progress_callback(message)
@@ -0,0 +1,121 @@
+from datetime import datetime
+from typing import Optional, Callable
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from knox.models import AuthToken
+
+from smart_meter.models import SmartMeter
+from smart_meter.services.archive import MeasurementArchiver
+from smart_meter.services.group_series import GroupSeriesAggregator
+from smart_meter.services.packing import PACKED_MODELS
+from smart_meter.services.partitions import MEASUREMENT_MODELS
+from smart_meter.sharding import measurement_database
+from users.models import User
+
+
+class MeterDeleter:
+    """
+    Service to delete meters and users with a large measurement history. Deleting only marks the meter (or user and
+    its meters) as deleted, which hides it right away. purge() deletes the measurements of the marked meters in
+    chunks, each chunk a plain DELETE in its own transaction, so no measurement is loaded in python and the locks
+    are short-lived. Once the measurements are gone, the meter and the user are deleted with the normal cascade.
+    """
+
+    def __init__(self, chunk_size: Optional[int] = None, progress_callback: Optional[Callable[[str], None]] = None):
+        """
+        Initialize the deleter
+
+        :param chunk_size: maximum amount of rows per delete, defaults to MEASUREMENT_DELETE_CHUNK_SIZE
+        :param progress_callback: Optional callback function to report progress messages
+        """
+        self.chunk_size = chunk_size or settings.MEASUREMENT_DELETE_CHUNK_SIZE
+        self.progress_callback = progress_callback
+
+    @transaction.atomic
+    def mark_meter(self, meter: SmartMeter, now: Optional[datetime] = None) -> None:
+        """
+        Mark a meter as deleted. Its group participations and the default meter reference of the user are removed
+        right away, these are small. The usage of the meter is subtracted from the series of the groups
+        """
+        meter.deleted_on = now or timezone.now()
+        meter.save(update_fields=['deleted_on'])
+        participations = list(meter.group_participations.values_list('group_id', 'joined_on', 'left_on'))
+        meter.group_participations.all().delete()
+        for group_id, joined_on, left_on in participations:
+            GroupSeriesAggregator().remove_participation(group_id, meter.pk, joined_on, left_on)
+        User.objects.filter(default_meter=meter).update(default_meter=None)
+
+    @transaction.atomic
+    def mark_user(self, user: User) -> None:
+        """Mark a user and all its meters as deleted, the user is deactivated and logged out"""
+        now = timezone.now()
+        for meter in SmartMeter.objects.user_meters(user.pk):
+            self.mark_meter(meter, now)
+        user.is_active = False
+        user.deleted_on = now
+        user.save(update_fields=['is_active', 'deleted_on'])
+        AuthToken.objects.filter(user=user).delete()
+
+    def purge(self) -> int:
+        """
+        Delete all meters marked as deleted, and the marked users once their meters are deleted
+
+        :return: amount of deleted measurement rows
+        """
+        deleted = 0
+        # Meters that are merged into another meter are deleted by the merge, once their history is moved
+        meter_ids = SmartMeter.objects.filter(deleted_on__isnull=False, merged_into__isnull=True).order_by(
+            'deleted_on', 'pk'
+        )
+        for meter_id in list(meter_ids.values_list('pk', flat=True)):
+            deleted += self.purge_meter(meter_id)
+
+        users = User.objects.filter(deleted_on__isnull=False, meters__isnull=True).order_by('pk')
+        for user in users:
+            user.delete()
+            self._log(f"User {user.username} deleted")
+        return deleted
+
+    def purge_meter(self, meter_id: int) -> int:
+        """
+        Delete the measurements (including packed and archived) of a meter in chunks, then the meter itself
+
+        :return: amount of deleted measurement rows
+        """
+        deleted = 0
+        for model in MEASUREMENT_MODELS:
+            deleted += self._delete_chunks(model, meter_id, 'timestamp')
+            deleted += self._delete_chunks(PACKED_MODELS[model], meter_id, 'date')
+            MeasurementArchiver(model).delete(meter_id)
+        SmartMeter.objects.filter(pk=meter_id).delete()
+        self._log(f"Meter {meter_id} deleted ({deleted:,} measurement rows)")
+        return deleted
+
+    def _delete_chunks(self, model, meter_id: int, key: str) -> int:
+        """
+        Delete the rows of a meter from a measurement table, in chunks ordered by key (unique per meter)
+
+        :return: amount of deleted rows
+        """
+        database = measurement_database(meter_id)
+        quote = connections[database].ops.quote_name
+        table, key = quote(model._meta.db_table), quote(key)
+        sql = f'DELETE FROM {table} WHERE meter_id = %s AND {key} IN ' \
+              f'(SELECT {key} FROM {table} WHERE meter_id = %s ORDER BY {key} LIMIT %s)'
+        total = model.objects.filter(meter_id=meter_id).count()
+        deleted = 0
+        while True:
+            with transaction.atomic(using=database), connections[database].cursor() as cursor:
+                cursor.execute(sql, [meter_id, meter_id, self.chunk_size])
+                if not cursor.rowcount:
+                    break
+                deleted += cursor.rowcount
+            self._log(f"{model.__name__}: meter {meter_id}, {deleted:,} of {total:,} rows deleted")
+        return deleted
+
+    def _log(self, message: str) -> None:
+        """Log a progress message if callback is provided"""
+        if self.progress_callback:
+            self.progress_callback(message)
@@ -0,0 +1,101 @@
+from datetime import datetime
+from typing import Optional, Callable
+
+from django.db import connections, transaction
+
+from smart_meter.models import SmartMeter
+from smart_meter.services.partitions import month_start, add_months
+from smart_meter.sharding import measurement_database
+
+
+class MeasurementDeltaCalculator:
+    """
+    Service to (re)calculate the delta fields of stored measurements from the totals, the same way as at ingest (see
+    Measurement.set_deltas): the increase since the previous measurement of the meter, 0 when the counter went down.
+    Used to fill the deltas of measurements stored before there were delta fields, and of measurements moved back
+    from the packed days or the archive.
+
+    Deltas are updated per meter and per month, each in its own transaction. Rows that already have the right deltas
+    are not written, so running it again is cheap.
+    """
+
+    def __init__(self, model, progress_callback: Optional[Callable[[str], None]] = None):
+        """
+        Initialize the calculator for a measurement model
+
+        :param model: PowerMeasurement, GasMeasurement or SolarMeasurement
+        :param progress_callback: Optional callback function to report progress messages
+        """
+        self.model = model
+        self.progress_callback = progress_callback
+        self.deltas = model.delta_fields()
+
+    def backfill(self, meter_id: Optional[int] = None) -> int:
+        """
+        Recalculate the deltas of all measurements
+
+        :param meter_id: only recalculate the measurements of this meter
+        :return: amount of updated measurements
+        """
+        updated = 0
+        meter_ids = SmartMeter.objects.order_by('pk').values_list('pk', flat=True)
+        if meter_id is not None:
+            meter_ids = meter_ids.filter(pk=meter_id)
+        for meter_id in meter_ids.iterator():
+            timestamps = self.model.objects.filter(meter_id=meter_id).order_by('timestamp').values_list(
+                'timestamp', flat=True
+            )
+            first, last = timestamps.first(), timestamps.last()
+            if not first:
+                continue
+
+            meter_updated = 0
+            month = month_start(first)
+            while month <= last:
+                meter_updated += self.update_range(meter_id, month, add_months(month, 1))
+                month = add_months(month, 1)
+            if meter_updated:
+                self._log(f"{self.model.__name__}: meter {meter_id}, {meter_updated:,} deltas updated")
+            updated += meter_updated
+        return updated
+
+    def update_range(self, meter_id: int, after: datetime, before: datetime) -> int:
+        """
+        Recalculate the deltas of the measurements of a meter in given time range, the first measurement is compared
+        with the last measurement before the range
+
+        :param meter_id: id of the meter
+        :param after: start of the range (inclusive)
+        :param before: end of the range (exclusive)
+        :return: amount of updated measurements
+        """
+        database = measurement_database(meter_id)
+        quote = connections[database].ops.quote_name
+        table = quote(self.model._meta.db_table)
+        calculations = ', '.join(
+            'GREATEST(COALESCE(%(total)s - LAG(%(total)s) OVER w, 0), 0) AS %(delta)s'
+            % {'total': quote(total), 'delta': quote(delta)} for total, delta in self.deltas.items()
+        )
+        assignments = ', '.join('%(delta)s = c.%(delta)s' % {'delta': quote(delta)} for delta in self.deltas.values())
+        changed = ' OR '.join('m.%(delta)s <> c.%(delta)s' % {'delta': quote(delta)} for delta in self.deltas.values())
+        sql = f'''
+            UPDATE {table} AS m SET {assignments}
+            FROM (
+                SELECT id, "timestamp", {calculations}
+                FROM {table}
+                WHERE meter_id = %s AND "timestamp" < %s AND "timestamp" >= COALESCE(
+                    (SELECT MAX("timestamp") FROM {table} WHERE meter_id = %s AND "timestamp" < %s), %s
+                )
+                WINDOW w AS (ORDER BY "timestamp")
+            ) AS c
+            WHERE m.id = c.id AND m."timestamp" = c."timestamp" AND m.meter_id = %s
+                AND m."timestamp" >= %s AND m."timestamp" < %s AND ({changed})
+        '''
+        with transaction.atomic(using=database), connections[database].cursor() as cursor:
+            cursor.execute(sql, [meter_id, before, meter_id, after, after, meter_id, after, before])
+            return cursor.rowcount
+
+    def _log(self, message: str) -> None:
+        """Log a progress message if callback is provided"""
+        if self.progress_callback:
+            self.progress_callback(message)
@@ -8,6 +8,7 @@ from typing import Optional, Callable
 from django.conf import settings
 
 from smart_meter.models import SmartMeter, PowerMeasurement, GasMeasurement, SolarMeasurement
+from smart_meter.services.archive import MeasurementArchiver, merge_rows
 
 BATCH_SIZE = 1000
 
@@ -35,7 +36,7 @@ class MeterDataExporter:
         filename = f"export_{timestamp}.zip"
 
         # Construct full file path in media directory
-        file_path = os.path.join(settings.MEDIA_ROOT, 'export', self.meter.pk, filename)
+        file_path = os.path.join(settings.MEDIA_ROOT, 'export', str(self.meter.pk), filename)
         file_dir = os.path.dirname(file_path)
 
         # Ensure directory exists
@@ -78,7 +79,7 @@ class MeterDataExporter:
         qs = (
             PowerMeasurement.objects
             .filter(meter=self.meter)
-            .order_by("id")
+            .order_by("timestamp")
         )
 
         self._write_queryset(
@@ -99,7 +100,7 @@ class MeterDataExporter:
         qs = (
             GasMeasurement.objects
             .filter(meter=self.meter)
-            .order_by("id")
+            .order_by("timestamp")
         )
 
         self._write_queryset(
@@ -120,7 +121,7 @@ class MeterDataExporter:
         qs = (
             SolarMeasurement.objects
             .filter(meter=self.meter)
-            .order_by("id")
+            .order_by("timestamp")
         )
 
         self._write_queryset(
@@ -131,8 +132,14 @@ class MeterDataExporter:
         )
 
     def _write_queryset(self, file_path: str, queryset, fields, title):
-        """Write queryset data to CSV file in batches"""
+        """Write queryset data, merged with the packed and archived measurements of the meter, to CSV file"""
         self._log(f"{title}: starting export")
+        archiver = MeasurementArchiver(queryset.model)
+        rows = merge_rows([
+            self._iterate_queryset(queryset, fields),
+            archiver.packer.read(self.meter.pk, fields=fields[1:]),
+            archiver.read(self.meter.pk, fields=fields[1:]),
+        ])
 
         with open(file_path, 'w', newline='', encoding='utf-8') as csvfile:
             writer = csv.writer(csvfile)
@@ -141,34 +148,38 @@ class MeterDataExporter:
             writer.writerow(fields)
 
             processed = 0
-            last_pk = 0
+            for row in rows:
+                values = list(row)
 
-            while True:
-                batch = list(
-                    queryset
-                    .filter(pk__gt=last_pk)
-                    .values_list(*fields, "pk")[:BATCH_SIZE]
-                )
+                # Convert timezone-aware datetime to naive UTC for the first field (timestamp)
+                if values and isinstance(values[0], datetime):
+                    if values[0].tzinfo is not None:
+                        values[0] = values[0].astimezone(dt_timezone.utc).replace(tzinfo=None)
 
-                if not batch:
-                    break
+                writer.writerow(values)
 
-                for row in batch:
-                    *values, pk = row
-
-                    # Convert timezone-aware datetime to naive UTC for the first field (timestamp)
-                    if values and isinstance(values[0], datetime):
-                        if values[0].tzinfo is not None:
-                            values[0] = values[0].astimezone(dt_timezone.utc).replace(tzinfo=None)
-
-                    writer.writerow(values)
-                    last_pk = pk
-
-                processed += len(batch)
-                self._log(f"{title}: {processed:,} records exported")
+                processed += 1
+                if processed % BATCH_SIZE == 0:
+                    self._log(f"{title}: {processed:,} records exported")
 
         self._log(f"{title}: export complete ({processed:,} total records)")
 
+    @staticmethod
+    def _iterate_queryset(queryset, fields):
+        """Iterate the queryset values in batches, sorted by timestamp (the first field)"""
+        last_timestamp = None
+        while True:
+            # Keyset pagination on the timestamp (unique per meter), served by the (meter, timestamp) index
+            batch_queryset = queryset
+            if last_timestamp is not None:
+                batch_queryset = batch_queryset.filter(timestamp__gt=last_timestamp)
+            batch = list(batch_queryset.values_list(*fields)[:BATCH_SIZE])
+
+            if not batch:
+                break
+            yield from batch
+            last_timestamp = batch[-1][0]
+
     def _log(self, message: str) -> None:
         """Log a progress message if callback is provided"""
         if self.progress_callback:
@@ -0,0 +1,239 @@
+from datetime import datetime, timezone as dt_timezone
+from typing import Optional, Callable, Iterable, List
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+
+from smart_meter.models import GroupEnergyInterval, GroupMeter, GroupParticipant, PowerMeasurement, GasMeasurement, \
+    SolarMeasurement, Measurement
+from smart_meter.services.packing import packed_before
+from smart_meter.sharding import measurement_database
+
+# Series fields of the group intervals, with the delta fields of the measurement models they are the sum of
+SERIES_SOURCES = {
+    PowerMeasurement: {
+        'power_import': ['delta_import_1', 'delta_import_2'],
+        'power_export': ['delta_export_1', 'delta_export_2'],
+    },
+    GasMeasurement: {'gas': ['delta_gas']},
+    SolarMeasurement: {'solar': ['delta_solar']},
+}
+SERIES_FIELDS = [field for sources in SERIES_SOURCES.values() for field in sources]
+
+
+def interval_start(timestamp: datetime) -> datetime:
+    """Start of the interval (hour, UTC) of a timestamp, the same as date_trunc('hour', timestamp, 'UTC')"""
+    return timestamp.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+class GroupSeriesAggregator:
+    """
+    Service to maintain the combined usage of the groups per hour (GroupEnergyInterval). A measurement counts for a
+    group when it is within the window of a participation of its meter: joined_on <= timestamp < left_on (or no
+    left_on). The usage is the sum of the deltas of the measurements, like the usage in the measurement buckets.
+
+    New measurements are added incrementally by add_measurements (one short upsert for all groups of the meter, after
+    the ingest is committed). Joining and leaving a group only change the window from now on, which the incremental
+    updates already follow. A deleted participation is subtracted from the intervals (remove_participation). When the
+    history of a group changes otherwise (a meter is merged), the group is rebuilt from the measurement tables.
+    """
+
+    def __init__(self, progress_callback: Optional[Callable[[str], None]] = None):
+        """
+        Initialize the aggregator
+
+        :param progress_callback: Optional callback function to report progress messages
+        """
+        self.progress_callback = progress_callback
+
+    def add_measurements(self, meter_id: int, measurements: Iterable[Measurement]) -> int:
+        """
+        Add the usage of new measurements of a meter to the intervals of the groups the meter participated in at the
+        time of each measurement. Called once the ingest is committed (see SmartMeterManager.new_measurement)
+
+        :param meter_id: id of the meter
+        :param measurements: new (saved) measurements of the meter, with their deltas
+        :return: amount of updated intervals
+        """
+        rows = []
+        for measurement in measurements:
+            row = [measurement.timestamp, interval_start(measurement.timestamp)] + [0] * len(SERIES_FIELDS)
+            for field, deltas in SERIES_SOURCES[measurement.__class__].items():
+                row[2 + SERIES_FIELDS.index(field)] = sum(
+                    measurement._meta.get_field(delta).to_scaled_integer(getattr(measurement, delta))
+                    for delta in deltas
+                )
+            rows.append(row)
+        if not rows:
+            return 0
+
+        quote = connection.ops.quote_name
+        fields = ', '.join(quote(field) for field in SERIES_FIELDS)
+        sums = ', '.join('SUM(v.%s)' % quote(field) for field in SERIES_FIELDS)
+        values = ', '.join('(%s::timestamptz, %s::timestamptz, {})'.format(
+            ', '.join(['%s::bigint'] * len(SERIES_FIELDS))
+        ) for _ in rows)
+        sql = f'''
+            INSERT INTO {quote(GroupEnergyInterval._meta.db_table)} AS i (group_id, "timestamp", {fields})
+            SELECT p.group_id, v.bucket, {sums}
+            FROM (VALUES {values}) AS v ("timestamp", bucket, {fields})
+            JOIN {quote(GroupParticipant._meta.db_table)} AS p ON p.meter_id = %s
+                AND p.joined_on <= v."timestamp" AND (p.left_on IS NULL OR v."timestamp" < p.left_on)
+            GROUP BY p.group_id, v.bucket
+            ON CONFLICT (group_id, "timestamp") DO UPDATE SET {self._additions()}
+        '''
+        # The intervals and participations are on the default database, in a transaction of their own so the lock on
+        # the interval rows of the hour is held only for this upsert
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, [value for row in rows for value in row] + [meter_id])
+            return cursor.rowcount
+
+    @transaction.atomic
+    def rebuild(self, group_id: int, after: Optional[datetime] = None) -> int:
+        """
+        Rebuild the intervals of a group from the measurement tables. Measurements that are packed or archived are no
+        longer in these tables, the intervals from before the first day that can be rebuilt are kept as they are
+
+        :param group_id: id of the group
+        :param after: only rebuild the intervals from this moment
+        :return: amount of intervals of the group from the rebuilt moment
+        """
+        start = self.rebuild_start()
+        if after is not None:
+            start = max(start, interval_start(after))
+        GroupEnergyInterval.objects.filter(group_id=group_id, timestamp__gte=start).delete()
+
+        # The measurements of the meters can be on different databases, each database sums the usage per hour of
+        # its meters, the sums are combined here
+        windows = {}
+        participants = GroupParticipant.objects.filter(group_id=group_id).values_list(
+            'meter__measurement_database', 'meter_id', 'joined_on', 'left_on'
+        )
+        for database, *window in participants:
+            windows.setdefault(database, []).append(window)
+        intervals = {}
+        for database, meter_windows in windows.items():
+            for timestamp, *sums in self._interval_sums(database, meter_windows, start):
+                interval = intervals.setdefault(timestamp, [0] * len(SERIES_FIELDS))
+                for i, value in enumerate(sums):
+                    interval[i] += value
+
+        fields = [GroupEnergyInterval._meta.get_field(field) for field in SERIES_FIELDS]
+        GroupEnergyInterval.objects.bulk_create([
+            GroupEnergyInterval(group_id=group_id, timestamp=timestamp, **{
+                field.name: field.from_db_value(value, None, connection) for field, value in zip(fields, sums)
+            }) for timestamp, sums in sorted(intervals.items())
+        ], batch_size=1000)
+        return len(intervals)
+
+    @transaction.atomic
+    def remove_participation(self, group_id: int, meter_id: int, joined_on: datetime,
+                             left_on: Optional[datetime] = None) -> int:
+        """
+        Subtract the usage of a deleted participation from the intervals of its group, the sums per hour of the
+        measurements of the meter within the participation window (one query on the measurements of the meter,
+        instead of rebuilding the group). Like rebuild, the intervals before the rebuildable range are kept
+
+        :param group_id: id of the group
+        :param meter_id: id of the meter of the participation
+        :param joined_on: start of the participation window
+        :param left_on: end of the participation window, None if the meter did not leave
+        :return: amount of updated intervals
+        """
+        start = max(self.rebuild_start(), interval_start(joined_on))
+        sums = self._interval_sums(measurement_database(meter_id), [(meter_id, joined_on, left_on)], start)
+        if not sums:
+            return 0
+
+        quote = connection.ops.quote_name
+        fields = ', '.join(quote(field) for field in SERIES_FIELDS)
+        subtractions = ', '.join('%(field)s = i.%(field)s - v.%(field)s' % {'field': quote(field)}
+                                 for field in SERIES_FIELDS)
+        values = ', '.join('(%s::timestamptz, {})'.format(', '.join(['%s::bigint'] * len(SERIES_FIELDS))) for _ in sums)
+        sql = f'''
+            UPDATE {quote(GroupEnergyInterval._meta.db_table)} AS i SET {subtractions}
+            FROM (VALUES {values}) AS v ("timestamp", {fields})
+            WHERE i.group_id = %s AND i."timestamp" = v."timestamp"
+        '''
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [value for row in sums for value in row] + [group_id])
+            return cursor.rowcount
+
+    @staticmethod
+    def _interval_sums(database: str, windows: List[tuple], start: datetime) -> List[tuple]:
+        """
+        Sum the usage per hour of the measurements within the participation windows, on one measurement database
+
+        :param database: alias of the measurement database
+        :param windows: list of (meter id, joined_on, left_on) of the meters on the database
+        :param start: first moment to sum
+        :return: list of (interval start, series values (scaled integers))
+        """
+        quote = connections[database].ops.quote_name
+        fields = ', '.join(quote(field) for field in SERIES_FIELDS)
+        meter_ids = list({window[0] for window in windows})
+        selects, params = [], []
+        for model, sources in SERIES_SOURCES.items():
+            columns = ', '.join(
+                ' + '.join(quote(delta) for delta in sources[field]) if field in sources else '0'
+                for field in SERIES_FIELDS
+            )
+            selects.append(f'''
+                SELECT meter_id, "timestamp", {columns} FROM {quote(model._meta.db_table)}
+                WHERE meter_id = ANY(%s) AND "timestamp" >= %s
+            ''')
+            params += [meter_ids, start]
+        values = ', '.join(['(%s::integer, %s::timestamptz, %s::timestamptz)'] * len(windows))
+        sums = ', '.join('SUM(m.%s)' % quote(field) for field in SERIES_FIELDS)
+        sql = f'''
+            SELECT date_trunc('hour', m."timestamp", 'UTC'), {sums}
+            FROM ({' UNION ALL '.join(selects)}) AS m (meter_id, "timestamp", {fields})
+            JOIN (VALUES {values}) AS p (meter_id, joined_on, left_on) ON p.meter_id = m.meter_id
+                AND p.joined_on <= m."timestamp" AND (p.left_on IS NULL OR m."timestamp" < p.left_on)
+            GROUP BY 1
+        '''
+        with connections[database].cursor() as cursor:
+            cursor.execute(sql, params + [value for window in windows for value in window])
+            return cursor.fetchall()
+
+    def rebuild_groups(self, group_ids: Optional[List[int]] = None, after: Optional[datetime] = None) -> int:
+        """
+        Rebuild the intervals of groups, each group in its own transaction
+
+        :param group_ids: ids of the groups, defaults to all groups
+        :param after: only rebuild the intervals from this moment
+        :return: amount of rebuilt intervals
+        """
+        if group_ids is None:
+            group_ids = list(GroupMeter.objects.order_by('pk').values_list('pk', flat=True))
+        rebuilt = 0
+        for group_id in group_ids:
+            intervals = self.rebuild(group_id, after)
+            self._log(f"Group {group_id}: {intervals:,} intervals rebuilt")
+            rebuilt += intervals
+        return rebuilt
+
+    @staticmethod
+    def rebuild_start(now: Optional[datetime] = None) -> datetime:
+        """
+        First moment of which the measurements are still in the measurement tables: the first day that is not packed,
+        or the first year that is not archived
+
+        :param now: moment to count from, defaults to the current time
+        :return: start of the rebuildable range
+        """
+        now = now or datetime.now(dt_timezone.utc)
+        start = datetime(now.year - settings.MEASUREMENT_ARCHIVE_YEARS, 1, 1, tzinfo=dt_timezone.utc)
+        packing = packed_before(now)
+        return max(start, packing) if packing else start
+
+    @staticmethod
+    def _additions() -> str:
+        quote = connection.ops.quote_name
+        return ', '.join('%(field)s = i.%(field)s + EXCLUDED.%(field)s' % {'field': quote(field)}
+                         for field in SERIES_FIELDS)
+
+    def _log(self, message: str) -> None:
+        """Log a progress message if callback is provided"""
+        if self.progress_callback:
+            self.progress_callback(message)
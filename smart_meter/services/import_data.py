@@ -0,0 +1,432 @@
+import csv
+import io
+import json
+import os
+import re
+import uuid
+import zipfile
+from datetime import datetime, timedelta
+from typing import Optional, Callable, BinaryIO, Dict, List, Tuple
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from smart_meter.models import SmartMeter, GroupParticipant
+from smart_meter.services.archive import MeasurementArchiver
+from smart_meter.services.deltas import MeasurementDeltaCalculator
+from smart_meter.services.group_series import GroupSeriesAggregator
+from smart_meter.services.packing import MeasurementPacker
+from smart_meter.services.partitions import MEASUREMENT_TYPES, MeasurementPartitioner
+from smart_meter.sharding import measurement_database
+
+# Rows per write to the COPY stream
+BATCH_SIZE = 10000
+# Invalid rows that are reported in the error
+MAX_ERRORS = 10
+# Decimal value of a measurement field (max_digits 9, decimal_places 3), as written by the MeterDataExporter
+NUMBER = r'-?\d{1,6}(?:\.\d{1,3})?'
+
+
+def staging_table(measurement_type: str) -> str:
+    """Temporary table of the staged rows of a measurement type"""
+    return f'import_{measurement_type}'
+
+
+def csv_fields(measurement_type: str) -> List[str]:
+    """Columns of the CSV file of a measurement type, the layout of the MeterDataExporter"""
+    return ['timestamp'] + MEASUREMENT_TYPES[measurement_type].reading_fields()
+
+
+def check_layout(file: BinaryIO) -> None:
+    """
+    Check that a file is in the export layout without reading its rows: a ZIP archive with CSV files, or a CSV file,
+    with the header of a measurement type. The rows are validated when the file is imported
+
+    :param file: binary file object, seekable
+    :raises ValueError: the file is not in the export layout
+    """
+    if zipfile.is_zipfile(file):
+        file.seek(0)
+        with zipfile.ZipFile(file) as archive:
+            names = [name for name in archive.namelist() if name.lower().endswith('.csv')]
+            if not names:
+                raise ValueError('The ZIP archive contains no CSV files')
+            for name in names:
+                with archive.open(name) as member:
+                    _check_header(member, name)
+    else:
+        file.seek(0)
+        _check_header(file, getattr(file, 'name', None) or 'CSV')
+    file.seek(0)
+
+
+def read_header(reader, name: str) -> Tuple[List[str], str]:
+    """
+    Read the header of a CSV file
+
+    :return: the columns and the measurement type they are the layout of
+    :raises ValueError: not a UTF-8 file, or not the columns of a measurement type
+    """
+    try:
+        header = [column.strip() for column in next(reader, [])]
+    except UnicodeDecodeError:
+        raise ValueError(f'{name}: not a UTF-8 text file')
+    measurement_type = next((key for key in MEASUREMENT_TYPES if sorted(csv_fields(key)) == sorted(header)), None)
+    if measurement_type is None:
+        raise ValueError(f'{name}: unknown columns {", ".join(header) or "(empty)"}')
+    return header, measurement_type
+
+
+def _check_header(file: BinaryIO, name: str) -> None:
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        read_header(csv.reader(text), name)
+    finally:
+        # Keep the file open for the import
+        text.detach()
+
+
+class ImportQueue:
+    """
+    Uploaded files waiting to be imported by the import_meter_data command, so the API does not import them during
+    the request. Each upload is a file with its options next to it, the options are written last so a listed upload
+    is complete. An upload is claimed before it is imported, by renaming its options to `.processing`, so two
+    commands never import the same upload
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        """
+        :param root: directory of the queue, default MEASUREMENT_IMPORT_ROOT
+        """
+        self.root = root or settings.MEASUREMENT_IMPORT_ROOT
+
+    def add(self, meter: SmartMeter, file, update: bool = False, skip_invalid: bool = False) -> str:
+        """
+        Queue an uploaded file for a meter
+
+        :param file: uploaded file (django.core.files.File)
+        :return: id of the queued upload
+        """
+        os.makedirs(self.root, exist_ok=True)
+        upload_id = f'{datetime.now():%Y%m%d%H%M%S%f}-{uuid.uuid4().hex[:8]}'
+        with open(os.path.join(self.root, f'{upload_id}.upload'), 'wb') as destination:
+            for chunk in file.chunks():
+                destination.write(chunk)
+        options = {'meter_id': meter.pk, 'name': file.name, 'update': update, 'skip_invalid': skip_invalid}
+        partial = os.path.join(self.root, f'{upload_id}.json.partial')
+        with open(partial, 'w') as destination:
+            json.dump(options, destination)
+        os.replace(partial, os.path.join(self.root, f'{upload_id}.json'))
+        return upload_id
+
+    def pending(self) -> List[dict]:
+        """
+        The queued uploads, oldest first
+
+        :return: per upload its id, path, meter_id, name, update and skip_invalid
+        """
+        if not os.path.isdir(self.root):
+            return []
+        uploads = []
+        for filename in sorted(os.listdir(self.root)):
+            if filename.endswith('.json'):
+                upload_id = filename[:-len('.json')]
+                try:
+                    with open(os.path.join(self.root, filename)) as file:
+                        options = json.load(file)
+                except FileNotFoundError:
+                    # Claimed by another command since it was listed
+                    continue
+                uploads.append({'id': upload_id, 'path': os.path.join(self.root, f'{upload_id}.upload'), **options})
+        return uploads
+
+    def claim(self, upload_id: str) -> bool:
+        """
+        Claim a pending upload for importing, the rename is atomic so only one command gets it. A claimed upload is
+        no longer pending, until it is released
+
+        :return: False if the upload was already claimed or removed
+        """
+        try:
+            os.rename(os.path.join(self.root, f'{upload_id}.json'), os.path.join(self.root, f'{upload_id}.processing'))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def release(self, upload_id: str) -> None:
+        """Put a claimed upload back in the queue, when its import failed before it could be done"""
+        os.rename(os.path.join(self.root, f'{upload_id}.processing'), os.path.join(self.root, f'{upload_id}.json'))
+
+    def remove(self, upload_id: str) -> None:
+        """Remove a queued upload, after it is imported (or failed)"""
+        for extension in ('.json', '.processing', '.upload'):
+            try:
+                os.remove(os.path.join(self.root, upload_id + extension))
+            except FileNotFoundError:
+                pass
+
+
+class MeterDataImporter:
+    """
+    Service to import the measurement history of a meter from CSV files in the layout of the MeterDataExporter
+    (power.csv, gas.csv and solar.csv), a ZIP archive of them or a single CSV file. The type of a file is taken from
+    its header. Timestamps without timezone are UTC.
+
+    The rows are validated while the file is read, and streamed with COPY into a temporary staging table of the
+    session. Once every file is staged, the partitions of the staged months are created and the packed days and
+    archived years in the staged range are moved back into the measurement table, each in its own short transaction.
+    The staged rows are then merged into the measurement tables in one transaction on the measurement database of the
+    meter, with their deltas; a measurement at a timestamp the meter already has is skipped or updated. An invalid
+    file imports nothing. Afterwards the series of the groups of the meter are rebuilt.
+    """
+
+    def __init__(self, meter: SmartMeter, update: bool = False, skip_invalid: bool = False,
+                 progress_callback: Optional[Callable[[str], None]] = None):
+        """
+        Initialize the importer for a meter
+
+        :param meter: The SmartMeter instance to import data for
+        :param update: update the measurements the meter already has at an imported timestamp, instead of skipping
+        :param skip_invalid: skip invalid rows, instead of failing the import
+        :param progress_callback: Optional callback function to report progress messages
+        """
+        self.meter = meter
+        self.update = update
+        self.skip_invalid = skip_invalid
+        self.progress_callback = progress_callback
+        self.database = measurement_database(meter)
+
+    @property
+    def connection(self):
+        return connections[self.database]
+
+    def import_file(self, file: BinaryIO, name: Optional[str] = None) -> Dict[str, dict]:
+        """
+        Import a ZIP archive or a CSV file
+
+        :param file: binary file object, seekable
+        :param name: name of a CSV file in the errors, default the name of the file object
+        :return: per measurement type: rows (valid rows read), invalid, imported, updated and skipped rows
+        :raises ValueError: the file is not in the export layout, or has invalid rows (unless skip_invalid)
+        """
+        results = {}
+        try:
+            if zipfile.is_zipfile(file):
+                file.seek(0)
+                with zipfile.ZipFile(file) as archive:
+                    names = [name for name in archive.namelist() if name.lower().endswith('.csv')]
+                    if not names:
+                        raise ValueError('The ZIP archive contains no CSV files')
+                    for name in names:
+                        with archive.open(name) as member:
+                            self._stage_csv(member, name, results)
+            else:
+                file.seek(0)
+                self._stage_csv(file, name or getattr(file, 'name', None) or 'CSV', results)
+
+            # The partitions, packed days and archived years are prepared before the merge, so the merge
+            # transaction holds no lock on the parent tables
+            staged = {
+                measurement_type: self._prepare(MEASUREMENT_TYPES[measurement_type], staging_table(measurement_type))
+                for measurement_type, result in results.items() if result['rows']
+            }
+            with transaction.atomic(using=self.database):
+                for measurement_type, (first, last) in staged.items():
+                    result = results[measurement_type]
+                    result.update(self._merge(MEASUREMENT_TYPES[measurement_type], staging_table(measurement_type),
+                                              first, last))
+                    result['skipped'] = result['rows'] - result['imported'] - result['updated']
+        finally:
+            self._drop_staging([staging_table(measurement_type) for measurement_type in results])
+        for measurement_type, result in results.items():
+            self._log(f"{measurement_type}: {result['rows']:,} rows, {result['imported']:,} imported, "
+                      f"{result['updated']:,} updated, {result['skipped']:,} skipped, {result['invalid']:,} invalid")
+
+        ranges = [imported for imported in (result.pop('range', None) for result in results.values()) if imported]
+        if ranges:
+            # The imported measurements now count in the series of the groups of the meter
+            group_ids = GroupParticipant.objects.filter(meter=self.meter).values_list('group_id', flat=True).distinct()
+            GroupSeriesAggregator(self.progress_callback).rebuild_groups(
+                list(group_ids), after=min(first for first, last in ranges)
+            )
+        return results
+
+    def _stage_csv(self, file: BinaryIO, name: str, results: Dict[str, dict]) -> None:
+        """Validate and stage one CSV file, the staging table is in the results once it can exist"""
+        reader = csv.reader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+        header, measurement_type = read_header(reader, name)
+        if measurement_type in results:
+            raise ValueError(f'{name}: more than one file with {measurement_type} measurements')
+
+        staging = staging_table(measurement_type)
+        results[measurement_type] = {'rows': 0, 'invalid': 0, 'imported': 0, 'updated': 0, 'skipped': 0}
+        try:
+            with transaction.atomic(using=self.database):
+                self._create_staging(MEASUREMENT_TYPES[measurement_type], staging)
+                rows, invalid = self._copy(reader, staging, header, name)
+        except UnicodeDecodeError:
+            raise ValueError(f'{name}: not a UTF-8 text file')
+        results[measurement_type].update(rows=rows, invalid=invalid)
+
+    def _create_staging(self, model, staging: str) -> None:
+        """
+        Temporary table with the CSV columns and the line of each row. It belongs to the session, not to a
+        transaction, so it is dropped at the end of the import (see _drop_staging)
+        """
+        quote = self.connection.ops.quote_name
+        columns = ', '.join('%s numeric' % quote(field) for field in model.reading_fields())
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'CREATE TEMPORARY TABLE {quote(staging)} (line bigint, "timestamp" timestamptz, {columns})')
+
+    def _drop_staging(self, stagings: List[str]) -> None:
+        quote = self.connection.ops.quote_name
+        with self.connection.cursor() as cursor:
+            for staging in stagings:
+                cursor.execute(f'DROP TABLE IF EXISTS {quote(staging)}')
+
+    def _copy(self, reader, staging: str, header: List[str], name: str) -> Tuple[int, int]:
+        """
+        Validate the rows and stream them into the staging table, in the text format of COPY. A timestamp without
+        timezone is read in the timezone of the connection, which is UTC (USE_TZ)
+
+        :return: amount of valid and invalid rows
+        :raises ValueError: invalid rows, unless skip_invalid
+        """
+        quote = self.connection.ops.quote_name
+        timestamp_index = header.index('timestamp')
+        # One match per row for the amount of columns and the values, the timestamps are parsed separately
+        pattern = re.compile('\t'.join(r'[^\t]+' if column == 'timestamp' else NUMBER for column in header))
+        columns = ', '.join(['line'] + [quote(column) for column in header])
+        rows, errors, lines = 0, [], []
+        with self.connection.cursor() as cursor, \
+                cursor.cursor.copy(f'COPY {quote(staging)} ({columns}) FROM STDIN') as copy:
+            for line, row in enumerate(reader, start=2):
+                if not row:
+                    continue
+                values = '\t'.join(row)
+                try:
+                    if not pattern.fullmatch(values):
+                        raise ValueError
+                    datetime.fromisoformat(row[timestamp_index])
+                except ValueError:
+                    errors.append(f'{name} line {line}: {self._error(row, header)}')
+                    if not self.skip_invalid and len(errors) >= MAX_ERRORS:
+                        break
+                    continue
+                lines.append(f'{line}\t{values}\n')
+                rows += 1
+                if len(lines) >= BATCH_SIZE:
+                    copy.write(''.join(lines))
+                    lines = []
+                    if rows % (BATCH_SIZE * 10) == 0:
+                        self._log(f"{name}: {rows:,} rows read")
+            if errors and not self.skip_invalid:
+                raise ValueError('\n'.join(errors))
+            copy.write(''.join(lines))
+        for error in errors[:MAX_ERRORS]:
+            self._log(f"Skipped {error}")
+        return rows, len(errors)
+
+    @staticmethod
+    def _error(row: List[str], header: List[str]) -> str:
+        """Reason a row is invalid"""
+        if len(row) != len(header):
+            return f'{len(row)} columns instead of {len(header)}'
+        for column, value in zip(header, row):
+            if column != 'timestamp' and not re.fullmatch(NUMBER, value):
+                return f'invalid value "{value}"'
+        return f'invalid timestamp "{row[header.index("timestamp")]}"'
+
+    def _prepare(self, model, staging: str) -> Tuple[datetime, datetime]:
+        """
+        Prepare the measurement table for the staged rows: create the partitions of the staged months, and move the
+        packed days and archived years in the staged range back into the table, so the imported measurements are
+        merged with them. Each of these is a short transaction of its own, before the merge
+
+        :return: first and last staged timestamp
+        """
+        quote = self.connection.ops.quote_name
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'SELECT MIN("timestamp"), MAX("timestamp") FROM {quote(staging)}')
+            first, last = cursor.fetchone()
+            cursor.execute(f'''SELECT DISTINCT date_trunc('month', "timestamp", 'UTC') FROM {quote(staging)}''')
+            months = [row[0] for row in cursor.fetchall()]
+
+        partitioner = MeasurementPartitioner(model, using=self.database)
+        for month in months:
+            # Measurements of the month in the default partition are moved into the new partition
+            partitioner.create_partition(month)
+        archiver = MeasurementArchiver(model)
+        for year in archiver.archived_years(self.meter.pk):
+            if first.year <= year <= last.year:
+                archiver.restore_year(self.meter.pk, year)
+        packer = MeasurementPacker(model)
+        for day in list(packer.days([self.meter.pk], first, last).values_list('date', flat=True)):
+            packer.unpack_day(self.meter.pk, day)
+        return first, last
+
+    def _merge(self, model, staging: str, first: datetime, last: datetime) -> dict:
+        """
+        Merge the staged rows into the measurement table (prepared by _prepare). The deltas are calculated over the
+        imported rows while inserting, and recalculated afterwards where the imported rows are next to measurements
+        the meter already had
+
+        :return: imported and updated rows
+        """
+        quote = self.connection.ops.quote_name
+        table = quote(model._meta.db_table)
+        fields = model.reading_fields()
+        deltas = model.delta_fields()
+        scaled = ', '.join(
+            'round(%(field)s * %(scale)d)::integer AS %(field)s' % {
+                'field': quote(field), 'scale': 10 ** model._meta.get_field(field).decimal_places,
+            } for field in fields
+        )
+        calculations = ', '.join(
+            'GREATEST(COALESCE(%(total)s - LAG(%(total)s) OVER (ORDER BY "timestamp"), 0), 0)' % {'total': quote(total)}
+            for total in deltas
+        )
+        if self.update:
+            changed = ' OR '.join('m.%(field)s IS DISTINCT FROM EXCLUDED.%(field)s' % {'field': quote(field)}
+                                  for field in fields)
+            conflict = 'DO UPDATE SET %s WHERE %s' % (
+                ', '.join('%(field)s = EXCLUDED.%(field)s' % {'field': quote(field)} for field in fields), changed
+            )
+        else:
+            conflict = 'DO NOTHING'
+        # A timestamp that is in the file more than once is imported from its first line
+        rows = f'SELECT DISTINCT ON ("timestamp") * FROM {quote(staging)} ORDER BY "timestamp", line'
+        columns = ', '.join(quote(field) for field in fields + list(deltas.values()))
+        sql = f'''
+            INSERT INTO {table} AS m (meter_id, "timestamp", {columns})
+            SELECT %s, "timestamp", {', '.join(map(quote, fields))}, {calculations}
+            FROM (SELECT "timestamp", {scaled} FROM ({rows}) AS s) AS s
+            ON CONFLICT (meter_id, "timestamp") {conflict}
+        '''
+        with self.connection.cursor() as cursor:
+            # The timestamps the meter already has (the system columns that tell inserted from updated rows can not
+            # be returned from a partitioned table)
+            cursor.execute(f'''
+                SELECT COUNT(*), COUNT(m.id) FROM ({rows}) AS s
+                LEFT JOIN {table} AS m ON m.meter_id = %s AND m."timestamp" = s."timestamp"
+            ''', [self.meter.pk])
+            distinct, existing = cursor.fetchone()
+            cursor.execute(sql, [self.meter.pk])
+            written = cursor.rowcount
+            imported = distinct - existing
+
+            cursor.execute(f'SELECT MIN("timestamp") FROM {table} WHERE meter_id = %s AND "timestamp" > %s',
+                           [self.meter.pk, last])
+            following = cursor.fetchone()[0]
+        if written:
+            # Only the rows of which the delta changed are written: the first imported row, the rows next to
+            # measurements the meter already had, and the first measurement after the imported range
+            MeasurementDeltaCalculator(model).update_range(
+                self.meter.pk, first, (following or last) + timedelta(microseconds=1)
+            )
+        return {'imported': imported, 'updated': written - imported, 'range': (first, last) if written else None}
+
+    def _log(self, message: str) -> None:
+        """Log a progress message if callback is provided"""
+        if self.progress_callback:
+            self.progress_callback(message)
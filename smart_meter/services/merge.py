@@ -0,0 +1,224 @@
+from datetime import timedelta
+from typing import Optional, Callable
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+
+from smart_meter.models import SmartMeter, GroupParticipant
+from smart_meter.services.archive import MeasurementArchiver
+from smart_meter.services.deltas import MeasurementDeltaCalculator
+from smart_meter.services.group_series import GroupSeriesAggregator
+from smart_meter.services.packing import MeasurementPacker
+from smart_meter.services.partitions import MEASUREMENT_MODELS
+from smart_meter.services.rebalance import MeasurementRebalancer
+from smart_meter.sharding import measurement_database
+from users.models import User
+
+# Latest meter data, taken from the merged meter when it has the most recent measurements
+METER_DATA_FIELDS = [
+    'gpx_version', 'last_update', 'sn_power', 'power_timestamp', 'actual_power_import', 'actual_power_export',
+    'tariff', 'total_power_import_1', 'total_power_import_2', 'total_power_export_1', 'total_power_export_2',
+    'sn_gas', 'gas_timestamp', 'actual_gas', 'total_gas', 'solar_timestamp', 'actual_solar', 'total_solar',
+]
+
+
+class MeterMerger:
+    """
+    Service to merge the history of a meter (source) into another meter of the same user (target), for example when
+    the smart meter was replaced and the new serial number created a new meter.
+
+    start() takes over the source meter in one short transaction: the target gets the latest meter data and the group
+    participations, and the source is hidden and marked as merged. From then on measurements are only added to the
+    target. merge() then moves the measurements in chunks, each in its own transaction, and deletes the source meter
+    when it is empty. A measurement of the source at a timestamp the target already has is dropped. Moving is
+    resumable: moved measurements no longer belong to the source, so running merge() again continues where it stopped.
+    """
+
+    def __init__(self, target: SmartMeter, source: SmartMeter, chunk_size: Optional[int] = None,
+                 progress_callback: Optional[Callable[[str], None]] = None):
+        """
+        Initialize the merger
+
+        :param target: meter that keeps the merged history
+        :param source: meter of which the history is moved, deleted afterwards
+        :param chunk_size: maximum amount of measurements per transaction, defaults to MEASUREMENT_DELETE_CHUNK_SIZE
+        :param progress_callback: Optional callback function to report progress messages
+        """
+        self.target = target
+        self.source = source
+        self.chunk_size = chunk_size or settings.MEASUREMENT_DELETE_CHUNK_SIZE
+        self.progress_callback = progress_callback
+
+    def merge(self) -> int:
+        """
+        Merge the source meter into the target meter, or continue a merge that was started
+
+        :return: amount of processed measurements (moved or dropped as conflict)
+        """
+        self.start()
+        if self.source.measurement_database != self.target.measurement_database:
+            # Measurements are only moved within a database, the source first joins the database of the target
+            MeasurementRebalancer(self.chunk_size, self.progress_callback).move_meter(
+                self.source.pk, self.target.measurement_database
+            )
+        processed = 0
+        for model in MEASUREMENT_MODELS:
+            processed += self.move_history(model)
+        self.finish()
+        return processed
+
+    @transaction.atomic
+    def start(self) -> None:
+        """
+        Take over the source meter, does nothing when the merge was already started. Both meters are locked, new
+        measurements for them wait until this transaction is done
+        """
+        meters = SmartMeter.objects.select_for_update(of=('self',)).filter(
+            pk__in=[self.target.pk, self.source.pk]
+        ).order_by('pk')
+        meters = {meter.pk: meter for meter in meters}
+        self.target, self.source = meters[self.target.pk], meters[self.source.pk]
+        if self.source.merged_into_id == self.target.pk:
+            return
+        if self.source.pk == self.target.pk or self.source.user_id != self.target.user_id:
+            raise ValueError('Only meters of the same user can be merged')
+        if self.source.deleted_on or self.target.deleted_on:
+            raise ValueError('Deleted meters can not be merged')
+
+        if self.source.power_timestamp > self.target.power_timestamp:
+            old, new = self.target, self.source
+        else:
+            old, new = self.source, self.target
+        self._fix_participations(old, new)
+        GroupParticipant.objects.filter(meter=self.source).update(meter=self.target)
+        if new is self.source:
+            for field in METER_DATA_FIELDS:
+                setattr(self.target, field, getattr(self.source, field))
+            self.target.save(update_fields=METER_DATA_FIELDS)
+        User.objects.filter(default_meter=self.source).update(default_meter=self.target)
+
+        self.source.deleted_on = timezone.now()
+        self.source.merged_into = self.target
+        self.source.save(update_fields=['deleted_on', 'merged_into'])
+        self._log(f"Meter {self.source.pk} merged into meter {self.target.pk}, moving measurements")
+
+    def move_history(self, model) -> int:
+        """
+        Move all measurements of the source meter of a measurement model: the packed days, the archived years
+        (restored first) and the measurements in chunks
+
+        :return: amount of processed measurements
+        """
+        self._move_packed_days(model)
+        archiver = MeasurementArchiver(model)
+        for year in archiver.archived_years(self.source.pk):
+            archiver.restore_year(self.source.pk, year)
+
+        processed = 0
+        while chunk := self.move_chunk(model):
+            processed += chunk
+            self._log(f"{model.__name__}: meter {self.source.pk}, {processed:,} measurements moved")
+        return processed
+
+    def move_chunk(self, model) -> int:
+        """
+        Move the first chunk of measurements of the source meter to the target meter, and recalculate the deltas of
+        the target meter in the time range of the chunk
+
+        :return: amount of processed measurements, 0 when the source has no measurements left
+        """
+        with transaction.atomic(using=measurement_database(self.target.pk)):
+            return self._move_chunk(model)
+
+    def _move_chunk(self, model) -> int:
+        chunk = model.objects.filter(meter_id=self.source.pk).order_by('timestamp')[:self.chunk_size].aggregate(
+            first=models.Min('timestamp'), last=models.Max('timestamp'), count=models.Count('timestamp'),
+        )
+        if not chunk['count']:
+            return 0
+
+        measurements = model.objects.filter(meter_id=self.source.pk, timestamp__range=(chunk['first'], chunk['last']))
+        measurements.exclude(
+            models.Exists(model.objects.filter(meter_id=self.target.pk, timestamp=models.OuterRef('timestamp')))
+        ).update(meter_id=self.target.pk)
+        # Left are the measurements at timestamps the target already has
+        measurements.delete()
+
+        following = model.objects.filter(
+            meter_id=self.target.pk, timestamp__gt=chunk['last']
+        ).order_by('timestamp').values_list('timestamp', flat=True).first()
+        MeasurementDeltaCalculator(model).update_range(
+            self.target.pk, chunk['first'], (following or chunk['last']) + timedelta(microseconds=1)
+        )
+        return chunk['count']
+
+    @transaction.atomic
+    def finish(self) -> None:
+        """Delete the source meter when all its measurements are moved, and rebuild the series of its groups"""
+        packers = [MeasurementPacker(model) for model in MEASUREMENT_MODELS]
+        if any(model.objects.filter(meter_id=self.source.pk).exists() for model in MEASUREMENT_MODELS) or \
+                any(packer.days([self.source.pk]).exists() for packer in packers) or \
+                any(MeasurementArchiver(model).archived_years(self.source.pk) for model in MEASUREMENT_MODELS):
+            return
+        SmartMeter.objects.filter(pk=self.source.pk, merged_into=self.target).delete()
+        self._log(f"Meter {self.source.pk} is merged into meter {self.target.pk}")
+        # The moved measurements now count in the participation windows of the target
+        group_ids = GroupParticipant.objects.filter(meter=self.target).values_list('group_id', flat=True).distinct()
+        GroupSeriesAggregator(self.progress_callback).rebuild_groups(list(group_ids))
+
+    def _move_packed_days(self, model) -> None:
+        """
+        Move the packed days of the source meter. A day that the target has packed as well is unpacked for both
+        meters, the measurements of that day are moved like the other measurements
+        """
+        packer = MeasurementPacker(model)
+        while dates := list(packer.days([self.source.pk]).values_list('date', flat=True)[:self.chunk_size]):
+            with transaction.atomic(using=measurement_database(self.target.pk)):
+                conflicts = set(packer.days([self.target.pk]).filter(date__in=dates).values_list('date', flat=True))
+                for day in conflicts:
+                    packer.unpack_day(self.source.pk, day)
+                    packer.unpack_day(self.target.pk, day)
+                packer.days([self.source.pk]).filter(date__in=dates).update(meter_id=self.target.pk)
+
+    @staticmethod
+    def _fix_participations(old: SmartMeter, new: SmartMeter) -> None:
+        """
+        Fix the joined values of the active group participations of the replaced (old) meter, so the usage in the
+        group continues from the first values of the new meter. When the new meter has an active participation
+        itself, the participations of the old meter are ended instead
+        """
+        participations = list(GroupParticipant.objects.active().filter(meter=old))
+        if not participations:
+            return
+        if GroupParticipant.objects.active().filter(meter=new).exists():
+            for participation in participations:
+                participation.leave()
+                participation.save()
+            return
+
+        first_power = new.powermeasurement_set.order_by('timestamp').first()
+        first_gas = new.gasmeasurement_set.order_by('timestamp').first()
+        first_solar = new.solarmeasurement_set.order_by('timestamp').first()
+        offsets = {
+            'power_import_joined': (first_power.total_import_1 + first_power.total_import_2 if first_power
+                                    else new.power_import) - old.power_import,
+            'power_export_joined': (first_power.total_export_1 + first_power.total_export_2 if first_power
+                                    else new.power_export) - old.power_export,
+            'gas_joined': (first_gas.total_gas if first_gas else new.total_gas, old.total_gas),
+            'solar_joined': (first_solar.total_solar if first_solar else new.total_solar, old.total_solar),
+        }
+        for field in ('gas_joined', 'solar_joined'):
+            start, end = offsets[field]
+            offsets[field] = start - end if start is not None and end is not None else None
+
+        for participation in participations:
+            for field, offset in offsets.items():
+                if offset is not None and getattr(participation, field) is not None:
+                    setattr(participation, field, getattr(participation, field) + offset)
+            participation.save(update_fields=list(offsets))
+
+    def _log(self, message: str) -> None:
+        """Log a progress message if callback is provided"""
+        if self.progress_callback:
+            self.progress_callback(message)
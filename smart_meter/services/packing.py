@@ -0,0 +1,238 @@
+from datetime import datetime, date, time, timezone as dt_timezone, timedelta
+from typing import Optional, Callable, Iterator, List, Tuple, Dict
+
+import numpy as np
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import functions
+
+from smart_meter.models import SmartMeter, PowerMeasurement, GasMeasurement, SolarMeasurement, PowerMeasurementDay, \
+    GasMeasurementDay, SolarMeasurementDay
+from smart_meter.services.deltas import MeasurementDeltaCalculator
+from smart_meter.sharding import measurement_database
+
+# Packed day model per measurement model
+PACKED_MODELS = {
+    PowerMeasurement: PowerMeasurementDay,
+    GasMeasurement: GasMeasurementDay,
+    SolarMeasurement: SolarMeasurementDay,
+}
+
+SECOND = 1000000  # in microseconds, the unit of the timestamp arrays
+
+
+def packed_before(now: Optional[datetime] = None) -> Optional[datetime]:
+    """
+    Moment before which measurements are packed (MEASUREMENT_PACK_AFTER_DAYS)
+
+    :param now: moment to count from, defaults to the current time
+    :return: start of the first day that is not packed, None if packing is disabled
+    """
+    if settings.MEASUREMENT_PACK_AFTER_DAYS is None:
+        return None
+    today = (now or datetime.now(dt_timezone.utc)).astimezone(dt_timezone.utc).date()
+    return day_start(today - timedelta(days=settings.MEASUREMENT_PACK_AFTER_DAYS))
+
+
+def day_start(day: date) -> datetime:
+    return datetime.combine(day, time(), tzinfo=dt_timezone.utc)
+
+
+def to_microseconds(timestamp: datetime) -> int:
+    return (timestamp - datetime(1970, 1, 1, tzinfo=dt_timezone.utc)) // timedelta(microseconds=1)
+
+
+class MeasurementPacker:
+    """
+    Service to pack the measurements of a meter into one row per day (see MeasurementDay), and to unpack them again.
+    A day of measurements every 5 minutes becomes 1 row instead of 288, each pack runs in its own transaction.
+    """
+
+    def __init__(self, model, progress_callback: Optional[Callable[[str], None]] = None):
+        """
+        Initialize the packer for a measurement model
+
+        :param model: PowerMeasurement, GasMeasurement or SolarMeasurement
+        :param progress_callback: Optional callback function to report progress messages
+        """
+        self.model = model
+        self.day_model = PACKED_MODELS[model]
+        self.fields = model.reading_fields()
+        self.progress_callback = progress_callback
+
+    def pack(self, before: datetime) -> int:
+        """
+        Pack the measurements of all meters on the days before given moment
+
+        :param before: start of the first day to keep unpacked, see packed_before()
+        :return: amount of packed measurements
+        """
+        packed = 0
+        meter_ids = SmartMeter.objects.order_by('pk').values_list('pk', flat=True)
+        for meter_id in meter_ids.iterator():
+            days = self.model.objects.filter(
+                meter_id=meter_id, timestamp__lt=before
+            ).annotate(
+                day=functions.TruncDate('timestamp', tzinfo=dt_timezone.utc)
+            ).values_list('day', flat=True).distinct().order_by('day')
+
+            meter_packed = sum(self.pack_day(meter_id, day) for day in list(days))
+            if meter_packed:
+                self._log(f"{self.model.__name__}: meter {meter_id}, {meter_packed:,} measurements packed")
+            packed += meter_packed
+        return packed
+
+    def pack_day(self, meter_id: int, day: date) -> int:
+        """
+        Move the measurements of a meter on given day into the packed row of that day, merged with the already
+        packed measurements
+
+        :return: amount of packed measurements
+        """
+        database = measurement_database(meter_id)
+        with transaction.atomic(using=database):
+            return self._pack_day(meter_id, day, database)
+
+    def _pack_day(self, meter_id: int, day: date, database: str) -> int:
+        start = day_start(day)
+        measurements = self.model.objects.filter(
+            meter_id=meter_id, timestamp__gte=start, timestamp__lt=start + timedelta(days=1)
+        )
+        # The stored integers, without scaling them to decimals and back
+        rows = list(measurements.order_by('timestamp').values_list(
+            'timestamp', *(functions.Cast(field, models.IntegerField()) for field in self.fields)
+        ))
+        if not rows:
+            return 0
+
+        if any(row[0].microsecond for row in rows):
+            # The packed days have whole second offsets, sub-second timestamps would be truncated (and could collide)
+            self._log(f"{self.model.__name__}: meter {meter_id}, {day} not packed, it has sub-second timestamps")
+            return 0
+
+        samples = {(row[0] - start) // timedelta(seconds=1): row[1:] for row in rows}
+        existing = self.day_model.objects.filter(meter_id=meter_id, date=day).first()
+        if existing:
+            for i, second in enumerate(existing.seconds):
+                samples.setdefault(second, tuple(getattr(existing, field)[i] for field in self.fields))
+
+        seconds = sorted(samples)
+        self.day_model.objects.using(database).update_or_create(
+            meter_id=meter_id,
+            date=day,
+            defaults=dict(
+                seconds=seconds,
+                **{field: [samples[second][i] for second in seconds] for i, field in enumerate(self.fields)},
+            ),
+        )
+        measurements.delete()
+        return len(rows)
+
+    def unpack(self, meter_id: int) -> int:
+        """
+        Move all packed measurements of a meter back into the measurement table
+
+        :return: amount of unpacked measurements
+        """
+        days = self.day_model.objects.filter(meter_id=meter_id).order_by('date').values_list('date', flat=True)
+        unpacked = sum(self.unpack_day(meter_id, day) for day in list(days))
+        self._log(f"{self.model.__name__}: meter {meter_id}, {unpacked:,} measurements unpacked")
+        return unpacked
+
+    def unpack_day(self, meter_id: int, day: date) -> int:
+        """
+        Move the packed measurements of a meter on given day back into the measurement table
+
+        :return: amount of unpacked measurements
+        """
+        with transaction.atomic(using=measurement_database(meter_id)):
+            return self._unpack_day(meter_id, day)
+
+    def _unpack_day(self, meter_id: int, day: date) -> int:
+        packed_day = self.day_model.objects.filter(meter_id=meter_id, date=day).first()
+        if not packed_day:
+            return 0
+        measurements = packed_day.unpack()
+        self.model.objects.bulk_create(measurements, ignore_conflicts=True)
+        # Deltas are not packed
+        MeasurementDeltaCalculator(self.model).update_range(meter_id, packed_day.start,
+                                                            packed_day.start + timedelta(days=1))
+        packed_day.delete()
+        return len(measurements)
+
+    def days(self, meter_ids: List[int], after: Optional[datetime] = None, before: Optional[datetime] = None):
+        """Packed days of the meters that overlap the time range, sorted by date"""
+        qs = self.day_model.objects.filter(meter_id__in=meter_ids)
+        if after:
+            qs = qs.filter(date__gte=after.astimezone(dt_timezone.utc).date())
+        if before:
+            qs = qs.filter(date__lte=before.astimezone(dt_timezone.utc).date())
+        return qs.order_by('date')
+
+    def read(self, meter_id: int, after: Optional[datetime] = None, before: Optional[datetime] = None,
+             fields: Optional[List[str]] = None) -> Iterator[tuple]:
+        """
+        Read the packed measurements of a meter, in the format of MeasurementArchiver.read
+
+        :param fields: value fields to return, in this order, defaults to all reading fields
+        :return: iterator of (timestamp, *values), sorted by timestamp
+        """
+        indexes = [self.fields.index(field) + 1 for field in fields] if fields else None
+        for packed_day in self.days([meter_id], after, before).iterator():
+            for row in self.read_day(packed_day):
+                if (after and row[0] < after) or (before and row[0] > before):
+                    continue
+                yield (row[0], *(row[i] for i in indexes)) if indexes else row
+
+    def read_day(self, packed_day) -> List[tuple]:
+        """Rows of (timestamp, *values) of a packed day"""
+        return [
+            (measurement.timestamp, *(getattr(measurement, field) for field in self.fields))
+            for measurement in packed_day.unpack()
+        ]
+
+    def read_arrays(self, meter_ids: List[int], after: datetime, before: datetime) \
+            -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+        """
+        Read the packed measurements of the meters in the time range as arrays, without unpacking per measurement
+
+        :return: (meter ids, timestamps in microseconds, dict of field and stored integer values), not sorted
+        """
+        rows = list(self.days(meter_ids, after, before).values_list('meter_id', 'date', 'seconds', *self.fields))
+        if not rows:
+            return np.empty(0, np.int64), np.empty(0, np.int64), {f: np.empty(0, np.int64) for f in self.fields}
+
+        lengths = [len(row[2]) for row in rows]
+        meters = np.repeat(np.array([row[0] for row in rows], np.int64), lengths)
+        timestamps = np.repeat(np.array([to_microseconds(day_start(row[1])) for row in rows], np.int64), lengths)
+        timestamps += np.concatenate([np.asarray(row[2], np.int64) for row in rows]) * SECOND
+        values = {
+            field: np.concatenate([np.asarray(row[i], np.int64) for row in rows])
+            for i, field in enumerate(self.fields, start=3)
+        }
+        return meters, timestamps, values
+
+    def last_before(self, meter_id: int, before: datetime) -> Optional[Tuple[int, Dict[str, int]]]:
+        """
+        Last packed measurement of a meter before a moment, the measurement the deltas from that moment on are
+        derived from
+
+        :return: (timestamp in microseconds, dict of field and stored integer value), None without packed measurement
+            before the moment
+        """
+        before_us = to_microseconds(before)
+        # The packed day of the moment can have only measurements after it, the packed day before it then has the last
+        days = self.day_model.objects.filter(
+            meter_id=meter_id, date__lte=before.astimezone(dt_timezone.utc).date()
+        ).order_by('-date').values_list('date', 'seconds', *self.fields)[:2]
+        for row in days:
+            timestamps = to_microseconds(day_start(row[0])) + np.asarray(row[1], np.int64) * SECOND
+            index = int(np.searchsorted(timestamps, before_us)) - 1
+            if index >= 0:
+                return int(timestamps[index]), {field: row[i][index] for i, field in enumerate(self.fields, start=2)}
+        return None
+
+    def _log(self, message: str) -> None:
+        """Log a progress message if callback is provided"""
+        if self.progress_callback:
+            self.progress_callback(message)
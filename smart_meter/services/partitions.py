@@ -0,0 +1,203 @@
+from datetime import datetime, timezone as dt_timezone
+from typing import Optional, Callable, List, Tuple
+
+from django.db import connections, transaction, DEFAULT_DB_ALIAS
+
+from smart_meter.models import PowerMeasurement, GasMeasurement, SolarMeasurement
+
+MEASUREMENT_MODELS = (PowerMeasurement, GasMeasurement, SolarMeasurement)
+# Measurement model per type, as used in the measurement storage settings and commands
+MEASUREMENT_TYPES = {
+    'power': PowerMeasurement,
+    'gas': GasMeasurement,
+    'solar': SolarMeasurement,
+}
+
+
+def month_start(timestamp: datetime) -> datetime:
+    """First moment (UTC) of the month of given timestamp"""
+    timestamp = timestamp.astimezone(dt_timezone.utc) if timestamp.tzinfo else timestamp
+    return datetime(timestamp.year, timestamp.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    """Shift the first moment of a month by an amount of months (can be negative)"""
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+class MeasurementPartitioner:
+    """
+    Service to manage the monthly range partitions of a measurement table. Partitions are named
+    `<table>_p<YYYY>_<MM>` and contain the measurements with a timestamp in that month (UTC). Measurements outside
+    of the created partitions end up in the `<table>_default` partition.
+    """
+
+    def __init__(self, model, progress_callback: Optional[Callable[[str], None]] = None, using: str = DEFAULT_DB_ALIAS):
+        """
+        Initialize the partitioner for a measurement model
+
+        :param model: PowerMeasurement, GasMeasurement or SolarMeasurement
+        :param progress_callback: Optional callback function to report progress messages
+        :param using: database of the table, every measurement database has its own partitions
+        """
+        self.model = model
+        self.using = using
+        self.table = model._meta.db_table
+        self.progress_callback = progress_callback
+
+    @property
+    def connection(self):
+        return connections[self.using]
+
+    def partition_name(self, month: datetime) -> str:
+        return '%s_p%s' % (self.table, month.strftime('%Y_%m'))
+
+    @property
+    def default_partition_name(self) -> str:
+        return '%s_default' % self.table
+
+    def partitions(self, attached=True) -> List[Tuple[str, datetime]]:
+        """
+        List the monthly partitions of the table, sorted by month
+
+        :param attached: List the attached partitions, or the detached (but not yet dropped) partitions
+        :return: list of (partition name, month start)
+        """
+        prefix = '%s_p' % self.table
+        with self.connection.cursor() as cursor:
+            if attached:
+                cursor.execute(
+                    'SELECT child.relname FROM pg_inherits '
+                    'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+                    'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+                    'WHERE parent.relname = %s',
+                    [self.table]
+                )
+            else:
+                cursor.execute(
+                    "SELECT relname FROM pg_class WHERE relkind = 'r' AND NOT relispartition "
+                    "AND relname LIKE %s",
+                    [prefix.replace('_', r'\_') + '%']
+                )
+            names = [row[0] for row in cursor.fetchall()]
+
+        partitions = []
+        for name in names:
+            if not name.startswith(prefix):
+                continue
+            try:
+                month = datetime.strptime(name[len(prefix):], '%Y_%m').replace(tzinfo=dt_timezone.utc)
+            except ValueError:
+                continue
+            partitions.append((name, month))
+        return sorted(partitions, key=lambda partition: partition[1])
+
+    def default_partition_count(self) -> int:
+        """Amount of measurements that did not fit in any monthly partition"""
+        with self.connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM %s' % self.connection.ops.quote_name(self.default_partition_name))
+            return cursor.fetchone()[0]
+
+    def default_partition_months(self) -> List[datetime]:
+        """Months of the measurements in the default partition, sorted"""
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT DISTINCT date_trunc(\'month\', "timestamp", \'UTC\') FROM %s ORDER BY 1'
+                % self.connection.ops.quote_name(self.default_partition_name)
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def create_partition(self, month: datetime) -> bool:
+        """
+        Create the partition for given month, if it does not exist yet. Measurements of the month in the default
+        partition are moved into the new partition
+
+        :param month: any moment in the month
+        :return: True if a partition was created
+        """
+        month = month_start(month)
+        name = self.partition_name(month)
+        if name in dict(self.partitions()):
+            return False
+        quote = self.connection.ops.quote_name
+        bounds = [month, add_months(month, 1)]
+        with transaction.atomic(using=self.using):
+            cursor = self.connection.cursor()
+            cursor.execute('SELECT EXISTS (SELECT 1 FROM %s WHERE "timestamp" >= %%s AND "timestamp" < %%s)'
+                           % quote(self.default_partition_name), bounds)
+            move = cursor.fetchone()[0]
+            if move:
+                # A partition can not be created for rows in the default partition: the default partition is
+                # detached while its rows of the month are moved, and attached again
+                cursor.execute('ALTER TABLE %s DETACH PARTITION %s'
+                               % (quote(self.table), quote(self.default_partition_name)))
+            # Creating a partition scans the default partition for rows that belong in the new partition
+            cursor.execute(
+                'CREATE TABLE %s PARTITION OF %s FOR VALUES FROM (%%s) TO (%%s)' % (quote(name), quote(self.table)),
+                bounds
+            )
+            if move:
+                cursor.execute(
+                    'WITH moved AS (DELETE FROM %s WHERE "timestamp" >= %%s AND "timestamp" < %%s RETURNING *) '
+                    'INSERT INTO %s SELECT * FROM moved' % (quote(self.default_partition_name), quote(name)),
+                    bounds
+                )
+                self._log('%s: moved %s measurements from the default partition' % (self.table, cursor.rowcount))
+                cursor.execute('ALTER TABLE %s ATTACH PARTITION %s DEFAULT'
+                               % (quote(self.table), quote(self.default_partition_name)))
+        self._log('%s: created partition %s' % (self.table, name))
+        return True
+
+    def ensure_partitions(self, months_ahead: int, now: Optional[datetime] = None) -> List[str]:
+        """
+        Pre-create the partitions for the current month and the given amount of months ahead
+
+        :param months_ahead: amount of future months to create
+        :param now: moment to count from, defaults to the current time
+        :return: names of created partitions
+        """
+        current = month_start(now or datetime.now(dt_timezone.utc))
+        created = []
+        for i in range(months_ahead + 1):
+            month = add_months(current, i)
+            if self.create_partition(month):
+                created.append(self.partition_name(month))
+        return created
+
+    def expire_partitions(self, retain_months: int, drop=False, now: Optional[datetime] = None) -> List[str]:
+        """
+        Detach (and optionally drop) all partitions that only contain measurements older than the retention period.
+        Detaching is a metadata change, the measurements stay available in a separate table until it is dropped
+
+        :param retain_months: amount of months to keep, before the current month
+        :param drop: drop the detached tables
+        :param now: moment to count from, defaults to the current time
+        :return: names of expired partitions
+        """
+        cutoff = add_months(month_start(now or datetime.now(dt_timezone.utc)), -retain_months)
+        quote = self.connection.ops.quote_name
+        expired = []
+        for name, month in self.partitions():
+            if month >= cutoff:
+                break
+            with transaction.atomic(using=self.using):
+                cursor = self.connection.cursor()
+                cursor.execute('ALTER TABLE %s DETACH PARTITION %s' % (quote(self.table), quote(name)))
+                # Detached table no longer takes new ids from the sequence of the measurement table
+                cursor.execute('ALTER TABLE %s ALTER COLUMN id DROP DEFAULT' % quote(name))
+            self._log('%s: detached partition %s' % (self.table, name))
+            expired.append(name)
+
+        if drop:
+            for name, month in self.partitions(attached=False):
+                if month >= cutoff:
+                    continue
+                self.connection.cursor().execute('DROP TABLE %s' % quote(name))
+                self._log('%s: dropped partition %s' % (self.table, name))
+        return expired
+
+    def _log(self, message: str) -> None:
+        """Log a progress message if callback is provided"""
+        if self.progress_callback:
+            self.progress_callback(message)
@@ -0,0 +1,357 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import lru_cache
+from itertools import repeat
+from typing import Optional, Callable, List, Dict, Iterator, Tuple
+from zoneinfo import ZoneInfo
+
+import django
+import numpy as np
+from django.conf import settings
+from django.db import connections
+from django.db.models import Min
+from django.utils import timezone
+
+from smart_meter.models import SmartMeter, MeterQualityReport, PowerMeasurement, GasMeasurement, SolarMeasurement
+from smart_meter.services.buckets import EPOCH
+from smart_meter.services.packing import MeasurementPacker, SECOND, day_start, to_microseconds
+from smart_meter.services.partitions import MEASUREMENT_TYPES, month_start, add_months
+from smart_meter.sharding import measurement_database
+
+MINUTE = 60 * SECOND
+HOUR = 60 * MINUTE
+
+# Issues found by the scan, in the order of the report
+ISSUES = ('gaps', 'negative_deltas', 'spikes', 'frozen', 'dst')
+# Timestamps of the first occurrences of each issue in the report
+MAX_EXAMPLES = 3
+# Counters are frozen when these totals do not change while the actual value is above 0
+FROZEN_FIELDS = {
+    PowerMeasurement: (['total_import_1', 'total_import_2'], 'actual_import'),
+    GasMeasurement: (['total_gas'], 'actual_gas'),
+    SolarMeasurement: (['total_solar'], 'actual_solar'),
+}
+# A jump of about an hour or a counter going down this close to a DST transition is a DST anomaly: a connector that
+# sends the local time instead of UTC
+DST_WINDOW = 3 * HOUR
+
+
+@lru_cache
+def dst_transitions(year: int) -> np.ndarray:
+    """
+    Moments the UTC offset of TIME_ZONE changes in a year
+
+    :return: array of timestamps in microseconds
+    """
+    zone = ZoneInfo(settings.TIME_ZONE)
+    start = datetime(year, 1, 1, tzinfo=dt_timezone.utc)
+    hours = [start + timedelta(hours=i) for i in range((datetime(year + 1, 1, 1, tzinfo=dt_timezone.utc) - start)
+                                                       // timedelta(hours=1))]
+    offsets = [hour.astimezone(zone).utcoffset() for hour in hours]
+    return np.array([
+        to_microseconds(hours[i]) for i in range(1, len(hours)) if offsets[i] != offsets[i - 1]
+    ], np.int64)
+
+
+def to_iso(timestamp: int) -> str:
+    return (EPOCH + timedelta(microseconds=int(timestamp))).isoformat()
+
+
+class SeriesScan:
+    """
+    Issues in the series of one measurement type of a meter. The series is fed in chunks sorted by timestamp, the
+    last measurement and an unfinished frozen run are carried over to the next chunk, so every check is vectorized
+    over a chunk and a chunk boundary is not a special case
+    """
+
+    def __init__(self, model, measurement_type: str):
+        self.totals = list(model.delta_fields())
+        self.frozen_totals, self.actual = FROZEN_FIELDS[model]
+        # Maximum increase per hour in stored units
+        self.max_usage = {
+            field: settings.MEASUREMENT_QUALITY_MAX_USAGE[measurement_type] * 10 ** model._meta.get_field(field)
+            .decimal_places for field in self.totals
+        }
+        self.gap = settings.MEASUREMENT_QUALITY_GAP_HOURS * HOUR
+        self.frozen = settings.MEASUREMENT_QUALITY_FROZEN_HOURS * HOUR
+        self.previous: Optional[Tuple[int, Dict[str, int]]] = None
+        # Start of a frozen run that continues in the next chunk
+        self.frozen_since: Optional[int] = None
+        self.measurements = 0
+        self.first = self.last = None
+        self.longest_gap = self.longest_frozen = 0
+        self.counts = dict.fromkeys(ISSUES, 0)
+        self.examples = {issue: [] for issue in ISSUES}
+
+    def feed(self, timestamps: np.ndarray, values: Dict[str, np.ndarray]) -> None:
+        """
+        Check the next chunk of the series
+
+        :param timestamps: timestamps in microseconds, sorted and unique, after the previous chunk
+        :param values: dict of field and stored integer values
+        """
+        if not len(timestamps):
+            return
+        self.measurements += len(timestamps)
+        self.first = timestamps[0] if self.first is None else self.first
+        self.last = timestamps[-1]
+        if self.previous is not None:
+            timestamps = np.r_[self.previous[0], timestamps]
+            values = {field: np.r_[self.previous[1][field], values[field]] for field in values}
+        self.previous = (timestamps[-1], {field: field_values[-1] for field, field_values in values.items()})
+        if len(timestamps) < 2:
+            return
+
+        # Every check is on the pairs of consecutive measurements, at the later measurement
+        ends = timestamps[1:]
+        elapsed = np.diff(timestamps)
+        deltas = {field: np.diff(values[field]) for field in self.totals}
+
+        gaps = elapsed > self.gap
+        # A gap is reported at its start
+        self._add('gaps', gaps, timestamps[:-1])
+        self.longest_gap = max(self.longest_gap, int(elapsed.max()))
+
+        negative = np.logical_or.reduce([delta < 0 for delta in deltas.values()])
+        self._add('negative_deltas', negative, ends)
+
+        hours = np.maximum(elapsed / HOUR, 1)
+        spikes = np.logical_or.reduce([delta > self.max_usage[field] * hours for field, delta in deltas.items()])
+        self._add('spikes', spikes, ends)
+
+        still = (np.add.reduce([deltas[field] for field in self.frozen_totals]) == 0) & (values[self.actual][1:] > 0)
+        self._frozen_runs(timestamps, still)
+
+        self._add('dst', self._near_dst(ends) & (negative | self._hour_jumps(elapsed)), ends)
+
+    def finish(self) -> dict:
+        """
+        Report of the series, after the last chunk
+
+        :return: dict with the amount of measurements, first and last timestamp, longest gap and frozen run, amount
+        per issue and examples
+        """
+        if self.frozen_since is not None:
+            # Still frozen at the last measurement
+            self._frozen_run(np.array([self.frozen_since]), np.array([self.last]))
+            self.frozen_since = None
+        return {
+            'measurements': self.measurements,
+            'first': to_iso(self.first) if self.first is not None else None,
+            'last': to_iso(self.last) if self.last is not None else None,
+            'longest_gap_hours': round(self.longest_gap / HOUR, 2),
+            'longest_frozen_hours': round(self.longest_frozen / HOUR, 2),
+            **self.counts,
+            'examples': {issue: examples for issue, examples in self.examples.items() if examples},
+        }
+
+    @property
+    def issues(self) -> int:
+        return sum(self.counts.values())
+
+    def _add(self, issue: str, found: np.ndarray, timestamps: np.ndarray) -> None:
+        indexes = np.flatnonzero(found)
+        self.counts[issue] += len(indexes)
+        missing = MAX_EXAMPLES - len(self.examples[issue])
+        self.examples[issue] += [to_iso(timestamp) for timestamp in timestamps[indexes[:missing]]]
+
+    def _frozen_runs(self, timestamps: np.ndarray, still: np.ndarray) -> None:
+        """Find the runs of pairs without counter change, a run spans from its first to its last measurement"""
+        edges = np.flatnonzero(np.diff(np.r_[0, still.astype(np.int8), 0]))
+        starts, stops = edges[::2], edges[1::2]
+        run_starts, run_ends = timestamps[starts], timestamps[stops]
+        if self.frozen_since is not None:
+            if len(starts) and starts[0] == 0:
+                # The run of the previous chunk continues
+                run_starts[0] = self.frozen_since
+            else:
+                # The run of the previous chunk ended at its last measurement
+                run_starts, run_ends = np.r_[self.frozen_since, run_starts], np.r_[timestamps[0], run_ends]
+                stops = np.r_[0, stops]
+        self.frozen_since = None
+        if len(stops) and stops[-1] == len(still):
+            # The last run continues in the next chunk
+            self.frozen_since = int(run_starts[-1])
+            run_starts, run_ends = run_starts[:-1], run_ends[:-1]
+        self._frozen_run(run_starts, run_ends)
+
+    def _frozen_run(self, starts: np.ndarray, ends: np.ndarray) -> None:
+        durations = ends - starts
+        if len(durations):
+            self.longest_frozen = max(self.longest_frozen, int(durations.max()))
+        self._add('frozen', durations > self.frozen, starts)
+
+    @staticmethod
+    def _near_dst(timestamps: np.ndarray) -> np.ndarray:
+        first, last = (EPOCH + timedelta(microseconds=int(timestamps[i])) for i in (0, -1))
+        transitions = np.concatenate([dst_transitions(year) for year in range(first.year, last.year + 1)])
+        if not len(transitions):
+            return np.zeros(len(timestamps), bool)
+        index = np.clip(np.searchsorted(transitions, timestamps), 1, len(transitions)) - 1
+        distance = np.minimum(
+            np.abs(timestamps - transitions[index]),
+            np.abs(timestamps - transitions[np.minimum(index + 1, len(transitions) - 1)]),
+        )
+        return distance <= DST_WINDOW
+
+    @staticmethod
+    def _hour_jumps(elapsed: np.ndarray) -> np.ndarray:
+        # Jumps of about an hour, when the meter reports much more often than that
+        return (np.abs(elapsed - HOUR) <= 10 * MINUTE) & (elapsed > 3 * np.median(elapsed))
+
+
+def table_arrays(model, meter_id: int, after: datetime, before: datetime, database: str) -> Dict[str, np.ndarray]:
+    """
+    The measurements of a meter in the time range from the measurement table, as one array per column. The rows are
+    aggregated into arrays by the database, so they are not converted one by one
+
+    :return: dict of field and stored integer values, with the timestamps in microseconds, sorted by timestamp
+    """
+    quote = connections[database].ops.quote_name
+    columns = {'timestamp': '(EXTRACT(EPOCH FROM "timestamp") * 1000000)::bigint'}
+    columns.update({field: '%s::bigint' % quote(field) for field in model.reading_fields()})
+    with connections[database].cursor() as cursor:
+        cursor.execute('SELECT %s FROM %s WHERE meter_id = %%s AND "timestamp" >= %%s AND "timestamp" < %%s' % (
+            ', '.join('array_agg(%s ORDER BY "timestamp")' % column for column in columns.values()),
+            quote(model._meta.db_table),
+        ), [meter_id, after, before])
+        row = cursor.fetchone()
+    return {field: np.array(values or [], np.int64) for field, values in zip(columns, row)}
+
+
+def measurement_chunks(model, meter_id: int, since: Optional[datetime] = None) \
+        -> Iterator[Tuple[np.ndarray, Dict[str, np.ndarray]]]:
+    """
+    The measurements of a meter per month, from the measurement table and the packed days, as arrays
+
+    :param since: start of the series, defaults to the first measurement
+    :return: iterator of (timestamps in microseconds, dict of field and stored integer values), sorted by timestamp
+    """
+    fields = model.reading_fields()
+    database = measurement_database(meter_id)
+    packer = MeasurementPacker(model)
+    first = [
+        model.objects.filter(meter_id=meter_id).aggregate(first=Min('timestamp'))['first'],
+        day_start(packed) if (packed := packer.days([meter_id]).aggregate(first=Min('date'))['first']) else None,
+    ]
+    first = [timestamp for timestamp in first if timestamp]
+    if not first:
+        return
+    start = max(min(first), since) if since else min(first)
+    end = timezone.now()
+    month = month_start(start)
+    while month <= end:
+        after, before = max(month, start), add_months(month, 1)
+        values = table_arrays(model, meter_id, after, before, database)
+        timestamps = values.pop('timestamp')
+        _, packed_timestamps, packed_values = packer.read_arrays([meter_id], after, before)
+        if len(packed_timestamps):
+            in_range = (packed_timestamps >= to_microseconds(after)) & (packed_timestamps < to_microseconds(before))
+            timestamps = np.r_[timestamps, packed_timestamps[in_range]]
+            values = {field: np.r_[values[field], packed_values[field][in_range]] for field in fields}
+            # Measurements in the table come first for a timestamp that is packed as well
+            order = np.argsort(timestamps, kind='stable')
+            unique = np.r_[True, np.diff(timestamps[order]) != 0]
+            timestamps, values = timestamps[order][unique], {field: values[field][order][unique] for field in fields}
+        yield timestamps, values
+        month = before
+
+
+def scan_meter(meter_id: int, since: Optional[datetime] = None) -> MeterQualityReport:
+    """
+    Scan the measurement history of a meter
+
+    :param since: start of the scan, defaults to the first measurement
+    :return: unsaved report
+    """
+    report, issues = {}, 0
+    for measurement_type, model in MEASUREMENT_TYPES.items():
+        scan = SeriesScan(model, measurement_type)
+        for timestamps, values in measurement_chunks(model, meter_id, since):
+            scan.feed(timestamps, values)
+        report[measurement_type] = scan.finish()
+        issues += scan.issues
+    return MeterQualityReport(meter_id=meter_id, scanned_on=timezone.now(), issues=issues, report=report)
+
+
+def scan_meters(meter_ids: List[int], since: Optional[datetime] = None) -> List[MeterQualityReport]:
+    """Scan a batch of meters, in a worker process of MeasurementQualityScanner"""
+    return [scan_meter(meter_id, since) for meter_id in meter_ids]
+
+
+class MeasurementQualityScanner:
+    """
+    Service to scan the measurement histories of the meters for data quality issues, and store a report per meter
+    (MeterQualityReport). The meters are scanned in batches by a pool of processes, each meter series is read per
+    month and checked with NumPy (see SeriesScan). Only reads the measurements, the reports are stored by the
+    calling process.
+    """
+
+    def __init__(self, days: Optional[int] = None, workers: Optional[int] = None, batch_size: int = 20,
+                 progress_callback: Optional[Callable[[str], None]] = None):
+        """
+        Initialize the scanner
+
+        :param days: scan the last amount of days, defaults to MEASUREMENT_QUALITY_SCAN_DAYS (None for everything)
+        :param workers: amount of processes, defaults to MEASUREMENT_QUALITY_WORKERS, 1 scans in this process
+        :param batch_size: amount of meters per task of a process
+        :param progress_callback: Optional callback function to report progress messages
+        """
+        days = settings.MEASUREMENT_QUALITY_SCAN_DAYS if days is None else days
+        self.since = timezone.now() - timedelta(days=days) if days else None
+        self.workers = workers or settings.MEASUREMENT_QUALITY_WORKERS
+        self.batch_size = batch_size
+        self.progress_callback = progress_callback
+
+    def scan(self, meter_ids: Optional[List[int]] = None) -> int:
+        """
+        Scan the meters, and replace their reports. The scans requested before are done
+
+        :param meter_ids: ids of the meters, defaults to all meters that are not deleted
+        :return: amount of meters with issues
+        """
+        started = timezone.now()
+        meters = SmartMeter.objects.visible().order_by('pk').values_list('pk', flat=True)
+        if meter_ids is not None:
+            meters = meters.filter(pk__in=meter_ids)
+        meter_ids = list(meters)
+        batches = [meter_ids[i:i + self.batch_size] for i in range(0, len(meter_ids), self.batch_size)]
+        if self.workers > 1 and len(batches) > 1:
+            # New processes (not forked), the database connections and pools of this process are not shared
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(self.workers, mp_context=context, initializer=django.setup) as executor:
+                results = executor.map(scan_meters, batches, repeat(self.since))
+                with_issues = self._store(results, len(meter_ids))
+        else:
+            with_issues = self._store((scan_meters(batch, self.since) for batch in batches), len(meter_ids))
+        # A scan requested during the scan is done by the next run
+        MeterQualityReport.objects.filter(meter__in=meter_ids, requested_on__lte=started).update(requested_on=None)
+        return with_issues
+
+    def scan_requested(self) -> int:
+        """
+        Scan the meters of which a new scan was requested through the API (MeterQualityReportDetailView)
+
+        :return: amount of meters with issues
+        """
+        return self.scan(list(MeterQualityReport.objects.filter(
+            requested_on__isnull=False
+        ).values_list('meter', flat=True)))
+
+    def _store(self, results: Iterator[List[MeterQualityReport]], total: int) -> int:
+        scanned = with_issues = 0
+        for reports in results:
+            MeterQualityReport.objects.bulk_create(
+                reports, update_conflicts=True, unique_fields=['meter'],
+                update_fields=['scanned_on', 'issues', 'report'],
+            )
+            scanned += len(reports)
+            with_issues += sum(1 for report in reports if report.issues)
+            self._log(f"{scanned:,}/{total:,} meters scanned, {with_issues:,} with issues")
+        return with_issues
+
+    def _log(self, message: str) -> None:
+        """Log a progress message if callback is provided"""
+        if self.progress_callback:
+            self.progress_callback(message)
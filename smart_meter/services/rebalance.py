@@ -0,0 +1,112 @@
+from typing import Optional, Callable, List
+
+from django.conf import settings
+
+from smart_meter.models import SmartMeter
+from smart_meter.services.packing import PACKED_MODELS
+from smart_meter.sharding import shard_for_meter
+
+# Models of which the rows are stored on the measurement database of their meter
+SHARDED_MODELS = [model for models in PACKED_MODELS.items() for model in models]
+
+
+class MeasurementRebalancer:
+    """
+    Service to move the measurements and packed days of meters to another measurement database, for example after a
+    database was added to MEASUREMENT_SHARDS (new meters are placed by shard_for_meter, existing meters stay where they
+    are until they are moved).
+
+    A meter is moved in three steps: the rows are copied to the new database in chunks while the meter still uses its
+    current database, then the meter is switched to the new database, and then the rows left on the other databases
+    (including the measurements that came in during the copy) are moved in chunks: inserted on the new database before
+    they are deleted. Rows the new database already has are skipped (unique meter and timestamp or date), so moving is
+    resumable: running it again moves the rows that are still left on another database.
+    Other maintenance commands (packing, archiving, compaction, merging) should not run at the same time.
+    """
+
+    def __init__(self, chunk_size: Optional[int] = None, progress_callback: Optional[Callable[[str], None]] = None):
+        """
+        Initialize the rebalancer
+
+        :param chunk_size: maximum amount of rows per copy, defaults to MEASUREMENT_DELETE_CHUNK_SIZE
+        :param progress_callback: Optional callback function to report progress messages
+        """
+        self.chunk_size = chunk_size or settings.MEASUREMENT_DELETE_CHUNK_SIZE
+        self.progress_callback = progress_callback
+
+    def rebalance(self, meter_ids: Optional[List[int]] = None, database: Optional[str] = None,
+                  dry_run=False) -> int:
+        """
+        Move meters to their shard (shard_for_meter), or to given database
+
+        :param meter_ids: ids of the meters, defaults to all meters
+        :param database: move the meters to this database instead of their shard
+        :param dry_run: only report the meters that would be moved
+        :return: amount of moved rows
+        """
+        meters = SmartMeter.objects.order_by('pk').values_list('pk', 'measurement_database')
+        if meter_ids is not None:
+            meters = meters.filter(pk__in=meter_ids)
+        moved = 0
+        for meter_id, current in meters.iterator():
+            target = database or shard_for_meter(meter_id)
+            if dry_run:
+                if current != target:
+                    self._log(f"Meter {meter_id}: {current} -> {target}")
+                continue
+            moved += self.move_meter(meter_id, target)
+        return moved
+
+    def move_meter(self, meter_id: int, database: str) -> int:
+        """
+        Move the measurements and packed days of a meter to given database, and switch the meter to it
+
+        :param meter_id: id of the meter
+        :param database: alias of the new measurement database
+        :return: amount of moved rows
+        """
+        if database not in settings.MEASUREMENT_DATABASES:
+            raise ValueError(f'Unknown database {database}')
+        current = SmartMeter.objects.filter(pk=meter_id).values_list('measurement_database', flat=True).get()
+        if current != database:
+            # The meter keeps reading from and writing to its current database during the copy
+            for model in SHARDED_MODELS:
+                self._transfer(model, meter_id, current, database)
+            SmartMeter.objects.filter(pk=meter_id).update(measurement_database=database)
+            self._log(f"Meter {meter_id}: switched from {current} to {database}")
+
+        moved = 0
+        for source in settings.MEASUREMENT_DATABASES:
+            if source == database:
+                continue
+            for model in SHARDED_MODELS:
+                moved += self._transfer(model, meter_id, source, database, delete=True)
+        if moved:
+            self._log(f"Meter {meter_id}: {moved:,} rows moved to {database}")
+        return moved
+
+    def _transfer(self, model, meter_id: int, source: str, target: str, delete=False) -> int:
+        """
+        Copy the rows of a meter from the source to the target database in chunks, and delete them from the source
+        when they are inserted
+
+        :return: amount of copied rows
+        """
+        rows = model.objects.using(source).filter(meter_id=meter_id).order_by('pk')
+        transferred, last = 0, None
+        while chunk := list((rows if last is None else rows.filter(pk__gt=last))[:self.chunk_size]):
+            last = chunk[-1].pk
+            ids = [row.pk for row in chunk]
+            for row in chunk:
+                # The target database numbers its own rows
+                row.pk = None
+            model.objects.using(target).bulk_create(chunk, ignore_conflicts=True)
+            if delete:
+                model.objects.using(source).filter(pk__in=ids).delete()
+            transferred += len(chunk)
+        return transferred
+
+    def _log(self, message: str) -> None:
+        """Log a progress message if callback is provided"""
+        if self.progress_callback:
+            self.progress_callback(message)
@@ -0,0 +1,82 @@
+import zlib
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+def is_sharded() -> bool:
+    """If there are measurement databases besides the default database"""
+    return len(settings.MEASUREMENT_DATABASES) > 1
+
+
+def shard_for_meter(meter_id: int) -> str:
+    """
+    Database of the measurements of a new meter, a stable hash of the meter id over MEASUREMENT_SHARDS (the same in
+    every process, unlike hash())
+    """
+    shards = settings.MEASUREMENT_SHARDS
+    return shards[zlib.crc32(str(meter_id).encode()) % len(shards)]
+
+
+def measurement_database(meter) -> str:
+    """
+    Database of the measurements of a meter
+
+    :param meter: SmartMeter or meter id
+    :return: database alias
+    """
+    from smart_meter.models import SmartMeter
+    if isinstance(meter, SmartMeter):
+        return meter.measurement_database
+    if not is_sharded():
+        return DEFAULT_DB_ALIAS
+    database = SmartMeter.objects.filter(pk=meter).values_list('measurement_database', flat=True).first()
+    return database or DEFAULT_DB_ALIAS
+
+
+def meters_database(meter_ids: Iterable[int]) -> Optional[str]:
+    """
+    Database of the measurements of the meters, when they are all on the same database
+
+    :return: database alias, None when the meters are on different databases
+    """
+    from smart_meter.models import SmartMeter
+    if not is_sharded():
+        return DEFAULT_DB_ALIAS
+    databases = set(SmartMeter.objects.filter(pk__in=list(meter_ids)).values_list('measurement_database', flat=True))
+    if len(databases) > 1:
+        return None
+    return databases.pop() if databases else DEFAULT_DB_ALIAS
+
+
+class MeasurementRouter:
+    """
+    Database router for the models that are sharded by meter (`sharded_by_meter`): all measurements and packed days
+    of a meter are on the `measurement_database` of the meter, the other models are on the default database. All
+    databases have the full schema, so migrations run everywhere.
+
+    The router finds the meter from the instance hint: the meter of a related manager (`meter.powermeasurement_set`)
+    or a saved measurement. Other queries find it from their meter lookup (see managers.MeterShardedQuerySet), raw SQL
+    uses `connections[measurement_database(meter_id)]`
+    """
+
+    def db_for_read(self, model, **hints):
+        if not getattr(model, 'sharded_by_meter', False) or not is_sharded():
+            return None
+        instance = hints.get('instance')
+        if instance is None:
+            return None
+        if getattr(instance, 'sharded_by_meter', False):
+            # A measurement, the meter is often cached by the related manager that created it
+            return measurement_database(instance._state.fields_cache.get('meter') or instance.meter_id)
+        # The meter of a related manager, like meter.powermeasurement_set
+        return measurement_database(instance)
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Measurements refer to their meter on the default database (without foreign key constraint)
+        if getattr(obj1, 'sharded_by_meter', False) or getattr(obj2, 'sharded_by_meter', False):
+            return True
+        return None
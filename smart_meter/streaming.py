@@ -0,0 +1,73 @@
+import decimal
+from typing import Iterable, Iterator, Optional, Sequence
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+
+
+def render(values: list) -> bytes:
+    """The values as comma separated JSON, rendered like the other API responses (without the list brackets)"""
+    return JSONRenderer().render(values)[1:-1]
+
+
+class StreamedList:
+    """
+    List of a streamed JSON response (see stream_json), of which the rows are serialized and written per chunk. The
+    totals of the given fields are summed from the rows on the way, like MeasurementQuerySet.bucket_period_total
+    """
+
+    def __init__(self, queryset, serializer, totals: Sequence[str] = ()):
+        """
+        :param queryset: measurement queryset, read from a server-side cursor (see MeasurementQuerySet.stream)
+        :param serializer: serializer instance of one row
+        :param totals: total fields to sum
+        """
+        self.rows = queryset.stream(settings.MEASUREMENT_STREAM_CHUNK_SIZE)
+        self.serializer = serializer
+        self.totals = {field: None for field in totals}
+
+    def render(self) -> Iterator[bytes]:
+        yield b'['
+        chunk = []
+        separator = b''
+        for row in self.rows:
+            for field, total in self.totals.items():
+                if not row.get('gap') and row[field] is not None:
+                    self.totals[field] = row[field] if total is None else total + row[field]
+            chunk.append(self.serializer.to_representation(row))
+            if len(chunk) >= settings.MEASUREMENT_STREAM_CHUNK_SIZE:
+                yield separator + render(chunk)
+                chunk = []
+                separator = b','
+        if chunk:
+            yield separator + render(chunk)
+        yield b']'
+
+    def total(self, field: str) -> Optional[decimal.Decimal]:
+        """Sum of a total field over the rows, None without rows. Only complete once the list is rendered"""
+        return self.totals[field]
+
+
+def stream_json(data) -> Iterable[bytes]:
+    """
+    JSON of the data, written incrementally. StreamedList values are written per chunk, callable values are called
+    when they are written (after the values before them, so they can use the totals of a StreamedList)
+    """
+    if isinstance(data, StreamedList):
+        yield from data.render()
+    elif callable(data):
+        yield from stream_json(data())
+    elif isinstance(data, dict):
+        yield b'{'
+        for index, (key, value) in enumerate(data.items()):
+            yield (b',' if index else b'') + render([str(key)]) + b':'
+            yield from stream_json(value)
+        yield b'}'
+    else:
+        yield render([data])
+
+
+def streaming_response(data) -> StreamingHttpResponse:
+    """Streamed JSON response of the data, see stream_json"""
+    return StreamingHttpResponse(stream_json(data), content_type='application/json')
@@ -1,8 +1,10 @@
 import decimal
 import random
+from datetime import datetime, timezone as dt_timezone
 
 from django.urls import reverse
 from django.utils import timezone
+from rest_framework.test import APIClient
 
 from smart_meter.models import SmartMeter, SolarMeasurement, GasMeasurement, PowerMeasurement, GroupMeter, \
     GroupParticipant
@@ -64,6 +66,36 @@ class MeterTestMixin(UserTestMixin):
             """
             return reverse('users:solar_measurement_list', kwargs={'user_pk': user_pk, 'meter_pk': meter_pk})
 
+        @staticmethod
+        def meter_merge_url(user_pk, meter_pk):
+            """
+            merge meter url (/users/id/meters/id/merge/)
+            :param user_pk: Id of user
+            :param meter_pk: Id of meter
+            :return: url
+            """
+            return reverse('users:meter_merge', kwargs={'user_pk': user_pk, 'meter_pk': meter_pk})
+
+        @staticmethod
+        def meter_import_url(user_pk, meter_pk):
+            """
+            import meter data url (/users/id/meters/id/import/)
+            :param user_pk: Id of user
+            :param meter_pk: Id of meter
+            :return: url
+            """
+            return reverse('users:meter_import', kwargs={'user_pk': user_pk, 'meter_pk': meter_pk})
+
+        @staticmethod
+        def meter_series_url(user_pk, meter_pk):
+            """
+            power, gas and solar series of a meter url (/users/id/meters/id/series/)
+            :param user_pk: Id of user
+            :param meter_pk: Id of meter
+            :return: url
+            """
+            return reverse('users:meter_series', kwargs={'user_pk': user_pk, 'meter_pk': meter_pk})
+
         @staticmethod
         def meter_group_participation_url(user_pk, participation_pk=None):
             """
@@ -101,6 +133,25 @@ class MeterTestMixin(UserTestMixin):
                 return reverse('smart_meter:public_group_meter_display', kwargs={'public_key': meter_lookup})
             return reverse('smart_meter:group_meter_display', kwargs={'pk': meter_lookup})
 
+        @staticmethod
+        def group_energy_series_url(group_pk):
+            """
+            Group energy series url (/meters/groups/id/series/)
+            :param group_pk: Id of group meter
+            :return: url
+            """
+            return reverse('smart_meter:group_energy_series', kwargs={'group_pk': group_pk})
+
+        @staticmethod
+        def group_participant_url(group_pk, participant_pk):
+            """
+            Group participant url for the manager (/meters/groups/id/participants/id/)
+            :param group_pk: Id of group meter
+            :param participant_pk: Id of participant
+            :return: url
+            """
+            return reverse('smart_meter:group_participant_detail', kwargs={'group_pk': group_pk, 'pk': participant_pk})
+
         @staticmethod
         def group_meter_invite_info(invitation_key):
             """
@@ -278,3 +329,35 @@ class MeterTestMixin(UserTestMixin):
         return GroupParticipant.objects.create(
             **participant_data
         )
+
+
+class MeasurementListTestMixin(MeterTestMixin):
+    """
+    Mixin class with the measurements of a meter for testing the measurement lists: power every 6 hours for 10 days
+    (total_import_1 counts up by one) and gas every 6 hours on the first two days, from 2026-03-01 UTC. The filter
+    data is 20 days from the start (day buckets), the client is authenticated as the owner of the meter
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user()
+        cls.meter = cls.create_smart_meter(cls.user)
+        cls.start = datetime(2026, 3, 1, tzinfo=dt_timezone.utc)
+        for i in range(40):
+            cls.create_power_measurement(cls.meter, timestamp=cls.start + timezone.timedelta(hours=6 * i),
+                                         total_import_1=i, total_import_2=0, total_export_1=0, total_export_2=0)
+        for i in range(8):
+            cls.create_gas_measurement(cls.meter, timestamp=cls.start + timezone.timedelta(hours=6 * i), total_gas=i)
+        cls.filter_data = {
+            'timestamp_after': cls.start,
+            'timestamp_before': cls.start + timezone.timedelta(days=20),
+        }
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_power(self, **params):
+        """Power measurement list of the meter, in the filter data"""
+        return self.client.get(self.MeterUrls.power_measurement_url(self.user.pk, self.meter.pk),
+                               {**self.filter_data, **params})
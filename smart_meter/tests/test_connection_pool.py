@@ -0,0 +1,56 @@
+from unittest import skipUnless
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.test import TestCase, tag
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from gpx_server.pooling import warm_up, pool_statistics
+from smart_meter.models import SmartMeter
+from smart_meter.tests.mixin import MeterTestMixin
+
+
+@tag('model')
+@skipUnless(settings.DB_POOL_MAX_SIZE, 'Requires the connection pool, GPX_DB_POOL_MAX_SIZE is 0')
+class TestConnectionPool(MeterTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user()
+        cls.meter = cls.create_smart_meter(cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    @tag('standard')
+    def test_warm_up_opens_minimum_connections_success(self):
+        # when
+        opened = warm_up(timeout=5)
+        # then
+        self.assertGreaterEqual(opened[DEFAULT_DB_ALIAS], settings.DB_POOL_MIN_SIZE)
+
+    @tag('standard')
+    def test_pool_statistics_success(self):
+        # given
+        SmartMeter.objects.count()
+        # when
+        pool = pool_statistics()[DEFAULT_DB_ALIAS]
+        # then
+        # The connection of the test is borrowed from the pool
+        self.assertGreaterEqual(pool['in_use'], 1)
+        self.assertEqual(settings.DB_POOL_MAX_SIZE, pool['max_size'])
+        self.assertGreater(pool['saturation'], 0)
+        self.assertLessEqual(pool['saturation'], 1)
+        self.assertGreaterEqual(pool['requests'], 1)
+
+    @tag('standard')
+    def test_database_statistics_pools_as_admin_success(self):
+        # given
+        self.client.force_authenticate(self.create_user(is_staff=True))
+        # when
+        response = self.client.get(reverse('database_statistics'))
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertIn(DEFAULT_DB_ALIAS, response.data['pools'])
+        self.assertIn('wait_ms_avg', response.data['pools'][DEFAULT_DB_ALIAS])
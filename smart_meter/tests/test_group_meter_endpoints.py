@@ -5,7 +5,7 @@ from django.utils.dateparse import parse_datetime
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from smart_meter.models import GroupMeter, SmartMeter
+from smart_meter.models import GroupMeter, SmartMeterLive
 from smart_meter.tests.mixin import MeterTestMixin
 
 
@@ -700,12 +700,12 @@ class TestGroupLiveDataGet(MeterTestMixin, TestCase):
         cls.group_one_active = cls.create_group_meter()
         goa_1 = cls.create_group_participation(cls.create_smart_meter(), cls.group_one_active)
         goa_2 = cls.create_group_participation(cls.create_smart_meter(), cls.group_one_active)
-        SmartMeter.objects.filter(pk__in=[goa_1.meter_id, goa_2.meter_id]).update(last_update=long_time_ago)
+        SmartMeterLive.objects.filter(pk__in=[goa_1.meter_id, goa_2.meter_id]).update(last_update=long_time_ago)
         # Third group has 3 participants, but all of them were last active a long time ago
         cls.group_inactive = cls.create_group_meter()
         cls.create_group_participation(cls.create_smart_meter(), cls.group_inactive)
         cls.create_group_participation(cls.create_smart_meter(), cls.group_inactive)
-        SmartMeter.objects.filter(groups=cls.group_inactive).update(last_update=long_time_ago)
+        SmartMeterLive.objects.filter(meter__groups=cls.group_inactive).update(last_update=long_time_ago)
 
     def setUp(self):
         self.client = APIClient()
@@ -735,7 +735,7 @@ class TestGroupLiveDataGet(MeterTestMixin, TestCase):
     def test_group_live_data_get_all_meters_inactive_as_nodejs_success(self):
         # given
         long_time_ago = timezone.now() - timezone.timedelta(seconds=16)
-        SmartMeter.objects.update(last_update=long_time_ago)
+        SmartMeterLive.objects.update(last_update=long_time_ago)
         params = {
             'groups': ','.join([
                 str(self.group_all_active.pk),
@@ -1,7 +1,7 @@
 from django.test import TestCase, tag
 from django.utils import timezone
 
-from smart_meter.models import GroupMeter, SmartMeter
+from smart_meter.models import GroupMeter, SmartMeterLive
 from smart_meter.tests.mixin import MeterTestMixin
 
 
@@ -101,11 +101,11 @@ class TestGroupMeterModel(MeterTestMixin, TestCase):
         group_one_active = self.create_group_meter()
         goa_1 = self.create_group_participation(self.create_smart_meter(), group_one_active)
         goa_2 = self.create_group_participation(self.create_smart_meter(), group_one_active)
-        SmartMeter.objects.filter(pk__in=[goa_1.meter_id, goa_2.meter_id]).update(last_update=long_time_ago)
+        SmartMeterLive.objects.filter(pk__in=[goa_1.meter_id, goa_2.meter_id]).update(last_update=long_time_ago)
         group_inactive = self.create_group_meter()
         self.create_group_participation(self.create_smart_meter(), group_inactive)
         self.create_group_participation(self.create_smart_meter(), group_inactive)
-        SmartMeter.objects.filter(groups=group_inactive).update(last_update=long_time_ago)
+        SmartMeterLive.objects.filter(meter__groups=group_inactive).update(last_update=long_time_ago)
         group_ids = [group_all_active.pk, group_one_active.pk, group_inactive.pk]
         # when
         groups = GroupMeter.objects.live_groups(group_ids)
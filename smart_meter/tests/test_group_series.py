@@ -0,0 +1,160 @@
+import decimal
+
+from django.test import TestCase, tag
+from django.utils import timezone, dateparse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from smart_meter.models import GroupEnergyInterval, GroupParticipant
+from smart_meter.services.group_series import GroupSeriesAggregator, interval_start
+from smart_meter.tests.mixin import MeterTestMixin
+
+
+@tag('api')
+class TestGroupSeries(MeterTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user()
+        cls.meter = cls.create_smart_meter(cls.user)
+        cls.group = cls.create_group_meter(cls.user, cls.meter)
+        cls.other_user = cls.create_user()
+        cls.other_meter = cls.create_smart_meter(cls.other_user)
+        cls.participant = cls.create_group_participation(cls.other_meter, cls.group)
+        cls.hour = interval_start(timezone.now()) - timezone.timedelta(hours=3)
+        # The meter of the manager is in the group for a day, the other meter from 00:30 until 01:30
+        GroupParticipant.objects.filter(meter=cls.meter).update(joined_on=cls.hour - timezone.timedelta(days=1))
+        GroupParticipant.objects.filter(pk=cls.participant.pk).update(
+            joined_on=cls.minutes(30), left_on=cls.minutes(90)
+        )
+        # 5 kWh import in the second hour
+        for i, total in enumerate([10, 15]):
+            cls.create_power_measurement(cls.meter, timestamp=cls.minutes(60 * i), total_import_1=total,
+                                         total_import_2=0, total_export_1=0, total_export_2=0)
+        # 1 kWh import every 15 minutes, only 00:30, 00:45, 01:00 and 01:15 are within the participation
+        for i in range(12):
+            cls.create_power_measurement(cls.other_meter, timestamp=cls.minutes(15 * i), total_import_1=i,
+                                         total_import_2=0, total_export_1=0, total_export_2=0)
+        cls.create_gas_measurement(cls.meter, timestamp=cls.minutes(0), total_gas=decimal.Decimal(2))
+        cls.create_gas_measurement(cls.meter, timestamp=cls.minutes(5), total_gas=decimal.Decimal('2.5'))
+
+    def setUp(self):
+        self.client = APIClient()
+
+    @classmethod
+    def minutes(cls, minutes):
+        return cls.hour + timezone.timedelta(minutes=minutes)
+
+    def series(self):
+        return list(GroupEnergyInterval.objects.filter(group=self.group).order_by('timestamp').values_list(
+            'timestamp', 'power_import', 'gas'
+        ))
+
+    @tag('standard')
+    def test_rebuild_within_participation_windows_success(self):
+        # when
+        rebuilt = GroupSeriesAggregator().rebuild(self.group.pk)
+        # then
+        self.assertEqual(2, rebuilt)
+        self.assertEqual([
+            (self.minutes(0), decimal.Decimal(2), decimal.Decimal('0.5')),
+            (self.minutes(60), decimal.Decimal(7), decimal.Decimal(0)),
+        ], self.series())
+
+    @tag('standard')
+    def test_new_measurement_added_incrementally_success(self):
+        # given
+        GroupSeriesAggregator().rebuild(self.group.pk)
+        self.client.force_authenticate(self.user)
+        payload = {
+            'power': {
+                'sn': self.meter.sn_power, 'timestamp': self.minutes(130), 'import_1': decimal.Decimal(18),
+                'import_2': 0, 'export_1': 0, 'export_2': 0, 'actual_import': 1, 'actual_export': 0, 'tariff': 1,
+            },
+        }
+        # when
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.post(self.MeterUrls.new_measurement_url(), payload, format='json')
+        # then
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+        # Added after the ingest is committed
+        self.assertEqual(1, len(callbacks))
+        series = self.series()
+        self.assertEqual((self.minutes(120), decimal.Decimal(3), decimal.Decimal(0)), series[-1])
+        # The same as rebuilding the series
+        GroupSeriesAggregator().rebuild(self.group.pk)
+        self.assertEqual(series, self.series())
+
+    @tag('standard')
+    def test_measurement_outside_participation_not_added_success(self):
+        # given
+        measurement = self.create_power_measurement(self.other_meter, timestamp=self.minutes(200), total_import_1=20,
+                                                    total_import_2=0, total_export_1=0, total_export_2=0)
+        # when
+        updated = GroupSeriesAggregator().add_measurements(self.other_meter.pk, [measurement])
+        # then
+        self.assertEqual(0, updated)
+        self.assertFalse(GroupEnergyInterval.objects.exists())
+
+    @tag('standard')
+    def test_deleted_participant_removed_from_series_success(self):
+        # given
+        GroupSeriesAggregator().rebuild(self.group.pk)
+        self.client.force_authenticate(self.user)
+        # when
+        response = self.client.delete(self.MeterUrls.group_participant_url(self.group.pk, self.participant.pk))
+        # then
+        self.assertEqual(status.HTTP_204_NO_CONTENT, response.status_code)
+        self.assertEqual([
+            (self.minutes(0), decimal.Decimal(0), decimal.Decimal('0.5')),
+            (self.minutes(60), decimal.Decimal(5), decimal.Decimal(0)),
+        ], self.series())
+
+    @tag('standard')
+    def test_remove_participation_same_as_rebuild_success(self):
+        # given
+        GroupSeriesAggregator().rebuild(self.group.pk)
+        GroupParticipant.objects.filter(pk=self.participant.pk).delete()
+        # when
+        updated = GroupSeriesAggregator().remove_participation(self.group.pk, self.other_meter.pk, self.minutes(30),
+                                                               self.minutes(90))
+        # then
+        self.assertEqual(2, updated)
+        series = self.series()
+        GroupSeriesAggregator().rebuild(self.group.pk)
+        self.assertEqual(self.series(), series)
+
+    @tag('standard')
+    def test_group_energy_series_get_as_participant_success(self):
+        # given
+        GroupSeriesAggregator().rebuild(self.group.pk)
+        self.client.force_authenticate(self.user)
+        # when
+        response = self.client.get(self.MeterUrls.group_energy_series_url(self.group.pk), {
+            'timestamp_after': self.minutes(30), 'timestamp_before': self.minutes(180),
+        })
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(1, len(response.data))
+        self.assertEqual(self.minutes(60), dateparse.parse_datetime(response.data[0]['timestamp']))
+        self.assertEqual('7.000', response.data[0]['power_import'])
+        self.assertEqual('0.000', response.data[0]['power_export'])
+
+    @tag('filter')
+    def test_group_energy_series_get_without_range_fail(self):
+        # given
+        self.client.force_authenticate(self.user)
+        # when
+        response = self.client.get(self.MeterUrls.group_energy_series_url(self.group.pk))
+        # then
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    @tag('permission')
+    def test_group_energy_series_get_as_other_user_fail_forbidden(self):
+        # given
+        self.client.force_authenticate(self.create_user())
+        # when
+        response = self.client.get(self.MeterUrls.group_energy_series_url(self.group.pk), {
+            'timestamp_after': self.minutes(0), 'timestamp_before': self.minutes(180),
+        })
+        # then
+        self.assertEqual(status.HTTP_403_FORBIDDEN, response.status_code)
@@ -0,0 +1,110 @@
+import csv
+import decimal
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime, timezone as dt_timezone
+
+from django.test import TestCase, tag, override_settings
+from django.utils import timezone
+
+from smart_meter.models import PowerMeasurement
+from smart_meter.services.archive import MeasurementArchiver, encode_columns, decode_columns
+from smart_meter.services.export_data import MeterDataExporter
+from smart_meter.tests.mixin import MeterTestMixin
+
+
+@tag('model')
+class TestMeasurementArchive(MeterTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.meter = cls.create_smart_meter()
+        cls.new_year = datetime(2021, 1, 1, tzinfo=dt_timezone.utc)
+        # Measurements every 10 minutes around new year 2021
+        for i in range(-12, 12):
+            cls.create_power_measurement(
+                cls.meter,
+                timestamp=cls.new_year + timezone.timedelta(minutes=10 * i),
+                total_import_1=decimal.Decimal(100 + i) / 4,
+            )
+
+    def setUp(self):
+        archive_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_root)
+        settings_override = override_settings(MEASUREMENT_ARCHIVE_ROOT=archive_root, MEDIA_ROOT=archive_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.archiver = MeasurementArchiver(PowerMeasurement)
+
+    @tag('standard')
+    def test_encode_decode_columns_success(self):
+        # given
+        columns = [[1, -2, 3], [2 ** 40, 0, -(2 ** 40)]]
+        # when
+        header, decoded = decode_columns(encode_columns({'rows': 3}, columns))
+        # then
+        self.assertEqual({'rows': 3}, header)
+        self.assertEqual(columns, [list(column) for column in decoded])
+
+    @tag('standard')
+    def test_archive_and_restore_year_success(self):
+        # given
+        fields = ['timestamp'] + self.archiver.fields
+        original = list(PowerMeasurement.objects.filter(meter=self.meter).order_by('timestamp').values_list(*fields))
+        # when
+        archived = self.archiver.archive_year(self.meter.pk, 2020)
+        # then
+        self.assertEqual(12, archived)
+        self.assertTrue(os.path.exists(self.archiver.path(self.meter.pk, 2020)))
+        self.assertEqual(12, PowerMeasurement.objects.filter(meter=self.meter).count())
+        self.assertEqual(original[:12], list(self.archiver.read(self.meter.pk)))
+
+        # when
+        with self.captureOnCommitCallbacks(execute=True):
+            restored = self.archiver.restore(self.meter.pk)
+        # then
+        self.assertEqual(12, restored)
+        self.assertEqual(original, list(PowerMeasurement.objects.filter(meter=self.meter).order_by('timestamp')
+                                        .values_list(*fields)))
+        self.assertEqual([], self.archiver.archived_years(self.meter.pk))
+
+    @tag('standard')
+    def test_archive_keeps_recent_years_of_active_meters_success(self):
+        # given
+        recent = self.create_power_measurement(self.meter)
+        # when
+        archived = self.archiver.archive(years=3, inactive_days=365)
+        # then
+        self.assertEqual(24, archived)
+        self.assertEqual([2020, 2021], self.archiver.archived_years(self.meter.pk))
+        self.assertEqual([recent.pk], list(PowerMeasurement.objects.filter(meter=self.meter)
+                                           .values_list('pk', flat=True)))
+
+    @tag('standard')
+    def test_filter_timestamp_merges_archive_success(self):
+        # given
+        after, before = self.new_year - timezone.timedelta(hours=3), self.new_year + timezone.timedelta(hours=3)
+        expected = list(PowerMeasurement.objects.filter(meter=self.meter).filter_timestamp(after, before))
+        self.archiver.archive_year(self.meter.pk, 2020)
+        # when
+        buckets = list(PowerMeasurement.objects.filter(meter=self.meter).filter_timestamp(after, before))
+        # then
+        self.assertEqual([bucket['timestamp'] for bucket in expected], [bucket['timestamp'] for bucket in buckets])
+        self.assertEqual([bucket['total_import_1'] for bucket in expected],
+                         [bucket['total_import_1'] for bucket in buckets])
+        self.assertIsNone(buckets[0]['id'])
+        self.assertIsNotNone(buckets[-1]['id'])
+
+    @tag('standard')
+    def test_export_includes_archived_measurements_success(self):
+        # given
+        self.archiver.archive_year(self.meter.pk, 2020)
+        # when
+        file_path = MeterDataExporter(self.meter).export_to_zip()
+        # then
+        with zipfile.ZipFile(file_path) as zipf:
+            rows = list(csv.reader(io.TextIOWrapper(zipf.open('power.csv'), encoding='utf-8')))
+        self.assertEqual(25, len(rows))
+        self.assertEqual('2020-12-31 22:00:00', rows[1][0])
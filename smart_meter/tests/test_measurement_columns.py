@@ -0,0 +1,100 @@
+import json
+
+from django.test import TestCase, tag
+from django.utils import timezone
+from rest_framework import status
+
+from smart_meter.tests.mixin import MeasurementListTestMixin
+
+
+@tag('api')
+class TestMeasurementColumns(MeasurementListTestMixin, TestCase):
+    @tag('standard')
+    def test_power_measurement_list_columnar_success(self):
+        # given
+        rows = self.get_power()
+        # when
+        response = self.get_power(columnar=True)
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        data = response.json()
+        # The first measurement of every day is at midnight UTC
+        self.assertEqual(int(self.start.timestamp()), data['start'])
+        self.assertEqual(86400, data['step'])
+        self.assertIsNone(data['timestamp'])
+        self.assertEqual([3] + [4] * 9, data['total_import_1'])
+        self.assertEqual([float(row['actual_import']) for row in rows.json()], data['actual_import'])
+        self.assertLess(len(response.content), len(rows.content) / 2)
+
+    @tag('standard')
+    def test_power_measurement_list_columnar_uneven_success(self):
+        # given
+        self.create_power_measurement(self.meter, timestamp=self.start - timezone.timedelta(hours=3))
+        # when
+        response = self.get_power(timestamp_after=self.start - timezone.timedelta(days=1), columnar=True,
+                                  ordering='-timestamp')
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        data = response.json()
+        self.assertIsNone(data['step'])
+        self.assertEqual(11, len(data['timestamp']))
+        self.assertEqual(int(self.start.timestamp()) - 3 * 3600, data['timestamp'][-1])
+
+    @tag('standard')
+    def test_gas_measurement_list_columnar_gaps_success(self):
+        # when
+        response = self.client.get(self.MeterUrls.gas_measurement_url(self.user.pk, self.meter.pk),
+                                   {**self.filter_data, 'gaps': 'null', 'columnar': True})
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        results = response.json()['results']
+        self.assertEqual(21, len(results['total_gas']))
+        self.assertEqual([None] * 19, results['actual_gas'][2:])
+        self.assertEqual(1, len(response.json()['gaps']))
+
+    @tag('standard')
+    def test_power_measurement_list_columnar_page_success(self):
+        # when
+        response = self.get_power(columnar=True, page_size=4)
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(4, len(response.data['results']['total_import_1']))
+        self.assertIsNotNone(response.data['next'])
+
+    @tag('standard')
+    def test_meter_detail_measurements_columnar_success(self):
+        # given
+        params = {**self.filter_data, 'measurements': True}
+        url = self.MeterUrls.user_meter_url(self.user.pk, self.meter.pk)
+        rows = self.client.get(url, params).json()
+        # when
+        response = self.client.get(url, {**params, 'columnar': True})
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        data = response.json()
+        self.assertEqual([row[3] for row in rows['power_set']], data['power_set']['total_import_1'])
+        self.assertEqual([row[2] for row in rows['gas_set']], data['gas_set']['total_gas'])
+        self.assertEqual({'start': None, 'step': None, 'timestamp': [], 'actual_solar': [], 'total_solar': []},
+                         data['solar_set'])
+        self.assertEqual(rows['period_import_1'], data['period_import_1'])
+
+    @tag('standard')
+    def test_meter_series_columnar_success(self):
+        # when
+        response = self.client.get(self.MeterUrls.meter_series_url(self.user.pk, self.meter.pk),
+                                   {**self.filter_data, 'columnar': True})
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        results = response.json()['results']
+        # The aligned series has a bucket for every day of the range
+        self.assertEqual(86400, results['step'])
+        self.assertEqual(21, len(results['total_import_1']))
+        self.assertEqual([3.0, 4.0] + [None] * 19, results['total_gas'])
+
+    @tag('filter')
+    def test_power_measurement_list_columnar_stream_fail(self):
+        # when
+        response = self.get_power(columnar=True, stream=True)
+        # then
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertIn('streamed', json.dumps(response.json()))
@@ -0,0 +1,62 @@
+import decimal
+from datetime import datetime, timezone as dt_timezone
+
+from django.test import TestCase, tag
+from django.utils import timezone
+
+from smart_meter.models import PowerMeasurement
+from smart_meter.services.compaction import MeasurementCompactor
+from smart_meter.tests.mixin import MeterTestMixin
+
+
+@tag('model')
+class TestMeasurementCompaction(MeterTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.meter = cls.create_smart_meter()
+        cls.old_hour = datetime(2020, 5, 4, 10, 0, tzinfo=dt_timezone.utc)
+        # Two hours of raw measurements, every 5 minutes
+        for i in range(24):
+            cls.create_power_measurement(
+                cls.meter,
+                timestamp=cls.old_hour + timezone.timedelta(minutes=5 * i),
+                actual_import=decimal.Decimal(i % 2),
+                total_import_1=decimal.Decimal(i),
+            )
+        cls.recent = cls.create_power_measurement(cls.meter)
+        cls.compactor = MeasurementCompactor(PowerMeasurement, 13)
+
+    @tag('standard')
+    def test_compact_replaces_raw_measurements_by_hours_success(self):
+        # when
+        removed = self.compactor.compact()
+        # then
+        self.assertEqual(22, removed)
+        hours = list(PowerMeasurement.objects.filter(meter=self.meter, timestamp__lt=self.recent.timestamp)
+                     .order_by('timestamp'))
+        self.assertEqual([self.old_hour, self.old_hour + timezone.timedelta(hours=1)], [h.timestamp for h in hours])
+        self.assertEqual([decimal.Decimal('0.5'), decimal.Decimal('0.5')], [h.actual_import for h in hours])
+        self.assertEqual([11, 23], [h.total_import_1 for h in hours])
+        self.assertTrue(PowerMeasurement.objects.filter(pk=self.recent.pk).exists())
+
+    @tag('standard')
+    def test_compact_twice_skips_compacted_months_success(self):
+        # given
+        self.compactor.compact()
+        # when
+        removed = self.compactor.compact()
+        # then
+        self.assertEqual(0, removed)
+        self.assertEqual(3, PowerMeasurement.objects.filter(meter=self.meter).count())
+
+    @tag('standard')
+    def test_filter_timestamp_on_compacted_measurements_success(self):
+        # given
+        self.compactor.compact()
+        # when
+        buckets = list(PowerMeasurement.objects.filter(meter=self.meter).filter_timestamp(
+            self.old_hour - timezone.timedelta(hours=1), self.old_hour + timezone.timedelta(hours=3)
+        ))
+        # then
+        self.assertEqual(2, len(buckets))
+        self.assertEqual(12, buckets[1]['total_import_1'])
@@ -0,0 +1,85 @@
+import decimal
+import io
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management import call_command
+from django.test import TestCase, tag
+from django.utils import timezone
+
+from smart_meter.models import PowerMeasurement, GasMeasurement
+from smart_meter.services.deltas import MeasurementDeltaCalculator
+from smart_meter.tests.mixin import MeterTestMixin
+
+
+@tag('model')
+class TestMeasurementDeltas(MeterTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.meter = cls.create_smart_meter()
+        cls.start = datetime(2021, 3, 31, 23, 30, tzinfo=dt_timezone.utc)
+        # Gas counter every 10 minutes, reset to 0 at 00:10 (the third measurement)
+        cls.totals = ['10.000', '10.250', '0.000', '0.125', '0.500']
+        for i, total in enumerate(cls.totals):
+            cls.create_gas_measurement(
+                cls.meter, timestamp=cls.start + timezone.timedelta(minutes=10 * i), total_gas=decimal.Decimal(total)
+            )
+
+    def deltas(self):
+        return list(GasMeasurement.objects.filter(meter=self.meter).order_by('timestamp')
+                    .values_list('delta_gas', flat=True))
+
+    @tag('standard')
+    def test_deltas_set_at_ingest_with_reset_clamped_success(self):
+        # then
+        self.assertEqual([decimal.Decimal(d) for d in ['0', '0.25', '0', '0.125', '0.375']], self.deltas())
+
+    @tag('standard')
+    def test_add_new_measurement_uses_previous_measurement_success(self):
+        # given
+        last = GasMeasurement.objects.filter(meter=self.meter).order_by('timestamp').last()
+        # when
+        measurement = self.meter.gasmeasurement_set.add_new_gas_measurement(
+            False, last, last.timestamp + timezone.timedelta(minutes=10), decimal.Decimal('1.5')
+        )
+        # then
+        self.assertEqual(decimal.Decimal('1.0'), measurement.delta_gas)
+
+    @tag('standard')
+    def test_period_and_bucket_totals_sum_deltas_success(self):
+        # given
+        measurements = GasMeasurement.objects.filter(meter=self.meter)
+        after, before = self.start + timezone.timedelta(minutes=5), self.start + timezone.timedelta(minutes=40)
+        # when
+        period = measurements.filter(timestamp__gte=after, timestamp__lte=before).period_total('total_gas')
+        buckets = list(measurements.filter_timestamp(after, before))
+        # then
+        # Usage up to the reset and after it, the usage into the first measurement of the range is included
+        self.assertEqual(decimal.Decimal('0.75'), period)
+        self.assertEqual(period, sum(bucket['total_gas'] for bucket in buckets))
+
+    @tag('standard')
+    def test_backfill_calculates_deltas_success(self):
+        # given
+        expected = self.deltas()
+        GasMeasurement.objects.update(delta_gas=0)
+        # when
+        call_command('backfill_measurement_deltas', type='gas', stdout=io.StringIO())
+        # then
+        self.assertEqual(expected, self.deltas())
+        self.assertEqual(0, MeasurementDeltaCalculator(GasMeasurement).backfill())
+
+    @tag('standard')
+    def test_backfill_compares_with_previous_month_success(self):
+        # given
+        PowerMeasurement.objects.bulk_create([
+            PowerMeasurement(meter=self.meter, timestamp=self.start + timezone.timedelta(minutes=20 * i),
+                             actual_import=0, actual_export=0, total_import_1=i, total_import_2=0,
+                             total_export_1=0, total_export_2=0)
+            for i in range(3)
+        ])
+        # when
+        updated = MeasurementDeltaCalculator(PowerMeasurement).backfill(self.meter.pk)
+        # then
+        self.assertEqual(2, updated)
+        self.assertEqual([0, 1, 1], list(PowerMeasurement.objects.filter(meter=self.meter).order_by('timestamp')
+                                         .values_list('delta_import_1', flat=True)))
@@ -0,0 +1,152 @@
+import decimal
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.test import TestCase, tag
+from django.utils import timezone, dateparse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from smart_meter.services.buckets import lttb_indexes
+from smart_meter.tests.mixin import MeterTestMixin
+
+
+@tag('api')
+class TestMeasurementDownsampling(MeterTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user()
+        cls.meter = cls.create_smart_meter(cls.user)
+        cls.start = datetime(2026, 3, 1, tzinfo=dt_timezone.utc)
+        # Gas every 3 hours for 20 days, 0.5 m3 each time, with a high actual value on the 8th day
+        for i in range(160):
+            timestamp = cls.start + timezone.timedelta(hours=3 * i)
+            cls.create_gas_measurement(cls.meter, timestamp=timestamp, total_gas=decimal.Decimal(i) / 2,
+                                       actual_gas=decimal.Decimal(9 if timestamp.day == 8 else 1))
+        # Day buckets, the measurements are in 20 local days
+        cls.filter_data = {
+            'timestamp_after': cls.start,
+            'timestamp_before': cls.start + timezone.timedelta(days=20),
+        }
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_gas(self, **params):
+        return self.client.get(self.MeterUrls.gas_measurement_url(self.user.pk, self.meter.pk),
+                               {**self.filter_data, **params})
+
+    def total(self, results):
+        return sum(decimal.Decimal(bucket['total_gas']) for bucket in results)
+
+    @tag('standard')
+    def test_gas_measurement_list_without_max_points_success(self):
+        # when
+        response = self.get_gas()
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(20, len(response.data))
+
+    @tag('standard')
+    def test_gas_measurement_list_max_points_picks_hour_buckets_success(self):
+        # when
+        response = self.get_gas(max_points=500)
+        # then
+        # 481 hours in the range, so hour buckets: one per measurement
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(160, len(response.data))
+        self.assertEqual(self.start + timezone.timedelta(hours=3),
+                         dateparse.parse_datetime(response.data[1]['timestamp']))
+        self.assertEqual(decimal.Decimal('79.5'), self.total(response.data))
+
+    @tag('standard')
+    def test_gas_measurement_list_max_points_merge_success(self):
+        # when
+        response = self.get_gas(max_points=5)
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(5, len(response.data))
+        self.assertEqual(self.start, dateparse.parse_datetime(response.data[0]['timestamp']))
+        # The usage is kept, the high day is averaged with the days it is merged with
+        self.assertEqual(decimal.Decimal('79.5'), self.total(response.data))
+        self.assertLess(max(decimal.Decimal(bucket['actual_gas']) for bucket in response.data), 9)
+
+    @tag('standard')
+    def test_gas_measurement_list_max_points_lttb_success(self):
+        # when
+        response = self.get_gas(max_points=5, downsample='lttb')
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(5, len(response.data))
+        # The first and last day are kept, and the high day
+        self.assertEqual(self.start, dateparse.parse_datetime(response.data[0]['timestamp']))
+        self.assertIn('9.000', [bucket['actual_gas'] for bucket in response.data])
+        self.assertEqual(decimal.Decimal('79.5'), self.total(response.data))
+
+    @tag('standard')
+    def test_gas_measurement_list_max_points_gaps_success(self):
+        # when
+        response = self.get_gas(max_points=5, gaps='null', ordering='-timestamp')
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(5, len(response.data['results']))
+        self.assertEqual(self.start, dateparse.parse_datetime(response.data['results'][-1]['timestamp']))
+        self.assertEqual([], response.data['gaps'])
+
+    @tag('standard')
+    def test_gas_measurement_list_max_points_lttb_gaps_success(self):
+        # given
+        meter = self.create_smart_meter(self.user)
+        # Gas every 3 hours for 20 days, without measurements from the 5th up to the 10th day
+        for i in range(160):
+            timestamp = self.start + timezone.timedelta(hours=3 * i)
+            if not 4 <= timestamp.day <= 9:
+                self.create_gas_measurement(meter, timestamp=timestamp, total_gas=decimal.Decimal(i) / 2,
+                                            actual_gas=decimal.Decimal(9 if timestamp.day == 15 else 1))
+        # when
+        response = self.client.get(self.MeterUrls.gas_measurement_url(self.user.pk, meter.pk),
+                                   {**self.filter_data, 'max_points': 8, 'downsample': 'lttb', 'gaps': 'null'})
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        results = response.data['results']
+        self.assertLessEqual(len(results), 8)
+        # Each gap is one bucket (the missing days and the last local day of the range), the other buckets are
+        # selected on their shape
+        self.assertEqual(2, len([bucket for bucket in results if bucket['actual_gas'] is None]))
+        self.assertEqual(2, len(response.data['gaps']))
+        self.assertIn('9.000', [bucket['actual_gas'] for bucket in results])
+        # The usage during the gap is in the first bucket after it
+        self.assertEqual(decimal.Decimal('79.5'), self.total(bucket for bucket in results if bucket['total_gas']))
+
+    @tag('filter')
+    def test_gas_measurement_list_max_points_invalid_fail(self):
+        # when
+        responses = [self.get_gas(max_points=2), self.get_gas(max_points='many'), self.get_gas(max_points=1000000),
+                     self.get_gas(max_points=10, downsample='random')]
+        # then
+        self.assertEqual([status.HTTP_400_BAD_REQUEST] * 4, [response.status_code for response in responses])
+
+    @tag('standard')
+    def test_meter_detail_measurements_max_points_success(self):
+        # when
+        response = self.client.get(self.MeterUrls.user_meter_url(self.user.pk, self.meter.pk),
+                                   {**self.filter_data, 'measurements': True, 'max_points': 5, 'downsample': 'lttb'})
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(5, len(response.data['gas_set']))
+        self.assertEqual(decimal.Decimal('79.5'), response.data['period_gas'])
+
+    @tag('standard')
+    def test_lttb_keeps_peak_success(self):
+        # given
+        x = np.arange(1000, dtype=np.float64)
+        y = np.sin(x / 100)
+        y[500] = 10
+        # when
+        indexes = lttb_indexes(x, y, 20)
+        # then
+        self.assertEqual(20, len(indexes))
+        self.assertEqual([0, 999], [indexes[0], indexes[-1]])
+        self.assertIn(500, indexes)
+        self.assertTrue(np.all(np.diff(indexes) > 0))
@@ -0,0 +1,124 @@
+import decimal
+from datetime import datetime, timezone as dt_timezone
+
+from django.test import TestCase, tag
+from django.utils import timezone, dateparse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from smart_meter.tests.mixin import MeterTestMixin
+
+
+@tag('api')
+class TestMeasurementGaps(MeterTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user()
+        cls.meter = cls.create_smart_meter(cls.user)
+        cls.start = datetime(2021, 3, 1, tzinfo=dt_timezone.utc)
+        # Hourly gas measurements, the connector was offline from 06:00 until 09:00 and after 11:00
+        for hour in [0, 1, 2, 3, 4, 5, 9, 10, 11]:
+            cls.create_gas_measurement(cls.meter, timestamp=cls.start + timezone.timedelta(hours=hour),
+                                       actual_gas=decimal.Decimal(1), total_gas=decimal.Decimal(hour))
+        # Two days, in hour buckets
+        cls.filter_data = {
+            'timestamp_after': cls.start,
+            'timestamp_before': cls.start + timezone.timedelta(days=2),
+        }
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def hours(self, hours):
+        return self.start + timezone.timedelta(hours=hours)
+
+    @tag('standard')
+    def test_gas_measurement_list_without_gaps_success(self):
+        # when
+        response = self.client.get(self.MeterUrls.gas_measurement_url(self.user.pk, self.meter.pk), self.filter_data)
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(9, len(response.data))
+
+    @tag('standard')
+    def test_gas_measurement_list_gaps_null_success(self):
+        # when
+        response = self.client.get(self.MeterUrls.gas_measurement_url(self.user.pk, self.meter.pk),
+                                   {**self.filter_data, 'gaps': 'null'})
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        results = response.data['results']
+        # Every hour of the range, 00:00 up to and including 00:00 two days later
+        self.assertEqual(49, len(results))
+        self.assertEqual(self.hours(6), dateparse.parse_datetime(results[6]['timestamp']))
+        self.assertIsNone(results[6]['actual_gas'])
+        self.assertIsNone(results[6]['total_gas'])
+        # The usage during the gap is in the first bucket after it
+        self.assertEqual('4.000', results[9]['total_gas'])
+        self.assertEqual([
+            {'start': self.hours(6), 'end': self.hours(9), 'buckets': 3},
+            {'start': self.hours(12), 'end': self.hours(48), 'buckets': 37},
+        ], [
+            {**gap, 'start': dateparse.parse_datetime(gap['start']), 'end': dateparse.parse_datetime(gap['end'])}
+            for gap in response.data['gaps']
+        ])
+
+    @tag('standard')
+    def test_gas_measurement_list_gaps_carry_descending_success(self):
+        # when
+        response = self.client.get(self.MeterUrls.gas_measurement_url(self.user.pk, self.meter.pk),
+                                   {**self.filter_data, 'gaps': 'carry', 'ordering': '-timestamp'})
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        results = response.data['results']
+        self.assertEqual(49, len(results))
+        self.assertEqual(self.hours(48), dateparse.parse_datetime(results[0]['timestamp']))
+        # The counter is carried forward, no usage in the empty bucket
+        self.assertIsNone(results[48 - 7]['actual_gas'])
+        self.assertEqual('0.000', results[48 - 7]['total_gas'])
+        self.assertEqual(2, len(response.data['gaps']))
+
+    @tag('filter')
+    def test_gas_measurement_list_gaps_invalid_fail(self):
+        # when
+        response = self.client.get(self.MeterUrls.gas_measurement_url(self.user.pk, self.meter.pk),
+                                   {**self.filter_data, 'gaps': 'interpolate'})
+        # then
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    @tag('standard')
+    def test_meter_detail_measurements_gaps_success(self):
+        # when
+        response = self.client.get(self.MeterUrls.user_meter_url(self.user.pk, self.meter.pk),
+                                   {**self.filter_data, 'measurements': True, 'gaps': 'null'})
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(49, len(response.data['gas_set']))
+        self.assertEqual(49, len(response.data['power_set']))
+        self.assertEqual(2, len(response.data['gaps']['gas']))
+        self.assertEqual(1, len(response.data['gaps']['power']))
+        self.assertEqual(49, response.data['gaps']['power'][0]['buckets'])
+
+    @tag('standard')
+    def test_gas_measurement_list_gaps_end_of_dst_success(self):
+        # given
+        meter = self.create_smart_meter(self.user)
+        # Every half hour over the end of summer time (Sunday 25 October 2026, 03:00 to 02:00 local time at 01:00 UTC)
+        start = datetime(2026, 10, 24, tzinfo=dt_timezone.utc)
+        for i in range(6 * 24 + 1):
+            self.create_gas_measurement(meter, timestamp=start + timezone.timedelta(minutes=30 * i),
+                                        actual_gas=decimal.Decimal(1), total_gas=decimal.Decimal(i))
+        # when
+        response = self.client.get(self.MeterUrls.gas_measurement_url(self.user.pk, meter.pk), {
+            'timestamp_after': start, 'timestamp_before': start + timezone.timedelta(days=3), 'gaps': 'null',
+        })
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        results = response.data['results']
+        # The two local hours from 02:00 are one bucket, without a gap after it
+        self.assertEqual([], response.data['gaps'])
+        self.assertEqual(3 * 24, len(results))
+        fold = datetime(2026, 10, 25, 0, tzinfo=dt_timezone.utc)
+        bucket = next(result for result in results if dateparse.parse_datetime(result['timestamp']) == fold)
+        self.assertEqual('4.000', bucket['total_gas'])
@@ -0,0 +1,59 @@
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.test import TestCase, tag
+from django.utils import timezone
+
+from smart_meter.fields import local_date, local_hour
+from smart_meter.models import PowerMeasurement
+from smart_meter.tests.mixin import MeterTestMixin
+
+
+@tag('model')
+class TestMeasurementLocalTime(MeterTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.meter = cls.create_smart_meter()
+        # Every 30 minutes around the start of summer time (Sunday 28 March 2021, 02:00 local becomes 03:00), 23:00
+        # UTC is 00:00 local on the 28th, 22:00 UTC is 00:00 local on the 29th
+        cls.start = datetime(2021, 3, 27, 22, 30, tzinfo=dt_timezone.utc)
+        for i in range(50):
+            cls.create_power_measurement(cls.meter, timestamp=cls.start + timezone.timedelta(minutes=30 * i),
+                                         total_import_1=i, total_import_2=0)
+
+    @tag('standard')
+    def test_local_date_and_hour_expressions_success(self):
+        # when
+        measurements = PowerMeasurement.objects.filter(meter=self.meter).order_by('timestamp')
+        local = list(measurements.annotate(local_date=local_date(), local_hour=local_hour()).values_list(
+            'timestamp', 'local_date', 'local_hour'
+        ))
+        # then
+        for timestamp, day, hour in local:
+            self.assertEqual(timezone.localtime(timestamp).date(), day)
+            self.assertEqual(timezone.localtime(timestamp).hour, hour)
+        # 01:30 local is followed by 03:00 local
+        self.assertEqual([1, 3], [hour for _, _, hour in local[4:6]])
+
+    @tag('standard')
+    def test_day_buckets_on_local_date_success(self):
+        # when
+        buckets = list(PowerMeasurement.objects.filter(meter=self.meter).filter_timestamp(
+            self.start, self.start + timezone.timedelta(days=14)
+        ))
+        # then
+        self.assertEqual([date(2021, 3, 27), date(2021, 3, 28), date(2021, 3, 29)],
+                         [timezone.localdate(bucket['timestamp']) for bucket in buckets])
+        # The 28th has 23 hours, 46 measurements. The first measurement has no usage
+        self.assertEqual([0, 46, 3], [int(bucket['total_import_1']) for bucket in buckets])
+
+    @tag('standard')
+    def test_hour_buckets_on_local_hour_success(self):
+        # when
+        buckets = list(PowerMeasurement.objects.filter(meter=self.meter).filter_timestamp(
+            self.start, self.start + timezone.timedelta(days=2)
+        ))
+        # then
+        # 23:00 on the 27th, the 23 hours of the 28th, 00:00 and 01:00 on the 29th
+        self.assertEqual(26, len(buckets))
+        self.assertEqual(self.start, buckets[0]['timestamp'])
+        self.assertEqual(self.start + timezone.timedelta(hours=24, minutes=30), buckets[-1]['timestamp'])
@@ -0,0 +1,130 @@
+import csv
+import decimal
+import io
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime, date, timezone as dt_timezone
+
+from django.test import TestCase, tag, override_settings
+from django.utils import timezone
+
+from smart_meter.models import PowerMeasurement, PowerMeasurementDay
+from smart_meter.services.export_data import MeterDataExporter
+from smart_meter.services.packing import MeasurementPacker
+from smart_meter.tests.mixin import MeterTestMixin
+
+
+@tag('model')
+@override_settings(MEASUREMENT_PACK_AFTER_DAYS=30)
+class TestMeasurementPacking(MeterTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.meter = cls.create_smart_meter()
+        cls.day = datetime(2021, 3, 1, tzinfo=dt_timezone.utc)
+        # Measurements every 10 minutes on the evening of 2021-02-28 and the morning of 2021-03-01
+        for i in range(-12, 12):
+            cls.create_power_measurement(
+                cls.meter,
+                timestamp=cls.day + timezone.timedelta(minutes=10 * i, seconds=7),
+                actual_import=decimal.Decimal(i % 5) / 8,
+                total_import_1=decimal.Decimal(100 + i) / 4,
+            )
+
+    def setUp(self):
+        self.packer = MeasurementPacker(PowerMeasurement)
+        self.fields = ['timestamp'] + self.packer.fields
+
+    @tag('standard')
+    def test_pack_and_unpack_success(self):
+        # given
+        original = list(PowerMeasurement.objects.filter(meter=self.meter).order_by('timestamp')
+                        .values_list(*self.fields))
+        # when
+        packed = self.packer.pack(self.day + timezone.timedelta(days=1))
+        # then
+        self.assertEqual(24, packed)
+        self.assertFalse(PowerMeasurement.objects.filter(meter=self.meter).exists())
+        self.assertEqual([date(2021, 2, 28), date(2021, 3, 1)],
+                         list(PowerMeasurementDay.objects.order_by('date').values_list('date', flat=True)))
+        self.assertEqual(original, list(self.packer.read(self.meter.pk)))
+
+        # when
+        unpacked = self.packer.unpack(self.meter.pk)
+        # then
+        self.assertEqual(24, unpacked)
+        self.assertFalse(PowerMeasurementDay.objects.exists())
+        self.assertEqual(original, list(PowerMeasurement.objects.filter(meter=self.meter).order_by('timestamp')
+                                        .values_list(*self.fields)))
+
+    @tag('standard')
+    def test_pack_day_merges_with_packed_measurements_success(self):
+        # given
+        self.packer.pack_day(self.meter.pk, date(2021, 3, 1))
+        late = self.create_power_measurement(self.meter, timestamp=self.day + timezone.timedelta(hours=5))
+        # when
+        packed = self.packer.pack_day(self.meter.pk, date(2021, 3, 1))
+        # then
+        self.assertEqual(1, packed)
+        packed_day = PowerMeasurementDay.objects.get(meter=self.meter, date=date(2021, 3, 1))
+        self.assertEqual(13, len(packed_day.seconds))
+        self.assertEqual(5 * 3600, packed_day.seconds[-1])
+        self.assertFalse(PowerMeasurement.objects.filter(pk=late.pk).exists())
+
+    @tag('standard')
+    def test_pack_day_sub_second_timestamps_not_packed_success(self):
+        # given
+        self.create_power_measurement(self.meter, timestamp=self.day + timezone.timedelta(hours=5, microseconds=500))
+        # when
+        packed = self.packer.pack_day(self.meter.pk, date(2021, 3, 1))
+        # then
+        self.assertEqual(0, packed)
+        self.assertFalse(PowerMeasurementDay.objects.exists())
+        self.assertEqual(13, PowerMeasurement.objects.filter(meter=self.meter, timestamp__gte=self.day).count())
+
+    @tag('standard')
+    def test_filter_timestamp_merges_packed_days_success(self):
+        # given
+        after, before = self.day - timezone.timedelta(hours=3), self.day + timezone.timedelta(hours=3)
+        expected = list(PowerMeasurement.objects.filter(meter=self.meter).filter_timestamp(after, before))
+        self.packer.pack_day(self.meter.pk, date(2021, 2, 28))
+        # when
+        buckets = list(PowerMeasurement.objects.filter(meter=self.meter).filter_timestamp(after, before))
+        # then
+        self.assertEqual(len(expected), len(buckets))
+        for field in self.fields:
+            self.assertEqual([bucket[field] for bucket in expected], [bucket[field] for bucket in buckets])
+        self.assertIsNone(buckets[0]['id'])
+        self.assertEqual(expected[-1]['id'], buckets[-1]['id'])
+
+    @tag('standard')
+    def test_filter_timestamp_packed_days_usage_since_previous_measurement_success(self):
+        # given
+        # The range starts in the packed day, after its first measurements
+        after, before = self.day - timezone.timedelta(hours=1), self.day + timezone.timedelta(hours=3)
+        measurements = PowerMeasurement.objects.filter(meter=self.meter)
+        expected = list(measurements.filter_timestamp(after, before))
+        period = measurements.filter(timestamp__range=(after, before)).period_total('total_import_1')
+        self.packer.pack_day(self.meter.pk, date(2021, 2, 28))
+        # when
+        buckets = list(measurements.filter_timestamp(after, before))
+        # then
+        self.assertEqual([bucket['total_import_1'] for bucket in expected],
+                         [bucket['total_import_1'] for bucket in buckets])
+        self.assertEqual(decimal.Decimal('0.25'), buckets[0]['total_import_1'])
+        self.assertEqual(period, sum(bucket['total_import_1'] for bucket in buckets))
+
+    @tag('standard')
+    def test_export_includes_packed_measurements_success(self):
+        # given
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.packer.pack_day(self.meter.pk, date(2021, 2, 28))
+        # when
+        with override_settings(MEDIA_ROOT=media_root, MEASUREMENT_ARCHIVE_ROOT=media_root):
+            file_path = MeterDataExporter(self.meter).export_to_zip()
+        # then
+        with zipfile.ZipFile(file_path) as zipf:
+            rows = list(csv.reader(io.TextIOWrapper(zipf.open('power.csv'), encoding='utf-8')))
+        self.assertEqual(25, len(rows))
+        self.assertEqual('2021-02-28 22:00:07', rows[1][0])
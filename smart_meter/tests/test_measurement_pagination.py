@@ -0,0 +1,140 @@
+import decimal
+from datetime import date
+
+from django.test import TestCase, tag, override_settings
+from django.utils import timezone
+from rest_framework import status
+
+from smart_meter.models import PowerMeasurement
+from smart_meter.services.packing import MeasurementPacker
+from smart_meter.sharding import is_sharded
+from smart_meter.tests.mixin import MeasurementListTestMixin
+
+
+@tag('api')
+class TestMeasurementPagination(MeasurementListTestMixin, TestCase):
+    def get_pages(self, **params):
+        """Results of all pages, following the next links"""
+        response = self.get_power(**params)
+        pages = []
+        while True:
+            self.assertEqual(status.HTTP_200_OK, response.status_code)
+            pages.append(response.data['results'])
+            if not response.data['next']:
+                return pages
+            response = self.client.get(response.data['next'])
+
+    @tag('standard')
+    def test_power_measurement_list_without_page_size_success(self):
+        # when
+        response = self.get_power()
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(10, len(response.data))
+
+    @tag('standard')
+    def test_power_measurement_list_pages_success(self):
+        # given
+        buckets = self.get_power().data
+        # when
+        pages = self.get_pages(page_size=3)
+        # then
+        # A bucket is never split over pages
+        self.assertEqual([3, 3, 3, 1], [len(page) for page in pages])
+        self.assertEqual(buckets, [bucket for page in pages for bucket in page])
+        # The first measurement has no usage
+        self.assertEqual(['3.000'] + ['4.000'] * 9, [bucket['total_import_1'] for page in pages for bucket in page])
+
+    @tag('standard')
+    def test_power_measurement_list_pages_descending_success(self):
+        # given
+        buckets = self.get_power(ordering='-timestamp').data
+        # when
+        pages = self.get_pages(page_size=4, ordering='-timestamp')
+        # then
+        self.assertEqual([4, 4, 2], [len(page) for page in pages])
+        self.assertEqual(buckets, [bucket for page in pages for bucket in page])
+
+    @tag('standard')
+    def test_power_measurement_list_page_exact_size_success(self):
+        # when
+        pages = self.get_pages(page_size=10)
+        # then
+        self.assertEqual([10], [len(page) for page in pages])
+
+    @tag('standard')
+    def test_power_measurement_list_page_queries_success(self):
+        # given
+        next_url = self.get_power(page_size=3).data['next']
+        # when
+        # The meter for the permission (and its measurement database when sharded), and one query for the page
+        with self.assertNumQueries(3 if is_sharded() else 2):
+            response = self.client.get(next_url)
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+    @tag('standard')
+    def test_power_measurement_list_cursor_stable_success(self):
+        # given
+        next_url = self.get_power(page_size=3).data['next']
+        expected = self.client.get(next_url).data['results']
+        # A measurement in the first page
+        self.create_power_measurement(self.meter, timestamp=self.start + timezone.timedelta(hours=1))
+        # when
+        response = self.client.get(next_url)
+        # then
+        self.assertEqual(expected, response.data['results'])
+
+    @tag('standard')
+    @override_settings(MEASUREMENT_PAGE_SIZE=4)
+    def test_power_measurement_list_default_page_size_success(self):
+        # when
+        response = self.get_power()
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(4, len(response.data['results']))
+        self.assertIsNotNone(response.data['next'])
+
+    @tag('standard')
+    @override_settings(MEASUREMENT_PACK_AFTER_DAYS=30)
+    def test_power_measurement_list_pages_packed_success(self):
+        # given
+        packer = MeasurementPacker(PowerMeasurement)
+        for day in range(2, 6):
+            packer.pack_day(self.meter.pk, date(2026, 3, day))
+        buckets = self.get_power().data
+        # when
+        pages = self.get_pages(page_size=3)
+        # then
+        self.assertEqual(10, len(buckets))
+        self.assertEqual(buckets, [bucket for page in pages for bucket in page])
+        self.assertEqual(decimal.Decimal(39), sum(decimal.Decimal(bucket['total_import_1']) for bucket in buckets))
+
+    @tag('standard')
+    @override_settings(MEASUREMENT_PACK_AFTER_DAYS=30)
+    def test_power_measurement_list_pages_packed_descending_success(self):
+        # given
+        packer = MeasurementPacker(PowerMeasurement)
+        for day in range(2, 6):
+            packer.pack_day(self.meter.pk, date(2026, 3, day))
+        buckets = self.get_power(ordering='-timestamp').data
+        # when
+        pages = self.get_pages(page_size=4, ordering='-timestamp')
+        # then
+        self.assertEqual([4, 4, 2], [len(page) for page in pages])
+        self.assertEqual(buckets, [bucket for page in pages for bucket in page])
+
+    @tag('filter')
+    def test_power_measurement_list_invalid_cursor_fail(self):
+        # when
+        response = self.get_power(page_size=3, cursor='not a cursor')
+        # then
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+    @tag('filter')
+    def test_power_measurement_list_invalid_page_size_fail(self):
+        # when
+        responses = [self.get_power(page_size=0), self.get_power(page_size='all'), self.get_power(page_size=1000000),
+                     self.get_power(page_size=3, gaps='null')]
+        # then
+        self.assertEqual([status.HTTP_400_BAD_REQUEST] * 4, [response.status_code for response in responses])
@@ -0,0 +1,103 @@
+import io
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, tag
+from django.utils import timezone
+
+from smart_meter.models import PowerMeasurement
+from smart_meter.services.partitions import MeasurementPartitioner, month_start, add_months
+from smart_meter.tests.mixin import MeterTestMixin
+
+
+@tag('model')
+class TestMeasurementPartitions(MeterTestMixin, TestCase):
+    # manage_partitions manages the partitions of every measurement database
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.meter = cls.create_smart_meter()
+        cls.partitioner = MeasurementPartitioner(PowerMeasurement)
+
+    @tag('standard')
+    def test_partitions_exist_for_current_and_future_months_success(self):
+        # given
+        current = month_start(timezone.now())
+        # when
+        months = [month for name, month in self.partitioner.partitions()]
+        # then
+        for i in range(4):
+            self.assertIn(add_months(current, i), months)
+
+    @tag('standard')
+    def test_ensure_partitions_creates_missing_months_success(self):
+        # given
+        future = add_months(month_start(timezone.now()), 24)
+        # when
+        created = self.partitioner.ensure_partitions(1, now=future)
+        created_again = self.partitioner.ensure_partitions(1, now=future)
+        # then
+        self.assertEqual([self.partitioner.partition_name(future),
+                          self.partitioner.partition_name(add_months(future, 1))], created)
+        self.assertEqual([], created_again)
+
+    @tag('standard')
+    def test_measurement_stored_in_month_partition_success(self):
+        # given
+        measurement = self.create_power_measurement(self.meter)
+        name = self.partitioner.partition_name(month_start(measurement.timestamp))
+        # when
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM %s WHERE id = %%s' % name, [measurement.pk])
+            count = cursor.fetchone()[0]
+        # then
+        self.assertEqual(1, count)
+        self.assertEqual(0, self.partitioner.default_partition_count())
+
+    @tag('standard')
+    def test_time_bounded_query_prunes_partitions_success(self):
+        # given
+        now = timezone.now()
+        qs = PowerMeasurement.objects.filter(
+            meter=self.meter, timestamp__range=(now - timezone.timedelta(hours=1), now)
+        )
+        # when
+        plan = qs.explain()
+        # then
+        scanned = [name for name, month in self.partitioner.partitions() if name in plan]
+        self.assertLessEqual(len(scanned), 2)
+        self.assertNotIn(self.partitioner.default_partition_name, plan)
+
+    @tag('standard')
+    def test_expire_partitions_detaches_and_drops_old_months_success(self):
+        # given
+        old_month = datetime(2015, 3, 1, tzinfo=dt_timezone.utc)
+        self.partitioner.create_partition(old_month)
+        self.create_power_measurement(self.meter, timestamp=old_month + timezone.timedelta(days=3))
+        # The test transaction holds deferred foreign key checks, which blocks dropping the table
+        connection.cursor().execute('SET CONSTRAINTS ALL IMMEDIATE')
+        # when
+        expired = self.partitioner.expire_partitions(12, drop=True)
+        # then
+        self.assertIn(self.partitioner.partition_name(old_month), expired)
+        self.assertFalse(PowerMeasurement.objects.filter(timestamp__lt=datetime(2016, 1, 1, tzinfo=dt_timezone.utc))
+                         .exists())
+        self.assertEqual([], self.partitioner.partitions(attached=False))
+
+    @tag('standard')
+    def test_manage_partitions_moves_default_partition_rows_success(self):
+        # given
+        month = add_months(month_start(timezone.now()), 60)
+        measurement = self.create_power_measurement(self.meter, timestamp=month + timezone.timedelta(days=3),
+                                                    total_import_1=5)
+        self.assertEqual(1, self.partitioner.default_partition_count())
+        # The test transaction holds deferred foreign key checks, which blocks detaching the default partition
+        connection.cursor().execute('SET CONSTRAINTS ALL IMMEDIATE')
+        # when
+        call_command('manage_partitions', stdout=io.StringIO())
+        # then
+        self.assertIn(self.partitioner.partition_name(month), dict(self.partitioner.partitions()))
+        self.assertEqual(0, self.partitioner.default_partition_count())
+        self.assertEqual(5, PowerMeasurement.objects.get(pk=measurement.pk).total_import_1)
@@ -0,0 +1,173 @@
+import io
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.core.management import call_command
+from django.test import TestCase, tag
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from smart_meter.models import MeterQualityReport, PowerMeasurement
+from smart_meter.services.packing import to_microseconds
+from smart_meter.services.quality import MeasurementQualityScanner, SeriesScan, HOUR
+from smart_meter.tests.mixin import MeterTestMixin
+
+
+@tag('model')
+class TestMeasurementQuality(MeterTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user()
+        cls.admin = cls.create_user(is_staff=True)
+        # A week before the start of summer time (Sunday 29 March 2026, 01:00 UTC)
+        cls.meter = cls.create_smart_meter(cls.user)
+        start = datetime(2026, 3, 20, 12, tzinfo=dt_timezone.utc)
+        series = [(start + timezone.timedelta(minutes=10 * i), 1 + i / 10, 0.5) for i in range(6)]
+        # Gap of 2 days, then the counter goes down (meter replaced), then a jump of 100 kWh in 10 minutes
+        series.append((series[-1][0] + timezone.timedelta(days=2), 2, 0.5))
+        series.append((series[-1][0] + timezone.timedelta(minutes=10), 0.5, 0.5))
+        series.append((series[-1][0] + timezone.timedelta(minutes=10), 100.5, 0.5))
+        # Usage, but the counter does not change for 30 hours
+        series += [(series[-1][0] + timezone.timedelta(hours=i), 100.5, 0.5) for i in range(1, 31)]
+        series.append((series[-1][0] + timezone.timedelta(hours=1), 101, 0.5))
+        for timestamp, total, actual in series:
+            cls.create_measurement(cls.meter, timestamp, total, actual)
+
+        # Every 10 minutes around the start of summer time, with a jump of an hour at the transition
+        cls.dst_meter = cls.create_smart_meter(cls.user)
+        start = datetime(2026, 3, 28, 23, tzinfo=dt_timezone.utc)
+        for i in range(18):
+            cls.create_measurement(cls.dst_meter, start + timezone.timedelta(minutes=10 * i + (60 if i >= 12 else 0)),
+                                   1 + i / 10, 0.5)
+
+    @classmethod
+    def create_measurement(cls, meter, timestamp, total, actual):
+        cls.create_power_measurement(meter, timestamp=timestamp, total_import_1=total, total_import_2=0,
+                                     total_export_1=0, total_export_2=0, actual_import=actual)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def scan(self, *meters):
+        return MeasurementQualityScanner(days=0, workers=1).scan([meter.pk for meter in meters])
+
+    @tag('standard')
+    def test_scan_finds_issues_success(self):
+        # when
+        with_issues = self.scan(self.meter)
+        # then
+        self.assertEqual(1, with_issues)
+        report = MeterQualityReport.objects.get(meter=self.meter)
+        power = report.report['power']
+        self.assertEqual(40, power['measurements'])
+        self.assertEqual(
+            {'gaps': 1, 'negative_deltas': 1, 'spikes': 1, 'frozen': 1, 'dst': 0},
+            {issue: power[issue] for issue in ('gaps', 'negative_deltas', 'spikes', 'frozen', 'dst')},
+        )
+        self.assertEqual(48, power['longest_gap_hours'])
+        self.assertEqual(30, power['longest_frozen_hours'])
+        self.assertEqual(['2026-03-20T12:50:00+00:00'], power['examples']['gaps'])
+        self.assertEqual(4, report.issues)
+        # No gas or solar measurements
+        self.assertEqual(0, report.report['gas']['measurements'])
+
+    @tag('standard')
+    def test_scan_finds_dst_anomaly_success(self):
+        # when
+        self.scan(self.dst_meter)
+        # then
+        power = MeterQualityReport.objects.get(meter=self.dst_meter).report['power']
+        self.assertEqual(1, power['dst'])
+        self.assertEqual(['2026-03-29T02:00:00+00:00'], power['examples']['dst'])
+        self.assertEqual(0, power['gaps'])
+
+    @tag('standard')
+    def test_scan_replaces_report_success(self):
+        # given
+        self.scan(self.meter)
+        PowerMeasurement.objects.filter(meter=self.meter).delete()
+        # when
+        with_issues = self.scan(self.meter)
+        # then
+        self.assertEqual(0, with_issues)
+        self.assertEqual(0, MeterQualityReport.objects.get(meter=self.meter).issues)
+
+    @tag('standard')
+    def test_frozen_run_over_chunks_success(self):
+        # given
+        scan = SeriesScan(PowerMeasurement, 'power')
+        start = to_microseconds(datetime(2026, 1, 5, tzinfo=dt_timezone.utc))
+        timestamps = start + np.arange(40, dtype=np.int64) * HOUR
+        values = {field: np.zeros(40, np.int64) for field in PowerMeasurement.reading_fields()}
+        values['actual_import'] += 500
+        # when
+        for chunk in (slice(0, 10), slice(10, 20), slice(20, 40)):
+            scan.feed(timestamps[chunk], {field: field_values[chunk] for field, field_values in values.items()})
+        report = scan.finish()
+        # then
+        # One run of 39 hours over the three chunks
+        self.assertEqual(1, report['frozen'])
+        self.assertEqual(39, report['longest_frozen_hours'])
+        self.assertEqual(40, report['measurements'])
+
+    @tag('standard')
+    def test_command_scans_meters_success(self):
+        # when
+        call_command('scan_measurement_quality', '--days', '0', '--workers', '1', stdout=io.StringIO())
+        # then
+        self.assertEqual(
+            {self.meter.pk: 4, self.dst_meter.pk: 1},
+            dict(MeterQualityReport.objects.filter(
+                meter__in=[self.meter, self.dst_meter]
+            ).values_list('meter', 'issues')),
+        )
+
+    @tag('standard')
+    def test_quality_report_list_as_admin_success(self):
+        # given
+        self.scan(self.meter, self.dst_meter)
+        self.client.force_authenticate(self.admin)
+        # when
+        response = self.client.get(reverse('smart_meter:meter_quality_report_list'))
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual([self.meter.pk, self.dst_meter.pk], [report['meter'] for report in response.data])
+
+    @tag('filter')
+    def test_quality_report_list_filter_issue_success(self):
+        # given
+        self.scan(self.meter, self.dst_meter)
+        self.client.force_authenticate(self.admin)
+        # when
+        response = self.client.get(reverse('smart_meter:meter_quality_report_list'), {'issue': 'dst'})
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual([self.dst_meter.pk], [report['meter'] for report in response.data])
+
+    @tag('permission')
+    def test_quality_report_list_as_user_fail_forbidden(self):
+        # given
+        self.client.force_authenticate(self.user)
+        # when
+        response = self.client.get(reverse('smart_meter:meter_quality_report_list'))
+        # then
+        self.assertEqual(status.HTTP_403_FORBIDDEN, response.status_code)
+
+    @tag('standard')
+    def test_quality_report_rescan_as_admin_success(self):
+        # given
+        self.client.force_authenticate(self.admin)
+        url = reverse('smart_meter:meter_quality_report_detail', kwargs={'pk': self.meter.pk})
+        # when
+        response = self.client.post(url)
+        # then
+        self.assertEqual(status.HTTP_202_ACCEPTED, response.status_code)
+        self.assertIsNotNone(self.client.get(url).data['requested_on'])
+        # The meter is scanned by the command
+        call_command('scan_measurement_quality', '--requested', '--workers', '1', stdout=io.StringIO())
+        report = self.client.get(url).data
+        self.assertEqual(4, report['issues'])
+        self.assertIsNone(report['requested_on'])
+        self.assertFalse(MeterQualityReport.objects.filter(meter=self.dst_meter).exists())
@@ -0,0 +1,89 @@
+import json
+from datetime import date
+
+from django.test import TestCase, tag, override_settings
+from django.utils import timezone
+from rest_framework import status
+
+from smart_meter.models import PowerMeasurement
+from smart_meter.services.packing import MeasurementPacker
+from smart_meter.sharding import is_sharded
+from smart_meter.tests.mixin import MeasurementListTestMixin
+
+
+@tag('api')
+@override_settings(MEASUREMENT_STREAM_CHUNK_SIZE=3)
+class TestMeasurementStreaming(MeasurementListTestMixin, TestCase):
+    def streamed(self, response):
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertTrue(response.streaming)
+        self.assertEqual('application/json', response['Content-Type'])
+        return json.loads(b''.join(response.streaming_content))
+
+    @tag('standard')
+    def test_power_measurement_list_stream_success(self):
+        # given
+        expected = self.get_power().json()
+        # when
+        response = self.get_power(stream=True)
+        # then
+        # 10 buckets, in 4 chunks
+        self.assertEqual(10, len(expected))
+        self.assertEqual(expected, self.streamed(response))
+
+    @tag('standard')
+    def test_power_measurement_list_stream_gaps_success(self):
+        # given
+        expected = self.get_power(gaps='null', ordering='-timestamp').json()
+        # when
+        response = self.get_power(gaps='null', ordering='-timestamp', stream=True)
+        # then
+        self.assertEqual(expected, self.streamed(response))
+        self.assertEqual(1, len(expected['gaps']))
+
+    @tag('standard')
+    def test_power_measurement_list_stream_empty_success(self):
+        # when
+        response = self.get_power(timestamp_after=self.start - timezone.timedelta(days=20),
+                                  timestamp_before=self.start - timezone.timedelta(days=1), stream=True)
+        # then
+        self.assertEqual([], self.streamed(response))
+
+    @tag('standard')
+    def test_power_measurement_list_stream_reads_while_streaming_success(self):
+        # when
+        # Only the meter for the permission (and its measurement database when sharded) before the response
+        with self.assertNumQueries(2 if is_sharded() else 1):
+            response = self.get_power(stream=True)
+        # then
+        with self.assertNumQueries(1):
+            self.assertEqual(10, len(self.streamed(response)))
+
+    @tag('standard')
+    @override_settings(MEASUREMENT_PACK_AFTER_DAYS=30)
+    def test_power_measurement_list_stream_packed_success(self):
+        # given
+        expected = self.get_power().json()
+        packer = MeasurementPacker(PowerMeasurement)
+        for day in range(2, 6):
+            packer.pack_day(self.meter.pk, date(2026, 3, day))
+        # when
+        response = self.get_power(stream=True)
+        # then
+        self.assertEqual(expected, self.streamed(response))
+
+    @tag('standard')
+    def test_meter_detail_measurements_stream_success(self):
+        # given
+        params = {**self.filter_data, 'measurements': True}
+        url = self.MeterUrls.user_meter_url(self.user.pk, self.meter.pk)
+        expected = self.client.get(url, params).json()
+        # when
+        response = self.client.get(url, {**params, 'stream': True})
+        # then
+        data = self.streamed(response)
+        self.assertEqual(expected, data)
+        self.assertEqual(39, data['period_import_1'])
+        self.assertEqual(7, data['period_gas'])
+        self.assertIsNone(data['period_solar'])
+        self.assertEqual(10, len(data['power_set']))
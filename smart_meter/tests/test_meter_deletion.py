@@ -0,0 +1,76 @@
+import decimal
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.test import TestCase, tag
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from smart_meter.models import SmartMeter, PowerMeasurement, GasMeasurement, PowerMeasurementDay
+from smart_meter.services.deletion import MeterDeleter
+from smart_meter.services.packing import MeasurementPacker
+from smart_meter.tests.mixin import MeterTestMixin
+from users.models import User
+
+
+@tag('api')
+class TestMeterDeletion(MeterTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user()
+        cls.meter = cls.create_smart_meter(cls.user)
+        cls.other_meter = cls.create_smart_meter(cls.user)
+        start = datetime(2021, 3, 1, tzinfo=dt_timezone.utc)
+        for i in range(25):
+            cls.create_power_measurement(cls.meter, timestamp=start + timezone.timedelta(hours=i),
+                                         total_import_1=decimal.Decimal(i))
+            cls.create_gas_measurement(cls.meter, timestamp=start + timezone.timedelta(hours=i))
+        cls.create_power_measurement(cls.other_meter, timestamp=start)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.messages = []
+        self.deleter = MeterDeleter(chunk_size=10, progress_callback=self.messages.append)
+
+    @tag('standard')
+    def test_delete_meter_hides_meter_until_purged_success(self):
+        # given
+        self.client.force_authenticate(self.user)
+        # when
+        response = self.client.delete(self.MeterUrls.user_meter_url(self.user.pk, self.meter.pk))
+        # then
+        self.assertEqual(status.HTTP_204_NO_CONTENT, response.status_code)
+        self.assertEqual([self.other_meter.pk], list(SmartMeter.objects.user_meters(self.user.pk)
+                                                     .values_list('pk', flat=True)))
+        self.assertEqual(25, PowerMeasurement.objects.filter(meter=self.meter).count())
+        response = self.client.get(self.MeterUrls.user_meter_url(self.user.pk, self.meter.pk))
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+    @tag('standard')
+    def test_purge_deletes_measurements_in_chunks_success(self):
+        # given
+        MeasurementPacker(PowerMeasurement).pack_day(self.meter.pk, date(2021, 3, 2))
+        self.deleter.mark_meter(self.meter)
+        # when
+        deleted = self.deleter.purge()
+        # then
+        self.assertEqual(24 + 1 + 25, deleted)
+        self.assertFalse(SmartMeter.objects.filter(pk=self.meter.pk).exists())
+        self.assertFalse(PowerMeasurement.objects.filter(meter_id=self.meter.pk).exists())
+        self.assertFalse(GasMeasurement.objects.filter(meter_id=self.meter.pk).exists())
+        self.assertFalse(PowerMeasurementDay.objects.filter(meter_id=self.meter.pk).exists())
+        self.assertEqual(1, PowerMeasurement.objects.filter(meter=self.other_meter).count())
+        self.assertIn('PowerMeasurement: meter %s, 10 of 24 rows deleted' % self.meter.pk, self.messages)
+
+    @tag('standard')
+    def test_delete_user_purges_meters_and_user_success(self):
+        # given
+        self.client.force_authenticate(self.user)
+        # when
+        response = self.client.delete(self.UserUrls.user_url(self.user.pk))
+        self.deleter.purge()
+        # then
+        self.assertEqual(status.HTTP_204_NO_CONTENT, response.status_code)
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(SmartMeter.objects.filter(user_id=self.user.pk).exists())
+        self.assertFalse(PowerMeasurement.objects.filter(meter_id__in=[self.meter.pk, self.other_meter.pk]).exists())
@@ -0,0 +1,272 @@
+import decimal
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, tag, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from smart_meter.models import PowerMeasurement, GasMeasurement, GroupEnergyInterval, GroupParticipant
+from smart_meter.services.export_data import MeterDataExporter
+from smart_meter.services.import_data import MeterDataImporter, ImportQueue
+from smart_meter.services.packing import MeasurementPacker
+from smart_meter.tests.mixin import MeterTestMixin
+
+POWER_HEADER = 'timestamp,actual_import,actual_export,total_import_1,total_import_2,total_export_1,total_export_2\n'
+
+
+@tag('model')
+class TestMeterImport(MeterTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user()
+        cls.meter = cls.create_smart_meter(cls.user)
+        cls.other_meter = cls.create_smart_meter(cls.user)
+        cls.start = datetime(2025, 3, 1, tzinfo=dt_timezone.utc)
+        for hour in range(6):
+            cls.create_power_measurement(cls.meter, timestamp=cls.start + timezone.timedelta(hours=hour),
+                                         total_import_1=decimal.Decimal(hour) / 4, total_import_2=0,
+                                         total_export_1=0, total_export_2=0, actual_import=decimal.Decimal('1.5'),
+                                         actual_export=0)
+            cls.create_gas_measurement(cls.meter, timestamp=cls.start + timezone.timedelta(hours=hour),
+                                       total_gas=hour, actual_gas=0)
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, MEASUREMENT_ARCHIVE_ROOT=media_root,
+                                              MEASUREMENT_IMPORT_ROOT=os.path.join(media_root, 'imports'))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+
+    def power_csv(self, *rows):
+        return io.BytesIO((POWER_HEADER + ''.join(row + '\n' for row in rows)).encode())
+
+    def import_file(self, meter, file, **options):
+        return MeterDataImporter(meter, **options).import_file(file)
+
+    @tag('standard')
+    def test_import_export_round_trip_success(self):
+        # given
+        group = self.create_group_meter()
+        participation = self.create_group_participation(self.other_meter, group)
+        GroupParticipant.objects.filter(pk=participation.pk).update(joined_on=self.start)
+        with open(MeterDataExporter(self.meter).export_to_zip(), 'rb') as file:
+            # when
+            results = self.import_file(self.other_meter, file)
+        # then
+        self.assertEqual({'rows': 6, 'invalid': 0, 'imported': 6, 'updated': 0, 'skipped': 0}, results['power'])
+        self.assertEqual(6, results['gas']['imported'])
+        fields = ['timestamp'] + PowerMeasurement.reading_fields() + list(PowerMeasurement.delta_fields().values())
+        self.assertEqual(
+            list(PowerMeasurement.objects.filter(meter=self.meter).order_by('timestamp').values_list(*fields)),
+            list(PowerMeasurement.objects.filter(meter=self.other_meter).order_by('timestamp').values_list(*fields)),
+        )
+        self.assertEqual(
+            [0, 1, 1, 1, 1, 1],
+            list(GasMeasurement.objects.filter(meter=self.other_meter).order_by('timestamp').values_list(
+                'delta_gas', flat=True
+            )),
+        )
+        # The imported usage is in the series of the group
+        self.assertEqual(5, sum(GroupEnergyInterval.objects.filter(group=group).values_list('gas', flat=True)))
+
+    @tag('standard')
+    def test_import_skips_existing_timestamps_success(self):
+        # given
+        file = self.power_csv(
+            '2025-03-01 05:00:00,2.000,0.000,9.000,0.000,0.000,0.000',
+            '2025-03-01 06:00:00,2.000,0.000,9.500,0.000,0.000,0.000',
+        )
+        # when
+        results = self.import_file(self.meter, file)
+        # then
+        self.assertEqual({'rows': 2, 'invalid': 0, 'imported': 1, 'updated': 0, 'skipped': 1}, results['power'])
+        measurements = PowerMeasurement.objects.filter(meter=self.meter).order_by('timestamp')
+        self.assertEqual(decimal.Decimal('1.25'), measurements[5].total_import_1)
+        self.assertEqual(decimal.Decimal('8.25'), measurements[6].delta_import_1)
+
+    @tag('standard')
+    def test_import_updates_existing_timestamps_success(self):
+        # given
+        file = self.power_csv(
+            '2025-03-01T05:00:00+00:00,2.000,0.000,2.000,0.000,0.000,0.000',
+            # Same row as stored, not written
+            '2025-03-01T04:00:00Z,1.500,0.000,1.000,0.000,0.000,0.000',
+        )
+        # when
+        results = self.import_file(self.meter, file, update=True)
+        # then
+        self.assertEqual({'rows': 2, 'invalid': 0, 'imported': 0, 'updated': 1, 'skipped': 1}, results['power'])
+        measurement = PowerMeasurement.objects.get(meter=self.meter, timestamp=self.start + timezone.timedelta(hours=5))
+        self.assertEqual(decimal.Decimal('2'), measurement.total_import_1)
+        self.assertEqual(decimal.Decimal('1'), measurement.delta_import_1)
+
+    @tag('standard')
+    def test_import_invalid_rows_fail(self):
+        # given
+        file = self.power_csv(
+            '2025-03-02 00:00:00,2.000,0.000,9.000,0.000,0.000,0.000',
+            '2025-03-02 01:00:00,2.000,0.000,9.0001,0.000,0.000,0.000',
+            'yesterday,2.000,0.000,9.000,0.000,0.000,0.000',
+            '2025-03-02 03:00:00,2.000,0.000',
+        )
+        # when
+        with self.assertRaises(ValueError) as context:
+            self.import_file(self.meter, file)
+        # then
+        self.assertEqual([
+            'CSV line 3: invalid value "9.0001"',
+            'CSV line 4: invalid timestamp "yesterday"',
+            'CSV line 5: 3 columns instead of 7',
+        ], str(context.exception).split('\n'))
+        # Nothing is imported
+        self.assertEqual(6, PowerMeasurement.objects.filter(meter=self.meter).count())
+
+    @tag('standard')
+    def test_import_skip_invalid_rows_success(self):
+        # given
+        file = self.power_csv(
+            '2025-03-02 00:00:00,2.000,0.000,9.000,0.000,0.000,0.000',
+            '2025-03-02 01:00:00,2.000,0.000,,0.000,0.000,0.000',
+        )
+        # when
+        results = self.import_file(self.meter, file, skip_invalid=True)
+        # then
+        self.assertEqual({'rows': 1, 'invalid': 1, 'imported': 1, 'updated': 0, 'skipped': 0}, results['power'])
+
+    @tag('standard')
+    def test_import_unknown_columns_fail(self):
+        # when
+        with self.assertRaises(ValueError):
+            self.import_file(self.meter, io.BytesIO(b'timestamp,actual_water\n2025-03-02 00:00:00,1\n'))
+
+    @tag('standard')
+    def test_import_merges_packed_day_success(self):
+        # given
+        packer = MeasurementPacker(PowerMeasurement)
+        packer.pack_day(self.meter.pk, date(2025, 3, 1))
+        file = self.power_csv('2025-03-01 02:30:00,2.000,0.000,0.600,0.000,0.000,0.000')
+        # when
+        results = self.import_file(self.meter, file)
+        # then
+        self.assertEqual(1, results['power']['imported'])
+        self.assertFalse(packer.days([self.meter.pk]).exists())
+        self.assertEqual(
+            [0, 0.25, 0.25, 0.1, 0.15, 0.25, 0.25],
+            [float(delta) for delta in PowerMeasurement.objects.filter(meter=self.meter).order_by(
+                'timestamp'
+            ).values_list('delta_import_1', flat=True)],
+        )
+
+    @tag('standard')
+    def test_command_imports_zip_success(self):
+        # given
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as zipf:
+            zipf.writestr('power.csv', self.power_csv('2025-03-02 00:00:00,2.000,0.000,9.000,0.000,0.000,0.000')
+                          .getvalue())
+        path = tempfile.mktemp(suffix='.zip')
+        self.addCleanup(lambda: shutil.os.remove(path))
+        with open(path, 'wb') as file:
+            file.write(archive.getvalue())
+        # when
+        call_command('import_meter_data', self.other_meter.pk, path, stdout=io.StringIO())
+        # then
+        self.assertEqual(1, PowerMeasurement.objects.filter(meter=self.other_meter).count())
+
+    @tag('standard')
+    def test_import_endpoint_success(self):
+        # given
+        self.client.force_authenticate(self.user)
+        file = SimpleUploadedFile('power.csv', self.power_csv(
+            '2025-03-02 00:00:00,2.000,0.000,9.000,0.000,0.000,0.000'
+        ).getvalue())
+        # when
+        response = self.client.post(self.MeterUrls.meter_import_url(self.user.pk, self.other_meter.pk),
+                                    {'file': file}, format='multipart')
+        # then
+        self.assertEqual(status.HTTP_202_ACCEPTED, response.status_code)
+        # The upload is imported by the command
+        self.assertFalse(PowerMeasurement.objects.filter(meter=self.other_meter).exists())
+        call_command('import_meter_data', stdout=io.StringIO())
+        self.assertEqual(1, PowerMeasurement.objects.filter(meter=self.other_meter).count())
+        self.assertEqual([], ImportQueue().pending())
+
+    @tag('standard')
+    def test_import_endpoint_invalid_file_fail(self):
+        # given
+        self.client.force_authenticate(self.user)
+        file = SimpleUploadedFile('power.csv', b'timestamp,actual_water\n2025-03-02 00:00:00,1\n')
+        # when
+        response = self.client.post(self.MeterUrls.meter_import_url(self.user.pk, self.other_meter.pk),
+                                    {'file': file}, format='multipart')
+        # then
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertEqual(['power.csv: unknown columns timestamp, actual_water'], response.data['file'])
+        self.assertEqual([], ImportQueue().pending())
+
+    @tag('standard')
+    @override_settings(MEASUREMENT_IMPORT_MAX_MB=0)
+    def test_import_endpoint_too_large_fail(self):
+        # given
+        self.client.force_authenticate(self.user)
+        file = SimpleUploadedFile('power.csv', self.power_csv().getvalue())
+        # when
+        response = self.client.post(self.MeterUrls.meter_import_url(self.user.pk, self.other_meter.pk),
+                                    {'file': file}, format='multipart')
+        # then
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        self.assertEqual(['Het bestand is groter dan 0 MB'], response.data['file'])
+
+    @tag('standard')
+    def test_command_skips_claimed_upload_success(self):
+        # given
+        file = SimpleUploadedFile('power.csv', self.power_csv(
+            '2025-03-02 00:00:00,2.000,0.000,9.000,0.000,0.000,0.000'
+        ).getvalue())
+        queue = ImportQueue()
+        upload_id = queue.add(self.other_meter, file)
+        # Being imported by another command
+        self.assertTrue(queue.claim(upload_id))
+        # when
+        call_command('import_meter_data', stdout=io.StringIO())
+        # then
+        self.assertFalse(queue.claim(upload_id))
+        self.assertFalse(PowerMeasurement.objects.filter(meter=self.other_meter).exists())
+        # A failed import puts the upload back
+        queue.release(upload_id)
+        self.assertEqual([upload_id], [upload['id'] for upload in queue.pending()])
+
+    @tag('standard')
+    def test_command_imports_queued_invalid_rows_fail(self):
+        # given
+        file = SimpleUploadedFile('power.csv', self.power_csv('2025-03-02 00:00:00,2.000').getvalue())
+        ImportQueue().add(self.other_meter, file)
+        stderr = io.StringIO()
+        # when
+        call_command('import_meter_data', stdout=io.StringIO(), stderr=stderr)
+        # then
+        self.assertIn('power.csv line 2: 2 columns instead of 7', stderr.getvalue())
+        self.assertFalse(PowerMeasurement.objects.filter(meter=self.other_meter).exists())
+        self.assertEqual([], ImportQueue().pending())
+
+    @tag('permission')
+    def test_import_endpoint_other_user_fail_forbidden(self):
+        # given
+        other_user = self.create_user()
+        self.client.force_authenticate(other_user)
+        file = SimpleUploadedFile('power.csv', self.power_csv().getvalue())
+        # when
+        response = self.client.post(self.MeterUrls.meter_import_url(self.user.pk, self.meter.pk),
+                                    {'file': file}, format='multipart')
+        # then
+        self.assertEqual(status.HTTP_403_FORBIDDEN, response.status_code)
@@ -0,0 +1,101 @@
+import decimal
+import io
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management import call_command
+from django.test import TestCase, tag
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from smart_meter.models import SmartMeter, PowerMeasurement
+from smart_meter.services.merge import MeterMerger
+from smart_meter.tests.mixin import MeterTestMixin
+
+
+@tag('api')
+class TestMeterMerge(MeterTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user()
+        cls.start = datetime(2021, 3, 1, tzinfo=dt_timezone.utc)
+        # Old meter until 12:00, replaced by a new meter (counter from 0) from 11:00
+        cls.old_meter = cls.create_smart_meter(
+            cls.user, power_timestamp=cls.start + timezone.timedelta(hours=12), total_power_import_1=112,
+            total_power_import_2=0,
+        )
+        cls.new_meter = cls.create_smart_meter(
+            cls.user, sn_power='NEW', power_timestamp=cls.start + timezone.timedelta(hours=24),
+            total_power_import_1=12, total_power_import_2=0,
+        )
+        for hour in range(13):
+            cls.create_power_measurement(cls.old_meter, timestamp=cls.start + timezone.timedelta(hours=hour),
+                                         total_import_1=100 + hour, total_import_2=0)
+        for hour in range(11, 25):
+            cls.create_power_measurement(cls.new_meter, timestamp=cls.start + timezone.timedelta(hours=hour),
+                                         total_import_1=hour - 12 if hour > 12 else 0, total_import_2=0)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    @tag('standard')
+    def test_merge_moves_history_in_chunks_success(self):
+        # given
+        participation = self.create_group_participation(self.old_meter, self.create_group_meter())
+        usage = participation.total_import
+        merger = MeterMerger(self.old_meter, self.new_meter, chunk_size=5)
+        # when
+        processed = merger.merge()
+        # then
+        self.assertEqual(14, processed)
+        self.assertFalse(SmartMeter.objects.filter(pk=self.new_meter.pk).exists())
+        self.old_meter.refresh_from_db()
+        self.assertEqual('NEW', self.old_meter.sn_power)
+        # The new meter measurements at 11:00 and 12:00 conflict with the old meter, these are dropped
+        measurements = PowerMeasurement.objects.filter(meter=self.old_meter).order_by('timestamp')
+        self.assertEqual(25, measurements.count())
+        self.assertEqual(decimal.Decimal(112), measurements[12].total_import_1)
+        self.assertEqual([0] + [1] * 12 + [0] + [1] * 11,
+                         [int(delta) for delta in measurements.values_list('delta_import_1', flat=True)])
+        # Usage in the group continues on the new meter
+        participation.refresh_from_db()
+        self.assertEqual(usage + 12, participation.total_import)
+
+    @tag('standard')
+    def test_merge_api_takes_over_meter_and_command_resumes_success(self):
+        # given
+        self.client.force_authenticate(self.user)
+        # when
+        response = self.client.post(self.MeterUrls.meter_merge_url(self.user.pk, self.old_meter.pk),
+                                    {'meter': self.new_meter.pk}, format='json')
+        # then
+        self.assertEqual(status.HTTP_202_ACCEPTED, response.status_code)
+        self.assertEqual([self.old_meter.pk], list(SmartMeter.objects.user_meters(self.user.pk)
+                                                   .values_list('pk', flat=True)))
+        self.assertEqual(14, PowerMeasurement.objects.filter(meter=self.new_meter).count())
+
+        # when
+        call_command('merge_meters', stdout=io.StringIO())
+        # then
+        self.assertFalse(SmartMeter.objects.filter(pk=self.new_meter.pk).exists())
+        self.assertEqual(25, PowerMeasurement.objects.filter(meter=self.old_meter).count())
+
+    @tag('validation')
+    def test_merge_api_fail_same_meter(self):
+        # given
+        self.client.force_authenticate(self.user)
+        # when
+        response = self.client.post(self.MeterUrls.meter_merge_url(self.user.pk, self.old_meter.pk),
+                                    {'meter': self.old_meter.pk}, format='json')
+        # then
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    @tag('permission')
+    def test_merge_api_as_other_user_fail_forbidden(self):
+        # given
+        self.client.force_authenticate(self.create_user())
+        # when
+        response = self.client.post(self.MeterUrls.meter_merge_url(self.user.pk, self.old_meter.pk),
+                                    {'meter': self.new_meter.pk}, format='json')
+        # then
+        self.assertEqual(status.HTTP_403_FORBIDDEN, response.status_code)
@@ -0,0 +1,134 @@
+import decimal
+from datetime import datetime, timezone as dt_timezone
+
+from django.test import TestCase, tag
+from django.utils import timezone, dateparse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from smart_meter.managers import fetch_buckets
+from smart_meter.models import PowerMeasurement, GasMeasurement, SolarMeasurement
+from smart_meter.tests.mixin import MeterTestMixin
+
+
+@tag('api')
+class TestMeterSeries(MeterTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user()
+        cls.meter = cls.create_smart_meter(cls.user)
+        cls.start = datetime(2026, 3, 1, tzinfo=dt_timezone.utc)
+        # Power every hour, gas from 00:00 until 06:00 and from 09:00 until 12:00, no solar
+        for hour in range(48):
+            cls.create_power_measurement(cls.meter, timestamp=cls.hours(hour), total_import_1=hour,
+                                         total_import_2=0, total_export_1=0, total_export_2=0)
+        for hour in [0, 1, 2, 3, 4, 5, 9, 10, 11]:
+            cls.create_gas_measurement(cls.meter, timestamp=cls.hours(hour), actual_gas=decimal.Decimal(1),
+                                       total_gas=decimal.Decimal(hour) / 2)
+        # Two days, in hour buckets
+        cls.filter_data = {
+            'timestamp_after': cls.start,
+            'timestamp_before': cls.hours(48),
+        }
+
+    @classmethod
+    def hours(cls, hours):
+        return cls.start + timezone.timedelta(hours=hours)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_series(self, **params):
+        return self.client.get(self.MeterUrls.meter_series_url(self.user.pk, self.meter.pk),
+                               {**self.filter_data, **params})
+
+    @tag('standard')
+    def test_meter_series_aligned_success(self):
+        # when
+        response = self.get_series()
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        results = response.data['results']
+        # Every hour of the range, 00:00 up to and including 00:00 two days later
+        self.assertEqual(49, len(results))
+        self.assertEqual([self.hours(hour) for hour in range(49)],
+                         [dateparse.parse_datetime(row['timestamp']) for row in results])
+        self.assertEqual('1.000', results[3]['total_import_1'])
+        self.assertEqual('1.000', results[3]['actual_gas'])
+        self.assertIsNone(results[7]['actual_gas'])
+        # The usage during the gap is in the first bucket after it
+        self.assertEqual('2.000', results[9]['total_gas'])
+        self.assertIsNone(results[3]['actual_solar'])
+        self.assertIsNone(results[48]['total_import_1'])
+        self.assertEqual(decimal.Decimal(47), response.data['period_import_1'])
+        self.assertEqual(decimal.Decimal('5.5'), response.data['period_gas'])
+        self.assertIsNone(response.data['period_solar'])
+
+    @tag('standard')
+    def test_meter_series_queries_success(self):
+        # given
+        url = self.MeterUrls.meter_series_url(self.user.pk, self.meter.pk)
+        # when
+        # The meter for the permission and for the measurement database, and the buckets of all measurement types
+        with self.assertNumQueries(3):
+            response = self.client.get(url, self.filter_data)
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+    @tag('standard')
+    def test_meter_series_carry_success(self):
+        # when
+        response = self.get_series(gaps='carry')
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        results = response.data['results']
+        self.assertEqual('0.000', results[7]['total_gas'])
+        self.assertEqual('0.000', results[7]['total_solar'])
+        self.assertIsNone(results[7]['actual_gas'])
+
+    @tag('standard')
+    def test_meter_series_max_points_success(self):
+        # when
+        response = self.get_series(max_points=3, timestamp_before=self.hours(24 * 5))
+        # then
+        # Six local days merged to three buckets of two days, the usage is kept
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        results = response.data['results']
+        self.assertEqual(3, len(results))
+        self.assertEqual(timezone.make_aware(datetime(2026, 3, 3)), dateparse.parse_datetime(results[1]['timestamp']))
+        # The last power measurement is at 00:00 local time
+        self.assertEqual(['46.000', '1.000', None], [row['total_import_1'] for row in results])
+        self.assertEqual('5.500', results[0]['total_gas'])
+        self.assertEqual(decimal.Decimal(47), response.data['period_import_1'])
+
+    @tag('filter')
+    def test_meter_series_without_timestamp_fail(self):
+        # when
+        response = self.client.get(self.MeterUrls.meter_series_url(self.user.pk, self.meter.pk))
+        # then
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    @tag('permission')
+    def test_meter_series_other_user_fail_forbidden(self):
+        # given
+        self.client.force_authenticate(self.create_user())
+        # when
+        response = self.get_series()
+        # then
+        self.assertEqual(status.HTTP_403_FORBIDDEN, response.status_code)
+
+    @tag('standard')
+    def test_fetch_buckets_same_as_separate_queries_success(self):
+        # given
+        def series():
+            return [model.objects.filter(meter=self.meter).filter_timestamp(self.start, self.hours(48))
+                    for model in (PowerMeasurement, GasMeasurement, SolarMeasurement)]
+        separate = [list(queryset) for queryset in series()]
+        together = series()
+        # when
+        with self.assertNumQueries(1):
+            fetch_buckets(together)
+            fetched = [list(queryset) for queryset in together]
+        # then
+        self.assertEqual(separate, fetched)
@@ -1,12 +1,14 @@
 from decimal import Decimal
 from zoneinfo import ZoneInfo
 
+from django.db import connection
 from django.test import TestCase, tag
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from smart_meter.models import SmartMeter
+from smart_meter.models import SmartMeter, SmartMeterLive
 from smart_meter.tests.mixin import MeterTestMixin
 
 
@@ -125,6 +127,23 @@ class TestNewMeasurementPost(MeterTestMixin, TestCase):
         self.assertEqual(payload['solar']['solar'], last_solar.actual_solar)
         self.assertEqual(0, last_solar.total_solar)
 
+    @tag('standard')
+    def test_new_measurement_view_post_updates_only_live_values_success(self):
+        # given
+        self.client.force_authenticate(self.user)
+        payload = self.default_payload
+        # The version a measurement without version sets, so the profile of the meter does not change
+        SmartMeter.objects.filter(pk=self.meter1.pk).update(gpx_version='Unknown')
+        meter_table, live_table = SmartMeter._meta.db_table, SmartMeterLive._meta.db_table
+        # when
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.MeterUrls.new_measurement_url(), payload, format='json')
+        # then
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertTrue(any(sql.startswith('UPDATE "%s"' % live_table) for sql in updates))
+        self.assertFalse(any(sql.startswith('UPDATE "%s"' % meter_table) for sql in updates))
+
     @tag('variation')
     def test_new_measurement_view_post_4_minute_measurement_as_user_success(self):
         # given
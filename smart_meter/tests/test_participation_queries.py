@@ -0,0 +1,53 @@
+from django.db import connection
+from django.test import TestCase, tag
+
+from smart_meter.models import GroupMeter, GroupParticipant
+from smart_meter.tests.mixin import MeterTestMixin
+from users.models import User
+
+
+@tag('model')
+class TestParticipationQueries(MeterTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user()
+        cls.meter = cls.create_smart_meter(cls.user)
+        cls.group = cls.create_group_meter(cls.user, cls.meter)
+        cls.other_group = cls.create_group_meter()
+        left = cls.create_group_participation(cls.meter, cls.other_group)
+        left.leave()
+        left.save()
+
+    def setUp(self):
+        # The test tables are tiny, without this the planner reads them sequentially
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+
+    @tag('standard')
+    def test_groups_by_user_exists_on_active_index_success(self):
+        # when
+        groups = GroupMeter.objects.by_user(self.user.pk)
+        # then
+        self.assertEqual([self.group.pk], list(groups.values_list('pk', flat=True)))
+        plan = groups.explain()
+        # Depending on the statistics, the group or the meter index is used
+        self.assertRegex(plan, r'Index Only Scan using participant_active_(group|meter)_idx')
+        self.assertNotIn('Unique', plan)
+
+    @tag('standard')
+    def test_users_active_in_group_exists_on_active_index_success(self):
+        # when
+        users = User.objects.active_in_group(self.group.pk)
+        # then
+        self.assertEqual([self.user.pk], list(users.values_list('pk', flat=True)))
+        # Depending on the statistics, the group or the meter index is used
+        self.assertRegex(users.explain(), r'Index Only Scan using participant_active_(group|meter)_idx')
+        self.assertFalse(User.objects.active_in_group(self.other_group.pk).filter(pk=self.user.pk).exists())
+
+    @tag('standard')
+    def test_active_participation_of_meter_on_active_meter_index_success(self):
+        # when
+        participations = GroupParticipant.objects.active().filter(meter=self.meter)
+        # then
+        self.assertEqual(self.group, self.meter.group_participation.group)
+        self.assertIn('participant_active_meter_idx', participations.explain())
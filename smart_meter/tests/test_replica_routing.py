@@ -0,0 +1,135 @@
+import json
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.test import TransactionTestCase, tag, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from gpx_server import replicas
+from smart_meter.tests.mixin import MeterTestMixin
+
+# First read replica (GPX_DATABASE_REPLICAS), a mirror of the default database in the tests
+REPLICA = next(iter(settings.DATABASE_REPLICAS), None)
+
+
+@tag('api')
+@skipUnless(REPLICA, 'Requires a read replica, set GPX_DATABASE_REPLICAS')
+@override_settings(DATABASE_QUERIES_HEADER=True)
+class TestReplicaRouting(MeterTestMixin, TransactionTestCase):
+    # The replica is a separate connection to the test database, it only sees committed rows
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = self.create_user()
+        self.meter = self.create_smart_meter(self.user)
+        self.start = timezone.now() - timezone.timedelta(hours=2)
+        for i in range(3):
+            self.create_power_measurement(self.meter, timestamp=self.start + timezone.timedelta(minutes=10 * i))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        # The token of the client, pinned clients are keyed by their credentials
+        self.client.credentials(HTTP_AUTHORIZATION='Token %s' % self.user.pk)
+        cache.clear()
+        replicas._replica_lags.clear()
+
+    @classmethod
+    def tearDownClass(cls):
+        # The test database is only dropped when the connections of the replica (pool) to it are closed
+        for alias in settings.DATABASE_REPLICAS:
+            connections[alias].close()
+            connections[alias].close_pool()
+        super().tearDownClass()
+
+    def queries(self, response):
+        return dict(item.split('=') for item in response['X-Database-Queries'].split(', ') if item)
+
+    def get_measurements(self):
+        return self.client.get(self.MeterUrls.power_measurement_url(self.user.pk, self.meter.pk), {
+            'timestamp_after': self.start,
+            'timestamp_before': self.start + timezone.timedelta(hours=1),
+        })
+
+    @tag('standard')
+    def test_measurement_list_reads_from_replica_success(self):
+        # when
+        response = self.get_measurements()
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(3, len(response.data))
+        self.assertNotIn('default', self.queries(response))
+        self.assertIn(REPLICA, self.queries(response))
+
+    @tag('standard')
+    def test_streamed_measurement_list_reads_from_replica_success(self):
+        # given
+        response = self.client.get(self.MeterUrls.power_measurement_url(self.user.pk, self.meter.pk), {
+            'timestamp_after': self.start,
+            'timestamp_before': self.start + timezone.timedelta(hours=1),
+            'stream': True,
+        })
+        # when
+        # The measurements are read while the response is streamed, after the request
+        with CaptureQueriesContext(connections[REPLICA]) as queries:
+            data = json.loads(b''.join(response.streaming_content))
+        # then
+        self.assertEqual(3, len(data))
+        self.assertEqual(1, len(queries))
+
+    @tag('standard')
+    def test_view_without_replica_reads_uses_default_success(self):
+        # when
+        response = self.client.get(self.MeterUrls.user_meter_url(self.user.pk))
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual([], [alias for alias in self.queries(response) if alias != 'default'])
+
+    @tag('standard')
+    def test_reads_after_write_stay_on_default_success(self):
+        # given
+        response = self.client.put(self.MeterUrls.user_meter_url(self.user.pk, self.meter.pk), {'name': 'Thuis'})
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        # when
+        response = self.client.get(self.MeterUrls.user_meter_url(self.user.pk, self.meter.pk))
+        # then
+        self.assertEqual('Thuis', response.data['name'])
+        self.assertEqual(['default'], list(self.queries(response)))
+        # Other clients still read from the replica
+        self.client.credentials(HTTP_AUTHORIZATION='Token other')
+        self.assertIn(REPLICA, self.queries(self.get_measurements()))
+
+    @tag('standard')
+    @override_settings(REPLICA_MAX_LAG_SECONDS=-1)
+    def test_lagging_replica_falls_back_to_default_success(self):
+        # when
+        response = self.get_measurements()
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(3, len(response.data))
+        # Only the lag check runs on the replica
+        self.assertEqual('1', self.queries(response)[REPLICA])
+        self.assertIn('default', self.queries(response))
+
+    @tag('permission')
+    def test_database_statistics_as_user_fail_forbidden(self):
+        # when
+        response = self.client.get(reverse('database_statistics'))
+        # then
+        self.assertEqual(status.HTTP_403_FORBIDDEN, response.status_code)
+
+    @tag('standard')
+    def test_database_statistics_as_admin_success(self):
+        # given
+        self.get_measurements()
+        self.client.force_authenticate(self.create_user(is_staff=True))
+        # when
+        response = self.client.get(reverse('database_statistics'))
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertGreater(response.data['queries'][REPLICA], 0)
+        self.assertEqual({REPLICA: 0}, response.data['replicas'])
@@ -0,0 +1,49 @@
+import decimal
+
+from django.db import connection
+from django.test import TestCase, tag
+from django.utils import timezone
+
+from smart_meter.models import PowerMeasurement
+from smart_meter.tests.mixin import MeterTestMixin
+
+
+@tag('model')
+class TestScaledIntegerField(MeterTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.meter = cls.create_smart_meter()
+
+    @tag('standard')
+    def test_value_stored_as_milli_units_success(self):
+        # given
+        measurement = self.create_power_measurement(self.meter, total_import_1=decimal.Decimal('1.2345'),
+                                                    actual_import=0.1)
+        # when
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT total_import_1, actual_import FROM smart_meter_powermeasurement WHERE id = %s',
+                           [measurement.pk])
+            stored = cursor.fetchone()
+        measurement.refresh_from_db()
+        # then
+        self.assertEqual((1235, 100), stored)
+        self.assertEqual(decimal.Decimal('1.235'), measurement.total_import_1)
+        self.assertEqual(decimal.Decimal('0.100'), measurement.actual_import)
+
+    @tag('standard')
+    def test_lookups_and_aggregates_in_units_success(self):
+        # given
+        now = timezone.now()
+        self.create_power_measurement(self.meter, timestamp=now - timezone.timedelta(minutes=1),
+                                      actual_import=decimal.Decimal('1.000'), total_import_1=decimal.Decimal('2.5'))
+        self.create_power_measurement(self.meter, timestamp=now, actual_import=decimal.Decimal('2.001'),
+                                      total_import_1=decimal.Decimal('3.75'))
+        measurements = PowerMeasurement.objects.filter(meter=self.meter)
+        # when
+        filtered = measurements.filter(total_import_1__gte=decimal.Decimal('3.5')).count()
+        buckets = list(measurements.filter_timestamp(now - timezone.timedelta(hours=1), now))
+        # then
+        self.assertEqual(1, filtered)
+        self.assertEqual(decimal.Decimal('1.0'), buckets[0]['actual_import'])
+        self.assertEqual(decimal.Decimal('1.25'), buckets[1]['total_import_1'])
+        self.assertEqual(decimal.Decimal('2.001'), buckets[1]['actual_import'])
@@ -0,0 +1,145 @@
+import decimal
+from unittest import skipUnless
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.test import TestCase, tag, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from smart_meter.models import SmartMeter, PowerMeasurement, GroupParticipant
+from smart_meter.services.group_series import GroupSeriesAggregator, interval_start
+from smart_meter.services.merge import MeterMerger
+from smart_meter.services.rebalance import MeasurementRebalancer
+from smart_meter.sharding import measurement_database
+from smart_meter.tests.mixin import MeterTestMixin
+
+# First measurement database besides the default database (GPX_MEASUREMENT_DATABASES)
+SHARD = next((alias for alias in settings.MEASUREMENT_DATABASES if alias != DEFAULT_DB_ALIAS), None)
+
+
+@tag('model')
+@skipUnless(SHARD, 'Requires a measurement database, set GPX_MEASUREMENT_DATABASES')
+@override_settings(MEASUREMENT_SHARDS=[SHARD])
+class TestMeasurementSharding(MeterTestMixin, TestCase):
+    databases = '__all__'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user()
+        cls.meter = cls.create_smart_meter(cls.user)
+        with override_settings(MEASUREMENT_SHARDS=[DEFAULT_DB_ALIAS]):
+            cls.default_meter = cls.create_smart_meter(cls.user)
+        cls.start = interval_start(timezone.now()) - timezone.timedelta(hours=3)
+        for meter in (cls.meter, cls.default_meter):
+            for i in range(6):
+                cls.create_power_measurement(meter, timestamp=cls.start + timezone.timedelta(minutes=10 * i),
+                                             total_import_1=i, total_import_2=0, total_export_1=0, total_export_2=0)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def count(self, meter, database):
+        return PowerMeasurement.objects.using(database).filter(meter_id=meter.pk).count()
+
+    @tag('standard')
+    def test_new_meter_placed_on_shard_success(self):
+        # then
+        self.assertEqual(SHARD, self.meter.measurement_database)
+        self.assertEqual(SHARD, measurement_database(self.meter.pk))
+        self.assertEqual(6, self.count(self.meter, SHARD))
+        self.assertEqual(0, self.count(self.meter, DEFAULT_DB_ALIAS))
+        self.assertEqual(6, PowerMeasurement.objects.filter(meter_id=self.meter.pk).count())
+
+    @tag('standard')
+    def test_new_measurement_stored_on_meter_database_success(self):
+        # given
+        self.client.force_authenticate(self.user)
+        payload = {
+            'power': {
+                'sn': self.meter.sn_power,
+                'timestamp': self.start + timezone.timedelta(hours=1),
+                'import_1': decimal.Decimal(10),
+                'import_2': decimal.Decimal(0),
+                'export_1': decimal.Decimal(0),
+                'export_2': decimal.Decimal(0),
+                'actual_import': decimal.Decimal('1.5'),
+                'actual_export': decimal.Decimal(0),
+                'tariff': 1,
+            },
+        }
+        # when
+        response = self.client.post(self.MeterUrls.new_measurement_url(), payload, format='json')
+        # then
+        self.assertEqual(status.HTTP_201_CREATED, response.status_code)
+        self.assertEqual(7, self.count(self.meter, SHARD))
+        self.assertEqual(0, self.count(self.meter, DEFAULT_DB_ALIAS))
+        # Delta from the last measurement on the shard
+        self.assertEqual(decimal.Decimal(5), self.meter.powermeasurement_set.last().delta_import_1)
+
+    @tag('standard')
+    def test_measurement_list_from_meter_database_success(self):
+        # given
+        self.client.force_authenticate(self.user)
+        filter_data = {
+            'timestamp_after': self.start,
+            'timestamp_before': self.start + timezone.timedelta(hours=1),
+        }
+        # when
+        response = self.client.get(self.MeterUrls.power_measurement_url(self.user.pk, self.meter.pk), filter_data)
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(6, len(response.data))
+
+    @tag('standard')
+    def test_rebalance_moves_measurements_success(self):
+        # given
+        rebalancer = MeasurementRebalancer(chunk_size=4)
+        # when
+        moved = rebalancer.rebalance([self.default_meter.pk])
+        # then
+        self.assertEqual(6, moved)
+        self.default_meter.refresh_from_db()
+        self.assertEqual(SHARD, self.default_meter.measurement_database)
+        self.assertEqual(6, self.count(self.default_meter, SHARD))
+        self.assertEqual(0, self.count(self.default_meter, DEFAULT_DB_ALIAS))
+        # Nothing left to move
+        self.assertEqual(0, rebalancer.rebalance([self.default_meter.pk]))
+
+    @tag('standard')
+    def test_rebalance_dry_run_moves_nothing_success(self):
+        # when
+        moved = MeasurementRebalancer().rebalance(dry_run=True)
+        # then
+        self.assertEqual(0, moved)
+        self.assertEqual(DEFAULT_DB_ALIAS, SmartMeter.objects.get(pk=self.default_meter.pk).measurement_database)
+        self.assertEqual(6, self.count(self.default_meter, DEFAULT_DB_ALIAS))
+
+    @tag('standard')
+    def test_group_series_combines_databases_success(self):
+        # given
+        group = self.create_group_meter(self.user, self.meter)
+        self.create_group_participation(self.default_meter, group)
+        GroupParticipant.objects.filter(group=group).update(joined_on=self.start)
+        # when
+        rebuilt = GroupSeriesAggregator().rebuild(group.pk)
+        # then
+        self.assertEqual(1, rebuilt)
+        self.assertEqual(decimal.Decimal(10), group.intervals.get().power_import)
+
+    @tag('standard')
+    def test_merge_across_databases_success(self):
+        # given
+        self.default_meter.power_timestamp = self.start
+        self.default_meter.save(update_fields=['power_timestamp'])
+        self.create_power_measurement(self.default_meter, timestamp=self.start + timezone.timedelta(hours=1))
+        merger = MeterMerger(self.meter, self.default_meter)
+        # when
+        processed = merger.merge()
+        # then
+        # The measurements at the timestamps of the target are dropped, the last one is moved
+        self.assertEqual(7, processed)
+        self.assertFalse(SmartMeter.objects.filter(pk=self.default_meter.pk).exists())
+        self.assertEqual(7, self.count(self.meter, SHARD))
+        self.assertEqual(0, PowerMeasurement.objects.using(DEFAULT_DB_ALIAS).count())
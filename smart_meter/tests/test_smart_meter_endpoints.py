@@ -1,9 +1,13 @@
+import decimal
+
 from django.core.exceptions import ObjectDoesNotExist
 from django.test import TestCase, tag
+from django.utils import timezone
 from django.utils.dateparse import parse_datetime
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from smart_meter.models import SmartMeter
 from smart_meter.tests.mixin import MeterTestMixin
 
 
@@ -162,6 +166,70 @@ class TestUserMeterDetailGet(MeterTestMixin, TestCase):
         self.assertEqual(status.HTTP_401_UNAUTHORIZED, response.status_code)
 
 
+@tag('api')
+class TestUserMeterDetailMeasurementsGet(MeterTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user()
+        cls.meter = cls.create_smart_meter(cls.user, name='Home')
+        cls.start = timezone.now().replace(minute=0, second=0, microsecond=0) - timezone.timedelta(days=3)
+        for hour in range(48):
+            timestamp = cls.start + timezone.timedelta(hours=hour)
+            cls.create_power_measurement(cls.meter, timestamp=timestamp, total_import_1=hour, total_import_2=hour * 2,
+                                         total_export_1=0, total_export_2=decimal.Decimal(hour) / 2)
+            cls.create_gas_measurement(cls.meter, timestamp=timestamp, total_gas=decimal.Decimal(hour) / 4)
+            cls.create_solar_measurement(cls.meter, timestamp=timestamp, total_solar=hour * 3)
+        cls.filter_data = {
+            'measurements': True,
+            'timestamp_after': cls.start + timezone.timedelta(hours=10),
+            'timestamp_before': cls.start + timezone.timedelta(hours=30),
+        }
+        super().setUpTestData()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @tag('standard')
+    def test_user_meter_detail_measurements_period_totals_success(self):
+        # when
+        response = self.client.get(self.MeterUrls.user_meter_url(self.user.pk, self.meter.pk), self.filter_data)
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertEqual(21, len(response.data['power_set']))
+        # The deltas of the measurements in the range, 10:00 up to and including 30:00
+        self.assertEqual(decimal.Decimal(21), response.data['period_import_1'])
+        self.assertEqual(decimal.Decimal(42), response.data['period_import_2'])
+        self.assertEqual(decimal.Decimal(0), response.data['period_export_1'])
+        self.assertEqual(decimal.Decimal('10.5'), response.data['period_export_2'])
+        self.assertEqual(decimal.Decimal('5.25'), response.data['period_gas'])
+        self.assertEqual(decimal.Decimal(63), response.data['period_solar'])
+
+    @tag('standard')
+    def test_user_meter_detail_measurements_queries_success(self):
+        # given
+        url = self.MeterUrls.user_meter_url(self.user.pk, self.meter.pk)
+        # when
+        # The meter, its group participation and the buckets of each measurement type, the period totals are summed
+        # from the buckets
+        with self.assertNumQueries(5):
+            response = self.client.get(url, self.filter_data)
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+
+    @tag('standard')
+    def test_user_meter_detail_measurements_without_measurements_success(self):
+        # given
+        meter = self.create_smart_meter(self.user)
+        # when
+        response = self.client.get(self.MeterUrls.user_meter_url(self.user.pk, meter.pk),
+                                   {**self.filter_data, 'gaps': 'carry'})
+        # then
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        self.assertIsNone(response.data['period_import_1'])
+        self.assertIsNone(response.data['period_gas'])
+
+
 @tag('api')
 class TestUserMeterDetailPut(MeterTestMixin, TestCase):
     @classmethod
@@ -237,7 +305,7 @@ class TestUserMeterDetailDelete(MeterTestMixin, TestCase):
         response = self.client.delete(self.MeterUrls.user_meter_url(self.user.pk, self.meter.pk))
         # then
         self.assertEqual(status.HTTP_204_NO_CONTENT, response.status_code)
-        self.assertEqual(0, self.user.meters.count())
+        self.assertEqual(0, SmartMeter.objects.user_meters(self.user.pk).count())
         with self.assertRaises(ObjectDoesNotExist):
             # Group participant should no longer exist
             as_participant.refresh_from_db()
@@ -171,3 +171,16 @@ class TestUserMeterModel(MeterTestMixin, TestCase):
         self.assertEqual(1, meter.powermeasurement_set.count())
         self.assertEqual(0, meter.gasmeasurement_set.count())
         self.assertEqual(0, meter.solarmeasurement_set.count())
+
+    @tag('model')
+    def test_meter_last_measurement_is_latest_timestamp_success(self):
+        # given
+        meter = self.create_smart_meter(self.user)
+        now = timezone.now()
+        latest = self.create_power_measurement(meter, timestamp=now)
+        # Inserted later (higher id), but measured earlier
+        self.create_power_measurement(meter, timestamp=now - timezone.timedelta(hours=1))
+        # when
+        last_measurement = meter.last_power_measurement
+        # then
+        self.assertEqual(latest.pk, last_measurement.pk)
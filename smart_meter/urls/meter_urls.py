@@ -1,7 +1,8 @@
 from django.urls import path
 
 from smart_meter.views import NewMeasurementView, GroupDisplayView, PublicGroupDisplayView, NewMeasurementTestView, \
-    GroupMeterInviteInfoView, GroupLiveDataView, GroupParticipantDetailView, GroupParticipantListView
+    GroupMeterInviteInfoView, GroupLiveDataView, GroupParticipantDetailView, GroupParticipantListView, \
+    GroupEnergySeriesView, MeterQualityReportListView, MeterQualityReportDetailView
 
 app_name = 'smart_meter'
 
@@ -14,11 +15,16 @@ urlpatterns = [
     path('groups/<int:pk>/', GroupDisplayView.as_view(), name='group_meter_display'),
     path('groups/public/<slug:public_key>/', PublicGroupDisplayView.as_view(), name='public_group_meter_display'),
     path('groups/invite/<uuid:invitation_key>/', GroupMeterInviteInfoView.as_view(), name='group_meter_invite_info'),
+    path('groups/<int:group_pk>/series/', GroupEnergySeriesView.as_view(), name='group_energy_series'),
 
     # For participant management TODO: activate these endpoints for history view
     path('groups/<int:group_pk>/participants/', GroupParticipantListView.as_view(), name='group_participant_list'),
     path('groups/<int:group_pk>/participants/<int:pk>/', GroupParticipantDetailView.as_view(), name='group_participant_detail'),
 
+    # internal urls, for admins
+    path('quality/', MeterQualityReportListView.as_view(), name='meter_quality_report_list'),
+    path('quality/<int:pk>/', MeterQualityReportDetailView.as_view(), name='meter_quality_report_detail'),
+
     # urls used by nodejs
     path('groups/live-data/', GroupLiveDataView.as_view(), name='group_live_data'),
 ]
@@ -2,7 +2,8 @@ from django.urls import path, include
 
 from smart_meter.views import UserMeterListView, UserMeterDetailView, GroupMeterDetailView, \
     GroupMeterListView, MeterGroupParticipationDetailView, MeterParticipationListView, \
-    PowerMeasurementListView, GasMeasurementListView, SolarMeasurementListView
+    PowerMeasurementListView, GasMeasurementListView, SolarMeasurementListView, MeterMergeView, \
+    MeterImportView, MeterSeriesView
 
 # urls under /users/<user_pk>/meters/...
 urlpatterns = [
@@ -12,6 +13,9 @@ urlpatterns = [
         path('power/', PowerMeasurementListView.as_view(), name='power_measurement_list'),
         path('gas/', GasMeasurementListView.as_view(), name='gas_measurement_list'),
         path('solar/', SolarMeasurementListView.as_view(), name='solar_measurement_list'),
+        path('series/', MeterSeriesView.as_view(), name='meter_series'),
+        path('merge/', MeterMergeView.as_view(), name='meter_merge'),
+        path('import/', MeterImportView.as_view(), name='meter_import'),
     ])),
     path('groups/', GroupMeterListView.as_view(), name='group_meter_list'),
     path('groups/<int:pk>/', GroupMeterDetailView.as_view(), name='group_meter_detail'),
@@ -1,24 +1,40 @@
+from django.db import transaction
+from django.db.models import F
 from django.http import HttpResponse
+from django.utils import timezone
 from django.views.generic.base import View
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters, permissions
+from rest_framework import filters, permissions, status
 from rest_framework.decorators import authentication_classes
 from rest_framework.exceptions import ValidationError
 from rest_framework.generics import CreateAPIView, ListAPIView, RetrieveUpdateAPIView, ListCreateAPIView, \
-    RetrieveUpdateDestroyAPIView, RetrieveAPIView
+    RetrieveUpdateDestroyAPIView, RetrieveAPIView, get_object_or_404
+from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from gpx_server.utils.authentication import ApiKeyAuthentication
-from smart_meter.filters import GroupParticipantFilter, MeasurementFilter, MeterMeasurementFilter
+from smart_meter.filters import GroupParticipantFilter, MeasurementFilter, MeterMeasurementFilter, \
+    GroupEnergyIntervalFilter, MeterQualityReportFilter, MeterSeriesFilter
+from smart_meter.managers import fetch_buckets
 from smart_meter.models import SmartMeter, GroupParticipant, GroupMeter, SolarMeasurement, GasMeasurement, \
-    PowerMeasurement
+    PowerMeasurement, GroupEnergyInterval, MeterQualityReport
+from smart_meter.pagination import MeasurementCursorPagination
 from smart_meter.permissions import UserOwnerOfMeter, UserManagerOfGroupMeter, RequestUserIsPartOfGroupMeter, \
     RequestFromNodejs, RequestUserIsManagerOfGroupMeter
+from smart_meter.services.buckets import aligned_buckets
+from smart_meter.services.deletion import MeterDeleter
+from smart_meter.services.group_series import GroupSeriesAggregator
+from smart_meter.services.import_data import ImportQueue
+from smart_meter.services.merge import MeterMerger
+from smart_meter.services.partitions import MEASUREMENT_TYPES
 from smart_meter.serializers.serializers import MeterDetailSerializer, MeterListSerializer, GroupMeterDetailSerializer, \
     GroupMeterListSerializer, GroupParticipationDetailSerializer, GroupParticipationListSerializer, \
     GasMeasurementSerializer, SolarMeasurementSerializer, PowerMeasurementSerializer, NewMeasurementSerializer, \
     GroupMeterViewSerializer, GroupMeterInviteInfoSerializer, GroupLiveDataSerializer, NewMeasurementTestSerializer, \
-    MeterMeasurementsDetailSerializer, ManageGroupParticipantSerializer
+    MeterMeasurementsDetailSerializer, ManageGroupParticipantSerializer, MeterMergeSerializer, GapSpanSerializer, \
+    GroupEnergyIntervalSerializer, MeterQualityReportSerializer, MeterImportSerializer, MeterSeriesSerializer, \
+    MeasurementColumnsSerializer, MeterMeasurementsColumnsSerializer
+from smart_meter.streaming import StreamedList, streaming_response
 from users.permissions import RequestUserIsRelatedToUser
 from users.views import SubUserView
 
@@ -58,7 +74,8 @@ class UserMeterListView(SubUserView, ListAPIView):
     serializer_class = MeterListSerializer
 
     def get_queryset(self):
-        return SmartMeter.objects.user_meters(self.user_id)
+        # power_timestamp is in the live values of the meter
+        return SmartMeter.objects.user_meters(self.user_id).alias(power_timestamp=F('live__power_timestamp'))
 
 
 class UserMeterDetailView(SubUserView, RetrieveUpdateDestroyAPIView):
@@ -69,6 +86,7 @@ class UserMeterDetailView(SubUserView, RetrieveUpdateDestroyAPIView):
     `PUT`:
     `DELETE`:
     """
+    replica_reads = True
     GET_permissions = [RequestUserIsRelatedToUser]
     PUT_permissions = GET_permissions
     DELETE_permissions = GET_permissions
@@ -77,12 +95,24 @@ class UserMeterDetailView(SubUserView, RetrieveUpdateDestroyAPIView):
 
     def get_serializer_class(self):
         if self.request.query_params.get('measurements'):
+            if self.request.query_params.get('columnar'):
+                return MeterMeasurementsColumnsSerializer
             return MeterMeasurementsDetailSerializer
         return MeterDetailSerializer
 
     def get_queryset(self):
         return SmartMeter.objects.user_meters(self.user_id)
 
+    def retrieve(self, request, *args, **kwargs):
+        # With `stream` the measurement sets are streamed, see MeterMeasurementsDetailSerializer.to_stream
+        if request.query_params.get('stream') and issubclass(self.get_serializer_class(),
+                                                             MeterMeasurementsDetailSerializer):
+            if request.query_params.get('columnar'):
+                raise ValidationError('Columnar measurements can not be streamed')
+            instance = self.get_object()
+            return streaming_response(self.get_serializer(instance).to_stream(instance))
+        return super().retrieve(request, *args, **kwargs)
+
     def perform_destroy(self, instance: SmartMeter):
         group = instance.group_participation.group if instance.group_participation else None
         if group and group.manager_id == self.user_id:
@@ -90,15 +120,52 @@ class UserMeterDetailView(SubUserView, RetrieveUpdateDestroyAPIView):
                 'Kan meter "%s" niet verwijderen, je bent momenteel manager van de groep "%s". Draag de groep eerst '
                 'over of verwijder de groep en probeer het daarna nog eens.' % (instance.name, group.name)
             )
-        super().perform_destroy(instance)
-
-
-class PowerMeasurementListView(SubUserView, SubMeterView, ListAPIView):
+        # The measurements are deleted in the background (purge_deleted command)
+        MeterDeleter().mark_meter(instance)
+
+
+class MeasurementListMixin:
+    """
+    Mixin for the measurement list views. When the gaps are filled (`gaps` parameter), the buckets are returned under
+    `results` with a summary of the gaps under `gaps`. With `page_size` the buckets are paginated, under `results`
+    with the url of the next page under `next` (see MeasurementCursorPagination). With `stream` the buckets are read
+    from a server-side cursor and written while they are read (see streaming.StreamedList). With `columnar` the buckets
+    are returned as one array per field (see MeasurementColumnsSerializer)
+    """
+    pagination_class = MeasurementCursorPagination
+
+    def serialize(self, buckets):
+        if self.request.query_params.get('columnar'):
+            return MeasurementColumnsSerializer(buckets, row_serializer=self.get_serializer_class()).data
+        return self.get_serializer(buckets, many=True).data
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.serialize(page))
+        if request.query_params.get('stream'):
+            if request.query_params.get('columnar'):
+                raise ValidationError('Columnar measurements can not be streamed')
+            data = StreamedList(queryset, self.get_serializer())
+            if not queryset.gap_fill:
+                return streaming_response(data)
+            return streaming_response({
+                'results': data, 'gaps': lambda: GapSpanSerializer(queryset.gap_spans(), many=True).data
+            })
+        data = self.serialize(queryset)
+        if not queryset.gap_fill:
+            return Response(data)
+        return Response({'results': data, 'gaps': GapSpanSerializer(queryset.gap_spans(), many=True).data})
+
+
+class PowerMeasurementListView(MeasurementListMixin, SubUserView, SubMeterView, ListAPIView):
     """
     List of power measurements for a meter (from user)
     Available request methods: GET
     `GET`:
     """
+    replica_reads = True
     GET_permissions = [RequestUserIsRelatedToUser, UserOwnerOfMeter]
     filter_backends = [filters.SearchFilter, DjangoFilterBackend, filters.OrderingFilter]
     search_fields = ['name']
@@ -111,12 +178,13 @@ class PowerMeasurementListView(SubUserView, SubMeterView, ListAPIView):
         return PowerMeasurement.objects.filter(meter_id=self.meter_id)
 
 
-class GasMeasurementListView(SubUserView, SubMeterView, ListAPIView):
+class GasMeasurementListView(MeasurementListMixin, SubUserView, SubMeterView, ListAPIView):
     """
     List of gas measurements for a meter (from user)
     Available request methods: GET
     `GET`:
     """
+    replica_reads = True
     GET_permissions = [RequestUserIsRelatedToUser, UserOwnerOfMeter]
     filter_backends = [filters.SearchFilter, DjangoFilterBackend, filters.OrderingFilter]
     search_fields = ['name']
@@ -129,12 +197,13 @@ class GasMeasurementListView(SubUserView, SubMeterView, ListAPIView):
         return GasMeasurement.objects.filter(meter_id=self.meter_id)
 
 
-class SolarMeasurementListView(SubUserView, SubMeterView, ListAPIView):
+class SolarMeasurementListView(MeasurementListMixin, SubUserView, SubMeterView, ListAPIView):
     """
     List of solar measurements for a meter (from user)
     Available request methods: GET
     `GET`:
     """
+    replica_reads = True
     GET_permissions = [RequestUserIsRelatedToUser, UserOwnerOfMeter]
     filter_backends = [filters.SearchFilter, DjangoFilterBackend, filters.OrderingFilter]
     search_fields = ['name']
@@ -147,6 +216,86 @@ class SolarMeasurementListView(SubUserView, SubMeterView, ListAPIView):
         return SolarMeasurement.objects.filter(meter_id=self.meter_id)
 
 
+class MeterSeriesView(SubUserView, SubMeterView, ListAPIView):
+    """
+    Power, gas and solar buckets of a meter on the same grid (one row per bucket), with the usage of the period
+    Available request methods: GET
+    `GET`:
+    The buckets of the measurement types are fetched in one query. Buckets without measurements are null (or carried
+    forward with `gaps` carry), with `max_points` consecutive buckets are merged. With `columnar` the buckets are
+    returned as one array per field
+    """
+    replica_reads = True
+    GET_permissions = [RequestUserIsRelatedToUser, UserOwnerOfMeter]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = MeterSeriesFilter
+    serializer_class = MeterSeriesSerializer
+
+    def get_queryset(self):
+        # The filters are applied to the measurements of each type, see list
+        return PowerMeasurement.objects.filter(meter_id=self.meter_id)
+
+    def list(self, request, *args, **kwargs):
+        # The database of the measurements is taken from the meter, instead of looked up for every measurement type
+        meter = SmartMeter.objects.select_related(None).only('measurement_database').get(pk=self.meter_id)
+        series = []
+        for model in MEASUREMENT_TYPES.values():
+            queryset = self.filter_queryset(model.objects.filter(meter=meter))
+            series.append(queryset.fill_gaps(queryset.gap_fill or 'null'))
+        fetch_buckets(series)
+        buckets = aligned_buckets(series, series[0].bucket_size)
+        if request.query_params.get('columnar'):
+            data = {'results': MeasurementColumnsSerializer(buckets, row_serializer=self.get_serializer_class()).data}
+        else:
+            data = {'results': self.get_serializer(buckets, many=True).data}
+        for queryset in series:
+            for total in queryset.model.delta_fields():
+                data['period_%s' % total[len('total_'):]] = queryset.bucket_period_total(total)
+        return Response(data)
+
+
+class MeterMergeView(SubUserView, SubMeterView, CreateAPIView):
+    """
+    Merge the history of another meter of the user into this meter, for example after the smart meter was replaced
+    Available request methods: POST
+    `POST`:
+    The other meter is merged right away, its measurements are moved in the background (merge_meters command)
+    """
+    POST_permissions = [RequestUserIsRelatedToUser, UserOwnerOfMeter]
+    serializer_class = MeterMergeSerializer
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
+    def perform_create(self, serializer):
+        target = SmartMeter.objects.user_meters(self.user_id).get(pk=self.meter_id)
+        MeterMerger(target, serializer.validated_data['meter']).start()
+
+
+class MeterImportView(SubUserView, SubMeterView, CreateAPIView):
+    """
+    Import the measurement history of this meter from an export of it (or of another meter)
+    Available request methods: POST
+    `POST`:
+    Multipart upload of a ZIP archive or CSV file (power.csv, gas.csv, solar.csv), imported in the background
+    (import_meter_data command)
+    """
+    POST_permissions = [RequestUserIsRelatedToUser, UserOwnerOfMeter]
+    serializer_class = MeterImportSerializer
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        meter = SmartMeter.objects.user_meters(self.user_id).get(pk=self.meter_id)
+        ImportQueue().add(
+            meter, serializer.validated_data['file'], update=serializer.validated_data['update'],
+            skip_invalid=serializer.validated_data['skip_invalid'],
+        )
+        return Response(status=status.HTTP_202_ACCEPTED)
+
+
 class GroupMeterListView(SubUserView, ListCreateAPIView):
     """
     List of group meters for a user (manager).
@@ -225,6 +374,32 @@ class GroupParticipantDetailView(SubGroupMeterView, RetrieveUpdateDestroyAPIView
     def get_queryset(self):
         return GroupParticipant.objects.filter(group_id=self.group_id)
 
+    def perform_destroy(self, instance: GroupParticipant):
+        with transaction.atomic():
+            instance.delete()
+            # The usage of the participant is no longer part of the group history
+            GroupSeriesAggregator().remove_participation(instance.group_id, instance.meter_id, instance.joined_on,
+                                                         instance.left_on)
+
+
+class GroupEnergySeriesView(SubGroupMeterView, ListAPIView):
+    """
+    Combined usage of the participants of a group per hour, for the group history chart. Only the usage of each
+    participant within its participation counts (see services.group_series)
+    Available request methods: GET
+    `GET`:
+    """
+    replica_reads = True
+    GET_permissions = [RequestUserIsPartOfGroupMeter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    ordering_fields = ['timestamp']
+    ordering = ['timestamp']
+    filterset_class = GroupEnergyIntervalFilter
+    serializer_class = GroupEnergyIntervalSerializer
+
+    def get_queryset(self):
+        return GroupEnergyInterval.objects.filter(group_id=self.group_id)
+
 
 class MeterParticipationListView(SubUserView, ListCreateAPIView):
     """
@@ -284,6 +459,7 @@ class GroupDisplayView(SubUserView, RetrieveAPIView):
     `GET`:
     Returns group meter info and participant info
     """
+    replica_reads = True
     serializer_class = GroupMeterViewSerializer
     GET_permissions = [RequestUserIsPartOfGroupMeter]
 
@@ -303,6 +479,7 @@ class PublicGroupDisplayView(RetrieveAPIView):
     `GET`:
     Returns group meter info and participant info
     """
+    replica_reads = True
     serializer_class = GroupMeterViewSerializer
     lookup_field = 'public_key'
 
@@ -352,6 +529,42 @@ class GroupLiveDataView(ListAPIView):
         return GroupMeter.objects.live_groups(group_ids)
 
 
+class MeterQualityReportListView(ListAPIView):
+    """
+    Data quality reports of the meters (see the scan_measurement_quality command), most issues first. Only for admins
+    Available request methods: GET
+    `GET`:
+    Filter on a minimum amount of issues (issues) or on a kind of issue (issue)
+    """
+    GET_permissions = [permissions.IsAdminUser]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    ordering_fields = ['issues', 'scanned_on', 'meter']
+    ordering = ['-issues', 'meter']
+    filterset_class = MeterQualityReportFilter
+    serializer_class = MeterQualityReportSerializer
+    queryset = MeterQualityReport.objects.all()
+
+
+class MeterQualityReportDetailView(RetrieveAPIView):
+    """
+    Data quality report of a meter. Only for admins
+    Available request methods: GET, POST
+    `GET`:
+    The report of the last scan
+    `POST`:
+    Request a new scan of the meter, scanned in the background (scan_measurement_quality --requested)
+    """
+    GET_permissions = [permissions.IsAdminUser]
+    POST_permissions = GET_permissions
+    serializer_class = MeterQualityReportSerializer
+    queryset = MeterQualityReport.objects.all()
+
+    def post(self, request, *args, **kwargs):
+        meter = get_object_or_404(SmartMeter.objects.visible(), pk=self.kwargs['pk'])
+        MeterQualityReport.objects.update_or_create(meter=meter, defaults={'requested_on': timezone.now()})
+        return Response(status=status.HTTP_202_ACCEPTED)
+
+
 class PingView(APIView):
     """Debugging view for testing api connection"""
 
@@ -11,13 +11,13 @@ class UserManager(BaseUserManager):
         return self.filter(is_active=True)
 
     def active_in_group(self, group_id):
-        return self.filter(
-            meters__group_participations__group=group_id,
-            meters__group_participations__left_on__isnull=True,
-        ).distinct()
+        from smart_meter.models import GroupParticipant
+        return self.filter(models.Exists(
+            GroupParticipant.objects.active().filter(group=group_id, meter__user=models.OuterRef('pk'))
+        ))
 
     def user_statistics(self):
-        return self.aggregate(
+        return self.filter(deleted_on__isnull=True).aggregate(
             total_users=models.Count('pk'),
         )
 
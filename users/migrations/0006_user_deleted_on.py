@@ -0,0 +1,18 @@
+# Generated by Django 6.0.5 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_alter_resetpasswordaction_id_alter_user_first_name_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='deleted_on',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
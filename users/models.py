@@ -27,6 +27,8 @@ class User(AbstractUser):
     default_meter = models.ForeignKey('smart_meter.SmartMeter', on_delete=models.SET_NULL, null=True,
                                       related_name='default')
     verified_email = models.EmailField(null=True, unique=True)
+    # Set when the user is deleted, the user is deactivated and deleted in the background (see purge_deleted)
+    deleted_on = models.DateTimeField(null=True)
 
     def new_api_key(self):
         self.api_key = api_key_gen()
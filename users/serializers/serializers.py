@@ -119,7 +119,7 @@ class UserDetailSerializer(serializers.ModelSerializer):
     def get_fields(self):
         fields = super().get_fields()
         # Limit selection of default meter to those of the user
-        fields['default_meter'].queryset = SmartMeter.objects.filter(user_id=self.context['view'].kwargs.get('pk'))
+        fields['default_meter'].queryset = SmartMeter.objects.user_meters(self.context['view'].kwargs.get('pk'))
         return fields
 
     def validate_new_password(self, value):
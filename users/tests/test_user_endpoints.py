@@ -323,12 +323,12 @@ class TestUserDetailDelete(UserTestMixin, TestCase):
     def test_user_detail_delete_as_user_success(self):
         # given
         self.client.force_authenticate(self.user)
-        pre_user_count = User.objects.count()
+        pre_user_count = User.objects.active_users().count()
         # when
         response = self.client.delete(self.UserUrls.user_url(self.user.pk))
         # then
         self.assertEqual(status.HTTP_204_NO_CONTENT, response.status_code)
-        self.assertEqual(pre_user_count - 1, User.objects.count())
+        self.assertEqual(pre_user_count - 1, User.objects.active_users().count())
 
     @tag('permission')
     def test_user_detail_delete_as_other_user_fail_forbidden(self):
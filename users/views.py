@@ -11,6 +11,7 @@ from rest_framework.exceptions import ValidationError
 from rest_framework.generics import CreateAPIView, RetrieveAPIView, RetrieveUpdateDestroyAPIView, RetrieveUpdateAPIView, \
     UpdateAPIView
 
+from smart_meter.services.deletion import MeterDeleter
 from users.models import User, ResetPasswordAction
 from users.permissions import RequestUserIsRelatedToUser
 from users.serializers import UserListSerializer, UserDetailSerializer, ResetPasswordRequestSerializer, \
@@ -86,7 +87,8 @@ class UserDetailView(RetrieveUpdateDestroyAPIView):
                 'Kan account "%s" niet verwijderen, je bent momenteel manager van de groep "%s". Draag de groep eerst '
                 'over of verwijder de groep en probeer het daarna nog eens.' % (instance.username, group.name)
             )
-        super().perform_destroy(instance)
+        # The meters and the user are deleted in the background (purge_deleted command)
+        MeterDeleter().mark_user(instance)
 
 
 class ResetPasswordRequestView(CreateAPIView):